@@ -19,6 +19,8 @@ from apps.accounts.permissions import (
 
 from core.models import UserAgent, CoreSettings
 from core.utils import RedisClient
+from apps.output.epg_cache import invalidate_epg_cache
+from .logo_cache import cached_logo_response, get_prefetch_stats
 
 from .models import (
     Stream,
@@ -645,6 +647,7 @@ class ChannelViewSet(viewsets.ModelViewSet):
             for channel_id in channel_ids:
                 Channel.objects.filter(id=channel_id).update(channel_number=channel_num)
                 channel_num = channel_num + 1
+            invalidate_epg_cache()
 
         return Response(
             {"message": "Channels have been auto-assigned!"}, status=status.HTTP_200_OK
@@ -1319,7 +1322,7 @@ class LogoViewSet(viewsets.ModelViewSet):
     parser_classes = (MultiPartParser, FormParser, JSONParser)
 
     def get_permissions(self):
-        if self.action in ["upload"]:
+        if self.action in ["upload", "prefetch_stats"]:
             return [IsAdmin()]
 
         if self.action in ["cache"]:
@@ -1519,6 +1522,18 @@ class LogoViewSet(viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED,
         )
 
+    @swagger_auto_schema(
+        method="get",
+        operation_description="Per-host latency and failure stats from the last background logo prefetch",
+        responses={200: "Prefetch stats", 204: "No prefetch has run yet"},
+    )
+    @action(detail=False, methods=["get"], url_path="prefetch-stats")
+    def prefetch_stats(self, request):
+        stats = get_prefetch_stats()
+        if stats is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(stats)
+
     @action(detail=True, methods=["get"], permission_classes=[AllowAny])
     def cache(self, request, pk=None):
         """Streams the logo file, whether it's local or remote."""
@@ -1543,54 +1558,8 @@ class LogoViewSet(viewsets.ModelViewSet):
             )
             return response
 
-        else:  # Remote image
-            try:
-                # Get the default user agent
-                try:
-                    default_user_agent_id = CoreSettings.get_default_user_agent_id()
-                    user_agent_obj = UserAgent.objects.get(id=int(default_user_agent_id))
-                    user_agent = user_agent_obj.user_agent
-                except (CoreSettings.DoesNotExist, UserAgent.DoesNotExist, ValueError):
-                    # Fallback to hardcoded if default not found
-                    user_agent = 'Dispatcharr/1.0'
-
-                # Add proper timeouts to prevent hanging
-                remote_response = requests.get(
-                    logo_url,
-                    stream=True,
-                    timeout=(3, 5),  # (connect_timeout, read_timeout)
-                    headers={'User-Agent': user_agent}
-                )
-                if remote_response.status_code == 200:
-                    # Try to get content type from response headers first
-                    content_type = remote_response.headers.get("Content-Type")
-
-                    # If no content type in headers or it's empty, guess based on URL
-                    if not content_type:
-                        content_type, _ = mimetypes.guess_type(logo_url)
-
-                    # If still no content type, default to common image type
-                    if not content_type:
-                        content_type = "image/jpeg"
-
-                    response = StreamingHttpResponse(
-                        remote_response.iter_content(chunk_size=8192),
-                        content_type=content_type,
-                    )
-                    response["Content-Disposition"] = 'inline; filename="{}"'.format(
-                        os.path.basename(logo_url)
-                    )
-                    return response
-                raise Http404("Remote image not found")
-            except requests.exceptions.Timeout:
-                logger.warning(f"Timeout fetching logo from {logo_url}")
-                raise Http404("Logo request timed out")
-            except requests.exceptions.ConnectionError:
-                logger.warning(f"Connection error fetching logo from {logo_url}")
-                raise Http404("Unable to connect to logo server")
-            except requests.RequestException as e:
-                logger.warning(f"Error fetching logo from {logo_url}: {e}")
-                raise Http404("Error fetching remote image")
+        else:  # Remote image, served through the on-disk logo cache
+            return cached_logo_response(request, logo_url)
 
 
 class ChannelProfileViewSet(viewsets.ModelViewSet):
@@ -1694,6 +1663,7 @@ class BulkUpdateChannelMembershipAPIView(APIView):
                     membership_dict[channel_id].enabled = enabled_status
 
             ChannelProfileMembership.objects.bulk_update(memberships, ["enabled"])
+            invalidate_epg_cache()
 
             return Response({"status": "success"}, status=status.HTTP_200_OK)
 
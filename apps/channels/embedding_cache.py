@@ -0,0 +1,194 @@
+"""
+Persistent sentence-transformer embeddings of EPG names for ML-assisted matching.
+
+Embeddings are stored per EPGSource as a .npy matrix (one L2-normalized row per
+distinct normalized EPG name, in sorted order) named after a content hash of
+the model and names, so an unchanged source is memory-mapped straight from
+disk. When a source's names change, rows for names that are still present are
+copied from the previous matrix and only new names are encoded.
+"""
+import hashlib
+import json
+import logging
+import os
+import uuid
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_TRANSFORMER_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+ENCODE_BATCH_SIZE = 64
+
+
+class EPGEmbeddingIndex:
+    """
+    Cosine-similarity lookup over the norm_name of each EPG row.
+
+    epg_rows are the dicts built for match_channels_to_epg; rows are grouped by
+    epg_source_id and each source's embeddings come from the on-disk cache.
+    """
+
+    def __init__(self, st_model, epg_rows, model_name=SENTENCE_TRANSFORMER_MODEL):
+        self.st_model = st_model
+        self.size = len(epg_rows)
+        # (matrix, epg row indexes, matrix row for each of those)
+        self.parts = []
+
+        rows_by_source = {}
+        for index, row in enumerate(epg_rows):
+            rows_by_source.setdefault(row.get("epg_source_id"), []).append(index)
+
+        for source_id, indexes in rows_by_source.items():
+            names = sorted({epg_rows[i]["norm_name"] for i in indexes})
+            if source_id is None:
+                matrix = _encode(st_model, names)
+            else:
+                matrix = load_source_embeddings(st_model, source_id, names, model_name)
+            positions = {name: position for position, name in enumerate(names)}
+            self.parts.append((
+                matrix,
+                np.array(indexes, dtype=np.int64),
+                np.array([positions[epg_rows[i]["norm_name"]] for i in indexes], dtype=np.int64),
+            ))
+
+    def similarities(self, text):
+        """Cosine similarity of text against every EPG row, in epg_rows order."""
+        vector = _encode(self.st_model, [text])[0]
+        scores = np.empty(self.size, dtype=np.float32)
+        for matrix, indexes, positions in self.parts:
+            scores[indexes] = (matrix @ vector)[positions]
+        return scores
+
+    def best_match(self, text):
+        """Return (epg row index, similarity) of the closest EPG row to text."""
+        scores = self.similarities(text)
+        top_index = int(scores.argmax())
+        return top_index, float(scores[top_index])
+
+
+def load_source_embeddings(st_model, source_id, names, model_name=SENTENCE_TRANSFORMER_MODEL):
+    """
+    Return the embedding matrix for names (sorted, distinct) of an EPG source,
+    encoding only the names the cache hasn't seen.
+    """
+    source_dir = _source_dir(source_id)
+    key = _names_key(names, model_name)
+    path = os.path.join(source_dir, f"{key}.npy")
+
+    try:
+        return np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        pass
+
+    # Reuse rows for names that are still present from the latest previous matrix
+    previous = _latest_entry(source_dir, model_name)
+    reused = {}
+    if previous is not None:
+        previous_names, previous_matrix = previous
+        reused = {name: previous_matrix[i] for i, name in enumerate(previous_names)}
+
+    missing = [name for name in names if name not in reused]
+    logger.info(
+        f"Encoding {len(missing)} of {len(names)} EPG names for source {source_id} "
+        f"({len(names) - len(missing)} cached)"
+    )
+    encoded = dict(zip(missing, _encode(st_model, missing))) if missing else {}
+
+    dimension = len(next(iter(encoded.values()))) if encoded else len(next(iter(reused.values())))
+    matrix = np.empty((len(names), dimension), dtype=np.float32)
+    for i, name in enumerate(names):
+        matrix[i] = encoded[name] if name in encoded else reused[name]
+
+    try:
+        _write_entry(source_dir, key, names, model_name, matrix)
+        _remove_other_entries(source_dir, key)
+    except OSError as e:
+        logger.warning(f"Unable to persist EPG embeddings for source {source_id}: {e}")
+    return matrix
+
+
+def delete_source_embeddings(source_id):
+    """Drop the cached embeddings of an EPG source."""
+    source_dir = _source_dir(source_id)
+    if os.path.isdir(source_dir):
+        _remove_other_entries(source_dir, None)
+        try:
+            os.rmdir(source_dir)
+        except OSError:
+            pass
+
+
+def _source_dir(source_id):
+    return os.path.join(settings.EPG_EMBEDDING_CACHE_DIR, f"source_{source_id}")
+
+
+def _names_key(names, model_name):
+    digest = hashlib.sha1(model_name.encode("utf-8"))
+    for name in names:
+        digest.update(b"\n")
+        digest.update(name.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _encode(st_model, texts):
+    vectors = st_model.encode(
+        texts,
+        batch_size=ENCODE_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def _latest_entry(source_dir, model_name):
+    """Newest complete (names, matrix) pair in source_dir for model_name, or None."""
+    try:
+        candidates = sorted(
+            (entry for entry in os.scandir(source_dir) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime,
+            reverse=True,
+        )
+    except OSError:
+        return None
+
+    for entry in candidates:
+        try:
+            with open(entry.path, "r") as f:
+                meta = json.load(f)
+            if meta.get("model") != model_name:
+                continue
+            matrix = np.load(entry.path[: -len(".json")] + ".npy", mmap_mode="r")
+            if matrix.shape[0] == len(meta["names"]):
+                return meta["names"], matrix
+        except (OSError, ValueError, KeyError):
+            continue
+    return None
+
+
+def _write_entry(source_dir, key, names, model_name, matrix):
+    os.makedirs(source_dir, exist_ok=True)
+    suffix = uuid.uuid4().hex[:8]
+
+    # Names first: a .npy without its .json is never used for incremental reuse
+    meta_tmp = os.path.join(source_dir, f"{key}.json.{suffix}.tmp")
+    with open(meta_tmp, "w") as f:
+        json.dump({"model": model_name, "names": names}, f)
+    os.replace(meta_tmp, os.path.join(source_dir, f"{key}.json"))
+
+    matrix_tmp = os.path.join(source_dir, f"{key}.{suffix}.tmp")
+    with open(matrix_tmp, "wb") as f:
+        np.save(f, matrix)
+    os.replace(matrix_tmp, os.path.join(source_dir, f"{key}.npy"))
+
+
+def _remove_other_entries(source_dir, keep_key):
+    for entry in os.scandir(source_dir):
+        if keep_key is not None and entry.name.startswith(f"{keep_key}."):
+            continue
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
@@ -0,0 +1,481 @@
+"""
+Disk cache for remote channel logos.
+
+Logos are stored content-addressed by URL (sha256) with a JSON sidecar holding
+the upstream validators and expiry. Expired entries are revalidated with
+If-None-Match/If-Modified-Since, upstream 404s are cached negatively so dead
+URLs aren't retried on every grid render, and concurrent misses for the same
+URL share a single upstream fetch. The cache is bounded in size and evicts the
+least recently served logos first.
+
+When nginx fronts the request (it sends `X-Sendfile-Type: X-Accel-Redirect`),
+the file body is handed back to nginx with X-Accel-Redirect instead of being
+streamed through a worker.
+"""
+import email.utils
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+from urllib.parse import urlparse
+
+import gevent
+import requests
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+
+from core.models import CoreSettings, UserAgent
+from core.utils import RedisClient
+
+logger = logging.getLogger(__name__)
+
+FETCH_LOCK_PREFIX = "channels:logo_cache:fetch:"
+PREFETCH_STATS_KEY = "channels:logo_cache:prefetch_stats"
+PREFETCH_STATS_TTL = 7 * 86400
+FETCH_LOCK_TTL = 15  # Longer than the worst-case upstream fetch, in seconds
+FETCH_TIMEOUT = (3, 5)  # (connect_timeout, read_timeout)
+FETCH_POLL_INTERVAL = 0.1
+MAX_LOGO_BYTES = 5 * 1024 * 1024
+ERROR_TTL = 60  # Back-off after timeouts/5xx so a slow CDN can't tie up workers
+TOUCH_INTERVAL = 3600  # Only bump an entry's LRU position this often
+EVICT_INTERVAL = 300
+EVICT_TARGET = 0.9  # Evict down to this fraction of LOGO_CACHE_MAX_BYTES
+EVICT_WRITE_FRACTION = 0.05  # Also scan once this fraction of the budget was written since the last scan
+CLIENT_MAX_AGE = 3600
+USER_AGENT_TTL = 300
+PREFETCH_PROGRESS_INTERVAL = 30
+
+_user_agent = (None, 0)
+_last_evict = 0
+_written_since_evict = 0
+
+
+def cached_logo_response(request, logo_url):
+    """Serve a remote logo from the disk cache, fetching or revalidating it as needed."""
+    key, body_path, meta_path = _entry_paths(logo_url)
+
+    meta = _read_meta(meta_path)
+    if meta is None or meta["expires"] <= time.time():
+        meta, _ = _refresh(logo_url, key, body_path, meta_path, meta)
+
+    if meta is None or meta.get("status") != 200 or not os.path.exists(body_path):
+        raise Http404("Remote image not found")
+
+    return _logo_response(request, logo_url, key, body_path, meta)
+
+
+def prefetch_logo(url, session=None):
+    """
+    Make sure url is in the cache without serving it.
+
+    Returns one of "cached" (already fresh), "fetched", "not_modified",
+    "not_found", "failed" or "coalesced" (another worker is fetching it).
+    A session passed in must carry the User-Agent header.
+    """
+    key, body_path, meta_path = _entry_paths(url)
+    meta = _read_meta(meta_path)
+    if meta is not None and meta["expires"] > time.time():
+        return "cached"
+    # Nothing is waiting on the result, so don't wait for another worker's fetch either
+    _, outcome = _refresh(url, key, body_path, meta_path, meta, session=session, wait=False)
+    return outcome
+
+
+def prefetch_logos(urls, workers=16, per_host=4, progress=None):
+    """
+    Warm the cache for every url in parallel.
+
+    At most `workers` fetches run at once and at most `per_host` of them
+    against any single upstream host, each host getting its own bounded
+    connection pool. Per-host latency/outcome stats are stored in Redis
+    (see get_prefetch_stats()) and returned. progress, if given, is called
+    every PREFETCH_PROGRESS_INTERVAL seconds while logos keep completing.
+    """
+    by_host = defaultdict(list)
+    for url in urls:
+        by_host[urlparse(url).netloc.lower()].append(url)
+
+    # Resolved once here: the worker threads would each open a DB connection for it
+    user_agent = _default_user_agent()
+    sessions = {}
+    limits = {}
+    for host in by_host:
+        session = requests.Session()
+        session.headers["User-Agent"] = user_agent
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=per_host)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        sessions[host] = session
+        limits[host] = threading.BoundedSemaphore(per_host)
+
+    stats = {host: {"outcomes": defaultdict(int), "latencies": []} for host in by_host}
+    stats_lock = threading.Lock()
+    last_progress = time.monotonic()
+
+    def fetch(host, url):
+        nonlocal last_progress
+        with limits[host]:
+            started = time.monotonic()
+            try:
+                outcome = prefetch_logo(url, session=sessions[host])
+            except Exception as e:
+                logger.warning(f"Error prefetching logo {url}: {e}")
+                outcome = "failed"
+            elapsed = time.monotonic() - started
+        with stats_lock:
+            stats[host]["outcomes"][outcome] += 1
+            if outcome != "cached":
+                stats[host]["latencies"].append(elapsed)
+            if progress is not None and time.monotonic() - last_progress >= PREFETCH_PROGRESS_INTERVAL:
+                last_progress = time.monotonic()
+                try:
+                    progress()
+                except Exception as e:
+                    logger.debug(f"Logo prefetch progress callback failed: {e}")
+
+    started = time.time()
+    # Interleave hosts so a single large host doesn't occupy every worker
+    queues = [[(host, url) for url in host_urls] for host, host_urls in by_host.items()]
+    ordered = [item for batch in zip_longest(*queues) for item in batch if item is not None]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        list(executor.map(lambda item: fetch(*item), ordered))
+    for session in sessions.values():
+        session.close()
+
+    hosts = {}
+    totals = defaultdict(int)
+    for host, host_stats in stats.items():
+        for outcome, count in host_stats["outcomes"].items():
+            totals[outcome] += count
+        hosts[host] = _host_summary(host_stats["outcomes"], host_stats["latencies"])
+
+    result = {
+        "finished_at": int(time.time()),
+        "duration": round(time.time() - started, 1),
+        "logos": len(ordered),
+        "totals": dict(totals),
+        "hosts": hosts,
+    }
+
+    redis_client = RedisClient.get_client()
+    if redis_client is not None:
+        try:
+            redis_client.set(PREFETCH_STATS_KEY, json.dumps(result), ex=PREFETCH_STATS_TTL)
+        except Exception as e:
+            logger.debug(f"Unable to store logo prefetch stats: {e}")
+    return result
+
+
+def _host_summary(outcomes, latencies):
+    summary = {
+        "requests": len(latencies),
+        "outcomes": dict(outcomes),
+        "failure_rate": 0.0,
+        "avg_ms": None,
+        "p95_ms": None,
+        "max_ms": None,
+    }
+    if latencies:
+        latencies = sorted(latencies)
+        summary.update(
+            failure_rate=round(outcomes.get("failed", 0) / len(latencies), 3),
+            avg_ms=round(sum(latencies) / len(latencies) * 1000, 1),
+            p95_ms=round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+            max_ms=round(latencies[-1] * 1000, 1),
+        )
+    return summary
+
+
+def get_prefetch_stats():
+    """Stats from the last prefetch_logos() run, or None."""
+    redis_client = RedisClient.get_client()
+    if redis_client is None:
+        return None
+    try:
+        stats = redis_client.get(PREFETCH_STATS_KEY)
+    except Exception:
+        return None
+    return json.loads(stats) if stats else None
+
+
+def _entry_paths(url):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    base = os.path.join(settings.LOGO_CACHE_DIR, key[:2], key)
+    return key, base, f"{base}.json"
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = f"{meta_path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+def _usable(meta, body_path):
+    return meta is not None and meta.get("status") == 200 and os.path.exists(body_path)
+
+
+def _refresh(url, key, body_path, meta_path, stale, session=None, wait=True):
+    """
+    Fetch or revalidate an entry, making sure only one worker hits upstream per URL.
+    With wait, a caller that loses the race waits for the other fetch to finish.
+    Returns (meta, outcome), see prefetch_logo() for outcomes.
+    """
+    redis_client = RedisClient.get_client()
+    if redis_client is None:
+        return _fetch(url, body_path, meta_path, stale, session)
+
+    lock_key = f"{FETCH_LOCK_PREFIX}{key}"
+    try:
+        acquired = redis_client.set(lock_key, 1, nx=True, ex=FETCH_LOCK_TTL)
+    except Exception as e:
+        logger.debug(f"Logo cache lock unavailable, fetching directly: {e}")
+        return _fetch(url, body_path, meta_path, stale, session)
+
+    if acquired:
+        try:
+            return _fetch(url, body_path, meta_path, stale, session)
+        finally:
+            try:
+                redis_client.delete(lock_key)
+            except Exception:
+                pass
+
+    # Someone else is already fetching; a stale copy is good enough in the meantime
+    if _usable(stale, body_path) or not wait:
+        return stale, "coalesced"
+
+    # Runs in the request greenlet: yield to the hub so a slow CDN doesn't stall the worker
+    deadline = time.time() + FETCH_LOCK_TTL
+    try:
+        while redis_client.exists(lock_key) and time.time() < deadline:
+            gevent.sleep(FETCH_POLL_INTERVAL)
+    except Exception:
+        pass
+    return _read_meta(meta_path), "coalesced"
+
+
+def _fetch(url, body_path, meta_path, stale, session=None):
+    """Fetch url from upstream and record the outcome in the cache."""
+    os.makedirs(os.path.dirname(body_path), exist_ok=True)
+    now = time.time()
+    revalidating = _usable(stale, body_path)
+
+    # Prefetch sessions already carry the User-Agent
+    headers = {} if session is not None else {"User-Agent": _default_user_agent()}
+    if revalidating:
+        if stale.get("etag"):
+            headers["If-None-Match"] = stale["etag"]
+        if stale.get("last_modified"):
+            headers["If-Modified-Since"] = stale["last_modified"]
+
+    try:
+        client = session or requests
+        with client.get(url, stream=True, timeout=FETCH_TIMEOUT, headers=headers) as upstream:
+            if upstream.status_code == 304 and revalidating:
+                meta = dict(stale, expires=now + settings.LOGO_CACHE_TTL)
+                _write_meta(meta_path, meta)
+                return meta, "not_modified"
+
+            if upstream.status_code == 200:
+                meta = _store(url, upstream, body_path, meta_path, now)
+                return meta, "fetched" if meta["status"] == 200 else "not_found"
+
+            if upstream.status_code in (404, 410):
+                logger.debug(f"Logo not found upstream ({upstream.status_code}): {url}")
+                meta = {"status": 404, "expires": now + settings.LOGO_CACHE_NEGATIVE_TTL}
+                _write_meta(meta_path, meta)
+                return meta, "not_found"
+
+            logger.warning(f"Unexpected status {upstream.status_code} fetching logo from {url}")
+    except requests.exceptions.Timeout:
+        logger.warning(f"Timeout fetching logo from {url}")
+    except requests.exceptions.ConnectionError:
+        logger.warning(f"Connection error fetching logo from {url}")
+    except requests.RequestException as e:
+        logger.warning(f"Error fetching logo from {url}: {e}")
+    except OSError as e:
+        logger.error(f"Error writing logo cache entry for {url}: {e}")
+
+    # Keep serving what we have, and don't retry upstream on every request
+    if revalidating:
+        meta = dict(stale, expires=now + ERROR_TTL)
+    else:
+        meta = {"status": 502, "expires": now + ERROR_TTL}
+    try:
+        _write_meta(meta_path, meta)
+    except OSError:
+        pass
+    return meta, "failed"
+
+
+def _store(url, upstream, body_path, meta_path, now):
+    global _written_since_evict
+    tmp_path = f"{body_path}.{uuid.uuid4().hex[:8]}.tmp"
+    size = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in upstream.iter_content(chunk_size=8192):
+                size += len(chunk)
+                if size > MAX_LOGO_BYTES:
+                    raise ValueError(f"logo exceeds {MAX_LOGO_BYTES} bytes")
+                f.write(chunk)
+        os.replace(tmp_path, body_path)
+    except ValueError as e:
+        logger.warning(f"Not caching logo from {url}: {e}")
+        os.remove(tmp_path)
+        meta = {"status": 404, "expires": now + settings.LOGO_CACHE_NEGATIVE_TTL}
+        _write_meta(meta_path, meta)
+        return meta
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    content_type = upstream.headers.get("Content-Type")
+    if not content_type:
+        content_type, _ = mimetypes.guess_type(urlparse(url).path)
+
+    meta = {
+        "status": 200,
+        "content_type": content_type or "image/jpeg",
+        "etag": upstream.headers.get("ETag"),
+        "last_modified": upstream.headers.get("Last-Modified"),
+        "stored": int(now),
+        "expires": now + settings.LOGO_CACHE_TTL,
+    }
+    _write_meta(meta_path, meta)
+    _written_since_evict += size
+    _maybe_evict()
+    return meta
+
+
+def _logo_response(request, url, key, body_path, meta):
+    etag = f'"{key[:16]}-{meta["stored"]:x}"'
+    _touch(body_path)
+
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    elif (
+        request.META.get("HTTP_X_SENDFILE_TYPE") == "X-Accel-Redirect"
+        and settings.LOGO_CACHE_ACCEL_PREFIX
+    ):
+        response = HttpResponse(content_type=meta["content_type"])
+        relative_path = os.path.relpath(body_path, settings.LOGO_CACHE_DIR)
+        response["X-Accel-Redirect"] = settings.LOGO_CACHE_ACCEL_PREFIX.rstrip("/") + "/" + relative_path
+    else:
+        response = FileResponse(open(body_path, "rb"), content_type=meta["content_type"])
+
+    filename = os.path.basename(urlparse(url).path) or "logo"
+    response["Content-Disposition"] = 'inline; filename="{}"'.format(filename)
+    response["ETag"] = etag
+    response["Last-Modified"] = email.utils.formatdate(meta["stored"], usegmt=True)
+    response["Cache-Control"] = f"public, max-age={CLIENT_MAX_AGE}"
+    return response
+
+
+def _etag_matches(request, etag):
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _touch(body_path):
+    """Mark an entry as recently used for LRU eviction (mtime is the access clock)."""
+    try:
+        if time.time() - os.path.getmtime(body_path) > TOUCH_INTERVAL:
+            os.utime(body_path)
+    except OSError:
+        pass
+
+
+def _default_user_agent():
+    global _user_agent
+    value, expires = _user_agent
+    if value is not None and expires > time.time():
+        return value
+
+    try:
+        default_user_agent_id = CoreSettings.get_default_user_agent_id()
+        value = UserAgent.objects.get(id=int(default_user_agent_id)).user_agent
+    except (CoreSettings.DoesNotExist, UserAgent.DoesNotExist, ValueError, TypeError):
+        # Fallback to hardcoded if default not found
+        value = "Dispatcharr/1.0"
+    _user_agent = (value, time.time() + USER_AGENT_TTL)
+    return value
+
+
+def _maybe_evict():
+    global _last_evict, _written_since_evict
+    max_bytes = settings.LOGO_CACHE_MAX_BYTES
+    # A bulk prefetch can write far more than the budget between timed scans
+    if (
+        time.monotonic() - _last_evict < EVICT_INTERVAL
+        and _written_since_evict < max_bytes * EVICT_WRITE_FRACTION
+    ):
+        return
+    _last_evict = time.monotonic()
+    _written_since_evict = 0
+    evict(settings.LOGO_CACHE_DIR, max_bytes)
+
+
+def evict(cache_dir, max_bytes):
+    """
+    Trim the cache to below max_bytes, least recently used entries first.
+    Expired negative entries are dropped regardless. Returns the number of entries removed.
+    """
+    entries = {}
+    now = time.time()
+    removed = 0
+    try:
+        for shard in os.scandir(cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                stat = entry.stat()
+                if entry.name.endswith(".tmp"):
+                    # Left behind by a crashed fetch
+                    if now - stat.st_mtime > FETCH_LOCK_TTL:
+                        os.remove(entry.path)
+                    continue
+                base = entry.path[: -len(".json")] if entry.name.endswith(".json") else entry.path
+                size, mtime = entries.get(base, (0, 0))
+                entries[base] = (size + stat.st_size, max(mtime, stat.st_mtime))
+    except OSError as e:
+        logger.debug(f"Error scanning logo cache: {e}")
+        return removed
+
+    total = sum(size for size, _ in entries.values())
+    over_budget = total > max_bytes
+    for base, (size, mtime) in sorted(entries.items(), key=lambda item: item[1][1]):
+        expired_negative = not os.path.exists(base) and now - mtime > settings.LOGO_CACHE_NEGATIVE_TTL
+        if not expired_negative and not (over_budget and total > max_bytes * EVICT_TARGET):
+            continue
+        for path in (base, f"{base}.json"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total -= size
+        removed += 1
+
+    if removed:
+        logger.debug(f"Evicted {removed} logo cache entries, {total} bytes remain")
+    return removed
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 05:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatcharr_channels', '0029_backfill_custom_stream_hashes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='channel',
+            name='hot_standby',
+            field=models.BooleanField(default=False, help_text='Keep a warm connection to the next stream for near-instant failover (uses an extra provider connection)'),
+        ),
+    ]
@@ -296,6 +296,11 @@ class Channel(models.Model):
 
     user_level = models.IntegerField(default=0)
 
+    hot_standby = models.BooleanField(
+        default=False,
+        help_text="Keep a warm connection to the next stream for near-instant failover (uses an extra provider connection)"
+    )
+
     auto_created = models.BooleanField(
         default=False,
         help_text="Whether this channel was automatically created via M3U auto channel sync"
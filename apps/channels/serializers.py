@@ -338,6 +338,7 @@ class ChannelSerializer(serializers.ModelSerializer):
             "uuid",
             "logo_id",
             "user_level",
+            "hot_standby",
             "auto_created",
             "auto_created_by",
             "auto_created_by_name",
@@ -19,6 +19,7 @@ from rapidfuzz import fuzz
 from apps.channels.models import Channel
 from apps.epg.models import EPGData
 from core.models import CoreSettings
+from apps.output.epg_cache import invalidate_epg_cache
 
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
@@ -88,8 +89,9 @@ def get_sentence_transformer():
         try:
             from sentence_transformers import SentenceTransformer
             from sentence_transformers import util
+            from .embedding_cache import SENTENCE_TRANSFORMER_MODEL
 
-            model_name = "sentence-transformers/all-MiniLM-L6-v2"
+            model_name = SENTENCE_TRANSFORMER_MODEL
             cache_dir = "/data/models"
 
             # Check environment variable to disable downloads
@@ -170,6 +172,59 @@ def normalize_name(name: str) -> str:
     norm = " ".join(tokens).strip()
     return norm
 
+REGION_CODE_PATTERN = re.compile(r'\.([a-z]{2})')
+# Channels scored against the EPG per rapidfuzz cdist call (bounds the score matrix size)
+FUZZY_MATCH_BLOCK_SIZE = 256
+
+def _region_bonus(row, region_code):
+    """Fuzzy score adjustment for an EPG row based on the preferred region."""
+    if not region_code or not row.get("tvg_id"):
+        return 0
+
+    combined_text = row["tvg_id"].lower() + " " + row["name"].lower()
+    dot_regions = REGION_CODE_PATTERN.findall(combined_text)
+
+    if dot_regions:
+        # Bigger bonus for matching region, penalty for a different one
+        return 15 if region_code in dot_regions else -15
+    if region_code in combined_text:
+        return 10
+    return 0
+
+def best_fuzzy_matches(names, epg_rows, region_code=None):
+    """
+    Find the best EPG row for each normalized channel name.
+
+    Scores are fuzz.ratio(name, row["norm_name"]) plus the region bonus, computed
+    with rapidfuzz's vectorized cdist instead of a Python loop per pair. Returns a
+    list of (score, index into epg_rows) with (0, None) when nothing scores above 0;
+    ties go to the first row, the same as a linear scan.
+    """
+    import numpy as np
+    from rapidfuzz import process
+
+    if not names or not epg_rows:
+        return [(0, None)] * len(names)
+
+    choices = [row["norm_name"] for row in epg_rows]
+    # The region bonus only depends on the EPG row, so compute it once per row
+    bonuses = np.array([_region_bonus(row, region_code) for row in epg_rows], dtype=np.float64)
+
+    results = []
+    for start in range(0, len(names), FUZZY_MATCH_BLOCK_SIZE):
+        scores = process.cdist(
+            names[start:start + FUZZY_MATCH_BLOCK_SIZE],
+            choices,
+            scorer=fuzz.ratio,
+            dtype=np.float64,
+            workers=-1,
+        )
+        scores += bonuses
+        for row_scores, best_index in zip(scores, scores.argmax(axis=1)):
+            best_score = float(row_scores[best_index])
+            results.append((best_score, int(best_index)) if best_score > 0 else (0, None))
+    return results
+
 def match_channels_to_epg(channels_data, epg_data, region_code=None, use_ml=True, send_progress=True):
     """
     EPG matching logic that finds the best EPG matches for channels using
@@ -211,7 +266,29 @@ def match_channels_to_epg(channels_data, epg_data, region_code=None, use_ml=True
         ML_HIGH_CONFIDENCE = 0.65       # Original threshold
         ML_LAST_RESORT = 0.50          # Original desperate threshold
         FUZZY_LAST_RESORT_MIN = 20     # Original minimum
-        logger.info("Using aggressive thresholds for single channel matching")    # Process each channel
+        logger.info("Using aggressive thresholds for single channel matching")
+
+    # Index EPG entries by tvg_id (first entry wins, as with a linear scan)
+    epg_by_tvg_id = {}
+    for epg in epg_data:
+        epg_by_tvg_id.setdefault(epg["tvg_id"], epg)
+    epg_with_names = [epg for epg in epg_data if epg.get("norm_name")]
+
+    # Score every channel that will need name-based matching in one vectorized pass
+    fuzzy_indexes = [
+        index for index, chan in enumerate(channels_data)
+        if chan["norm_chan"]
+        and not (chan.get("tvg_id") and chan.get("tvg_id") in epg_by_tvg_id)
+        and not (chan.get("gracenote_id") and chan.get("gracenote_id") in epg_by_tvg_id)
+    ]
+    fuzzy_results = dict(zip(
+        fuzzy_indexes,
+        best_fuzzy_matches(
+            [channels_data[index]["norm_chan"] for index in fuzzy_indexes], epg_with_names, region_code
+        ),
+    ))
+
+    # Process each channel
     for index, chan in enumerate(channels_data):
         normalized_tvg_id = chan.get("tvg_id", "")
         fallback_name = chan["tvg_id"].strip() if chan["tvg_id"] else chan["name"]
@@ -228,19 +305,19 @@ def match_channels_to_epg(channels_data, epg_data, region_code=None, use_ml=True
         fallback_name = chan["tvg_id"].strip() if chan["tvg_id"] else chan["name"]
 
         # Step 1: Exact TVG ID match
-        epg_by_tvg_id = next((epg for epg in epg_data if epg["tvg_id"] == normalized_tvg_id), None)
-        if normalized_tvg_id and epg_by_tvg_id:
-            chan["epg_data_id"] = epg_by_tvg_id["id"]
+        epg_tvg_match = epg_by_tvg_id.get(normalized_tvg_id)
+        if normalized_tvg_id and epg_tvg_match:
+            chan["epg_data_id"] = epg_tvg_match["id"]
             channels_to_update.append(chan)
-            matched_channels.append((chan['id'], fallback_name, epg_by_tvg_id["tvg_id"]))
-            logger.info(f"Channel {chan['id']} '{fallback_name}' => EPG found by exact tvg_id={epg_by_tvg_id['tvg_id']}")
+            matched_channels.append((chan['id'], fallback_name, epg_tvg_match["tvg_id"]))
+            logger.info(f"Channel {chan['id']} '{fallback_name}' => EPG found by exact tvg_id={epg_tvg_match['tvg_id']}")
             continue
 
         # Step 2: Secondary TVG ID check (legacy compatibility)
         if chan["tvg_id"]:
-            epg_match = [epg["id"] for epg in epg_data if epg["tvg_id"] == chan["tvg_id"]]
+            epg_match = epg_by_tvg_id.get(chan["tvg_id"])
             if epg_match:
-                chan["epg_data_id"] = epg_match[0]
+                chan["epg_data_id"] = epg_match["id"]
                 channels_to_update.append(chan)
                 matched_channels.append((chan['id'], fallback_name, chan["tvg_id"]))
                 logger.info(f"Channel {chan['id']} '{chan['name']}' => EPG found by secondary tvg_id={chan['tvg_id']}")
@@ -249,7 +326,7 @@ def match_channels_to_epg(channels_data, epg_data, region_code=None, use_ml=True
         # Step 2.5: Exact Gracenote ID match
         normalized_gracenote_id = chan.get("gracenote_id", "")
         if normalized_gracenote_id:
-            epg_by_gracenote_id = next((epg for epg in epg_data if epg["tvg_id"] == normalized_gracenote_id), None)
+            epg_by_gracenote_id = epg_by_tvg_id.get(normalized_gracenote_id)
             if epg_by_gracenote_id:
                 chan["epg_data_id"] = epg_by_gracenote_id["id"]
                 channels_to_update.append(chan)
@@ -262,42 +339,8 @@ def match_channels_to_epg(channels_data, epg_data, region_code=None, use_ml=True
             logger.debug(f"Channel {chan['id']} '{chan['name']}' => empty after normalization, skipping")
             continue
 
-        best_score = 0
-        best_epg = None
-
-        # Debug: show what we're matching against
-        logger.debug(f"Fuzzy matching '{chan['norm_chan']}' against EPG entries...")
-
-        # Find best fuzzy match
-        for row in epg_data:
-            if not row.get("norm_name"):
-                continue
-
-            base_score = fuzz.ratio(chan["norm_chan"], row["norm_name"])
-            bonus = 0
-
-            # Apply region-based bonus/penalty
-            if region_code and row.get("tvg_id"):
-                combined_text = row["tvg_id"].lower() + " " + row["name"].lower()
-                dot_regions = re.findall(r'\.([a-z]{2})', combined_text)
-
-                if dot_regions:
-                    if region_code in dot_regions:
-                        bonus = 15  # Bigger bonus for matching region
-                    else:
-                        bonus = -15  # Penalty for different region
-                elif region_code in combined_text:
-                    bonus = 10
-
-            score = base_score + bonus
-
-            # Debug the best few matches
-            if score > 50:  # Only show decent matches
-                logger.debug(f"  EPG '{row['name']}' (norm: '{row['norm_name']}') => score: {score} (base: {base_score}, bonus: {bonus})")
-
-            if score > best_score:
-                best_score = score
-                best_epg = row
+        best_score, best_index = fuzzy_results[index]
+        best_epg = epg_with_names[best_index] if best_index is not None else None
 
         # Log the best score we found
         if best_epg:
@@ -320,30 +363,22 @@ def match_channels_to_epg(channels_data, epg_data, region_code=None, use_ml=True
                 st_model, util = get_sentence_transformer()
 
             # Lazy generate embeddings only when we actually need them
-            if epg_embeddings is None and st_model and any(row.get("norm_name") for row in epg_data):
+            if epg_embeddings is None and st_model and epg_with_names:
                 try:
-                    logger.info("Generating embeddings for EPG data using ML model (lazy loading)")
-                    epg_embeddings = st_model.encode(
-                        [row["norm_name"] for row in epg_data if row.get("norm_name")],
-                        convert_to_tensor=True
-                    )
+                    from .embedding_cache import EPGEmbeddingIndex
+                    logger.info("Loading cached EPG embeddings for ML model (lazy loading)")
+                    epg_embeddings = EPGEmbeddingIndex(st_model, epg_with_names)
                 except Exception as e:
                     logger.warning(f"Failed to generate embeddings: {e}")
                     epg_embeddings = None
 
             if epg_embeddings is not None and st_model:
                 try:
-                    # Generate embedding for this channel
-                    chan_embedding = st_model.encode(chan["norm_chan"], convert_to_tensor=True)
-
-                    # Calculate similarity with all EPG embeddings
-                    sim_scores = util.cos_sim(chan_embedding, epg_embeddings)[0]
-                    top_index = int(sim_scores.argmax())
-                    top_value = float(sim_scores[top_index])
+                    # Encode this channel and compare it against all EPG embeddings
+                    top_index, top_value = epg_embeddings.best_match(chan["norm_chan"])
 
                     if top_value >= ML_HIGH_CONFIDENCE:
                         # Find the EPG entry that corresponds to this embedding index
-                        epg_with_names = [epg for epg in epg_data if epg.get("norm_name")]
                         matched_epg = epg_with_names[top_index]
 
                         chan["epg_data_id"] = matched_epg["id"]
@@ -355,7 +390,6 @@ def match_channels_to_epg(channels_data, epg_data, region_code=None, use_ml=True
 
                         # Last resort: try ML with very low fuzzy threshold
                         if top_value >= ML_LAST_RESORT:  # Dynamic last resort threshold
-                            epg_with_names = [epg for epg in epg_data if epg.get("norm_name")]
                             matched_epg = epg_with_names[top_index]
 
                             chan["epg_data_id"] = matched_epg["id"]
@@ -377,13 +411,11 @@ def match_channels_to_epg(channels_data, epg_data, region_code=None, use_ml=True
                 st_model, util = get_sentence_transformer()
 
             # Lazy generate embeddings for last resort attempts
-            if epg_embeddings is None and st_model and any(row.get("norm_name") for row in epg_data):
+            if epg_embeddings is None and st_model and epg_with_names:
                 try:
-                    logger.info("Generating embeddings for EPG data using ML model (last resort lazy loading)")
-                    epg_embeddings = st_model.encode(
-                        [row["norm_name"] for row in epg_data if row.get("norm_name")],
-                        convert_to_tensor=True
-                    )
+                    from .embedding_cache import EPGEmbeddingIndex
+                    logger.info("Loading cached EPG embeddings for ML model (last resort lazy loading)")
+                    epg_embeddings = EPGEmbeddingIndex(st_model, epg_with_names)
                 except Exception as e:
                     logger.warning(f"Failed to generate embeddings for last resort: {e}")
                     epg_embeddings = None
@@ -391,17 +423,11 @@ def match_channels_to_epg(channels_data, epg_data, region_code=None, use_ml=True
             if epg_embeddings is not None and st_model:
                 try:
                     logger.info(f"Channel {chan['id']} '{chan['name']}' => trying ML as last resort (fuzzy={best_score})")
-                    # Generate embedding for this channel
-                    chan_embedding = st_model.encode(chan["norm_chan"], convert_to_tensor=True)
-
-                    # Calculate similarity with all EPG embeddings
-                    sim_scores = util.cos_sim(chan_embedding, epg_embeddings)[0]
-                    top_index = int(sim_scores.argmax())
-                    top_value = float(sim_scores[top_index])
+                    # Encode this channel and compare it against all EPG embeddings
+                    top_index, top_value = epg_embeddings.best_match(chan["norm_chan"])
 
                     if top_value >= ML_LAST_RESORT:  # Dynamic threshold for desperate attempts
                         # Find the EPG entry that corresponds to this embedding index
-                        epg_with_names = [epg for epg in epg_data if epg.get("norm_name")]
                         matched_epg = epg_with_names[top_index]
 
                         chan["epg_data_id"] = matched_epg["id"]
@@ -417,8 +443,9 @@ def match_channels_to_epg(channels_data, epg_data, region_code=None, use_ml=True
             # No ML available or very low fuzzy score
             logger.info(f"Channel {chan['id']} '{chan['name']}' => best fuzzy score={best_score} < {FUZZY_MEDIUM_CONFIDENCE}, no ML fallback available")
 
-    # Clean up ML models from memory after matching (infrequent operation)
-    if _ml_model_cache['sentence_transformer'] is not None:
+    # Clean up ML models from memory after bulk matching (infrequent operation).
+    # Single-channel matches keep the model loaded so the next one is a single encode.
+    if is_bulk_matching and _ml_model_cache['sentence_transformer'] is not None:
         logger.info("Cleaning up ML models from memory")
         _ml_model_cache['sentence_transformer'] = None
         gc.collect()
@@ -481,7 +508,7 @@ def match_epg_channels():
                 'original_tvg_id': epg.tvg_id,
                 'name': epg.name,
                 'norm_name': normalize_name(epg.name),
-                'epg_source_id': epg.epg_source.id if epg.epg_source else None,
+                'epg_source_id': epg.epg_source_id,
             })
 
         logger.info(f"Processing {len(channels_data)} channels against {len(epg_data)} EPG entries")
@@ -512,6 +539,7 @@ def match_epg_channels():
 
             # Bulk update all channels
             Channel.objects.bulk_update(channels_list, ["epg_data"])
+            invalidate_epg_cache()
 
         total_matched = len(matched_channels)
         if total_matched:
@@ -628,7 +656,7 @@ def match_selected_channels_epg(channel_ids):
                 'original_tvg_id': epg.tvg_id,
                 'name': epg.name,
                 'norm_name': normalize_name(epg.name),
-                'epg_source_id': epg.epg_source.id if epg.epg_source else None,
+                'epg_source_id': epg.epg_source_id,
             })
 
         logger.info(f"Processing {len(channels_data)} selected channels against {len(epg_data)} EPG entries")
@@ -659,6 +687,7 @@ def match_selected_channels_epg(channel_ids):
 
             # Bulk update all channels
             Channel.objects.bulk_update(channels_list, ["epg_data"])
+            invalidate_epg_cache()
 
         total_matched = len(matched_channels)
         if total_matched:
@@ -759,7 +788,7 @@ def match_single_channel_epg(channel_id):
                 'original_tvg_id': epg.tvg_id,
                 'name': epg.name,
                 'norm_name': normalize_name(epg.name),
-                'epg_source_id': epg.epg_source.id if epg.epg_source else None,
+                'epg_source_id': epg.epg_source_id,
             })
 
         if not epg_data_list:
@@ -806,12 +835,6 @@ def match_single_channel_epg(channel_id):
                     # Send completion progress for single channel
                     send_epg_matching_progress(1, 1, current_channel_name=channel.name, stage="completed")
 
-                    # Clean up ML models from memory after single channel matching
-                    if _ml_model_cache['sentence_transformer'] is not None:
-                        logger.info("Cleaning up ML models from memory")
-                        _ml_model_cache['sentence_transformer'] = None
-                        gc.collect()
-
                     return {
                         "matched": True,
                         "message": success_msg,
@@ -825,12 +848,6 @@ def match_single_channel_epg(channel_id):
         # Send completion progress for single channel (failed)
         send_epg_matching_progress(1, 0, current_channel_name=channel.name, stage="completed")
 
-        # Clean up ML models from memory after single channel matching
-        if _ml_model_cache['sentence_transformer'] is not None:
-            logger.info("Cleaning up ML models from memory")
-            _ml_model_cache['sentence_transformer'] = None
-            gc.collect()
-
         return {
             "matched": False,
             "message": f"No suitable EPG match found for channel '{channel.name}'"
@@ -894,21 +911,13 @@ def evaluate_series_rules_impl(tvg_id: str | None = None):
             result["details"].append({"tvg_id": rv_tvg, "status": "no_epg_match"})
             continue
 
-        programs_qs = ProgramData.objects.filter(
-                epg=epg,
-                start_time__gte=now,
-                start_time__lte=horizon,
-            )
+        programs_qs = ProgramData.objects.window(epg.id, now, horizon, inclusive_end=True)
         if series_title:
             programs_qs = programs_qs.filter(title__iexact=series_title)
-        programs = list(programs_qs.order_by("start_time"))
+        programs = list(programs_qs)
         # Fallback: if no direct matches and we have a title, try normalized comparison in Python
         if series_title and not programs:
-            all_progs = ProgramData.objects.filter(
-                epg=epg,
-                start_time__gte=now,
-                start_time__lte=horizon,
-            ).only("id", "title", "start_time", "end_time", "custom_properties", "tvg_id")
+            all_progs = ProgramData.objects.window(epg.id, now, horizon, inclusive_end=True).only("id", "title", "start_time", "end_time", "custom_properties", "tvg_id")
             programs = [p for p in all_progs if normalize_name(p.title) == norm_series]
 
         channel = Channel.objects.filter(epg_data=epg).order_by("channel_number").first()
@@ -2414,6 +2423,53 @@ def prefetch_recording_artwork(recording_id):
         return f"error: {e}"
 
 
+@shared_task
+def prefetch_logos():
+    """
+    Download every remote logo used by channels or VOD into the logo cache so the
+    first client load after a refresh doesn't fan out to every logo host at once.
+    """
+    from django.conf import settings
+    from django.db.models import Q
+    from core.utils import acquire_task_lock, refresh_task_locks, release_task_lock
+    from .logo_cache import prefetch_logos as prefetch_logo_urls
+    from .models import Logo
+
+    if not acquire_task_lock("prefetch_logos", 0):
+        return "Logo prefetch already running"
+
+    try:
+        urls = list(
+            Logo.objects.filter(
+                Q(channels__isnull=False) | Q(movie__isnull=False) | Q(series__isnull=False)
+            )
+            .filter(Q(url__startswith="http://") | Q(url__startswith="https://"))
+            .values_list("url", flat=True)
+            .distinct()
+        )
+        logger.info(f"Prefetching {len(urls)} logos")
+        result = prefetch_logo_urls(
+            urls,
+            workers=settings.LOGO_PREFETCH_WORKERS,
+            per_host=settings.LOGO_PREFETCH_PER_HOST,
+            # Large logo sets outlive the 300s task lock
+            progress=lambda: refresh_task_locks("prefetch_logos", [0]),
+        )
+    finally:
+        release_task_lock("prefetch_logos", 0)
+
+    slowest = sorted(
+        (item for item in result["hosts"].items() if item[1]["avg_ms"] is not None),
+        key=lambda item: item[1]["avg_ms"],
+        reverse=True,
+    )[:5]
+    logger.info(
+        f"Logo prefetch finished in {result['duration']}s: {result['totals']}. Slowest hosts: "
+        + ", ".join(f"{host} ({stats['avg_ms']}ms avg, {stats['failure_rate']:.0%} failed)" for host, stats in slowest)
+    )
+    return result["totals"]
+
+
 @shared_task(bind=True)
 def bulk_create_channels_from_streams(self, stream_ids, channel_profile_ids=None, starting_channel_number=None):
     """
@@ -2667,6 +2723,7 @@ def bulk_create_channels_from_streams(self, stream_ids, channel_profile_ids=None
                 # Bulk update channels with logos
                 if update:
                     Channel.objects.bulk_update(update, ["logo"])
+                    invalidate_epg_cache()
 
                 # Bulk create channel-stream associations
                 if channel_stream_associations:
@@ -2696,6 +2753,9 @@ def bulk_create_channels_from_streams(self, stream_ids, channel_profile_ids=None
             'count': len(created_channels)
         })
 
+        if created_channels:
+            prefetch_logos.delay()
+
         return {
             'status': 'completed',
             'created_count': len(created_channels),
@@ -2764,6 +2824,7 @@ def set_channels_names_from_epg(self, channel_ids):
             # Bulk update the batch
             if batch_updates:
                 Channel.objects.bulk_update(batch_updates, ['name'])
+                invalidate_epg_cache()
 
             # Send progress update
             progress = min(i + batch_size, total_channels)
@@ -2890,6 +2951,7 @@ def set_channels_logos_from_epg(self, channel_ids):
             # Bulk update the batch
             if batch_updates:
                 Channel.objects.bulk_update(batch_updates, ['logo'])
+                invalidate_epg_cache()
 
             # Send progress update
             progress = min(i + batch_size, total_channels)
@@ -2988,6 +3050,7 @@ def set_channels_tvg_ids_from_epg(self, channel_ids):
             # Bulk update the batch
             if batch_updates:
                 Channel.objects.bulk_update(batch_updates, ['tvg_id'])
+                invalidate_epg_cache()
 
             # Send progress update
             progress = min(i + batch_size, total_channels)
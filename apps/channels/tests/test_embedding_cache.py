@@ -0,0 +1,73 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from apps.channels.embedding_cache import EPGEmbeddingIndex, delete_source_embeddings
+
+
+class FakeModel:
+    """Deterministic stand-in for a SentenceTransformer that records what it encodes."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        vectors = []
+        for text in texts:
+            seed = int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+            vector = np.random.default_rng(seed).standard_normal(16)
+            vectors.append(vector / np.linalg.norm(vector))
+        return np.array(vectors, dtype=np.float32)
+
+
+def epg_row(id, norm_name, source_id):
+    return {"id": id, "tvg_id": f"{norm_name}.us", "name": norm_name, "norm_name": norm_name, "epg_source_id": source_id}
+
+
+class EPGEmbeddingCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        override = override_settings(EPG_EMBEDDING_CACHE_DIR=self.cache_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_names_are_encoded_once_and_reused_incrementally(self):
+        rows = [epg_row(1, "cnn", 1), epg_row(2, "bbc one", 1), epg_row(3, "cnn", 1), epg_row(4, "espn", 2)]
+
+        model = FakeModel()
+        EPGEmbeddingIndex(model, rows)
+        self.assertEqual(sorted(model.encoded), ["bbc one", "cnn", "espn"])
+
+        model = FakeModel()
+        EPGEmbeddingIndex(model, rows)
+        self.assertEqual(model.encoded, [])
+
+        model = FakeModel()
+        EPGEmbeddingIndex(model, rows + [epg_row(5, "hbo", 1)])
+        self.assertEqual(model.encoded, ["hbo"])
+        # Only the latest matrix per source is kept
+        self.assertEqual(len([f for f in os.listdir(os.path.join(self.cache_dir, "source_1")) if f.endswith(".npy")]), 1)
+
+    def test_best_match_returns_row_index_and_similarity(self):
+        rows = [epg_row(1, "cnn", 1), epg_row(2, "bbc one", 2), epg_row(3, "espn", 1)]
+        model = FakeModel()
+        index = EPGEmbeddingIndex(model, rows)
+
+        top_index, top_value = index.best_match("bbc one")
+        self.assertEqual(top_index, 1)
+        self.assertAlmostEqual(top_value, 1.0, places=5)
+
+        # Cached rows must line up with the rows they were computed for
+        expected = model.encode(["cnn", "bbc one", "espn"]) @ model.encode(["espn"])[0]
+        np.testing.assert_allclose(index.similarities("espn"), expected, rtol=1e-5)
+
+    def test_delete_source_embeddings(self):
+        EPGEmbeddingIndex(FakeModel(), [epg_row(1, "cnn", 7)])
+        delete_source_embeddings(7)
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, "source_7")))
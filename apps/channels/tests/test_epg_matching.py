@@ -0,0 +1,144 @@
+import random
+import re
+
+from django.test import SimpleTestCase
+from rapidfuzz import fuzz
+
+from apps.channels.tasks import match_channels_to_epg, normalize_name
+
+WORDS = [
+    "news", "sports", "kids", "movies", "comedy", "history", "science", "music", "cooking",
+    "travel", "nature", "drama", "classic", "action", "family", "world", "local", "weather",
+]
+REGIONS = ["us", "uk", "ca", "de", "au"]
+
+
+def legacy_match(channels_data, epg_data, region_code, fuzzy_threshold):
+    """Reference implementation: the linear scans match_channels_to_epg used to do (no ML)."""
+    matches = {}
+    for chan in channels_data:
+        tvg_id = chan.get("tvg_id", "")
+        epg = next((epg for epg in epg_data if epg["tvg_id"] == tvg_id), None)
+        if tvg_id and epg:
+            matches[chan["id"]] = epg["id"]
+            continue
+
+        gracenote_id = chan.get("gracenote_id", "")
+        if gracenote_id:
+            epg = next((epg for epg in epg_data if epg["tvg_id"] == gracenote_id), None)
+            if epg:
+                matches[chan["id"]] = epg["id"]
+                continue
+
+        if not chan["norm_chan"]:
+            continue
+
+        best_score, best_epg = 0, None
+        for row in epg_data:
+            if not row.get("norm_name"):
+                continue
+            bonus = 0
+            if region_code and row.get("tvg_id"):
+                combined_text = row["tvg_id"].lower() + " " + row["name"].lower()
+                dot_regions = re.findall(r'\.([a-z]{2})', combined_text)
+                if dot_regions:
+                    bonus = 15 if region_code in dot_regions else -15
+                elif region_code in combined_text:
+                    bonus = 10
+            score = fuzz.ratio(chan["norm_chan"], row["norm_name"]) + bonus
+            if score > best_score:
+                best_score, best_epg = score, row
+
+        if best_epg and best_score >= fuzzy_threshold:
+            matches[chan["id"]] = best_epg["id"]
+    return matches
+
+
+def make_epg_row(id, name, tvg_id):
+    return {"id": id, "tvg_id": tvg_id, "name": name, "norm_name": normalize_name(name)}
+
+
+def make_channel(id, name, tvg_id="", gracenote_id=""):
+    return {
+        "id": id,
+        "name": name,
+        "tvg_id": tvg_id,
+        "gracenote_id": gracenote_id,
+        "norm_chan": normalize_name(name),
+    }
+
+
+class EPGMatchingGoldenTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(1234)
+
+        self.epg_data = []
+        for i in range(1500):
+            name = " ".join(rng.sample(WORDS, rng.randint(1, 3))).title()
+            region = rng.choice(REGIONS)
+            if rng.random() < 0.5:
+                tvg_id = f"{name.replace(' ', '')}.{region}"
+            else:
+                tvg_id = f"{name.replace(' ', '').lower()}{region}"
+            self.epg_data.append(make_epg_row(i + 1, f"{name} {rng.choice(['HD', '', 'TV'])}".strip(), tvg_id.lower()))
+        # Duplicate tvg_ids: the first entry must win
+        self.epg_data.append(make_epg_row(9001, "Duplicate", self.epg_data[10]["tvg_id"]))
+        # Entries that normalize to nothing are never fuzzy candidates
+        self.epg_data.append(make_epg_row(9002, "HD TV", "hdtv.us"))
+
+        self.channels_data = []
+        for i in range(400):
+            kind = rng.random()
+            source = rng.choice(self.epg_data)
+            if kind < 0.2:
+                chan = make_channel(i + 1, "Some Channel", tvg_id=source["tvg_id"])
+            elif kind < 0.3:
+                chan = make_channel(i + 1, "Another Channel", gracenote_id=source["tvg_id"])
+            elif kind < 0.35:
+                chan = make_channel(i + 1, "[HD] (east)")
+            else:
+                words = source["name"].split()
+                rng.shuffle(words)
+                noise = rng.choice(["", " HD", " 1080p", " East", " Plus", " 2"])
+                chan = make_channel(i + 1, " ".join(words) + noise, tvg_id=rng.choice(["", "unknown.id"]))
+            self.channels_data.append(chan)
+
+    def assertMatchesLegacy(self, channels_data, region_code, fuzzy_threshold):
+        expected = legacy_match(channels_data, self.epg_data, region_code, fuzzy_threshold)
+        result = match_channels_to_epg(
+            [dict(chan) for chan in channels_data], self.epg_data, region_code, use_ml=False, send_progress=False
+        )
+        actual = {chan["id"]: chan["epg_data_id"] for chan in result["channels_to_update"]}
+        self.assertEqual(actual, expected)
+        self.assertEqual([m[0] for m in result["matched_channels"]], sorted(expected))
+        return actual
+
+    def test_bulk_matches_legacy_without_region(self):
+        actual = self.assertMatchesLegacy(self.channels_data, None, 90)
+        self.assertGreater(len(actual), 100)
+
+    def test_bulk_matches_legacy_with_region(self):
+        self.assertMatchesLegacy(self.channels_data, "uk", 90)
+
+    def test_single_channel_matches_legacy(self):
+        for chan in self.channels_data[:40]:
+            self.assertMatchesLegacy([chan], "us", 85)
+
+    def test_known_matches(self):
+        epg_data = [
+            make_epg_row(1, "CNN", "cnn.us"),
+            make_epg_row(2, "BBC One", "bbcone.uk"),
+            make_epg_row(3, "BBC One", "bbcone.us"),
+            make_epg_row(4, "KVLY NBC 11", "kvly.us"),
+        ]
+        channels = [
+            make_channel(1, "CNN HD"),
+            make_channel(2, "BBC One"),
+            make_channel(3, "Unrelated", tvg_id="kvly.us"),
+            make_channel(4, "Something", gracenote_id="cnn.us"),
+            make_channel(5, "Totally Different Network"),
+        ]
+        result = match_channels_to_epg(channels, epg_data, "us", use_ml=False, send_progress=False)
+        actual = {chan["id"]: chan["epg_data_id"] for chan in result["channels_to_update"]}
+        # The preferred region breaks the tie between the two BBC One entries
+        self.assertEqual(actual, {1: 1, 2: 3, 3: 4, 4: 1})
@@ -0,0 +1,216 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+
+from apps.channels import logo_cache
+
+LOGO_URL = "http://cdn.example.com/logos/news.png"
+
+
+class FakeUpstream:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class LogoCacheTests(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        self.settings_override = override_settings(LOGO_CACHE_DIR=self.cache_dir, LOGO_CACHE_ACCEL_PREFIX="/internal/logo-cache/")
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        # Exercise the single-worker path; coalescing needs a live Redis
+        patcher = mock.patch.object(logo_cache.RedisClient, "get_client", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Fixed user agent, so the lookup can be counted and needs no CoreSettings row
+        patcher = mock.patch.object(logo_cache, "_default_user_agent", return_value="Dispatcharr/1.0")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.factory = RequestFactory()
+
+    def _get(self, upstream, **headers):
+        with mock.patch.object(logo_cache.requests, "get", return_value=upstream) as get:
+            response = logo_cache.cached_logo_response(self.factory.get("/", **headers), LOGO_URL)
+        return response, get
+
+    def _expire(self):
+        _, _, meta_path = logo_cache._entry_paths(LOGO_URL)
+        with open(meta_path) as f:
+            meta = json.load(f)
+        meta["expires"] = time.time() - 1
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+
+    def test_miss_then_hit_and_client_revalidation(self):
+        upstream = FakeUpstream(200, b"PNGDATA", {"Content-Type": "image/png", "ETag": '"v1"'})
+        response, get = self._get(upstream)
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(b"".join(response.streaming_content), b"PNGDATA")
+        self.assertEqual(response["Content-Type"], "image/png")
+
+        response, get = self._get(upstream)
+        self.assertEqual(get.call_count, 0)
+        self.assertEqual(b"".join(response.streaming_content), b"PNGDATA")
+
+        response, get = self._get(upstream, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(get.call_count, 0)
+
+    def test_expired_entry_is_revalidated_upstream(self):
+        self._get(FakeUpstream(200, b"PNGDATA", {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}))
+        self._expire()
+
+        response, get = self._get(FakeUpstream(304))
+        sent = get.call_args.kwargs["headers"]
+        self.assertEqual(sent["If-None-Match"], '"v1"')
+        self.assertEqual(sent["If-Modified-Since"], "Mon, 01 Jan 2024 00:00:00 GMT")
+        self.assertEqual(b"".join(response.streaming_content), b"PNGDATA")
+
+        _, get = self._get(FakeUpstream(304))
+        self.assertEqual(get.call_count, 0)
+
+    def test_upstream_failure_serves_stale_copy(self):
+        self._get(FakeUpstream(200, b"PNGDATA"))
+        self._expire()
+
+        response, _ = self._get(FakeUpstream(503))
+        self.assertEqual(b"".join(response.streaming_content), b"PNGDATA")
+
+    def test_waiting_for_another_workers_fetch_yields_to_gevent(self):
+        redis_client = mock.Mock()
+        redis_client.set.return_value = None  # Another worker holds the fetch lock
+        redis_client.exists.side_effect = [1, 1, 0]
+        with mock.patch.object(logo_cache.RedisClient, "get_client", return_value=redis_client), \
+                mock.patch.object(logo_cache.gevent, "sleep") as sleep, \
+                mock.patch.object(logo_cache.time, "sleep") as blocking_sleep:
+            with self.assertRaises(Http404):
+                self._get(FakeUpstream(200, b"PNGDATA"))
+        self.assertEqual(sleep.call_count, 2)
+        blocking_sleep.assert_not_called()
+
+    def test_not_found_is_cached_negatively(self):
+        with self.assertRaises(Http404):
+            self._get(FakeUpstream(404))
+        with mock.patch.object(logo_cache.requests, "get") as get:
+            with self.assertRaises(Http404):
+                logo_cache.cached_logo_response(self.factory.get("/"), LOGO_URL)
+        get.assert_not_called()
+
+    def test_accel_redirect_when_behind_nginx(self):
+        response, _ = self._get(FakeUpstream(200, b"PNGDATA"), HTTP_X_SENDFILE_TYPE="X-Accel-Redirect")
+        key, body_path, _ = logo_cache._entry_paths(LOGO_URL)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["X-Accel-Redirect"], f"/internal/logo-cache/{key[:2]}/{key}")
+        self.assertTrue(os.path.exists(body_path))
+
+    def test_evict_removes_least_recently_used(self):
+        now = time.time()
+        paths = []
+        for i in range(4):
+            url = f"http://cdn.example.com/{i}.png"
+            _, body_path, meta_path = logo_cache._entry_paths(url)
+            os.makedirs(os.path.dirname(body_path), exist_ok=True)
+            with open(body_path, "wb") as f:
+                f.write(b"x" * 1000)
+            with open(meta_path, "w") as f:
+                json.dump({"status": 200, "stored": int(now), "expires": now + 60}, f)
+            # Entry 0 is the least recently served
+            os.utime(body_path, (now - 1000 + i, now - 1000 + i))
+            os.utime(meta_path, (now - 2000, now - 2000))
+            paths.append(body_path)
+
+        removed = logo_cache.evict(self.cache_dir, 3500)
+        self.assertEqual(removed, 2)
+        self.assertEqual([os.path.exists(p) for p in paths], [False, False, True, True])
+
+    @override_settings(LOGO_CACHE_MAX_BYTES=20000)
+    def test_writes_trigger_eviction_between_timed_scans(self):
+        patcher = mock.patch.object(logo_cache, "_last_evict", time.monotonic())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(logo_cache, "_written_since_evict", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        with mock.patch.object(logo_cache, "evict") as evict:
+            self._get(FakeUpstream(200, b"x" * 500, {"Content-Type": "image/png"}))
+            evict.assert_not_called()
+            # 5% of the budget written since the last scan
+            with mock.patch.object(logo_cache.requests, "get", return_value=FakeUpstream(200, b"x" * 500)):
+                logo_cache.cached_logo_response(self.factory.get("/"), "http://cdn.example.com/other.png")
+            evict.assert_called_once_with(self.cache_dir, 20000)
+        self.assertEqual(logo_cache._written_since_evict, 0)
+
+    def test_prefetch_bounds_per_host_concurrency_and_records_stats(self):
+        active = {}
+        peak = {}
+        lock = threading.Lock()
+
+        def fake_get(url, **kwargs):
+            host = url.split("/")[2]
+            with lock:
+                active[host] = active.get(host, 0) + 1
+                peak[host] = max(peak.get(host, 0), active[host])
+            time.sleep(0.02)
+            with lock:
+                active[host] -= 1
+            if host == "dead.example.com":
+                return FakeUpstream(404)
+            return FakeUpstream(200, b"PNGDATA", {"Content-Type": "image/png"})
+
+        urls = [f"http://cdn.example.com/{i}.png" for i in range(8)]
+        urls += [f"http://dead.example.com/{i}.png" for i in range(2)]
+
+        with mock.patch.object(logo_cache.requests.Session, "get", side_effect=fake_get):
+            result = logo_cache.prefetch_logos(urls, workers=8, per_host=2)
+
+        self.assertLessEqual(peak["cdn.example.com"], 2)
+        self.assertEqual(result["totals"], {"fetched": 8, "not_found": 2})
+        self.assertEqual(result["hosts"]["cdn.example.com"]["requests"], 8)
+        self.assertEqual(result["hosts"]["dead.example.com"]["outcomes"], {"not_found": 2})
+        self.assertIsNotNone(result["hosts"]["cdn.example.com"]["p95_ms"])
+
+        with mock.patch.object(logo_cache.requests.Session, "get") as get:
+            result = logo_cache.prefetch_logos(urls, workers=8, per_host=2)
+        get.assert_not_called()
+        self.assertEqual(result["totals"], {"cached": 10})
+
+    def test_prefetch_resolves_the_user_agent_once_and_reports_progress(self):
+        seen = []
+
+        def fake_get(session, url, **kwargs):
+            seen.append((session.headers["User-Agent"], kwargs["headers"].get("User-Agent")))
+            return FakeUpstream(200, b"PNGDATA", {"Content-Type": "image/png"})
+
+        progress = mock.Mock()
+        urls = [f"http://cdn{i % 2}.example.com/{i}.png" for i in range(6)]
+        with mock.patch.object(logo_cache.requests.Session, "get", autospec=True, side_effect=fake_get), \
+                mock.patch.object(logo_cache, "PREFETCH_PROGRESS_INTERVAL", 0):
+            logo_cache.prefetch_logos(urls, workers=4, per_host=2, progress=progress)
+
+        # Looked up before the worker threads start, then sent by each host's session
+        self.assertEqual(logo_cache._default_user_agent.call_count, 1)
+        self.assertEqual(seen, [("Dispatcharr/1.0", None)] * 6)
+        self.assertEqual(progress.call_count, 6)
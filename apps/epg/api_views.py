@@ -136,12 +136,13 @@ class EPGGridAPIView(APIView):
         )
 
         # Use select_related to prefetch EPGData and include programs from the last hour
-        programs = ProgramData.objects.select_related("epg").filter(
-            # Programs that end after one hour ago (includes recently ended programs)
-            end_time__gt=one_hour_ago,
-            # AND start before the end time window
-            start_time__lt=twenty_four_hours_later,
-        )
+        # Programs that end after one hour ago (includes recently ended programs)
+        # AND start before the end time window
+        programs = ProgramData.objects.window(
+            start=one_hour_ago,
+            end=twenty_four_hours_later,
+            overlapping=True,
+        ).select_related("epg")
         count = programs.count()
         logger.debug(
             f"EPGGridAPIView: Found {count} program(s), including recently ended, currently running, and upcoming shows."
@@ -0,0 +1,131 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.epg.models import EPGSource, EPGData, ProgramData
+
+# Indexes added for ProgramData.objects.window(); dropped for the "before" run
+WINDOW_INDEXES = ['epg_program_epg_start_idx', 'epg_program_epg_end_idx']
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark ProgramData time-window queries with and without the composite "
+        "(epg, start_time)/(epg, end_time) indexes on a synthetic dataset. (PostgreSQL only)\n"
+        "All synthetic data is created inside a transaction that is rolled back. "
+        "The indexes are dropped inside that transaction for the comparison, which locks "
+        "the programme table until the run finishes, so don't point this at a live instance."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5_000_000, help='Number of synthetic programmes')
+        parser.add_argument('--channels', type=int, default=2000, help='Number of synthetic EPG entries')
+        parser.add_argument('--sample', type=int, default=200, help='EPG entries queried by the multi-channel window')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed executions per query')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("epg_query_bench requires PostgreSQL")
+
+        rows = options['rows']
+        channels = options['channels']
+        sample = min(options['sample'], channels)
+        repeat = max(1, options['repeat'])
+        per_channel = max(1, rows // channels)
+
+        with transaction.atomic():
+            self.stdout.write(f"Generating {channels} EPG entries x {per_channel} programmes...")
+            epg_ids = self._generate(channels, per_channel)
+
+            now = timezone.now()
+            queries = {
+                'generate_epg (1 channel, 3 days)': ProgramData.objects.window(
+                    epg_ids[len(epg_ids) // 2], now, now + timedelta(days=3)
+                ),
+                'xc_get_epg (1 channel, upcoming)': ProgramData.objects.window(
+                    epg_ids[len(epg_ids) // 3], start=now
+                ),
+                f'series rules ({sample} channels, 7 days)': ProgramData.objects.window(
+                    epg_ids[:sample], now, now + timedelta(days=7)
+                ),
+                f'grid ({sample} channels, airing in 25h)': ProgramData.objects.window(
+                    epg_ids[:sample], now - timedelta(hours=1), now + timedelta(hours=24), overlapping=True
+                ),
+            }
+
+            after = self._run(queries, repeat)
+
+            with connection.cursor() as cursor:
+                for name in WINDOW_INDEXES:
+                    cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+                cursor.execute(f'ANALYZE "{ProgramData._meta.db_table}"')
+            before = self._run(queries, repeat)
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("\nResults (median ms, without -> with indexes)"))
+        for label in queries:
+            b, a = before[label], after[label]
+            speedup = b['median_ms'] / a['median_ms'] if a['median_ms'] else float('inf')
+            self.stdout.write(f"  {label}: {b['median_ms']:.2f} -> {a['median_ms']:.2f} ({speedup:.1f}x)")
+            self.stdout.write(f"    before: {b['plan']}")
+            self.stdout.write(f"    after:  {a['plan']}")
+
+    def _generate(self, channels, per_channel):
+        """Insert synthetic EPG entries and half-hour programmes centred on now."""
+        source_table = EPGSource._meta.db_table
+        epg_table = EPGData._meta.db_table
+        program_table = ProgramData._meta.db_table
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO "{source_table}" (name, source_type, is_active, refresh_interval, status, created_at, custom_properties) '
+                f"VALUES ('epg_query_bench', 'xmltv', false, 0, 'idle', now(), '{{}}') RETURNING id"
+            )
+            source_id = cursor.fetchone()[0]
+
+            cursor.execute(
+                f'INSERT INTO "{epg_table}" (tvg_id, name, epg_source_id) '
+                f"SELECT 'bench.' || g, 'Bench ' || g, %s FROM generate_series(1, %s) g RETURNING id",
+                [source_id, channels],
+            )
+            epg_ids = sorted(row[0] for row in cursor.fetchall())
+
+            start = time.monotonic()
+            cursor.execute(
+                f'INSERT INTO "{program_table}" (epg_id, start_time, end_time, title, tvg_id, custom_properties) '
+                f"SELECT e.id, "
+                f"  now() - (%s * interval '15 minutes') + (p * interval '30 minutes'), "
+                f"  now() - (%s * interval '15 minutes') + ((p + 1) * interval '30 minutes'), "
+                f"  'Programme ' || p, e.tvg_id, '{{}}' "
+                f'FROM "{epg_table}" e CROSS JOIN generate_series(0, %s - 1) p '
+                f"WHERE e.epg_source_id = %s",
+                [per_channel, per_channel, per_channel, source_id],
+            )
+            self.stdout.write(f"Inserted {cursor.rowcount} programmes in {time.monotonic() - start:.1f}s")
+            cursor.execute(f'ANALYZE "{program_table}"')
+
+        return epg_ids
+
+    def _run(self, queries, repeat):
+        results = {}
+        with connection.cursor() as cursor:
+            for label, qs in queries.items():
+                sql, params = qs.query.sql_with_params()
+
+                cursor.execute(f"EXPLAIN (FORMAT TEXT) {sql}", params)
+                plan = " | ".join(line[0].strip() for line in cursor.fetchall()[:3])
+
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                    timings.append((time.perf_counter() - start) * 1000)
+                timings.sort()
+
+                results[label] = {'median_ms': timings[len(timings) // 2], 'plan': plan}
+        return results
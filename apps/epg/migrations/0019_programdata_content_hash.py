@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epg', '0018_epgsource_custom_properties_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='programdata',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='Hash of the programme content, used to detect changes between EPG refreshes', max_length=40, null=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epg', '0019_programdata_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='programdata',
+            index=models.Index(fields=['epg', 'start_time'], name='epg_program_epg_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='programdata',
+            index=models.Index(fields=['epg', 'end_time'], name='epg_program_epg_end_idx'),
+        ),
+    ]
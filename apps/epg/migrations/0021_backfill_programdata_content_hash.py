@@ -0,0 +1,60 @@
+# Generated migration to backfill content_hash for existing programmes
+
+from django.db import migrations
+import hashlib
+import json
+
+
+def program_content_hash(program):
+    """Same hash as ProgramData.compute_content_hash() at the time of this migration."""
+    payload = json.dumps(
+        [
+            program.end_time.isoformat() if program.end_time else None,
+            program.title,
+            program.sub_title,
+            program.description,
+            program.tvg_id,
+            program.custom_properties,
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def backfill_content_hashes(apps, schema_editor):
+    """
+    Hash the programmes stored before content_hash existed, so the first EPG
+    refresh after upgrading only rewrites programmes that actually changed.
+    """
+    ProgramData = apps.get_model('epg', 'ProgramData')
+
+    batch = []
+    updated_count = 0
+    programs = ProgramData.objects.filter(content_hash__isnull=True).only(
+        'id', 'end_time', 'title', 'sub_title', 'description', 'tvg_id', 'custom_properties'
+    )
+    for program in programs.iterator(chunk_size=2000):
+        program.content_hash = program_content_hash(program)
+        batch.append(program)
+        if len(batch) >= 1000:
+            ProgramData.objects.bulk_update(batch, ['content_hash'])
+            updated_count += len(batch)
+            batch = []
+    if batch:
+        ProgramData.objects.bulk_update(batch, ['content_hash'])
+        updated_count += len(batch)
+
+    if updated_count > 0:
+        print(f"Backfilled content_hash for {updated_count} programmes")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epg', '0020_programdata_epg_time_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_content_hashes, migrations.RunPython.noop),
+    ]
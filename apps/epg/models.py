@@ -2,6 +2,8 @@ from django.db import models
 from django.utils import timezone
 from django_celery_beat.models import PeriodicTask
 from django.conf import settings
+import hashlib
+import json
 import os
 
 class EPGSource(models.Model):
@@ -149,6 +151,37 @@ class EPGData(models.Model):
     def __str__(self):
         return f"EPG Data for {self.name}"
 
+class ProgramDataManager(models.Manager):
+    def window(self, epg_ids=None, start=None, end=None, overlapping=False, inclusive_end=False):
+        """
+        Programmes for the given EPG entries within a time window, ordered by start_time.
+
+        epg_ids may be a single id, an iterable of ids or None for all entries.
+        By default programmes are selected by start_time (start <= start_time < end);
+        with overlapping=True anything airing during the window is returned instead
+        (end_time > start and start_time < end). inclusive_end=True also takes
+        programmes starting exactly at end. Either bound may be omitted.
+        Backed by the (epg, start_time) and (epg, end_time) indexes.
+        """
+        qs = self.get_queryset()
+        if epg_ids is not None:
+            if isinstance(epg_ids, (int, str)):
+                qs = qs.filter(epg_id=epg_ids)
+            else:
+                qs = qs.filter(epg_id__in=epg_ids)
+
+        if overlapping:
+            if start is not None:
+                qs = qs.filter(end_time__gt=start)
+        elif start is not None:
+            qs = qs.filter(start_time__gte=start)
+
+        if end is not None:
+            qs = qs.filter(start_time__lte=end) if inclusive_end else qs.filter(start_time__lt=end)
+
+        return qs.order_by('start_time', 'id')
+
+
 class ProgramData(models.Model):
     # Each programme is associated with an EPGData record.
     epg = models.ForeignKey(EPGData, on_delete=models.CASCADE, related_name="programs")
@@ -159,6 +192,36 @@ class ProgramData(models.Model):
     description = models.TextField(blank=True, null=True)
     tvg_id = models.CharField(max_length=255, null=True, blank=True)
     custom_properties = models.JSONField(default=dict, blank=True, null=True)
+    content_hash = models.CharField(
+        max_length=40,
+        blank=True,
+        null=True,
+        help_text="Hash of the programme content, used to detect changes between EPG refreshes"
+    )
+
+    objects = ProgramDataManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['epg', 'start_time'], name='epg_program_epg_start_idx'),
+            models.Index(fields=['epg', 'end_time'], name='epg_program_epg_end_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.start_time} - {self.end_time})"
+
+    def compute_content_hash(self):
+        """Hash every field that can change for a programme at a given start time."""
+        payload = json.dumps(
+            [
+                self.end_time.isoformat() if self.end_time else None,
+                self.title,
+                self.sub_title,
+                self.description,
+                self.tvg_id,
+                self.custom_properties,
+            ],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
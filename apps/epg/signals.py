@@ -194,3 +194,10 @@ def delete_cached_files(sender, instance, **kwargs):
                 logger.info(f"Deleted extracted file: {instance.extracted_file_path}")
             except OSError as e:
                 logger.error(f"Error deleting extracted file {instance.extracted_file_path}: {e}")
+
+    # Drop cached ML embeddings of this source's channel names
+    try:
+        from apps.channels.embedding_cache import delete_source_embeddings
+        delete_source_embeddings(instance.id)
+    except Exception as e:
+        logger.error(f"Error deleting EPG embedding cache for source {instance.id}: {e}")
@@ -24,7 +24,11 @@ from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 
 from .models import EPGSource, EPGData, ProgramData
-from core.utils import acquire_task_lock, release_task_lock, send_websocket_update, cleanup_memory
+from core.utils import (
+    acquire_task_lock, release_task_lock, acquire_task_locks, refresh_task_locks, release_task_locks,
+    send_websocket_update, cleanup_memory,
+)
+from apps.output.epg_cache import invalidate_epg_cache
 
 logger = logging.getLogger(__name__)
 
@@ -1133,7 +1137,7 @@ def parse_programs_for_tvg_id(epg_id):
 
     source_file = None
     program_parser = None
-    programs_to_create = []
+    program_sync = None
     programs_processed = 0
     try:
         # Add memory tracking only in trace mode or higher
@@ -1164,69 +1168,11 @@ def parse_programs_for_tvg_id(epg_id):
 
         logger.info(f"Refreshing program data for tvg_id: {epg.tvg_id}")
 
-        # Optimize deletion with a single delete query instead of chunking
-        # This is faster for most database engines
-        ProgramData.objects.filter(epg=epg).delete()
-
-        file_path = epg_source.extracted_file_path if epg_source.extracted_file_path else epg_source.file_path
+        file_path, error = resolve_program_file_path(epg_source)
         if not file_path:
-            file_path = epg_source.get_cache_file()
-
-        # Check if the file exists
-        if not os.path.exists(file_path):
-            logger.error(f"EPG file not found at: {file_path}")
-
-            if epg_source.url:
-                # Update the file path in the database
-                new_path = epg_source.get_cache_file()
-                logger.info(f"Updating file_path from '{file_path}' to '{new_path}'")
-                epg_source.file_path = new_path
-                epg_source.save(update_fields=['file_path'])
-                logger.info(f"Fetching new EPG data from URL: {epg_source.url}")
-            else:
-                logger.info(f"EPG source does not have a URL, using existing file path: {file_path} to rebuild cache")
-
-            # Fetch new data before continuing
-            if epg_source:
-
-                # Properly check the return value from fetch_xmltv
-                fetch_success = fetch_xmltv(epg_source)
-
-                # If fetch was not successful or the file still doesn't exist, abort
-                if not fetch_success:
-                    logger.error(f"Failed to fetch EPG data, cannot parse programs for tvg_id: {epg.tvg_id}")
-                    # Update status to error if not already set
-                    epg_source.status = 'error'
-                    epg_source.last_message = f"Failed to download EPG data, cannot parse programs"
-                    epg_source.save(update_fields=['status', 'last_message'])
-                    send_epg_update(epg_source.id, "parsing_programs", 100, status="error", error="Failed to download EPG file")
-                    release_task_lock('parse_epg_programs', epg_id)
-                    return
-
-                # Also check if the file exists after download
-                if not os.path.exists(epg_source.file_path):
-                    logger.error(f"Failed to fetch EPG data, file still missing at: {epg_source.file_path}")
-                    epg_source.status = 'error'
-                    epg_source.last_message = f"Failed to download EPG data, file missing after download"
-                    epg_source.save(update_fields=['status', 'last_message'])
-                    send_epg_update(epg_source.id, "parsing_programs", 100, status="error", error="File not found after download")
-                    release_task_lock('parse_epg_programs', epg_id)
-                    return
-
-                # Update file_path with the new location
-                if epg_source.extracted_file_path:
-                    file_path = epg_source.extracted_file_path
-                else:
-                    file_path = epg_source.file_path
-            else:
-                logger.error(f"No URL provided for EPG source {epg_source.name}, cannot fetch new data")
-                # Update status to error
-                epg_source.status = 'error'
-                epg_source.last_message = f"No URL provided, cannot fetch EPG data"
-                epg_source.save(update_fields=['status', 'last_message'])
-                send_epg_update(epg_source.id, "parsing_programs", 100, status="error", error="No URL provided")
-                release_task_lock('parse_epg_programs', epg_id)
-                return
+            logger.error(f"{error}, cannot parse programs for tvg_id: {epg.tvg_id}")
+            release_task_lock('parse_epg_programs', epg_id)
+            return
 
         # Use streaming parsing to reduce memory usage
         # No need to check file type anymore since it's always XML
@@ -1241,8 +1187,8 @@ def parse_programs_for_tvg_id(epg_id):
                 logger.warning(f"Error tracking memory: {e}")
                 mem_before = 0
 
-        programs_to_create = []
-        batch_size = 1000  # Process in batches to limit memory usage
+        # Diff against stored programmes rather than delete-and-reinsert
+        program_sync = ProgramDataSync()
 
         try:
             # Open the file directly - no need to check compression
@@ -1255,53 +1201,13 @@ def parse_programs_for_tvg_id(epg_id):
             for _, elem in program_parser:
                 if elem.get('channel') == epg.tvg_id:
                     try:
-                        start_time = parse_xmltv_time(elem.get('start'))
-                        end_time = parse_xmltv_time(elem.get('stop'))
-                        title = None
-                        desc = None
-                        sub_title = None
-
-                        # Efficiently process child elements
-                        for child in elem:
-                            if child.tag == 'title':
-                                title = child.text or 'No Title'
-                            elif child.tag == 'desc':
-                                desc = child.text or ''
-                            elif child.tag == 'sub-title':
-                                sub_title = child.text or ''
-
-                        if not title:
-                            title = 'No Title'
-
-                        # Extract custom properties
-                        custom_props = extract_custom_properties(elem)
-                        custom_properties_json = None
-
-                        if custom_props:
-                            logger.trace(f"Number of custom properties: {len(custom_props)}")
-                            custom_properties_json = custom_props
-
-                        programs_to_create.append(ProgramData(
-                            epg=epg,
-                            start_time=start_time,
-                            end_time=end_time,
-                            title=title,
-                            description=desc,
-                            sub_title=sub_title,
-                            tvg_id=epg.tvg_id,
-                            custom_properties=custom_properties_json
-                        ))
+                        program_sync.add(build_program_from_element(elem, epg.id, epg.tvg_id))
                         programs_processed += 1
                         # Clear the element to free memory
                         clear_element(elem)
-                        # Batch processing
-                        if len(programs_to_create) >= batch_size:
-                            ProgramData.objects.bulk_create(programs_to_create)
-                            logger.debug(f"Saved batch of {len(programs_to_create)} programs for {epg.tvg_id}")
-                            programs_to_create = []
-                            # Only call gc.collect() every few batches
-                            if programs_processed % (batch_size * 5) == 0:
-                                gc.collect()
+                        # Only call gc.collect() every few batches
+                        if programs_processed % (program_sync.batch_size * 5) == 0:
+                            gc.collect()
 
                     except Exception as e:
                         logger.error(f"Error processing program for {epg.tvg_id}: {e}", exc_info=True)
@@ -1343,16 +1249,16 @@ def parse_programs_for_tvg_id(epg_id):
                 except Exception as e:
                     logger.warning(f"Error tracking memory: {e}")
 
-        # Process any remaining items
-        if programs_to_create:
-            ProgramData.objects.bulk_create(programs_to_create)
-            logger.debug(f"Saved final batch of {len(programs_to_create)} programs for {epg.tvg_id}")
-            programs_to_create = None
-            custom_props = None
-            custom_properties_json = None
-
+        # Write remaining changes and remove programmes no longer in the guide
+        sync_stats = program_sync.finish([epg.id])
+        program_sync = None
+        if any(sync_stats.values()):
+            invalidate_epg_cache()
 
-        logger.info(f"Completed program parsing for tvg_id={epg.tvg_id}.")
+        logger.info(
+            f"Completed program parsing for tvg_id={epg.tvg_id}: {sync_stats['inserted']} inserted, "
+            f"{sync_stats['updated']} updated, {sync_stats['deleted']} deleted."
+        )
     finally:
         # Reset internal caches and pools that lxml might be keeping
         try:
@@ -1367,7 +1273,7 @@ def parse_programs_for_tvg_id(epg_id):
                 pass
         source_file = None
         program_parser = None
-        programs_to_create = None
+        program_sync = None
 
         epg_source = None
         # Add comprehensive cleanup before releasing lock
@@ -1410,65 +1316,120 @@ def parse_programs_for_source(epg_source, tvg_id=None):
         process = None
         should_log_memory = False
 
+    locked_epg_ids = set()
     try:
-        # Process EPG entries in batches rather than all at once
-        batch_size = 20  # Process fewer channels at once to reduce memory usage
-        epg_count = EPGData.objects.filter(epg_source=epg_source).count()
+        # Only EPG entries that are mapped to at least one channel need programs,
+        # matching the per-tvg_id parser. Build the routing table up front so the
+        # XMLTV file only has to be streamed once for the whole source.
+        epg_entries = EPGData.objects.filter(
+            epg_source=epg_source,
+            tvg_id__isnull=False,
+            channels__isnull=False,
+        ).exclude(tvg_id='')
+        if tvg_id:
+            epg_entries = epg_entries.filter(tvg_id=tvg_id)
+        tvg_id_to_epg_id = dict(epg_entries.distinct().values_list('tvg_id', 'id'))
+        epg_count = len(tvg_id_to_epg_id)
 
         if epg_count == 0:
-            logger.info(f"No EPG entries found for source: {epg_source.name}")
+            logger.info(f"No mapped EPG entries found for source: {epg_source.name}")
             # Update status - this is not an error, just no entries
             epg_source.status = 'success'
             epg_source.save(update_fields=['status'])
             send_epg_update(epg_source.id, "parsing_programs", 100, status="success")
             return True
 
-        logger.info(f"Parsing programs for {epg_count} EPG entries from source: {epg_source.name}")
+        file_path, error = resolve_program_file_path(epg_source)
+        if not file_path:
+            logger.error(f"{error}, cannot parse programs for source: {epg_source.name}")
+            return False
+
+        # Hold the per-EPG parse locks so parse_programs_for_tvg_id (queued when a channel's
+        # EPG mapping changes) can't sync the same entries at the same time. Entries whose
+        # per-EPG parse is already running are left to it.
+        locked_epg_ids = acquire_task_locks('parse_epg_programs', tvg_id_to_epg_id.values())
+        if len(locked_epg_ids) < epg_count:
+            logger.info(
+                f"Skipping {epg_count - len(locked_epg_ids)} EPG entries of {epg_source.name} "
+                f"with a program parse already in progress"
+            )
+            tvg_id_to_epg_id = {
+                tvg: epg_id for tvg, epg_id in tvg_id_to_epg_id.items() if epg_id in locked_epg_ids
+            }
+            epg_count = len(tvg_id_to_epg_id)
+
+        logger.info(f"Parsing programs for {epg_count} mapped EPG entries from source: {epg_source.name}")
 
         failed_entries = []
         program_count = 0
         channel_count = 0
-        updated_count = 0
-        processed = 0
-        # Process in batches using cursor-based approach to limit memory usage
-        last_id = 0
-        while True:
-            # Get a batch of EPG entries
-            batch_entries = list(EPGData.objects.filter(
-                epg_source=epg_source,
-                id__gt=last_id
-            ).order_by('id')[:batch_size])
 
-            if not batch_entries:
-                break  # No more entries to process
+        # Diff against the stored programmes instead of deleting and re-inserting,
+        # so only new/changed/removed rows are written. Pending writes are capped at
+        # batch_size, but the match index keeps (id, hash) for every stored programme
+        # of each entry seen so far, so memory grows with the source's stored guide.
+        program_sync = ProgramDataSync()
+        channels_seen = set()
+        file_size = os.path.getsize(file_path) or 1
+        last_progress = 0
+
+        source_file = open(file_path, 'rb')
+        try:
+            program_parser = etree.iterparse(source_file, events=('end',), tag='programme', remove_blank_text=True, recover=True)
 
-            # Update last_id for next iteration
-            last_id = batch_entries[-1].id
+            for _, elem in program_parser:
+                channel_tvg_id = elem.get('channel')
+                epg_id = tvg_id_to_epg_id.get(channel_tvg_id)
+                if epg_id is None:
+                    clear_element(elem)
+                    continue
 
-            # Process this batch
-            for epg in batch_entries:
-                if epg.tvg_id:
-                    try:
-                        result = parse_programs_for_tvg_id(epg.id)
-                        if result == "Task already running":
-                            logger.info(f"Program parse for {epg.id} already in progress, skipping")
+                try:
+                    program_sync.add(build_program_from_element(elem, epg_id, channel_tvg_id))
+                    channels_seen.add(epg_id)
+                    program_count += 1
+                except Exception as e:
+                    logger.error(f"Error processing program for {channel_tvg_id}: {e}", exc_info=True)
+                    failed_entries.append(f"{channel_tvg_id}: {str(e)}")
+                finally:
+                    clear_element(elem)
 
-                        processed += 1
-                        progress = min(95, int((processed / epg_count) * 100)) if epg_count > 0 else 50
-                        send_epg_update(epg_source.id, "parsing_programs", progress)
-                    except Exception as e:
-                        logger.error(f"Error parsing programs for tvg_id={epg.tvg_id}: {e}", exc_info=True)
-                        failed_entries.append(f"{epg.tvg_id}: {str(e)}")
+                # Report progress based on how far through the file we are
+                progress = min(95, int((source_file.tell() / file_size) * 100))
+                if progress >= last_progress + 5:
+                    last_progress = progress
+                    send_epg_update(epg_source.id, "parsing_programs", progress)
+                    refresh_task_locks('parse_epg_programs', locked_epg_ids)
+                    gc.collect()
 
-            # Force garbage collection after each batch
-            batch_entries = None  # Remove reference to help garbage collection
-            gc.collect()
+            program_parser = None
+        finally:
+            source_file.close()
+            source_file = None
+
+        # Write remaining changes and drop programmes that are no longer in the guide
+        refresh_task_locks('parse_epg_programs', locked_epg_ids)
+        sync_stats = program_sync.finish(tvg_id_to_epg_id.values())
+        program_sync = None
+        if any(sync_stats.values()):
+            invalidate_epg_cache()
+        logger.info(
+            f"Program sync for {epg_source.name}: {sync_stats['inserted']} inserted, "
+            f"{sync_stats['updated']} updated, {sync_stats['deleted']} deleted"
+        )
+
+        channel_count = len(channels_seen)
+        channels_seen = None
+        gc.collect()
 
         # If there were failures, include them in the message but continue
         if failed_entries:
             epg_source.status = EPGSource.STATUS_SUCCESS  # Still mark as success if some processed
-            error_summary = f"Failed to parse {len(failed_entries)} of {epg_count} entries"
-            stats_summary = f"Processed {program_count} programs across {channel_count} channels. Updated: {updated_count}."
+            error_summary = f"Failed to parse {len(failed_entries)} programs"
+            stats_summary = (
+                f"Processed {program_count} programs across {channel_count} channels. "
+                f"Inserted: {sync_stats['inserted']}, updated: {sync_stats['updated']}, deleted: {sync_stats['deleted']}."
+            )
             epg_source.last_message = f"{stats_summary} Warning: {error_summary}"
             epg_source.updated_at = timezone.now()
             epg_source.save(update_fields=['status', 'last_message', 'updated_at'])
@@ -1476,7 +1437,8 @@ def parse_programs_for_source(epg_source, tvg_id=None):
             # Send completion notification with mixed status
             send_epg_update(epg_source.id, "parsing_programs", 100,
                           status="success",
-                          message=epg_source.last_message)
+                          message=epg_source.last_message,
+                          **sync_stats)
 
             # Explicitly release memory of large lists before returning
             del failed_entries
@@ -1486,14 +1448,18 @@ def parse_programs_for_source(epg_source, tvg_id=None):
 
         # If all successful, set a comprehensive success message
         epg_source.status = EPGSource.STATUS_SUCCESS
-        epg_source.last_message = f"Successfully processed {program_count} programs across {channel_count} channels. Updated: {updated_count}."
+        epg_source.last_message = (
+            f"Successfully processed {program_count} programs across {channel_count} channels. "
+            f"Inserted: {sync_stats['inserted']}, updated: {sync_stats['updated']}, deleted: {sync_stats['deleted']}."
+        )
         epg_source.updated_at = timezone.now()
         epg_source.save(update_fields=['status', 'last_message', 'updated_at'])
 
         # Send completion notification with status
         send_epg_update(epg_source.id, "parsing_programs", 100,
                       status="success",
-                      message=epg_source.last_message)
+                      message=epg_source.last_message,
+                      **sync_stats)
 
         logger.info(f"Completed parsing all programs for source: {epg_source.name}")
         return True
@@ -1509,15 +1475,12 @@ def parse_programs_for_source(epg_source, tvg_id=None):
                       message=epg_source.last_message)
         return False
     finally:
-        # Final memory cleanup and tracking
-
+        release_task_locks('parse_epg_programs', locked_epg_ids)
 
         # Explicitly release any remaining large data structures
         failed_entries = None
         program_count = None
         channel_count = None
-        updated_count = None
-        processed = None
         gc.collect()
 
         # Add comprehensive memory cleanup at the end
@@ -1593,6 +1556,7 @@ def fetch_schedules_direct(source):
                     logger.info(f"Created ProgramData '{title}' for tvg_id '{tvg_id}'.")
                 else:
                     logger.info(f"Updated ProgramData '{title}' for tvg_id '{tvg_id}'.")
+        invalidate_epg_cache()
     except Exception as e:
         logger.error(f"Error fetching Schedules Direct data from {source.name}: {e}", exc_info=True)
 
@@ -1654,6 +1618,182 @@ def parse_schedules_direct_time(time_str):
         raise
 
 
+def resolve_program_file_path(epg_source):
+    """
+    Locate the XMLTV file to parse programs from, re-fetching it if it's missing.
+    Returns (file_path, None) on success or (None, error_message) on failure.
+    """
+    file_path = epg_source.extracted_file_path if epg_source.extracted_file_path else epg_source.file_path
+    if not file_path:
+        file_path = epg_source.get_cache_file()
+
+    if os.path.exists(file_path):
+        return file_path, None
+
+    logger.error(f"EPG file not found at: {file_path}")
+
+    if epg_source.url:
+        # Update the file path in the database
+        new_path = epg_source.get_cache_file()
+        logger.info(f"Updating file_path from '{file_path}' to '{new_path}'")
+        epg_source.file_path = new_path
+        epg_source.save(update_fields=['file_path'])
+        logger.info(f"Fetching new EPG data from URL: {epg_source.url}")
+    else:
+        logger.info(f"EPG source does not have a URL, using existing file path: {file_path} to rebuild cache")
+
+    # Properly check the return value from fetch_xmltv
+    fetch_success = fetch_xmltv(epg_source)
+
+    # If fetch was not successful or the file still doesn't exist, abort
+    if not fetch_success:
+        epg_source.status = 'error'
+        epg_source.last_message = f"Failed to download EPG data, cannot parse programs"
+        epg_source.save(update_fields=['status', 'last_message'])
+        send_epg_update(epg_source.id, "parsing_programs", 100, status="error", error="Failed to download EPG file")
+        return None, "Failed to fetch EPG data"
+
+    # Also check if the file exists after download
+    if not os.path.exists(epg_source.file_path):
+        epg_source.status = 'error'
+        epg_source.last_message = f"Failed to download EPG data, file missing after download"
+        epg_source.save(update_fields=['status', 'last_message'])
+        send_epg_update(epg_source.id, "parsing_programs", 100, status="error", error="File not found after download")
+        return None, f"EPG file still missing at: {epg_source.file_path}"
+
+    # Use the new location
+    if epg_source.extracted_file_path:
+        return epg_source.extracted_file_path, None
+    return epg_source.file_path, None
+
+
+def build_program_from_element(elem, epg_id, tvg_id):
+    """Build an unsaved ProgramData instance from a <programme> element."""
+    start_time = parse_xmltv_time(elem.get('start'))
+    end_time = parse_xmltv_time(elem.get('stop'))
+    title = None
+    desc = None
+    sub_title = None
+
+    # Efficiently process child elements
+    for child in elem:
+        if child.tag == 'title':
+            title = child.text or 'No Title'
+        elif child.tag == 'desc':
+            desc = child.text or ''
+        elif child.tag == 'sub-title':
+            sub_title = child.text or ''
+
+    if not title:
+        title = 'No Title'
+
+    # Extract custom properties
+    custom_props = extract_custom_properties(elem)
+    if custom_props:
+        logger.trace(f"Number of custom properties: {len(custom_props)}")
+
+    return ProgramData(
+        epg_id=epg_id,
+        start_time=start_time,
+        end_time=end_time,
+        title=title,
+        description=desc,
+        sub_title=sub_title,
+        tvg_id=tvg_id,
+        custom_properties=custom_props or None
+    )
+
+
+class ProgramDataSync:
+    """
+    Diff freshly parsed programmes against what is already stored.
+
+    Programmes are matched per EPG entry on start_time, then compared by
+    content hash: new ones are inserted, changed ones updated in place and,
+    once finish() is called, anything that wasn't seen again is deleted.
+    Unchanged rows are never touched, so the guide is never empty mid-refresh.
+    """
+
+    UPDATE_FIELDS = ['end_time', 'title', 'sub_title', 'description', 'tvg_id', 'custom_properties', 'content_hash']
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        # epg_id -> {start_time: [(id, content_hash), ...]} for rows not yet matched
+        self._existing = {}
+        self._to_create = []
+        self._to_update = []
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.deleted = 0
+
+    def _existing_for(self, epg_id):
+        existing = self._existing.get(epg_id)
+        if existing is None:
+            existing = {}
+            rows = ProgramData.objects.filter(epg_id=epg_id).values_list('id', 'start_time', 'content_hash')
+            for program_id, start_time, content_hash in rows.iterator(chunk_size=2000):
+                existing.setdefault(start_time, []).append((program_id, content_hash))
+            self._existing[epg_id] = existing
+        return existing
+
+    def add(self, program):
+        program.content_hash = program.compute_content_hash()
+        candidates = self._existing_for(program.epg_id).get(program.start_time)
+
+        if not candidates:
+            self._to_create.append(program)
+        else:
+            # Prefer an identical row if the old data had duplicates at this time
+            match = next((c for c in candidates if c[1] == program.content_hash), candidates[0])
+            candidates.remove(match)
+            if match[1] == program.content_hash:
+                self.unchanged += 1
+            else:
+                program.id = match[0]
+                self._to_update.append(program)
+
+        if len(self._to_create) >= self.batch_size or len(self._to_update) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._to_create:
+            ProgramData.objects.bulk_create(self._to_create)
+            self.inserted += len(self._to_create)
+            self._to_create = []
+        if self._to_update:
+            ProgramData.objects.bulk_update(self._to_update, self.UPDATE_FIELDS)
+            self.updated += len(self._to_update)
+            self._to_update = []
+
+    def finish(self, epg_ids):
+        """
+        Write pending changes and delete programmes that disappeared for epg_ids.
+        Entries that received no programmes at all lose all of their rows.
+        """
+        self.flush()
+
+        stale_ids = []
+        unseen_epg_ids = []
+        for epg_id in epg_ids:
+            existing = self._existing.get(epg_id)
+            if existing is None:
+                unseen_epg_ids.append(epg_id)
+                continue
+            for candidates in existing.values():
+                stale_ids.extend(program_id for program_id, _ in candidates)
+
+        for i in range(0, len(stale_ids), self.batch_size):
+            deleted, _ = ProgramData.objects.filter(id__in=stale_ids[i:i + self.batch_size]).delete()
+            self.deleted += deleted
+        for i in range(0, len(unseen_epg_ids), 500):
+            deleted, _ = ProgramData.objects.filter(epg_id__in=unseen_epg_ids[i:i + 500]).delete()
+            self.deleted += deleted
+
+        self._existing = {}
+        return {'inserted': self.inserted, 'updated': self.updated, 'deleted': self.deleted}
+
+
 # Helper function to extract custom properties - moved to a separate function to clean up the code
 def extract_custom_properties(prog):
     # Create a new dictionary for each call
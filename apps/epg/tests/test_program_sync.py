@@ -0,0 +1,97 @@
+import importlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.apps import apps as django_apps
+from django.test import TestCase
+
+from apps.epg.models import EPGData, EPGSource, ProgramData
+from apps.epg.tasks import ProgramDataSync
+
+START = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def program(epg, hour, title, **fields):
+    start = START + timedelta(hours=hour)
+    return ProgramData(
+        epg=epg, start_time=start, end_time=start + timedelta(hours=1), title=title, tvg_id=epg.tvg_id, **fields
+    )
+
+
+class ProgramDataSyncTest(TestCase):
+    def setUp(self):
+        source = EPGSource.objects.create(name="Sync", source_type="xmltv")
+        self.epg = EPGData.objects.create(tvg_id="one", name="One", epg_source=source)
+        self.other = EPGData.objects.create(tvg_id="two", name="Two", epg_source=source)
+
+    def _store(self, *programs):
+        sync = ProgramDataSync()
+        for p in programs:
+            sync.add(p)
+        return sync.finish([self.epg.id, self.other.id])
+
+    def _guide(self, epg):
+        return list(
+            ProgramData.objects.filter(epg=epg).order_by('start_time', 'id').values_list('start_time', 'title')
+        )
+
+    def test_only_differences_are_written(self):
+        self._store(program(self.epg, 0, "News"), program(self.epg, 1, "Film"), program(self.other, 0, "Kids"))
+        ids = dict(ProgramData.objects.values_list('title', 'id'))
+
+        stats = self._store(
+            program(self.epg, 0, "News"),
+            program(self.epg, 1, "Film", description="Now with a synopsis"),
+            program(self.epg, 2, "Late Show"),
+            program(self.other, 0, "Kids"),
+        )
+        self.assertEqual(stats, {'inserted': 1, 'updated': 1, 'deleted': 0})
+        # Unchanged and updated programmes keep their rows
+        self.assertEqual(ProgramData.objects.get(title="News").id, ids["News"])
+        film = ProgramData.objects.get(title="Film")
+        self.assertEqual((film.id, film.description), (ids["Film"], "Now with a synopsis"))
+        self.assertEqual(film.content_hash, film.compute_content_hash())
+
+    def test_programmes_that_disappeared_are_deleted(self):
+        self._store(program(self.epg, 0, "News"), program(self.epg, 1, "Film"), program(self.other, 0, "Kids"))
+
+        # "two" got no programmes at all this time: its whole guide goes
+        stats = self._store(program(self.epg, 1, "Film"))
+        self.assertEqual(stats, {'inserted': 0, 'updated': 0, 'deleted': 2})
+        self.assertEqual(self._guide(self.epg), [(START + timedelta(hours=1), "Film")])
+        self.assertEqual(self._guide(self.other), [])
+
+    def test_duplicates_at_the_same_start_time(self):
+        self._store(program(self.epg, 0, "News"), program(self.epg, 0, "Weather"))
+
+        # The identical row is kept whatever its position, the other one is rewritten
+        stats = self._store(program(self.epg, 0, "Weather"), program(self.epg, 0, "Sport"))
+        self.assertEqual(stats, {'inserted': 0, 'updated': 1, 'deleted': 0})
+        self.assertEqual(sorted(title for _, title in self._guide(self.epg)), ["Sport", "Weather"])
+
+        # One fewer duplicate: the spare row is deleted
+        stats = self._store(program(self.epg, 0, "Sport"))
+        self.assertEqual(stats, {'inserted': 0, 'updated': 0, 'deleted': 1})
+        self.assertEqual(self._guide(self.epg), [(START, "Sport")])
+
+    def test_writes_are_batched(self):
+        sync = ProgramDataSync(batch_size=2)
+        for hour in range(5):
+            sync.add(program(self.epg, hour, f"Show {hour}"))
+        # Two full batches written, the fifth programme still pending
+        self.assertEqual((sync.inserted, ProgramData.objects.count()), (4, 4))
+        self.assertEqual(sync.finish([self.epg.id]), {'inserted': 5, 'updated': 0, 'deleted': 0})
+
+    def test_backfilled_hashes_match(self):
+        fields = {'sub_title': "Evening", 'custom_properties': {'categories': ['News']}}
+        self._store(program(self.epg, 0, "News", **fields))
+        stored = ProgramData.objects.get()
+        # As stored before content_hash existed
+        ProgramData.objects.update(content_hash=None)
+
+        migration = importlib.import_module('apps.epg.migrations.0021_backfill_programdata_content_hash')
+        migration.backfill_content_hashes(django_apps, None)
+        self.assertEqual(ProgramData.objects.get().content_hash, stored.content_hash)
+
+        # So the first refresh after upgrading doesn't rewrite every programme
+        stats = self._store(program(self.epg, 0, "News", **fields))
+        self.assertEqual(stats, {'inserted': 0, 'updated': 0, 'deleted': 0})
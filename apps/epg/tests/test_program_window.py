@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.test import TestCase
+
+from apps.epg.models import EPGData, EPGSource, ProgramData
+
+from .test_program_sync import START, program
+
+
+class ProgramWindowTest(TestCase):
+    def setUp(self):
+        source = EPGSource.objects.create(name="Window", source_type="xmltv")
+        self.epg = EPGData.objects.create(tvg_id="one", name="One", epg_source=source)
+        other = EPGData.objects.create(tvg_id="two", name="Two", epg_source=source)
+        ProgramData.objects.bulk_create(
+            [program(self.epg, hour, f"Show {hour}") for hour in range(4)] + [program(other, 1, "Other")]
+        )
+
+    def _titles(self, *args, **kwargs):
+        return [p.title for p in ProgramData.objects.window(*args, **kwargs)]
+
+    def test_by_start_time(self):
+        end = START + timedelta(hours=2)
+        self.assertEqual(self._titles(self.epg.id, START + timedelta(hours=1), end), ["Show 1"])
+        self.assertEqual(
+            self._titles(self.epg.id, START + timedelta(hours=1), end, inclusive_end=True), ["Show 1", "Show 2"]
+        )
+        self.assertEqual(self._titles(start=START + timedelta(hours=3)), ["Show 3"])
+        self.assertEqual(self._titles([self.epg.id], end=START + timedelta(minutes=90)), ["Show 0", "Show 1"])
+
+    def test_overlapping(self):
+        # Show 0 is still airing at 00:30
+        start = START + timedelta(minutes=30)
+        self.assertEqual(
+            self._titles(self.epg.id, start, START + timedelta(hours=2), overlapping=True), ["Show 0", "Show 1"]
+        )
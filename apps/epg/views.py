@@ -18,10 +18,7 @@ def epg_view(request):
     print(f"[EPG VIEW] Now: {now} | End Time: {end_time}")
 
     # Query ProgramData within the time range
-    programmes = ProgramData.objects.filter(
-        start_time__gte=now,
-        start_time__lte=end_time
-    ).order_by('start_time')
+    programmes = ProgramData.objects.window(start=now, end=end_time, inclusive_end=True)
     print(f"[EPG VIEW] Found {programmes.count()} programme(s) between now and end_time.")
 
     # Group programmes by channel (retrieved via the EPGData parent)
@@ -2764,6 +2764,13 @@ def refresh_single_m3u_account(account_id):
             except Exception as e:
                 logger.error(f"Failed to queue VOD refresh for account {account_id}: {str(e)}")
 
+        # Warm the logo cache for any new channel logos
+        try:
+            from apps.channels.tasks import prefetch_logos
+            prefetch_logos.delay()
+        except Exception as e:
+            logger.error(f"Failed to queue logo prefetch after refreshing account {account_id}: {str(e)}")
+
     except Exception as e:
         logger.error(f"Error processing M3U for account {account_id}: {str(e)}")
         account.status = M3UAccount.Status.ERROR
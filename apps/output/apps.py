@@ -4,3 +4,7 @@ class OutputConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.output'
     verbose_name = "Output"
+
+    def ready(self):
+        # Import signals so they get registered.
+        import apps.output.signals
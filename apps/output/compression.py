@@ -0,0 +1,137 @@
+"""
+Content-Encoding negotiation for the M3U and XMLTV outputs.
+
+Streaming responses are compressed incrementally as the underlying generator
+(or cached file) produces data, so nothing is buffered beyond the compressor's
+own window.
+"""
+import logging
+import time
+import zlib
+
+from django.utils.cache import patch_vary_headers
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+# Don't bother compressing tiny non-streaming bodies
+MIN_COMPRESS_SIZE = 1024
+# Streams are flushed to the client after this much input or this long, whichever comes first,
+# so slow renders keep the connection alive and clients can start parsing early
+FLUSH_SIZE = 65536
+FLUSH_INTERVAL = 1.0
+
+
+def negotiate_encoding(request):
+    """Pick the encoding the client prefers by q-value (zstd on a tie with gzip), else None."""
+    accepted = {}
+    for item in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        parts = item.strip().split(";")
+        name = parts[0].strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            param = param.strip()
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+
+    wildcard = accepted.get("*", 0.0)
+    gzip_quality = max(accepted.get("gzip", wildcard), accepted.get("x-gzip", 0.0))
+    zstd_quality = accepted.get("zstd", wildcard) if zstandard is not None else 0.0
+    # Highest q wins; zstd only breaks ties
+    if zstd_quality > 0 and zstd_quality >= gzip_quality:
+        return "zstd"
+    if gzip_quality > 0:
+        return "gzip"
+    return None
+
+
+def _compressor(encoding):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    # wbits=31 produces a gzip container rather than a raw zlib stream
+    return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+
+def _sync_flush(compressor, encoding):
+    """Emit everything compressed so far without ending the stream."""
+    if encoding == "zstd":
+        return compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+    return compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of str/bytes chunks, yielding output as it becomes available."""
+    compressor = _compressor(encoding)
+    unflushed = 0
+    last_flush = time.monotonic()
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        data = compressor.compress(chunk)
+        unflushed += len(chunk)
+        if unflushed and (unflushed >= FLUSH_SIZE or time.monotonic() - last_flush >= FLUSH_INTERVAL):
+            data += _sync_flush(compressor, encoding)
+            unflushed = 0
+            last_flush = time.monotonic()
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compress_response(request, response, encoding=None, as_file=False):
+    """
+    Compress response with the negotiated (or given) encoding.
+
+    With as_file=True the compressed body is the payload itself (e.g. `epg.xml.gz`
+    for players that want a .gz file but can't send Accept-Encoding), so it's
+    served as application/gzip instead of with a Content-Encoding header.
+    """
+    if encoding is None:
+        encoding = negotiate_encoding(request)
+
+    if not as_file:
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+    if encoding is None or response.status_code != 200 or response.has_header("Content-Encoding"):
+        return response
+
+    if response.streaming:
+        response.streaming_content = compress_stream(response.streaming_content, encoding)
+    else:
+        if len(response.content) < MIN_COMPRESS_SIZE and not as_file:
+            return response
+        response.content = b"".join(compress_stream([response.content], encoding))
+    # Length changes once compressed (FileResponse sets it from the file size)
+    if response.has_header("Content-Length"):
+        del response["Content-Length"]
+    if not response.streaming:
+        response["Content-Length"] = str(len(response.content))
+
+    if as_file:
+        response["Content-Type"] = "application/gzip" if encoding == "gzip" else "application/zstd"
+        disposition = response.get("Content-Disposition")
+        if disposition and disposition.endswith('"'):
+            extension = ".gz" if encoding == "gzip" else ".zst"
+            response["Content-Disposition"] = f'{disposition[:-1]}{extension}"'
+    else:
+        response["Content-Encoding"] = encoding
+
+    # Compressed bytes differ from the identity representation; a weak ETag still
+    # lets conditional requests match (same approach as Django's GZipMiddleware)
+    etag = response.get("ETag")
+    if etag and not etag.startswith("W/"):
+        response["ETag"] = f"W/{etag}"
+
+    return response
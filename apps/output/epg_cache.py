@@ -0,0 +1,249 @@
+"""
+Disk-backed render cache for the XMLTV output.
+
+Rendering the full guide is expensive and every media server polls it, so a
+rendered document is written to disk once per distinct set of output options
+and served from there until it expires or the cache version is bumped (on EPG
+refresh or channel changes). Concurrent requests for the same document share
+a single render: one worker renders in the background while every request,
+including the first, streams the file as it is being written.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import gevent
+from django.conf import settings
+from django.db import connection
+from django.http import FileResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date
+
+from core.utils import RedisClient
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "output:epg_cache:version"
+RENDER_LOCK_PREFIX = "output:epg_cache:render:"
+RENDER_LOCK_TTL = 1800  # Upper bound for a single render, in seconds
+# The renderer keeps its lock alive this long at a time, so a dead worker's lock lapses quickly
+RENDER_HEARTBEAT_TTL = 30
+RENDER_HEARTBEAT_INTERVAL = 10
+# Followers stop waiting once the render file hasn't grown for this long
+RENDER_STALL_TIMEOUT = 60
+FOLLOW_POLL_INTERVAL = 0.1
+FOLLOW_READ_SIZE = 65536
+
+
+def invalidate_epg_cache():
+    """Bump the cache version so every previously rendered document is treated as stale."""
+    if getattr(settings, "EPG_OUTPUT_CACHE_TTL", 0) <= 0:
+        return
+    redis_client = RedisClient.get_client()
+    if redis_client is None:
+        return
+    try:
+        redis_client.incr(VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Failed to invalidate EPG output cache: {e}")
+
+
+def cached_epg_response(request, key_parts, render):
+    """
+    Return a response for the XMLTV document identified by key_parts.
+
+    render is a zero-argument callable returning a generator of str chunks and
+    is only invoked when no fresh copy is on disk and no render is in flight.
+    Falls back to streaming render() directly if Redis or the cache dir are unavailable.
+    """
+    ttl = getattr(settings, "EPG_OUTPUT_CACHE_TTL", 0)
+    cache_dir = getattr(settings, "EPG_OUTPUT_CACHE_DIR", None)
+    redis_client = RedisClient.get_client() if ttl > 0 and cache_dir else None
+
+    if redis_client is None:
+        return _xml_response(StreamingHttpResponse(render(), content_type="application/xml"))
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        version = int(redis_client.get(VERSION_KEY) or 0)
+    except Exception as e:
+        logger.warning(f"EPG output cache unavailable, rendering directly: {e}")
+        return _xml_response(StreamingHttpResponse(render(), content_type="application/xml"))
+
+    key = hashlib.sha1(
+        "|".join(str(part) for part in (version, *key_parts)).encode("utf-8")
+    ).hexdigest()
+    path = os.path.join(cache_dir, f"{key}.xml")
+    lock_key = f"{RENDER_LOCK_PREFIX}{key}"
+
+    # A render can finish between our checks, so retry once before giving up on the cache
+    for _ in range(2):
+        mtime = _fresh_mtime(path, ttl)
+        if mtime is not None:
+            etag = _etag(key, mtime)
+            if _etag_matches(request, etag):
+                return _xml_response(HttpResponseNotModified(), etag, mtime)
+            response = FileResponse(open(path, "rb"), content_type="application/xml")
+            return _xml_response(response, etag, mtime)
+
+        started = int(time.time())
+        if redis_client.set(lock_key, started, nx=True, ex=RENDER_HEARTBEAT_TTL):
+            tmp_path = f"{path}.{started}.tmp"
+            output = open(tmp_path, "wb")
+            threading.Thread(
+                target=_render_to_file,
+                args=(render, output, tmp_path, path, started, lock_key, cache_dir, ttl),
+                daemon=True,
+            ).start()
+        else:
+            in_flight = redis_client.get(lock_key)
+            if in_flight is None:
+                continue
+            started = int(in_flight)
+
+        response = StreamingHttpResponse(
+            _follow_render(f"{path}.{started}.tmp", lock_key, started),
+            content_type="application/xml",
+        )
+        return _xml_response(response, _etag(key, started), started)
+
+    logger.warning("EPG output cache render raced repeatedly, rendering directly")
+    return _xml_response(StreamingHttpResponse(render(), content_type="application/xml"))
+
+
+def _render_to_file(render, output, tmp_path, path, started, lock_key, cache_dir, ttl):
+    """Write a full render to tmp_path and atomically move it into place."""
+    completed = False
+    done = threading.Event()
+    threading.Thread(target=_heartbeat, args=(lock_key, started, done), daemon=True).start()
+    try:
+        for piece in render():
+            output.write(piece.encode("utf-8"))
+            output.flush()
+        output.close()
+        os.utime(tmp_path, (started, started))
+        os.replace(tmp_path, path)
+        completed = True
+        logger.debug(f"Rendered EPG output to {path} in {time.time() - started:.1f}s")
+    except Exception as e:
+        logger.error(f"Error rendering EPG output: {e}", exc_info=True)
+    finally:
+        if not output.closed:
+            output.close()
+        if not completed:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        done.set()
+        try:
+            RedisClient.get_client().delete(lock_key)
+        except Exception:
+            pass
+        # This thread opened its own DB connection; don't leave it dangling
+        connection.close()
+
+    if completed:
+        _prune(cache_dir, ttl)
+
+
+def _heartbeat(lock_key, started, done):
+    """Keep the render lock alive until the render is done, up to RENDER_LOCK_TTL."""
+    redis_client = RedisClient.get_client()
+    while not done.wait(RENDER_HEARTBEAT_INTERVAL) and time.time() - started < RENDER_LOCK_TTL:
+        try:
+            redis_client.expire(lock_key, RENDER_HEARTBEAT_TTL)
+        except Exception as e:
+            logger.debug(f"Failed to refresh EPG output render lock: {e}")
+
+
+def _follow_render(tmp_path, lock_key, started):
+    """
+    Stream a file that another thread or worker is still writing.
+    Runs in the request greenlet, so waits must yield to the hub rather than block the worker.
+    """
+    redis_client = RedisClient.get_client()
+    final_path = tmp_path[: -len(f".{started}.tmp")]
+
+    source = None
+    deadline = time.time() + 10
+    while source is None:
+        try:
+            source = open(tmp_path, "rb")
+        except FileNotFoundError:
+            # The render may already have been moved into place
+            try:
+                if int(os.path.getmtime(final_path)) == started:
+                    source = open(final_path, "rb")
+                    break
+            except OSError:
+                pass
+            if time.time() > deadline:
+                logger.error(f"EPG output render {tmp_path} never appeared")
+                return
+            gevent.sleep(FOLLOW_POLL_INTERVAL)
+
+    try:
+        last_growth = time.time()
+        while True:
+            data = source.read(FOLLOW_READ_SIZE)
+            if data:
+                last_growth = time.time()
+                yield data
+                continue
+
+            if redis_client.exists(lock_key):
+                if time.time() - last_growth < RENDER_STALL_TIMEOUT:
+                    gevent.sleep(FOLLOW_POLL_INTERVAL)
+                    continue
+                logger.error(f"EPG output render {tmp_path} stopped growing, giving up on it")
+
+            # Render finished (or stalled); drain anything written since the last read
+            data = source.read()
+            if data:
+                yield data
+            break
+    finally:
+        source.close()
+
+
+def _prune(cache_dir, ttl):
+    """Remove rendered documents that can no longer be served."""
+    cutoff = time.time() - max(ttl, RENDER_LOCK_TTL)
+    try:
+        for entry in os.scandir(cache_dir):
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+    except OSError as e:
+        logger.debug(f"Error pruning EPG output cache: {e}")
+
+
+def _fresh_mtime(path, ttl):
+    try:
+        mtime = int(os.path.getmtime(path))
+    except OSError:
+        return None
+    return mtime if time.time() - mtime < ttl else None
+
+
+def _etag(key, mtime):
+    return f'"{key[:16]}-{mtime:x}"'
+
+
+def _etag_matches(request, etag):
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _xml_response(response, etag=None, mtime=None):
+    response["Content-Disposition"] = 'attachment; filename="Dispatcharr.xml"'
+    # Clients must revalidate, but can do so cheaply with If-None-Match
+    response["Cache-Control"] = "no-cache"
+    if etag:
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(mtime)
+    return response
@@ -0,0 +1,19 @@
+# apps/output/signals.py
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.channels.models import Channel, ChannelProfile, ChannelProfileMembership, Logo
+from apps.epg.models import EPGData
+from .epg_cache import invalidate_epg_cache
+
+
+@receiver(post_save, sender=Channel)
+@receiver(post_delete, sender=Channel)
+@receiver(post_save, sender=ChannelProfileMembership)
+@receiver(post_delete, sender=ChannelProfileMembership)
+@receiver(post_delete, sender=ChannelProfile)
+@receiver(post_save, sender=Logo)
+@receiver(post_delete, sender=EPGData)
+def invalidate_epg_output(sender, **kwargs):
+    """Any change to what ends up in the XMLTV output makes cached renders stale."""
+    invalidate_epg_cache()
@@ -1,5 +1,27 @@
-from django.test import TestCase, Client
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.http import JsonResponse
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.channels.models import Channel, ChannelGroup, ChannelStream, Logo, Stream
+from apps.epg.models import EPGData, EPGSource, ProgramData
+from apps.output import compression, epg_cache
+from apps.output import views as output_views
+from apps.output.views import generate_epg, generate_m3u, xc_get_live_streams
+from core.utils import RedisClient
 
 class OutputM3UTest(TestCase):
     def setUp(self):
@@ -14,3 +36,284 @@ class OutputM3UTest(TestCase):
         self.assertEqual(response.status_code, 200)
         content = response.content.decode()
         self.assertIn("#EXTM3U", content)
+
+
+class OutputQueryCountTest(TestCase):
+    """The output endpoints must not issue per-channel queries."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username="admin", password="x", user_level=10)
+        self.group = ChannelGroup.objects.create(name="Query Count")
+        self.epg_source = EPGSource.objects.create(name="Query Count", source_type="xmltv")
+        self.channel_count = 0
+
+    def _add_channels(self, count):
+        now = timezone.now()
+        for _ in range(count):
+            self.channel_count += 1
+            i = self.channel_count
+            channel = Channel.objects.create(
+                channel_number=i,
+                name=f"Channel {i}",
+                channel_group=self.group,
+                logo=Logo.objects.create(name=f"Logo {i}", url=f"http://example.com/{i}.png"),
+            )
+            stream = Stream.objects.create(name=f"Stream {i}", url=f"http://example.com/{i}.ts")
+            ChannelStream.objects.create(channel=channel, stream=stream, order=0)
+
+            epg = EPGData.objects.create(tvg_id=f"ch{i}", name=f"Channel {i}", epg_source=self.epg_source)
+            ProgramData.objects.create(
+                epg=epg, start_time=now, end_time=now + timedelta(hours=1), title=f"Show {i}", tvg_id=epg.tvg_id
+            )
+            # Queryset update so the post_save EPG parse task isn't dispatched
+            Channel.objects.filter(id=channel.id).update(epg_data=epg)
+
+    def _consume(self, response):
+        if response.streaming:
+            return b"".join(
+                chunk.encode() if isinstance(chunk, str) else chunk for chunk in response.streaming_content
+            )
+        return response.content
+
+    def _assert_constant_queries(self, render, added=3):
+        self._add_channels(3)
+        with CaptureQueriesContext(connection) as baseline:
+            body = self._consume(render())
+        self.assertIn(b"Channel 3", body)
+
+        self._add_channels(added)
+        with self.assertNumQueries(len(baseline)):
+            body = self._consume(render())
+        self.assertIn(f"Channel {3 + added}".encode(), body)
+        return body
+
+    def test_m3u_queries_constant(self):
+        self._assert_constant_queries(lambda: generate_m3u(self.factory.get("/output/m3u")))
+
+    def test_m3u_direct_urls_queries_constant(self):
+        self._assert_constant_queries(lambda: generate_m3u(self.factory.get("/output/m3u?direct=true")))
+
+    @override_settings(EPG_OUTPUT_CACHE_TTL=0)
+    def test_epg_queries_constant(self):
+        self._assert_constant_queries(lambda: generate_epg(self.factory.get("/output/epg")))
+
+    @override_settings(EPG_OUTPUT_CACHE_TTL=0)
+    def test_epg_queries_constant_for_many_channels(self):
+        # Programmes are streamed in small chunks from one query, whatever the channel count
+        with mock.patch.object(output_views, "EPG_PROGRAM_CHUNK_SIZE", 7):
+            body = self._assert_constant_queries(lambda: generate_epg(self.factory.get("/output/epg")), added=120)
+        self.assertEqual(body.count(b"<programme "), 123)
+        self.assertIn(b"<title>Show 123</title>", body)
+
+    def test_channels_sharing_an_epg_entry_get_its_programmes(self):
+        self._add_channels(2)
+        shared = Channel.objects.get(name="Channel 1").epg_data
+        extra = Channel.objects.create(channel_number=3, name="Channel 3", channel_group=self.group)
+        Channel.objects.filter(id=extra.id).update(epg_data=shared)
+        bare = Channel.objects.create(channel_number=4, name="No EPG", channel_group=self.group)
+
+        channels = list(output_views.output_channel_queryset(Channel.objects.order_by("channel_number")))
+        programs = {
+            channel.name: [p.title for p in channel_programs]
+            for channel, channel_programs in output_views.iter_channel_programs(channels)
+        }
+        self.assertEqual(
+            programs, {"Channel 1": ["Show 1"], "Channel 2": ["Show 2"], "Channel 3": ["Show 1"], bare.name: []}
+        )
+
+    def test_xc_live_streams_queries_constant(self):
+        def render():
+            return JsonResponse(xc_get_live_streams(self.factory.get("/player_api.php"), self.user), safe=False)
+
+        self._assert_constant_queries(render)
+
+
+
+class OutputCompressionTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        override = override_settings(EPG_OUTPUT_CACHE_DIR=self.cache_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        RedisClient.get_client().delete(epg_cache.VERSION_KEY)
+
+    def _negotiate(self, accept_encoding):
+        return compression.negotiate_encoding(self.factory.get("/", HTTP_ACCEPT_ENCODING=accept_encoding))
+
+    def test_negotiation(self):
+        self.assertEqual(self._negotiate("gzip, deflate, br, zstd"), "zstd")
+        self.assertEqual(self._negotiate("gzip;q=1.0, zstd;q=0.5"), "gzip")
+        self.assertEqual(self._negotiate("zstd;q=0.8, gzip;q=0.8"), "zstd")
+        self.assertEqual(self._negotiate("x-gzip"), "gzip")
+        self.assertEqual(self._negotiate("*;q=0.5, zstd;q=0"), "gzip")
+        self.assertEqual(self._negotiate("gzip;q=0, identity"), None)
+        self.assertEqual(self._negotiate(""), None)
+        with mock.patch.object(compression, "zstandard", None):
+            self.assertEqual(self._negotiate("zstd, gzip;q=0.1"), "gzip")
+
+    def test_stream_is_flushed_while_rendering(self):
+        def chunks():
+            yield "<tv>" + "x" * 100
+            yield "</tv>"
+
+        decompressor = zlib.decompressobj(31)
+        with mock.patch.object(compression, "FLUSH_SIZE", 100):
+            stream = compression.compress_stream(chunks(), "gzip")
+            # Everything passed in so far can be decoded before the render finishes
+            self.assertEqual(decompressor.decompress(next(stream)), b"<tv>" + b"x" * 100)
+            self.assertEqual(decompressor.decompress(b"".join(stream)), b"</tv>")
+
+    def _epg(self, url_name="output:epg_endpoint", **headers):
+        response = self.client.get(reverse(url_name), **headers)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, body
+
+    @override_settings(EPG_OUTPUT_CACHE_TTL=0)
+    def test_gzip_file_route(self):
+        response, body = self._epg("output:epg_endpoint_gz", HTTP_ACCEPT_ENCODING="zstd")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="Dispatcharr.xml.gz"')
+        self.assertTrue(gzip.decompress(body).startswith(b'<?xml version="1.0" encoding="UTF-8"?>'))
+
+    @override_settings(EPG_OUTPUT_CACHE_TTL=900)
+    def test_not_modified_when_compressed(self):
+        response, body = self._epg(HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        self.assertTrue(gzip.decompress(body).startswith(b"<?xml"))
+
+        response, body = self._epg(HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(body, b"")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+class EPGOutputCacheTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        override = override_settings(EPG_OUTPUT_CACHE_DIR=self.cache_dir, EPG_OUTPUT_CACHE_TTL=900)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.redis = RedisClient.get_client()
+        self.redis.delete(epg_cache.VERSION_KEY)
+        self.renders = 0
+
+    def _render(self):
+        self.renders += 1
+        yield "<tv>"
+        yield f"<render>{self.renders}</render>"
+        yield "</tv>"
+
+    def _get(self, render=None, **headers):
+        request = self.factory.get("/output/epg", **headers)
+        return epg_cache.cached_epg_response(request, ("epg", self.id()), render or self._render)
+
+    def _body(self, response):
+        try:
+            return b"".join(response.streaming_content)
+        finally:
+            response.close()
+
+    def _wait_for_render(self):
+        deadline = time.time() + 5
+        while any(name.endswith(".tmp") for name in os.listdir(self.cache_dir)) and time.time() < deadline:
+            time.sleep(0.01)
+        # The lock is released just after the file is moved into place
+        while self.redis.keys(f"{epg_cache.RENDER_LOCK_PREFIX}*") and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_rendered_once_then_served_from_disk(self):
+        first = self._get()
+        self.assertEqual(self._body(first), b"<tv><render>1</render></tv>")
+        self._wait_for_render()
+
+        second = self._get()
+        self.assertIsInstance(second, epg_cache.FileResponse)
+        self.assertEqual(self._body(second), b"<tv><render>1</render></tv>")
+        self.assertEqual(self.renders, 1)
+        # The render's start time is the document's identity, before and after it lands on disk
+        self.assertEqual(first["ETag"], second["ETag"])
+
+        not_modified = self._get(HTTP_IF_NONE_MATCH=second["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["ETag"], second["ETag"])
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_expired_documents_are_rendered_again(self):
+        self._body(self._get())
+        self._wait_for_render()
+        path = next(entry.path for entry in os.scandir(self.cache_dir))
+        expired = time.time() - 901
+        os.utime(path, (expired, expired))
+
+        self.assertEqual(self._body(self._get()), b"<tv><render>2</render></tv>")
+
+    def test_channel_and_epg_changes_invalidate(self):
+        self._body(self._get())
+        self._wait_for_render()
+
+        channel = Channel.objects.create(channel_number=1, name="New")
+        self.assertEqual(self._body(self._get()), b"<tv><render>2</render></tv>")
+        self._wait_for_render()
+
+        epg = EPGData.objects.create(
+            tvg_id="gone", name="Gone", epg_source=EPGSource.objects.create(name="Gone", source_type="xmltv")
+        )
+        self.assertEqual(self._body(self._get()), b"<tv><render>2</render></tv>")
+        epg.delete()
+        self.assertEqual(self._body(self._get()), b"<tv><render>3</render></tv>")
+        self._wait_for_render()
+
+        # What the EPG refresh and channel tasks call when programmes or channels change
+        epg_cache.invalidate_epg_cache()
+        self.assertEqual(self._body(self._get()), b"<tv><render>4</render></tv>")
+        self._wait_for_render()
+        channel.delete()
+        self.assertEqual(self._body(self._get()), b"<tv><render>5</render></tv>")
+
+    def test_followers_stream_a_render_in_progress(self):
+        started = threading.Event()
+        finish = threading.Event()
+
+        def slow_render():
+            self.renders += 1
+            yield "<tv>"
+            started.set()
+            finish.wait(5)
+            yield "</tv>"
+
+        leader = self._get(slow_render)
+        self.assertTrue(started.wait(5))
+        follower = self._get(slow_render)
+        self.assertEqual(leader["ETag"], follower["ETag"])
+
+        threading.Timer(0.2, finish.set).start()
+        self.assertEqual(self._body(follower), b"<tv></tv>")
+        self.assertEqual(self._body(leader), b"<tv></tv>")
+        self.assertEqual(self.renders, 1)
+
+    def test_followers_give_up_on_a_dead_renderer(self):
+        self._body(self._get())
+        self._wait_for_render()
+        epg_cache.invalidate_epg_cache()
+
+        # A render whose worker died after writing part of the file
+        with mock.patch.object(epg_cache.threading, "Thread"):
+            self._get()
+        self.assertEqual(self.renders, 1)
+        lock_key = self.redis.keys(f"{epg_cache.RENDER_LOCK_PREFIX}*")[0]
+        self.assertLessEqual(self.redis.ttl(lock_key), epg_cache.RENDER_HEARTBEAT_TTL)
+        tmp_path = next(entry.path for entry in os.scandir(self.cache_dir) if entry.name.endswith(".tmp"))
+        with open(tmp_path, "wb") as f:
+            f.write(b"<tv>")
+
+        with mock.patch.object(epg_cache, "RENDER_STALL_TIMEOUT", 0.3):
+            self.assertEqual(self._body(self._get()), b"<tv>")
+        self.redis.delete(lock_key)
@@ -7,6 +7,8 @@ app_name = "output"
 urlpatterns = [
     # Allow `/m3u`, `/m3u/`, `/m3u/profile_name`, and `/m3u/profile_name/`
     re_path(r"^m3u(?:/(?P<profile_name>[^/]+))?/?$", m3u_endpoint, name="m3u_endpoint"),
+    # Gzip file variants `/epg.xml.gz` and `/epg/profile_name.xml.gz` (must come before the plain EPG route)
+    re_path(r"^epg(?:/(?P<profile_name>[^/]+?))?\.xml\.gz$", epg_endpoint, {"gzip_file": True}, name="epg_endpoint_gz"),
     # Allow `/epg`, `/epg/`, `/epg/profile_name`, and `/epg/profile_name/`
     re_path(r"^epg(?:/(?P<profile_name>[^/]+))?/?$", epg_endpoint, name="epg_endpoint"),
     # Allow both `/stream/<int:stream_id>` and `/stream/<int:stream_id>/`
@@ -2,7 +2,7 @@ import ipaddress
 from django.http import HttpResponse, JsonResponse, Http404, HttpResponseForbidden, StreamingHttpResponse
 from rest_framework.response import Response
 from django.urls import reverse
-from apps.channels.models import Channel, ChannelProfile, ChannelGroup
+from apps.channels.models import Channel, ChannelProfile, ChannelGroup, ChannelStream
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from apps.epg.models import ProgramData
@@ -19,9 +19,14 @@ from tzlocal import get_localzone
 from urllib.parse import urlparse
 import base64
 import logging
+from django.db.models import Prefetch
+from itertools import groupby
+from operator import attrgetter
 from django.db.models.functions import Lower
 import os
 from apps.m3u.utils import calculate_tuner_count
+from apps.output.compression import compress_response
+from apps.output.epg_cache import cached_epg_response
 import regex
 
 logger = logging.getLogger(__name__)
@@ -30,13 +35,89 @@ def m3u_endpoint(request, profile_name=None, user=None):
     if not network_access_allowed(request, "M3U_EPG"):
         return JsonResponse({"error": "Forbidden"}, status=403)
 
-    return generate_m3u(request, profile_name, user)
+    return compress_response(request, generate_m3u(request, profile_name, user))
 
-def epg_endpoint(request, profile_name=None, user=None):
+def epg_endpoint(request, profile_name=None, user=None, gzip_file=False):
     if not network_access_allowed(request, "M3U_EPG"):
         return JsonResponse({"error": "Forbidden"}, status=403)
 
-    return generate_epg(request, profile_name, user)
+    # `epg.xml.gz` URLs always get a gzip file, for players that can't negotiate encoding
+    if gzip_file:
+        return compress_response(request, generate_epg(request, profile_name, user), encoding="gzip", as_file=True)
+
+    return compress_response(request, generate_epg(request, profile_name, user))
+
+def output_channel_queryset(channels, with_streams=False):
+    """
+    Load everything the M3U/XMLTV/XC outputs touch per channel up front, so the
+    number of queries doesn't grow with the number of channels.
+    With with_streams, channelstream_set is prefetched in stream order.
+    """
+    channels = channels.select_related("channel_group", "logo", "epg_data__epg_source")
+    if with_streams:
+        channels = channels.prefetch_related(
+            Prefetch(
+                "channelstream_set",
+                queryset=ChannelStream.objects.select_related("stream").order_by("order"),
+            )
+        )
+    return channels
+
+
+EPG_PROGRAM_CHUNK_SIZE = 2000
+
+
+def iter_channel_programs(channels, start=None, end=None):
+    """
+    Yield (channel, programs) for each channel, streaming every channel's programmes
+    from a single query ordered by EPG entry, so neither the query count nor memory
+    grows with the number of channels.
+
+    Channels with stored programmes come first, in EPG entry order; the rest follow
+    in their original order. programs is None for a custom dummy EPG without stored
+    programmes, meaning they should be generated on demand; otherwise it's the
+    channel's programmes within [start, end) in start_time order (possibly empty).
+    """
+    channels_by_epg = {}
+    for channel in channels:
+        channels_by_epg.setdefault(channel.epg_data_id, []).append(channel)
+
+    epg_ids = {epg_id for epg_id in channels_by_epg if epg_id}
+    dummy_epg_ids = {
+        channel.epg_data_id for channel in channels
+        if channel.epg_data_id and channel.epg_data.epg_source
+        and channel.epg_data.epg_source.source_type == 'dummy'
+    }
+    dummy_with_programs = set()
+    if dummy_epg_ids:
+        dummy_with_programs = set(
+            ProgramData.objects.filter(epg_id__in=dummy_epg_ids).values_list('epg_id', flat=True).distinct()
+        )
+
+    served = set()
+    stored_epg_ids = (epg_ids - dummy_epg_ids) | dummy_with_programs
+    if stored_epg_ids:
+        programs = (
+            ProgramData.objects.window(stored_epg_ids, start, end)
+            .order_by('epg_id', 'start_time', 'id')
+            .iterator(chunk_size=EPG_PROGRAM_CHUNK_SIZE)
+        )
+        for epg_id, epg_programs in groupby(programs, key=attrgetter('epg_id')):
+            served.add(epg_id)
+            epg_channels = channels_by_epg[epg_id]
+            # Channels sharing an EPG entry each need the programmes; hold only this entry's
+            epg_programs = list(epg_programs) if len(epg_channels) > 1 else epg_programs
+            for channel in epg_channels:
+                yield channel, epg_programs
+
+    for channel in channels:
+        if channel.epg_data_id in served:
+            continue
+        if channel.epg_data_id in dummy_epg_ids and channel.epg_data_id not in dummy_with_programs:
+            yield channel, None
+        else:
+            yield channel, []
+
 
 @csrf_exempt
 @require_http_methods(["GET", "POST"])
@@ -95,6 +176,8 @@ def generate_m3u(request, profile_name=None, user=None):
     # Check if direct stream URLs should be used instead of proxy
     use_direct_urls = request.GET.get('direct', 'false').lower() == 'true'
 
+    channels = output_channel_queryset(channels, with_streams=use_direct_urls)
+
     # Get the source to use for tvg-id value
     # Options: 'channel_number' (default), 'tvg_id', 'gracenote'
     tvg_id_source = request.GET.get('tvg_id_source', 'channel_number').lower()
@@ -166,8 +249,9 @@ def generate_m3u(request, profile_name=None, user=None):
 
         # Determine the stream URL based on the direct parameter
         if use_direct_urls:
-            # Try to get the first stream's direct URL
-            first_stream = channel.streams.order_by('channelstream__order').first()
+            # Try to get the first stream's direct URL (channelstream_set is prefetched in order)
+            channel_streams = channel.channelstream_set.all()
+            first_stream = channel_streams[0].stream if channel_streams else None
             if first_stream and first_stream.url:
                 # Use the direct stream URL
                 stream_url = first_stream.url
@@ -926,7 +1010,25 @@ def generate_epg(request, profile_name=None, user=None):
     Since the EPG data is stored independently of Channels, we group programmes
     by their associated EPGData record.
     This version filters data based on the 'days' parameter and sends keep-alives during processing.
+    Rendered documents are cached on disk (see apps.output.epg_cache) and served with an ETag.
     """
+    # Check if the request wants to use direct logo URLs instead of cache
+    use_cached_logos = request.GET.get('cachedlogos', 'true').lower() != 'false'
+
+    # Get the source to use for tvg-id value
+    # Options: 'channel_number' (default), 'tvg_id', 'gracenote'
+    tvg_id_source = request.GET.get('tvg_id_source', 'channel_number').lower()
+
+    # Get the number of days for EPG data
+    try:
+        # Default to 0 days (everything) for real EPG if not specified
+        days_param = request.GET.get('days', '0')
+        num_days = int(days_param)
+        # Set reasonable limits
+        num_days = max(0, min(num_days, 365))  # Between 0 and 365 days
+    except ValueError:
+        num_days = 0  # Default to all data if invalid value
+
     def epg_generator():
         """Generator function that yields EPG data with keep-alives during processing"""        # Send initial HTTP headers as comments (these will be ignored by XML parsers but keep connection alive)
 
@@ -967,22 +1069,8 @@ def generate_epg(request, profile_name=None, user=None):
             else:
                 channels = Channel.objects.all().order_by("channel_number")
 
-        # Check if the request wants to use direct logo URLs instead of cache
-        use_cached_logos = request.GET.get('cachedlogos', 'true').lower() != 'false'
-
-        # Get the source to use for tvg-id value
-        # Options: 'channel_number' (default), 'tvg_id', 'gracenote'
-        tvg_id_source = request.GET.get('tvg_id_source', 'channel_number').lower()
-
-        # Get the number of days for EPG data
-        try:
-            # Default to 0 days (everything) for real EPG if not specified
-            days_param = request.GET.get('days', '0')
-            num_days = int(days_param)
-            # Set reasonable limits
-            num_days = max(0, min(num_days, 365))  # Between 0 and 365 days
-        except ValueError:
-            num_days = 0  # Default to all data if invalid value
+        # Evaluate once with related data; the channel and programme sections both iterate it
+        channels = list(output_channel_queryset(channels, with_streams=True))
 
         # For dummy EPG, use either the specified value or default to 3 days
         dummy_days = num_days if num_days > 0 else 3
@@ -1035,8 +1123,9 @@ def generate_epg(request, profile_name=None, user=None):
         yield '\n'.join(xml_lines) + '\n'
         xml_lines = []  # Clear to save memory
 
-        # Process programs for each channel
-        for channel in channels:
+        # Process programs for each channel, streaming programmes from one query
+        program_window = (now, cutoff_date) if num_days > 0 else (None, None)
+        for channel, channel_programs in iter_channel_programs(channels, *program_window):
 
             # Use the same channel ID determination for program entries
             if tvg_id_source == 'tvg_id' and channel.tvg_id:
@@ -1069,10 +1158,11 @@ def generate_epg(request, profile_name=None, user=None):
 
                     if name_source == 'stream':
                         stream_index = custom_props.get('stream_index', 1) - 1
-                        channel_streams = channel.streams.all().order_by('channelstream__order')
+                        # channelstream_set is prefetched in order, see output_channel_queryset()
+                        channel_streams = [cs.stream for cs in channel.channelstream_set.all()]
 
-                        if channel_streams.exists() and 0 <= stream_index < channel_streams.count():
-                            stream = list(channel_streams)[stream_index]
+                        if 0 <= stream_index < len(channel_streams):
+                            stream = channel_streams[stream_index]
                             pattern_match_name = stream.name
                             logger.debug(f"Using stream name for parsing: {pattern_match_name} (stream index: {stream_index})")
                         else:
@@ -1119,8 +1209,8 @@ def generate_epg(request, profile_name=None, user=None):
             else:
                 # Check if this is a dummy EPG with no programs (generate on-demand)
                 if channel.epg_data.epg_source and channel.epg_data.epg_source.source_type == 'dummy':
-                    # This is a custom dummy EPG - check if it has programs
-                    if not channel.epg_data.programs.exists():
+                    # This is a custom dummy EPG - None means it has no stored programs
+                    if channel_programs is None:
                         # No programs stored, generate on-demand using custom patterns
                         # Use actual channel name for pattern matching
                         program_length_hours = 4
@@ -1159,272 +1249,253 @@ def generate_epg(request, profile_name=None, user=None):
 
                         continue  # Skip to next channel
 
-                # For real EPG data - filter only if days parameter was specified
-                if num_days > 0:
-                    programs_qs = channel.epg_data.programs.filter(
-                        start_time__gte=now,
-                        start_time__lt=cutoff_date
-                    ).order_by('id')  # Explicit ordering for consistent chunking
-                else:
-                    # Return all programs if days=0 or not specified
-                    programs_qs = channel.epg_data.programs.all().order_by('id')
-
-                # Process programs in chunks to avoid cursor timeout issues
+                # Programmes are streamed for this channel by iter_channel_programs
                 program_batch = []
                 batch_size = 250
-                chunk_size = 1000  # Fetch 1000 programs at a time from DB
-
-                # Fetch chunks until no more results (avoids count() query)
-                offset = 0
-                while True:
-                    # Fetch a chunk of programs - this closes the cursor after fetching
-                    program_chunk = list(programs_qs[offset:offset + chunk_size])
-
-                    # Break if no more programs
-                    if not program_chunk:
-                        break
-
-                    # Process each program in the chunk
-                    for prog in program_chunk:
-                        start_str = prog.start_time.strftime("%Y%m%d%H%M%S %z")
-                        stop_str = prog.end_time.strftime("%Y%m%d%H%M%S %z")
-
-                        program_xml = [f'  <programme start="{start_str}" stop="{stop_str}" channel="{channel_id}">']
-                        program_xml.append(f'    <title>{html.escape(prog.title)}</title>')
-
-                        # Add subtitle if available
-                        if prog.sub_title:
-                            program_xml.append(f"    <sub-title>{html.escape(prog.sub_title)}</sub-title>")
-
-                        # Add description if available
-                        if prog.description:
-                            program_xml.append(f"    <desc>{html.escape(prog.description)}</desc>")
-
-                        # Process custom properties if available
-                        if prog.custom_properties:
-                            custom_data = prog.custom_properties or {}
-
-                            # Add categories if available
-                            if "categories" in custom_data and custom_data["categories"]:
-                                for category in custom_data["categories"]:
-                                    program_xml.append(f"    <category>{html.escape(category)}</category>")
-
-                            # Add keywords if available
-                            if "keywords" in custom_data and custom_data["keywords"]:
-                                for keyword in custom_data["keywords"]:
-                                    program_xml.append(f"    <keyword>{html.escape(keyword)}</keyword>")
-
-                            # Handle episode numbering - multiple formats supported
-                            # Prioritize onscreen_episode over standalone episode for onscreen system
-                            if "onscreen_episode" in custom_data:
-                                program_xml.append(f'    <episode-num system="onscreen">{html.escape(custom_data["onscreen_episode"])}</episode-num>')
-                            elif "episode" in custom_data:
-                                program_xml.append(f'    <episode-num system="onscreen">E{custom_data["episode"]}</episode-num>')
-
-                            # Handle dd_progid format
-                            if 'dd_progid' in custom_data:
-                                program_xml.append(f'    <episode-num system="dd_progid">{html.escape(custom_data["dd_progid"])}</episode-num>')
-
-                            # Handle external database IDs
-                            for system in ['thetvdb.com', 'themoviedb.org', 'imdb.com']:
-                                if f'{system}_id' in custom_data:
-                                    program_xml.append(f'    <episode-num system="{system}">{html.escape(custom_data[f"{system}_id"])}</episode-num>')
-
-                            # Add season and episode numbers in xmltv_ns format if available
-                            if "season" in custom_data and "episode" in custom_data:
-                                season = (
-                                    int(custom_data["season"]) - 1
-                                    if str(custom_data["season"]).isdigit()
-                                    else 0
-                                )
-                                episode = (
-                                    int(custom_data["episode"]) - 1
-                                    if str(custom_data["episode"]).isdigit()
-                                    else 0
-                                )
-                                program_xml.append(f'    <episode-num system="xmltv_ns">{season}.{episode}.</episode-num>')
-
-                            # Add language information
-                            if "language" in custom_data:
-                                program_xml.append(f'    <language>{html.escape(custom_data["language"])}</language>')
-
-                            if "original_language" in custom_data:
-                                program_xml.append(f'    <orig-language>{html.escape(custom_data["original_language"])}</orig-language>')
-
-                            # Add length information
-                            if "length" in custom_data and isinstance(custom_data["length"], dict):
-                                length_value = custom_data["length"].get("value", "")
-                                length_units = custom_data["length"].get("units", "minutes")
-                                program_xml.append(f'    <length units="{html.escape(length_units)}">{html.escape(str(length_value))}</length>')
-
-                            # Add video information
-                            if "video" in custom_data and isinstance(custom_data["video"], dict):
-                                program_xml.append("    <video>")
-                                for attr in ['present', 'colour', 'aspect', 'quality']:
-                                    if attr in custom_data["video"]:
-                                        program_xml.append(f"      <{attr}>{html.escape(custom_data['video'][attr])}</{attr}>")
-                                program_xml.append("    </video>")
-
-                            # Add audio information
-                            if "audio" in custom_data and isinstance(custom_data["audio"], dict):
-                                program_xml.append("    <audio>")
-                                for attr in ['present', 'stereo']:
-                                    if attr in custom_data["audio"]:
-                                        program_xml.append(f"      <{attr}>{html.escape(custom_data['audio'][attr])}</{attr}>")
-                                program_xml.append("    </audio>")
-
-                            # Add subtitles information
-                            if "subtitles" in custom_data and isinstance(custom_data["subtitles"], list):
-                                for subtitle in custom_data["subtitles"]:
-                                    if isinstance(subtitle, dict):
-                                        subtitle_type = subtitle.get("type", "")
-                                        type_attr = f' type="{html.escape(subtitle_type)}"' if subtitle_type else ""
-                                        program_xml.append(f"    <subtitles{type_attr}>")
-                                        if "language" in subtitle:
-                                            program_xml.append(f"      <language>{html.escape(subtitle['language'])}</language>")
-                                        program_xml.append("    </subtitles>")
-
-                            # Add rating if available
-                            if "rating" in custom_data:
-                                rating_system = custom_data.get("rating_system", "TV Parental Guidelines")
-                                program_xml.append(f'    <rating system="{html.escape(rating_system)}">')
-                                program_xml.append(f'      <value>{html.escape(custom_data["rating"])}</value>')
-                                program_xml.append(f"    </rating>")
-
-                            # Add star ratings
-                            if "star_ratings" in custom_data and isinstance(custom_data["star_ratings"], list):
-                                for star_rating in custom_data["star_ratings"]:
-                                    if isinstance(star_rating, dict) and "value" in star_rating:
-                                        system_attr = f' system="{html.escape(star_rating["system"])}"' if "system" in star_rating else ""
-                                        program_xml.append(f"    <star-rating{system_attr}>")
-                                        program_xml.append(f"      <value>{html.escape(star_rating['value'])}</value>")
-                                        program_xml.append("    </star-rating>")
-
-                            # Add reviews
-                            if "reviews" in custom_data and isinstance(custom_data["reviews"], list):
-                                for review in custom_data["reviews"]:
-                                    if isinstance(review, dict) and "content" in review:
-                                        review_type = review.get("type", "text")
-                                        attrs = [f'type="{html.escape(review_type)}"']
-                                        if "source" in review:
-                                            attrs.append(f'source="{html.escape(review["source"])}"')
-                                        if "reviewer" in review:
-                                            attrs.append(f'reviewer="{html.escape(review["reviewer"])}"')
-                                        attr_str = " ".join(attrs)
-                                        program_xml.append(f'    <review {attr_str}>{html.escape(review["content"])}</review>')
-
-                            # Add images
-                            if "images" in custom_data and isinstance(custom_data["images"], list):
-                                for image in custom_data["images"]:
-                                    if isinstance(image, dict) and "url" in image:
-                                        attrs = []
-                                        for attr in ['type', 'size', 'orient', 'system']:
-                                            if attr in image:
-                                                attrs.append(f'{attr}="{html.escape(image[attr])}"')
-                                        attr_str = " " + " ".join(attrs) if attrs else ""
-                                        program_xml.append(f'    <image{attr_str}>{html.escape(image["url"])}</image>')
-
-                            # Add enhanced credits handling
-                            if "credits" in custom_data:
-                                program_xml.append("    <credits>")
-                                credits = custom_data["credits"]
-
-                                # Handle different credit types
-                                for role in ['director', 'writer', 'adapter', 'producer', 'composer', 'editor', 'presenter', 'commentator', 'guest']:
-                                    if role in credits:
-                                        people = credits[role]
-                                        if isinstance(people, list):
-                                            for person in people:
-                                                program_xml.append(f"      <{role}>{html.escape(person)}</{role}>")
-                                        else:
-                                            program_xml.append(f"      <{role}>{html.escape(people)}</{role}>")
-
-                                # Handle actors separately to include role and guest attributes
-                                if "actor" in credits:
-                                    actors = credits["actor"]
-                                    if isinstance(actors, list):
-                                        for actor in actors:
-                                            if isinstance(actor, dict):
-                                                name = actor.get("name", "")
-                                                role_attr = f' role="{html.escape(actor["role"])}"' if "role" in actor else ""
-                                                guest_attr = ' guest="yes"' if actor.get("guest") else ""
-                                                program_xml.append(f"      <actor{role_attr}{guest_attr}>{html.escape(name)}</actor>")
-                                            else:
-                                                program_xml.append(f"      <actor>{html.escape(actor)}</actor>")
-                                    else:
-                                        program_xml.append(f"      <actor>{html.escape(actors)}</actor>")
-
-                                program_xml.append("    </credits>")
-
-                            # Add program date if available (full date, not just year)
-                            if "date" in custom_data:
-                                program_xml.append(f'    <date>{html.escape(custom_data["date"])}</date>')
-
-                            # Add country if available
-                            if "country" in custom_data:
-                                program_xml.append(f'    <country>{html.escape(custom_data["country"])}</country>')
-
-                            # Add icon if available
-                            if "icon" in custom_data:
-                                program_xml.append(f'    <icon src="{html.escape(custom_data["icon"])}" />')
-
-                            # Add special flags as proper tags with enhanced handling
-                            if custom_data.get("previously_shown", False):
-                                prev_shown_details = custom_data.get("previously_shown_details", {})
-                                attrs = []
-                                if "start" in prev_shown_details:
-                                    attrs.append(f'start="{html.escape(prev_shown_details["start"])}"')
-                                if "channel" in prev_shown_details:
-                                    attrs.append(f'channel="{html.escape(prev_shown_details["channel"])}"')
-                                attr_str = " " + " ".join(attrs) if attrs else ""
-                                program_xml.append(f"    <previously-shown{attr_str} />")
-
-                            if custom_data.get("premiere", False):
-                                premiere_text = custom_data.get("premiere_text", "")
-                                if premiere_text:
-                                    program_xml.append(f"    <premiere>{html.escape(premiere_text)}</premiere>")
-                                else:
-                                    program_xml.append("    <premiere />")
 
-                            if custom_data.get("last_chance", False):
-                                last_chance_text = custom_data.get("last_chance_text", "")
-                                if last_chance_text:
-                                    program_xml.append(f"    <last-chance>{html.escape(last_chance_text)}</last-chance>")
+                for prog in channel_programs:
+                    start_str = prog.start_time.strftime("%Y%m%d%H%M%S %z")
+                    stop_str = prog.end_time.strftime("%Y%m%d%H%M%S %z")
+
+                    program_xml = [f'  <programme start="{start_str}" stop="{stop_str}" channel="{channel_id}">']
+                    program_xml.append(f'    <title>{html.escape(prog.title)}</title>')
+
+                    # Add subtitle if available
+                    if prog.sub_title:
+                        program_xml.append(f"    <sub-title>{html.escape(prog.sub_title)}</sub-title>")
+
+                    # Add description if available
+                    if prog.description:
+                        program_xml.append(f"    <desc>{html.escape(prog.description)}</desc>")
+
+                    # Process custom properties if available
+                    if prog.custom_properties:
+                        custom_data = prog.custom_properties or {}
+
+                        # Add categories if available
+                        if "categories" in custom_data and custom_data["categories"]:
+                            for category in custom_data["categories"]:
+                                program_xml.append(f"    <category>{html.escape(category)}</category>")
+
+                        # Add keywords if available
+                        if "keywords" in custom_data and custom_data["keywords"]:
+                            for keyword in custom_data["keywords"]:
+                                program_xml.append(f"    <keyword>{html.escape(keyword)}</keyword>")
+
+                        # Handle episode numbering - multiple formats supported
+                        # Prioritize onscreen_episode over standalone episode for onscreen system
+                        if "onscreen_episode" in custom_data:
+                            program_xml.append(f'    <episode-num system="onscreen">{html.escape(custom_data["onscreen_episode"])}</episode-num>')
+                        elif "episode" in custom_data:
+                            program_xml.append(f'    <episode-num system="onscreen">E{custom_data["episode"]}</episode-num>')
+
+                        # Handle dd_progid format
+                        if 'dd_progid' in custom_data:
+                            program_xml.append(f'    <episode-num system="dd_progid">{html.escape(custom_data["dd_progid"])}</episode-num>')
+
+                        # Handle external database IDs
+                        for system in ['thetvdb.com', 'themoviedb.org', 'imdb.com']:
+                            if f'{system}_id' in custom_data:
+                                program_xml.append(f'    <episode-num system="{system}">{html.escape(custom_data[f"{system}_id"])}</episode-num>')
+
+                        # Add season and episode numbers in xmltv_ns format if available
+                        if "season" in custom_data and "episode" in custom_data:
+                            season = (
+                                int(custom_data["season"]) - 1
+                                if str(custom_data["season"]).isdigit()
+                                else 0
+                            )
+                            episode = (
+                                int(custom_data["episode"]) - 1
+                                if str(custom_data["episode"]).isdigit()
+                                else 0
+                            )
+                            program_xml.append(f'    <episode-num system="xmltv_ns">{season}.{episode}.</episode-num>')
+
+                        # Add language information
+                        if "language" in custom_data:
+                            program_xml.append(f'    <language>{html.escape(custom_data["language"])}</language>')
+
+                        if "original_language" in custom_data:
+                            program_xml.append(f'    <orig-language>{html.escape(custom_data["original_language"])}</orig-language>')
+
+                        # Add length information
+                        if "length" in custom_data and isinstance(custom_data["length"], dict):
+                            length_value = custom_data["length"].get("value", "")
+                            length_units = custom_data["length"].get("units", "minutes")
+                            program_xml.append(f'    <length units="{html.escape(length_units)}">{html.escape(str(length_value))}</length>')
+
+                        # Add video information
+                        if "video" in custom_data and isinstance(custom_data["video"], dict):
+                            program_xml.append("    <video>")
+                            for attr in ['present', 'colour', 'aspect', 'quality']:
+                                if attr in custom_data["video"]:
+                                    program_xml.append(f"      <{attr}>{html.escape(custom_data['video'][attr])}</{attr}>")
+                            program_xml.append("    </video>")
+
+                        # Add audio information
+                        if "audio" in custom_data and isinstance(custom_data["audio"], dict):
+                            program_xml.append("    <audio>")
+                            for attr in ['present', 'stereo']:
+                                if attr in custom_data["audio"]:
+                                    program_xml.append(f"      <{attr}>{html.escape(custom_data['audio'][attr])}</{attr}>")
+                            program_xml.append("    </audio>")
+
+                        # Add subtitles information
+                        if "subtitles" in custom_data and isinstance(custom_data["subtitles"], list):
+                            for subtitle in custom_data["subtitles"]:
+                                if isinstance(subtitle, dict):
+                                    subtitle_type = subtitle.get("type", "")
+                                    type_attr = f' type="{html.escape(subtitle_type)}"' if subtitle_type else ""
+                                    program_xml.append(f"    <subtitles{type_attr}>")
+                                    if "language" in subtitle:
+                                        program_xml.append(f"      <language>{html.escape(subtitle['language'])}</language>")
+                                    program_xml.append("    </subtitles>")
+
+                        # Add rating if available
+                        if "rating" in custom_data:
+                            rating_system = custom_data.get("rating_system", "TV Parental Guidelines")
+                            program_xml.append(f'    <rating system="{html.escape(rating_system)}">')
+                            program_xml.append(f'      <value>{html.escape(custom_data["rating"])}</value>')
+                            program_xml.append(f"    </rating>")
+
+                        # Add star ratings
+                        if "star_ratings" in custom_data and isinstance(custom_data["star_ratings"], list):
+                            for star_rating in custom_data["star_ratings"]:
+                                if isinstance(star_rating, dict) and "value" in star_rating:
+                                    system_attr = f' system="{html.escape(star_rating["system"])}"' if "system" in star_rating else ""
+                                    program_xml.append(f"    <star-rating{system_attr}>")
+                                    program_xml.append(f"      <value>{html.escape(star_rating['value'])}</value>")
+                                    program_xml.append("    </star-rating>")
+
+                        # Add reviews
+                        if "reviews" in custom_data and isinstance(custom_data["reviews"], list):
+                            for review in custom_data["reviews"]:
+                                if isinstance(review, dict) and "content" in review:
+                                    review_type = review.get("type", "text")
+                                    attrs = [f'type="{html.escape(review_type)}"']
+                                    if "source" in review:
+                                        attrs.append(f'source="{html.escape(review["source"])}"')
+                                    if "reviewer" in review:
+                                        attrs.append(f'reviewer="{html.escape(review["reviewer"])}"')
+                                    attr_str = " ".join(attrs)
+                                    program_xml.append(f'    <review {attr_str}>{html.escape(review["content"])}</review>')
+
+                        # Add images
+                        if "images" in custom_data and isinstance(custom_data["images"], list):
+                            for image in custom_data["images"]:
+                                if isinstance(image, dict) and "url" in image:
+                                    attrs = []
+                                    for attr in ['type', 'size', 'orient', 'system']:
+                                        if attr in image:
+                                            attrs.append(f'{attr}="{html.escape(image[attr])}"')
+                                    attr_str = " " + " ".join(attrs) if attrs else ""
+                                    program_xml.append(f'    <image{attr_str}>{html.escape(image["url"])}</image>')
+
+                        # Add enhanced credits handling
+                        if "credits" in custom_data:
+                            program_xml.append("    <credits>")
+                            credits = custom_data["credits"]
+
+                            # Handle different credit types
+                            for role in ['director', 'writer', 'adapter', 'producer', 'composer', 'editor', 'presenter', 'commentator', 'guest']:
+                                if role in credits:
+                                    people = credits[role]
+                                    if isinstance(people, list):
+                                        for person in people:
+                                            program_xml.append(f"      <{role}>{html.escape(person)}</{role}>")
+                                    else:
+                                        program_xml.append(f"      <{role}>{html.escape(people)}</{role}>")
+
+                            # Handle actors separately to include role and guest attributes
+                            if "actor" in credits:
+                                actors = credits["actor"]
+                                if isinstance(actors, list):
+                                    for actor in actors:
+                                        if isinstance(actor, dict):
+                                            name = actor.get("name", "")
+                                            role_attr = f' role="{html.escape(actor["role"])}"' if "role" in actor else ""
+                                            guest_attr = ' guest="yes"' if actor.get("guest") else ""
+                                            program_xml.append(f"      <actor{role_attr}{guest_attr}>{html.escape(name)}</actor>")
+                                        else:
+                                            program_xml.append(f"      <actor>{html.escape(actor)}</actor>")
                                 else:
-                                    program_xml.append("    <last-chance />")
-
-                            if custom_data.get("new", False):
-                                program_xml.append("    <new />")
-
-                            if custom_data.get('live', False):
-                                program_xml.append('    <live />')
-
-                        program_xml.append("  </programme>")
-
-                        # Add to batch
-                        program_batch.extend(program_xml)
-
-                        # Send batch when full or send keep-alive
-                        if len(program_batch) >= batch_size:
-                            yield '\n'.join(program_batch) + '\n'
-                            program_batch = []
-
-                    # Move to next chunk
-                    offset += chunk_size
+                                    program_xml.append(f"      <actor>{html.escape(actors)}</actor>")
+
+                            program_xml.append("    </credits>")
+
+                        # Add program date if available (full date, not just year)
+                        if "date" in custom_data:
+                            program_xml.append(f'    <date>{html.escape(custom_data["date"])}</date>')
+
+                        # Add country if available
+                        if "country" in custom_data:
+                            program_xml.append(f'    <country>{html.escape(custom_data["country"])}</country>')
+
+                        # Add icon if available
+                        if "icon" in custom_data:
+                            program_xml.append(f'    <icon src="{html.escape(custom_data["icon"])}" />')
+
+                        # Add special flags as proper tags with enhanced handling
+                        if custom_data.get("previously_shown", False):
+                            prev_shown_details = custom_data.get("previously_shown_details", {})
+                            attrs = []
+                            if "start" in prev_shown_details:
+                                attrs.append(f'start="{html.escape(prev_shown_details["start"])}"')
+                            if "channel" in prev_shown_details:
+                                attrs.append(f'channel="{html.escape(prev_shown_details["channel"])}"')
+                            attr_str = " " + " ".join(attrs) if attrs else ""
+                            program_xml.append(f"    <previously-shown{attr_str} />")
+
+                        if custom_data.get("premiere", False):
+                            premiere_text = custom_data.get("premiere_text", "")
+                            if premiere_text:
+                                program_xml.append(f"    <premiere>{html.escape(premiere_text)}</premiere>")
+                            else:
+                                program_xml.append("    <premiere />")
+
+                        if custom_data.get("last_chance", False):
+                            last_chance_text = custom_data.get("last_chance_text", "")
+                            if last_chance_text:
+                                program_xml.append(f"    <last-chance>{html.escape(last_chance_text)}</last-chance>")
+                            else:
+                                program_xml.append("    <last-chance />")
+
+                        if custom_data.get("new", False):
+                            program_xml.append("    <new />")
+
+                        if custom_data.get('live', False):
+                            program_xml.append('    <live />')
+
+                    program_xml.append("  </programme>")
+
+                    # Add to batch
+                    program_batch.extend(program_xml)
+
+                    # Send batch when full or send keep-alive
+                    if len(program_batch) >= batch_size:
+                        yield '\n'.join(program_batch) + '\n'
+                        program_batch = []
 
                 # Send remaining programs in batch
                 if program_batch:
                     yield '\n'.join(program_batch) + '\n'
 
         # Send final closing tag and completion message
-        yield "</tv>\n"    # Return streaming response
-    response = StreamingHttpResponse(
-        streaming_content=epg_generator(),
-        content_type="application/xml"
+        yield "</tv>\n"
+
+    # Everything that changes the rendered document has to be part of the cache key,
+    # including the host used to build logo URLs
+    cache_key_parts = (
+        "xmltv",
+        profile_name,
+        user.id if user is not None else None,
+        tvg_id_source,
+        num_days,
+        use_cached_logos,
+        build_absolute_uri_with_port(request, ""),
     )
-    response["Content-Disposition"] = 'attachment; filename="Dispatcharr.xml"'
-    response["Cache-Control"] = "no-cache"
-    return response
+    return cached_epg_response(request, cache_key_parts, epg_generator)
 
 
 def xc_get_user(request):
@@ -1570,7 +1641,7 @@ def xc_get(request):
     if user is None:
         return JsonResponse({'error': 'Unauthorized'}, status=401)
 
-    return generate_m3u(request, None, user)
+    return compress_response(request, generate_m3u(request, None, user))
 
 
 def xc_xmltv(request):
@@ -1582,7 +1653,7 @@ def xc_xmltv(request):
     if user is None:
         return JsonResponse({'error': 'Unauthorized'}, status=401)
 
-    return generate_epg(request, None, user)
+    return compress_response(request, generate_epg(request, None, user))
 
 
 def xc_get_live_categories(user):
@@ -1653,7 +1724,7 @@ def xc_get_live_streams(request, user, category_id=None):
                 channel_group__id=category_id, user_level__lte=user.user_level
             ).order_by("channel_number")
 
-    for channel in channels:
+    for channel in output_channel_queryset(channels):
         streams.append(
             {
                 "num": int(channel.channel_number) if channel.channel_number.is_integer() else channel.channel_number,
@@ -1731,19 +1802,15 @@ def xc_get_epg(request, user, short=False):
             else:
                 # Has stored programs, use them
                 if short == False:
-                    programs = channel.epg_data.programs.filter(
-                        start_time__gte=django_timezone.now()
-                    ).order_by('start_time')
+                    programs = ProgramData.objects.window(channel.epg_data_id, start=django_timezone.now())
                 else:
-                    programs = channel.epg_data.programs.all().order_by('start_time')[:limit]
+                    programs = ProgramData.objects.window(channel.epg_data_id)[:limit]
         else:
             # Regular EPG with stored programs
             if short == False:
-                programs = channel.epg_data.programs.filter(
-                    start_time__gte=django_timezone.now()
-                ).order_by('start_time')
+                programs = ProgramData.objects.window(channel.epg_data_id, start=django_timezone.now())
             else:
-                programs = channel.epg_data.programs.all().order_by('start_time')[:limit]
+                programs = ProgramData.objects.window(channel.epg_data_id)[:limit]
     else:
         # No EPG data assigned, generate default dummy
         programs = generate_dummy_programs(channel_id=channel_id, channel_name=channel.name, epg_source=None)
@@ -74,6 +74,11 @@ class HLSConfig(BaseConfig):
     INITIAL_BUFFER_SECONDS = 25.0
     MAX_INITIAL_SEGMENTS = 10
     BUFFER_READY_TIMEOUT = 30.0
+    SEGMENT_FETCH_WORKERS = 4    # Concurrent segment downloads per channel
+    SEGMENT_FETCH_ATTEMPTS = 3   # Downloads of a segment before it is skipped
+    SEGMENT_STATS_HISTORY = 100  # Recent segment downloads kept for latency metrics
+    OWNER_TTL = 30               # Seconds a worker's fetch lease lasts without renewal
+    SHARED_STATE_TTL = 300       # Seconds shared segments and playlist state outlive their last update
 
 class TSConfig(BaseConfig):
     """Configuration settings for TS proxy"""
@@ -82,6 +87,30 @@ class TSConfig(BaseConfig):
     INITIAL_BEHIND_CHUNKS = 4  # How many chunks behind to start a client (4 chunks = ~1MB)
     CHUNK_BATCH_SIZE = 5       # How many chunks to fetch in one batch
     KEEPALIVE_INTERVAL = 0.5   # Seconds between keepalive packets when at buffer head
+    CHUNK_WAIT_TIMEOUT = 1.0   # Max seconds a client at the buffer head waits for a new-chunk notification
+    CONTROL_REFRESH_INTERVAL = 1.0     # Seconds between shared stop/state checks per channel per worker
+    CLIENT_STATS_FLUSH_INTERVAL = 2.0  # Seconds between batched writes of client transfer stats
+    LIVENESS_UPDATE_INTERVAL = 5       # Min seconds between upstream last_data timestamp writes per channel
+    HTTP_DIRECT_INGEST = True          # Read non-transcoded HTTP streams in the stream manager thread (False: reader thread + pipe)
+    HTTP_READ_SIZE = 128 * 1024        # Max bytes per direct upstream read
+    LOCAL_CHUNK_CACHE_BYTES = 8 * 1024 * 1024  # Per-worker, per-channel ring of recent chunks shared by local clients (0 disables)
+    KEYFRAME_JOIN = True               # Start new clients on a keyframe with PAT/PMT in front (False: INITIAL_BEHIND_CHUNKS back)
+    KEYFRAME_JOIN_SECONDS = 2.0        # Join on the newest keyframe at least this many seconds behind live
+    KEYFRAME_JOIN_MAX_SECONDS = 10.0   # Ignore keyframes older than this; fall back to INITIAL_BEHIND_CHUNKS
+    TS_INSPECTION = True               # Check sync/continuity/PCR of every buffered chunk with NumPy (skipped without NumPy)
+    TS_STATS_INTERVAL = 5              # Seconds between writes of TS inspection stats to channel metadata
+    TS_CORRUPTION_THRESHOLD = 0.05     # Fraction of errored packets in a chunk that counts as corrupt
+    TS_CORRUPTION_TIMEOUT = 10         # Switch streams after this many seconds of continuously corrupt chunks (0 disables)
+    HOT_STANDBY_PROBE_TIMEOUT = 10     # A hot standby without data for this long is dropped and reopened
+    HOT_STANDBY_RETRY_INTERVAL = 30    # Seconds between attempts to open a hot standby
+    HOT_STANDBY_TAIL_BYTES = 8 * 1024 * 1024  # Max standby data kept since its last keyframe for the splice
+    HOT_STANDBY_HANDOFF_TIMEOUT = 1.0  # Max seconds to wait for the standby to hand over its connection
+    HLS_OUTPUT = True                  # Cut the buffer into HLS segments at keyframes for the HLS endpoints
+    HLS_SEGMENT_SECONDS = 4.0          # Minimum HLS segment duration; segments end on the next keyframe after it
+    HLS_PLAYLIST_SEGMENTS = 6          # Segments listed in the rolling HLS playlist
+    HLS_CLIENT_TIMEOUT = 20            # Seconds without a playlist request before an HLS client is dropped
+    HLS_NATIVE_INGEST = True           # Fetch MPEG-TS HLS upstreams in process (False: remux them with FFmpeg)
+    HLS_INGEST_LIVE_SEGMENTS = 3       # Segments back from the live edge to start a native HLS upstream at
     # Chunk read timeout
     CHUNK_TIMEOUT = 5        # Seconds to wait for each chunk read
 
@@ -0,0 +1,29 @@
+"""
+Defines Redis key patterns used by the HLS proxy to share channels between workers.
+"""
+
+class RedisKeys:
+    @staticmethod
+    def channel_owner(channel_id):
+        """Key holding the worker ID that fetches the channel"""
+        return f"hls_proxy:channel:{channel_id}:owner"
+
+    @staticmethod
+    def channel_state(channel_id):
+        """Hash of the channel's URL and playlist state"""
+        return f"hls_proxy:channel:{channel_id}:state"
+
+    @staticmethod
+    def segment_index(channel_id):
+        """Hash of buffered sequence number -> "<duration>:<discontinuity>" """
+        return f"hls_proxy:channel:{channel_id}:segments"
+
+    @staticmethod
+    def segment(channel_id, sequence):
+        """Key for the data of one buffered segment"""
+        return f"hls_proxy:channel:{channel_id}:segment:{sequence}"
+
+    @staticmethod
+    def client_activity(channel_id):
+        """Hash of client IP -> last request time"""
+        return f"hls_proxy:channel:{channel_id}:clients"
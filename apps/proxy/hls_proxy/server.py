@@ -12,12 +12,17 @@ import threading
 import logging
 import m3u8
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, urljoin
 import argparse
 from typing import Optional, Dict, List, Set, Deque
 import sys
 import os
+import socket
 from apps.proxy.config import HLSConfig as Config
+from core.utils import RedisClient
+from apps.proxy.hls_proxy.redis_keys import RedisKeys
 
 # Global state management
 manifest_buffer = None  # Stores current manifest content
@@ -31,16 +36,28 @@ class StreamBuffer:
     Attributes:
         buffer (Dict[int, bytes]): Maps sequence numbers to segment data
         lock (threading.Lock): Thread safety for buffer access
+        segment_info (Dict[int, tuple]): Maps sequence numbers to (duration, discontinuity)
+        state (dict): Channel URL and playlist state
         
     Features:
         - Thread-safe segment storage and retrieval
         - Automatic cleanup of old segments
         - Sequence number based indexing
+        - Segments and playlist state shared by all workers through Redis
+
+    Given a Redis client, the buffer is the channel's shared store: the worker
+    that owns the channel stores segments into Redis and any worker can build
+    the playlist and serve segments from it. The local dict then only caches
+    segments this worker has stored or read.
     """
     
-    def __init__(self):
+    def __init__(self, channel_id: Optional[str] = None, redis_client=None):
         self.buffer: Dict[int, bytes] = {}  # Maps sequence numbers to segment data
         self.lock: threading.Lock = threading.Lock()
+        self.segment_info: Dict[int, tuple] = {}
+        self.state: dict = {}
+        self.channel_id = channel_id
+        self.redis_client = redis_client if channel_id is not None else None
 
     def __getitem__(self, key: int) -> Optional[bytes]:
         """Get segment data by sequence number"""
@@ -56,6 +73,7 @@ class StreamBuffer:
             to_remove = keys[:-Config.MAX_SEGMENTS]
             for k in to_remove:
                 del self.buffer[k]
+                self.segment_info.pop(k, None)
 
     def __contains__(self, key: int) -> bool:
         """Check if sequence number exists in buffer"""
@@ -71,12 +89,117 @@ class StreamBuffer:
             if seq not in keep_sequences:
                 del self.buffer[seq]
 
+    def add_segment(self, seq: int, data: bytes, duration: float, discontinuity: bool):
+        """
+        Store a downloaded segment. Call with the lock held.
+
+        Sequence numbers are assigned consecutively, so the shared copy of
+        segment seq - MAX_SEGMENTS is dropped along with it.
+        """
+        self.segment_info[seq] = (duration, discontinuity)
+        self[seq] = data
+        if self.redis_client is None:
+            return
+
+        ttl = Config.SHARED_STATE_TTL
+        index_key = RedisKeys.segment_index(self.channel_id)
+        state_key = RedisKeys.channel_state(self.channel_id)
+        pipe = self.redis_client.pipeline()
+        pipe.setex(RedisKeys.segment(self.channel_id, seq), ttl, data)
+        pipe.hset(index_key, seq, f"{duration}:{int(discontinuity)}")
+        pipe.hset(state_key, 'next_sequence', seq + 1)
+        evicted = seq - Config.MAX_SEGMENTS
+        if evicted >= 0:
+            pipe.hdel(index_key, evicted)
+            pipe.delete(RedisKeys.segment(self.channel_id, evicted))
+        pipe.expire(index_key, ttl)
+        pipe.expire(state_key, ttl)
+        pipe.execute()
+
+    def get_segment(self, seq: int) -> Optional[bytes]:
+        """Segment data from the local buffer, falling back to the shared store"""
+        with self.lock:
+            data = self.buffer.get(seq)
+        if data is not None or self.redis_client is None:
+            return data
+
+        data = self.redis_client.get(RedisKeys.segment(self.channel_id, seq))
+        if data is not None:
+            with self.lock:
+                self[seq] = data
+        return data
+
+    def segment_index(self) -> List[tuple]:
+        """Buffered segments as (sequence, duration, discontinuity), in sequence order"""
+        if self.redis_client is None:
+            with self.lock:
+                return sorted((seq, duration, discontinuity)
+                              for seq, (duration, discontinuity) in self.segment_info.items())
+
+        index = []
+        for seq, value in self.redis_client.hgetall(RedisKeys.segment_index(self.channel_id)).items():
+            duration, discontinuity = _decode(value).split(':')
+            index.append((int(_decode(seq)), float(duration), discontinuity == '1'))
+        return sorted(index)
+
+    def set_state(self, **fields):
+        """Update the channel's URL and playlist state (url, target_duration, ready, ...)"""
+        self.state.update(fields)
+        if self.redis_client is None:
+            return
+        state_key = RedisKeys.channel_state(self.channel_id)
+        pipe = self.redis_client.pipeline()
+        pipe.hset(state_key, mapping={name: str(value) for name, value in fields.items()})
+        pipe.expire(state_key, Config.SHARED_STATE_TTL)
+        pipe.execute()
+
+    def get_state(self) -> dict:
+        """The channel's URL and playlist state, as strings when shared"""
+        if self.redis_client is None:
+            return dict(self.state)
+        state = self.redis_client.hgetall(RedisKeys.channel_state(self.channel_id))
+        return {_decode(name): _decode(value) for name, value in state.items()}
+
+    def exists(self) -> bool:
+        """Whether the channel has shared state, i.e. some worker runs it"""
+        if self.redis_client is None:
+            return bool(self.state)
+        return bool(self.redis_client.exists(RedisKeys.channel_state(self.channel_id)))
+
+    def clear(self):
+        """Remove all segments and state of the channel, shared ones included"""
+        with self.lock:
+            self.buffer.clear()
+            self.segment_info.clear()
+        self.state.clear()
+        if self.redis_client is None:
+            return
+        index_key = RedisKeys.segment_index(self.channel_id)
+        segment_keys = [RedisKeys.segment(self.channel_id, _decode(seq))
+                        for seq in self.redis_client.hkeys(index_key)]
+        self.redis_client.delete(
+            RedisKeys.channel_state(self.channel_id),
+            RedisKeys.client_activity(self.channel_id),
+            index_key,
+            *segment_keys
+        )
+
+def _decode(value) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else str(value)
+
 class ClientManager:
-    """Manages client connections and activity tracking"""
+    """
+    Manages client connections and activity tracking.
+
+    Given a Redis client, activity is also recorded in Redis, so the worker
+    that owns the channel sees the clients of every worker.
+    """
     
-    def __init__(self):
+    def __init__(self, channel_id: Optional[str] = None, redis_client=None):
         self.last_activity = {}  # Maps client IPs to last activity timestamp
         self.lock = threading.Lock()
+        self.channel_id = channel_id
+        self.redis_client = redis_client if channel_id is not None else None
         
     def record_activity(self, client_ip: str):
         """Record client activity timestamp"""
@@ -88,11 +211,33 @@ class ClientManager:
                 logging.info(f"New client connected: {client_ip}")
             else:
                 logging.debug(f"Client activity: {client_ip}")
+
+        if self.redis_client is not None:
+            activity_key = RedisKeys.client_activity(self.channel_id)
+            pipe = self.redis_client.pipeline()
+            pipe.hset(activity_key, client_ip, current_time)
+            pipe.expire(activity_key, Config.SHARED_STATE_TTL)
+            pipe.execute()
+
+    def has_activity(self) -> bool:
+        """Whether any client has requested the channel, on any worker"""
+        with self.lock:
+            if self.last_activity:
+                return True
+        if self.redis_client is None:
+            return False
+        return bool(self.redis_client.exists(RedisKeys.client_activity(self.channel_id)))
                 
     def cleanup_inactive(self, timeout: float) -> bool:
         """Remove inactive clients"""
         now = time.time()
         with self.lock:
+            if self.redis_client is not None:
+                shared = self.redis_client.hgetall(RedisKeys.client_activity(self.channel_id))
+                for ip, last_time in shared.items():
+                    ip = _decode(ip)
+                    self.last_activity[ip] = max(float(_decode(last_time)), self.last_activity.get(ip, 0))
+
             active_clients = {
                 ip: last_time 
                 for ip, last_time in self.last_activity.items()
@@ -104,6 +249,8 @@ class ClientManager:
                 for ip in removed:
                     inactive_time = now - self.last_activity[ip]
                     logging.warning(f"Client {ip} inactive for {inactive_time:.1f}s, removing")
+                if self.redis_client is not None:
+                    self.redis_client.hdel(RedisKeys.client_activity(self.channel_id), *removed)
             
             self.last_activity = active_clients
             if active_clients:
@@ -112,6 +259,49 @@ class ClientManager:
             
             return len(active_clients) == 0
 
+class SegmentFetchStats:
+    """Download latency and outcome of a channel's recent segments"""
+
+    def __init__(self, history: int = Config.SEGMENT_STATS_HISTORY):
+        self.lock = threading.Lock()
+        self.recent: Deque[dict] = deque(maxlen=history)
+        self.fetched = 0
+        self.failed = 0
+        self.missed = 0  # Segments that left the playlist before they were scheduled
+
+    def record(self, media_sequence: int, latency: float, size: int, attempts: int):
+        with self.lock:
+            self.fetched += 1
+            self.recent.append({
+                'media_sequence': media_sequence,
+                'latency': round(latency, 3),
+                'size': size,
+                'attempts': attempts,
+            })
+
+    def record_failure(self):
+        with self.lock:
+            self.failed += 1
+
+    def record_missed(self, count: int):
+        with self.lock:
+            self.missed += count
+
+    def snapshot(self) -> dict:
+        """Counters plus latency summary and per-segment details of recent downloads"""
+        with self.lock:
+            recent = list(self.recent)
+            stats = {'fetched': self.fetched, 'failed': self.failed, 'missed': self.missed}
+        latencies = sorted(entry['latency'] for entry in recent)
+        if latencies:
+            stats['latency'] = {
+                'avg': round(sum(latencies) / len(latencies), 3),
+                'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                'max': latencies[-1],
+            }
+        stats['recent'] = recent
+        return stats
+
 class StreamManager:
     """
     Manages HLS stream state and switching logic.
@@ -180,6 +370,9 @@ class StreamManager:
         self.buffered_duration = 0.0
         self.initial_buffering = True
 
+        # Segment download metrics
+        self.fetch_stats = SegmentFetchStats()
+
     def update_url(self, new_url: str) -> bool:
         """
         Handle stream URL changes with proper discontinuity marking.
@@ -293,6 +486,14 @@ class StreamManager:
             self.fetch_thread.join(timeout=5)
         logging.info(f"Stream manager stopped for channel {self.channel_id}")
 
+    def keep_ownership(self) -> bool:
+        """Renew this worker's fetch lease; False once another worker fetches the channel"""
+        if self.proxy_server is None or self.proxy_server.extend_ownership(self.channel_id):
+            return True
+        logging.warning(f"Channel {self.channel_id} is fetched by another worker now, stopping local fetch")
+        self.proxy_server.relinquish_channel(self.channel_id)
+        return False
+
     def enable_cleanup(self):
         """Enable cleanup after first client connects"""
         if not self.first_client_connected:
@@ -305,11 +506,11 @@ class StreamManager:
             # Wait for initial connection window
             start_time = time.time()
             while self.cleanup_running and (time.time() - start_time) < Config.INITIAL_CONNECTION_WINDOW:
-                if self.first_client_connected:
+                if self.first_client_connected or self.client_manager.has_activity():
                     break
                 time.sleep(1)
                 
-            if not self.first_client_connected:
+            if not (self.first_client_connected or self.client_manager.has_activity()):
                 logging.info(f"Channel {self.channel_id}: No clients connected within {Config.INITIAL_CONNECTION_WINDOW}s window")
                 self.proxy_server.stop_channel(self.channel_id)
                 return
@@ -371,7 +572,7 @@ class StreamFetcher:
         # Set up connection pooling
         adapter = requests.adapters.HTTPAdapter(
             pool_connections=2,    # Number of connection pools
-            pool_maxsize=4,       # Connections per pool
+            pool_maxsize=Config.SEGMENT_FETCH_WORKERS + 1,  # Segment workers plus the manifest poll
             max_retries=3,        # Auto-retry failed requests
             pool_block=False      # Don't block when pool is full
         )
@@ -412,12 +613,13 @@ class StreamFetcher:
             logging.error(f"Error extracting base host: {e}")
             return url
     
-    def download(self, url: str) -> tuple[bytes, str]:
+    def download(self, url: str, throttle: bool = True) -> tuple[bytes, str]:
         """
         Download content with connection reuse and redirect handling.
         
         Args:
             url: URL to download from
+            throttle: Apply min_request_interval; segment workers download without it
             
         Returns:
             tuple containing:
@@ -431,10 +633,11 @@ class StreamFetcher:
             - Host fallback on failure
             - Automatic retries
         """
-        now = time.time()
-        wait_time = self.last_request_time + self.min_request_interval - now
-        if (wait_time > 0):
-            time.sleep(wait_time)
+        if throttle:
+            now = time.time()
+            wait_time = self.last_request_time + self.min_request_interval - now
+            if (wait_time > 0):
+                time.sleep(wait_time)
             
         try:
             # Use cached redirect if available
@@ -461,138 +664,226 @@ class StreamFetcher:
                 # Use urljoin to handle path resolution
                 new_url = urljoin(self.last_host + '/', url.split('://')[-1].split('/', 1)[-1])
                 logging.debug(f"Retrying with last host: {new_url}")
-                return self.download(new_url)
+                return self.download(new_url, throttle)
             raise
 
     def fetch_loop(self):
-        """Main fetch loop for stream data"""
+        """
+        Main fetch loop for stream data.
+
+        Polls the playlist every half target duration and hands it to a
+        SegmentScheduler, which downloads every new segment concurrently and
+        stores them in order.
+        """
         retry_delay = 1
         max_retry_delay = 8
-        last_manifest_time = 0
-        downloaded_segments = set()  # Track downloaded segment URIs
+        scheduler = SegmentScheduler(self)
+        playlist_info = None
 
-        while self.manager.running:
-            try:
-                current_time = time.time()
-                
-                # Check manifest update timing
-                if last_manifest_time:
-                    time_since_last = current_time - last_manifest_time
-                    if time_since_last < (self.manager.target_duration * 0.5):
-                        time.sleep(self.manager.target_duration * 0.5 - time_since_last)
-                        continue
+        try:
+            while self.manager.running:
+                try:
+                    if not self.manager.keep_ownership():
+                        break
 
-                # Get manifest data
-                manifest_data, final_url = self.download(self.manager.current_url)
-                manifest = m3u8.loads(manifest_data.decode())
-                
-                # Update manifest info
-                if manifest.target_duration:
-                    self.manager.target_duration = float(manifest.target_duration)
-                if manifest.version:
-                    self.manager.manifest_version = manifest.version
+                    # A stream change may have been requested through another worker
+                    requested_url = self.buffer.get_state().get('url')
+                    if requested_url:
+                        self.manager.update_url(requested_url)
 
-                if not manifest.segments:
-                    continue
+                    # Get manifest data
+                    manifest_data, final_url = self.download(self.manager.current_url)
+                    manifest = m3u8.loads(manifest_data.decode())
 
-                if self.manager.initial_buffering:
-                    segments_to_fetch = []
-                    current_duration = 0.0
-                    successful_downloads = 0  # Initialize counter here
-                    
-                    # Start from the end of the manifest
-                    for segment in reversed(manifest.segments):
-                        current_duration += float(segment.duration)
-                        segments_to_fetch.append(segment)
-                        
-                        # Stop when we have enough duration or hit max segments
-                        if (current_duration >= Config.INITIAL_BUFFER_SECONDS or 
-                            len(segments_to_fetch) >= Config.MAX_INITIAL_SEGMENTS):
-                            break
-                    
-                    # Reverse back to chronological order
-                    segments_to_fetch.reverse()
-                    
-                    # Download initial segments
-                    for segment in segments_to_fetch:
-                        try:
-                            segment_url = urljoin(final_url, segment.uri)
-                            segment_data, _ = self.download(segment_url)
-                            
-                            validation = verify_segment(segment_data)
-                            if validation.get('valid', False):
-                                with self.buffer.lock:
-                                    seq = self.manager.next_sequence
-                                    self.buffer[seq] = segment_data
-                                    duration = float(segment.duration)
-                                    self.manager.segment_durations[seq] = duration
-                                    self.manager.buffered_duration += duration
-                                    self.manager.next_sequence += 1
-                                    successful_downloads += 1
-                                    logging.debug(f"Buffered initial segment {seq} (source: {segment.uri}, duration: {duration}s)")
-                        except Exception as e:
-                            logging.error(f"Initial segment download error: {e}")
-                    
-                    # Only mark buffer ready if we got some segments
-                    if successful_downloads > 0:
-                        self.manager.initial_buffering = False
-                        self.manager.buffer_ready.set()
-                        logging.info(f"Initial buffer ready with {successful_downloads} segments "
-                                   f"({self.manager.buffered_duration:.1f}s of content)")
-                    continue
+                    # Update manifest info
+                    if manifest.target_duration:
+                        self.manager.target_duration = float(manifest.target_duration)
+                    if manifest.version:
+                        self.manager.manifest_version = manifest.version
+                    if playlist_info != (self.manager.target_duration, self.manager.manifest_version):
+                        playlist_info = (self.manager.target_duration, self.manager.manifest_version)
+                        self.buffer.set_state(target_duration=playlist_info[0], manifest_version=playlist_info[1])
 
-                # Normal operation - get latest segment if we haven't already
-                latest_segment = manifest.segments[-1]
-                if (latest_segment.uri in downloaded_segments):
-                    # Wait for next manifest update
-                    time.sleep(self.manager.target_duration * 0.5)
-                    continue
+                    if manifest.segments:
+                        scheduler.schedule(manifest, final_url)
+                    retry_delay = 1
 
-                try:
-                    segment_url = urljoin(final_url, latest_segment.uri)
-                    segment_data, _ = self.download(segment_url)
-                    
-                    # Try several times if segment validation fails
-                    max_retries = 3
-                    retry_count = 0
-                    while retry_count < max_retries:
-                        verification = verify_segment(segment_data)
-                        if verification.get('valid', False):
-                            break
-                        logging.warning(f"Invalid segment, retry {retry_count + 1}/{max_retries}: {verification.get('error')}")
-                        time.sleep(0.5)  # Short delay before retry
-                        segment_data, _ = self.download(segment_url)
-                        retry_count += 1
-
-                    if verification.get('valid', False):
-                        with self.buffer.lock:
-                            seq = self.manager.next_sequence
-                            self.buffer[seq] = segment_data
-                            self.manager.segment_durations[seq] = float(latest_segment.duration)
-                            self.manager.next_sequence += 1
-                            downloaded_segments.add(latest_segment.uri)
-                            logging.debug(f"Stored segment {seq} (source: {latest_segment.uri}, "
-                                       f"duration: {latest_segment.duration}s, "
-                                       f"size: {len(segment_data)})")
-
-                        # Update timing
-                        last_manifest_time = time.time()
-                        retry_delay = 1  # Reset retry delay on success
-                    else:
-                        logging.error(f"Segment validation failed after {max_retries} retries")
+                    # Wait for the next manifest update
+                    time.sleep(self.manager.target_duration * 0.5)
 
                 except Exception as e:
-                    logging.error(f"Segment download error: {e}")
-                    continue
+                    logging.error(f"Fetch error: {e}")
+                    time.sleep(retry_delay)
+                    retry_delay = min(retry_delay * 2, max_retry_delay)
+        finally:
+            scheduler.shutdown()
+
+class SegmentScheduler:
+    """
+    Downloads the segments of a live playlist over a bounded worker pool.
+
+    Segments are tracked by media sequence number, so every segment that
+    appears between two playlist polls is fetched, not just the newest one.
+    Completed downloads are stored in the buffer strictly in media sequence
+    order; a segment that fails or left the playlist before it could be
+    scheduled is skipped and the next stored segment is marked as a
+    discontinuity.
+    """
+
+    def __init__(self, fetcher: StreamFetcher, workers: int = Config.SEGMENT_FETCH_WORKERS):
+        self.fetcher = fetcher
+        self.manager = fetcher.manager
+        self.stats = fetcher.manager.fetch_stats
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix=f"HLSSegment-{fetcher.manager.channel_id}"
+        )
+        # Reentrant: a download that is already done runs its callback in schedule()
+        self.lock = threading.RLock()
+
+        self.source_url = None            # Playlist URL the sequence numbers belong to
+        self.last_scheduled = None        # Highest media sequence queued for download
+        self.last_stored = None           # Media sequence of the last segment in the buffer
+        self.pending = {}                 # media sequence -> (segment, Future)
+        self.discontinuity = False        # Mark the next stored segment
+        self.initial_remaining = 0        # Segments of the initial window still to store
 
-                # Cleanup old segment URIs from tracking
-                if len(downloaded_segments) > 100:
-                    downloaded_segments.clear()
+    def schedule(self, manifest: m3u8.M3U8, base_url: str) -> int:
+        """Queue every segment newer than the last scheduled one and return how many were queued"""
+        first = manifest.media_sequence or 0
+        last = first + len(manifest.segments) - 1
 
+        with self.lock:
+            if self.source_url != self.manager.current_url or (
+                self.last_scheduled is not None and last < self.last_scheduled
+            ):
+                # New source or the upstream restarted its numbering
+                self._restart()
+
+            if self.last_scheduled is None:
+                start = self._initial_start(manifest.segments)
+                if self.manager.initial_buffering:
+                    self.initial_remaining = len(manifest.segments) - start
+            else:
+                start = self.last_scheduled + 1 - first
+                if start < 0:
+                    logging.warning(f"Channel {self.manager.channel_id}: {-start} segments left the playlist before they were fetched")
+                    self.stats.record_missed(-start)
+                    start = 0
+
+            queued = 0
+            for index in range(start, len(manifest.segments)):
+                segment = manifest.segments[index]
+                media_sequence = first + index
+                url = urljoin(base_url, segment.uri)
+                future = self.executor.submit(self._download, media_sequence, url)
+                self.pending[media_sequence] = (segment, future)
+                future.add_done_callback(lambda _: self._store_ready())
+                queued += 1
+
+            if queued:
+                self.last_scheduled = last
+                logging.debug(f"Channel {self.manager.channel_id}: queued {queued} segments up to media sequence {last}")
+            return queued
+
+    def _initial_start(self, segments) -> int:
+        """Index of the first segment to fetch when joining the playlist"""
+        if not self.manager.initial_buffering:
+            # After a switch or restart only the live edge is needed
+            return len(segments) - 1
+        duration = 0.0
+        start = len(segments)
+        while start > 0:
+            start -= 1
+            duration += float(segments[start].duration)
+            if (duration >= Config.INITIAL_BUFFER_SECONDS or
+                    len(segments) - start >= Config.MAX_INITIAL_SEGMENTS):
+                break
+        return start
+
+    def _restart(self):
+        """Forget the old sequence numbering; whatever is still in flight is dropped"""
+        # Cancelling runs the done callback, which walks pending, so empty it first
+        futures = [future for _, future in self.pending.values()]
+        self.pending.clear()
+        for future in futures:
+            future.cancel()
+        if self.last_stored is not None:
+            self.discontinuity = True
+        self.source_url = self.manager.current_url
+        self.last_scheduled = None
+        self.last_stored = None
+        self.manager.switching_stream = False
+
+    def _download(self, media_sequence: int, url: str) -> Optional[bytes]:
+        """Download and verify one segment, retrying a few times; None if it can't be fetched"""
+        for attempt in range(1, Config.SEGMENT_FETCH_ATTEMPTS + 1):
+            if not self.manager.running:
+                return None
+            if attempt > 1:
+                time.sleep(0.5)  # Short delay before retry
+            started = time.time()
+            try:
+                data, _ = self.fetcher.download(url, throttle=False)
             except Exception as e:
-                logging.error(f"Fetch error: {e}")
-                time.sleep(retry_delay)
-                retry_delay = min(retry_delay * 2, max_retry_delay)
+                logging.warning(f"Segment {media_sequence} download failed, attempt {attempt}/{Config.SEGMENT_FETCH_ATTEMPTS}: {e}")
+                continue
+            verification = verify_segment(data)
+            if verification.get('valid', False):
+                self.stats.record(media_sequence, time.time() - started, len(data), attempt)
+                return data
+            logging.warning(f"Invalid segment {media_sequence}, attempt {attempt}/{Config.SEGMENT_FETCH_ATTEMPTS}: {verification.get('error')}")
+
+        logging.error(f"Segment {media_sequence} skipped after {Config.SEGMENT_FETCH_ATTEMPTS} attempts")
+        self.stats.record_failure()
+        return None
+
+    def _store_ready(self):
+        """Move finished downloads into the buffer, in media sequence order"""
+        with self.lock:
+            for media_sequence in sorted(self.pending):
+                segment, future = self.pending[media_sequence]
+                if not future.done():
+                    # Later segments wait for this one
+                    break
+                del self.pending[media_sequence]
+                data = None if future.cancelled() else future.result()
+                if self.initial_remaining:
+                    self.initial_remaining -= 1
+                if data is None:
+                    continue
+
+                gap = self.last_stored is not None and media_sequence != self.last_stored + 1
+                self._store(segment, data, self.discontinuity or gap)
+                self.discontinuity = False
+                self.last_stored = media_sequence
+
+            if self.manager.initial_buffering and not self.initial_remaining and self.last_stored is not None:
+                self.manager.initial_buffering = False
+                self.manager.buffer_ready.set()
+                self.fetcher.buffer.set_state(ready=1)
+                logging.info(f"Initial buffer ready ({self.manager.buffered_duration:.1f}s of content)")
+
+    def _store(self, segment: m3u8.Segment, data: bytes, discontinuity: bool):
+        duration = float(segment.duration)
+        with self.fetcher.buffer.lock:
+            seq = self.manager.next_sequence
+            if discontinuity:
+                self.manager.source_changes.add(seq)
+            self.fetcher.buffer.add_segment(seq, data, duration, seq in self.manager.source_changes)
+            self.manager.segment_durations[seq] = duration
+            if self.manager.initial_buffering:
+                self.manager.buffered_duration += duration
+            self.manager.next_sequence += 1
+        logging.debug(f"Stored segment {seq} (source: {segment.uri}, duration: {duration}s, size: {len(data)})")
+
+    def shutdown(self):
+        with self.lock:
+            futures = [future for _, future in self.pending.values()]
+            self.pending.clear()
+            for future in futures:
+                future.cancel()
+        self.executor.shutdown(wait=False)
 
 def get_segment_sequence(segment_uri: str) -> Optional[int]:
     """
@@ -797,7 +1088,15 @@ def fetch_stream(fetcher: StreamFetcher, stop_event: threading.Event, start_sequ
             manifest_update_needed = True
 
 class ProxyServer:
-    """Manages HLS proxy server instance"""
+    """
+    Manages HLS proxy server instance.
+
+    With Redis, each channel is fetched by one worker only: the one holding
+    its owner lease, as in the TS proxy. Segments and playlist state live in
+    Redis (see StreamBuffer), so any worker serves any client. When the owner
+    goes away, the next worker that gets a playlist request for the channel
+    takes the lease and resumes fetching.
+    """
     
     def __init__(self, user_agent: Optional[str] = None):
         self.stream_managers: Dict[str, StreamManager] = {}
@@ -805,28 +1104,113 @@ class ProxyServer:
         self.client_managers: Dict[str, ClientManager] = {}
         self.fetch_threads: Dict[str, threading.Thread] = {}
         self.user_agent: str = user_agent or Config.DEFAULT_USER_AGENT
+        self.worker_id: str = f"{socket.gethostname()}:{os.getpid()}"
+
+        try:
+            self.redis_client = RedisClient.get_client()
+        except Exception as e:
+            logging.error(f"Failed to initialize Redis for HLS proxy: {e}")
+            self.redis_client = None
+        if self.redis_client is None:
+            logging.warning("HLS proxy running without Redis, channels are not shared between workers")
+
+    def get_channel_owner(self, channel_id: str) -> Optional[str]:
+        """Worker ID that fetches the channel, or None"""
+        if not self.redis_client:
+            return None
+        try:
+            owner = self.redis_client.get(RedisKeys.channel_owner(channel_id))
+            return _decode(owner) if owner else None
+        except Exception as e:
+            logging.error(f"Error getting owner of channel {channel_id}: {e}")
+            return None
+
+    def try_acquire_ownership(self, channel_id: str) -> bool:
+        """Take (or refresh) the lease to fetch the channel; False if another worker holds it"""
+        if not self.redis_client:
+            return True  # Without Redis every worker fetches for itself
+
+        try:
+            lock_key = RedisKeys.channel_owner(channel_id)
+            if self.redis_client.set(lock_key, self.worker_id, nx=True, ex=Config.OWNER_TTL):
+                logging.info(f"Worker {self.worker_id} acquired ownership of HLS channel {channel_id}")
+                return True
+            if self.get_channel_owner(channel_id) == self.worker_id:
+                self.redis_client.expire(lock_key, Config.OWNER_TTL)
+                return True
+            return False
+        except Exception as e:
+            logging.error(f"Error acquiring ownership of channel {channel_id}: {e}")
+            return False
+
+    def extend_ownership(self, channel_id: str) -> bool:
+        """
+        Renew the lease of a channel this worker fetches. Only returns False when
+        another worker holds the lease; a Redis error keeps the current owner.
+        """
+        if not self.redis_client:
+            return True
+        try:
+            if self.try_acquire_ownership(channel_id):
+                return True
+            return self.get_channel_owner(channel_id) is None
+        except Exception as e:
+            logging.error(f"Error extending ownership of channel {channel_id}: {e}")
+            return True
+
+    def release_ownership(self, channel_id: str) -> None:
+        """Drop the lease, if this worker holds it"""
+        if not self.redis_client:
+            return
+        try:
+            if self.get_channel_owner(channel_id) == self.worker_id:
+                self.redis_client.delete(RedisKeys.channel_owner(channel_id))
+                logging.info(f"Released ownership of HLS channel {channel_id}")
+        except Exception as e:
+            logging.error(f"Error releasing ownership of channel {channel_id}: {e}")
 
     def initialize_channel(self, url: str, channel_id: str) -> None:
-        """Initialize a new channel stream"""
+        """Initialize a new channel stream, or join it if another worker fetches it"""
         if channel_id in self.stream_managers:
             self.stop_channel(channel_id)
-            
-        self.stream_managers[channel_id] = StreamManager(
-            url, 
-            channel_id,
-            user_agent=self.user_agent
-        )
-        self.stream_buffers[channel_id] = StreamBuffer()
-        self.client_managers[channel_id] = ClientManager()
+
+        if not self.try_acquire_ownership(channel_id):
+            logging.info(f"Channel {channel_id} is fetched by worker {self.get_channel_owner(channel_id)}, "
+                         f"serving it from the shared buffer")
+            self._follow_channel(channel_id)
+            self.update_channel_url(channel_id, url)
+            return
+
+        buffer = StreamBuffer(channel_id, self.redis_client)
+        buffer.clear()
+        buffer.set_state(url=url, user_agent=self.user_agent)
+        self._start_channel(channel_id, url, buffer, self.user_agent)
+        logging.info(f"Initialized channel {channel_id} with URL {url}")
+
+    def _start_channel(self, channel_id: str, url: str, buffer: StreamBuffer,
+                       user_agent: Optional[str], resume_state: Optional[dict] = None) -> None:
+        """Start fetching a channel this worker owns"""
+        manager = StreamManager(url, channel_id, user_agent=user_agent or self.user_agent)
+        if resume_state:
+            # Continue the shared numbering; the first new segment follows a gap
+            manager.next_sequence = int(resume_state.get('next_sequence', 0))
+            manager.source_changes.add(manager.next_sequence)
+            manager.target_duration = float(resume_state.get('target_duration', manager.target_duration))
+            manager.manifest_version = int(resume_state.get('manifest_version', manager.manifest_version))
+            if resume_state.get('ready'):
+                manager.initial_buffering = False
+                manager.buffer_ready.set()
+                manager.first_client_connected = True
+
+        self.stream_managers[channel_id] = manager
+        self.stream_buffers[channel_id] = buffer
+        self.client_managers[channel_id] = ClientManager(channel_id, self.redis_client)
         
         # Set up cleanup references
-        self.stream_managers[channel_id].client_manager = self.client_managers[channel_id]
-        self.stream_managers[channel_id].proxy_server = self
+        manager.client_manager = self.client_managers[channel_id]
+        manager.proxy_server = self
         
-        fetcher = StreamFetcher(
-            self.stream_managers[channel_id], 
-            self.stream_buffers[channel_id]
-        )
+        fetcher = StreamFetcher(manager, buffer)
         
         self.fetch_threads[channel_id] = threading.Thread(
             target=fetcher.fetch_loop,
@@ -836,13 +1220,84 @@ class ProxyServer:
         self.fetch_threads[channel_id].start()
         
         # Start cleanup monitoring
-        self.stream_managers[channel_id].start_cleanup_thread()
-        logging.info(f"Initialized channel {channel_id} with URL {url}")
+        manager.start_cleanup_thread()
+
+    def _follow_channel(self, channel_id: str) -> StreamBuffer:
+        """Local handles for serving a channel that another worker fetches"""
+        if channel_id not in self.stream_buffers:
+            self.stream_buffers[channel_id] = StreamBuffer(channel_id, self.redis_client)
+            self.client_managers[channel_id] = ClientManager(channel_id, self.redis_client)
+        return self.stream_buffers[channel_id]
+
+    def _take_over(self, channel_id: str) -> bool:
+        """Resume fetching a shared channel whose owner went away"""
+        buffer = StreamBuffer(channel_id, self.redis_client)
+        state = buffer.get_state()
+        if not state.get('url') or not self.try_acquire_ownership(channel_id):
+            return False
+        logging.info(f"Worker {self.worker_id} took over fetching of channel {channel_id}")
+        self._cleanup_channel(channel_id)
+        self._start_channel(channel_id, state['url'], buffer, state.get('user_agent'), resume_state=state)
+        return True
+
+    def _channel_buffer(self, channel_id: str, take_over: bool = True) -> Optional[StreamBuffer]:
+        """
+        Buffer to serve a channel from, or None if no worker runs it. With
+        take_over, an orphaned channel is adopted by this worker.
+        """
+        if channel_id in self.stream_managers:
+            return self.stream_buffers[channel_id]
+        if not self.redis_client:
+            return None
+
+        try:
+            if not StreamBuffer(channel_id, self.redis_client).exists():
+                self._cleanup_channel(channel_id)
+                return None
+            if take_over and self.get_channel_owner(channel_id) is None and self._take_over(channel_id):
+                return self.stream_buffers[channel_id]
+            return self._follow_channel(channel_id)
+        except Exception as e:
+            logging.error(f"Error looking up shared channel {channel_id}: {e}")
+            return None
+
+    def has_channel(self, channel_id: str) -> bool:
+        """Whether the channel runs on this or any other worker"""
+        return self._channel_buffer(channel_id, take_over=False) is not None
+
+    def update_channel_url(self, channel_id: str, new_url: str) -> Optional[bool]:
+        """
+        Switch a channel to a new URL. The owner applies it right away; through
+        other workers it is picked up on the owner's next playlist poll.
+
+        Returns:
+            True if the URL changed, False if unchanged, None if the channel isn't running
+        """
+        buffer = self._channel_buffer(channel_id, take_over=False)
+        if buffer is None:
+            return None
+        manager = self.stream_managers.get(channel_id)
+        if manager:
+            changed = manager.update_url(new_url)
+        else:
+            changed = buffer.get_state().get('url') != new_url
+        if changed:
+            buffer.set_state(url=new_url)
+        return changed
+
+    def relinquish_channel(self, channel_id: str) -> None:
+        """Stop fetching a channel another worker took over, keeping its shared state"""
+        manager = self.stream_managers.get(channel_id)
+        if manager:
+            manager.running = False
+            manager.cleanup_running = False
+        self._cleanup_channel(channel_id)
 
     def stop_channel(self, channel_id: str) -> None:
         """Stop and cleanup a channel"""
         if channel_id in self.stream_managers:
             logging.info(f"Stopping channel {channel_id}")
+            buffer = self.stream_buffers.get(channel_id)
             try:
                 # Stop the stream manager
                 self.stream_managers[channel_id].stop()
@@ -855,7 +1310,16 @@ class ProxyServer:
             except Exception as e:
                 logging.error(f"Error stopping channel {channel_id}: {e}")
             finally:
+                try:
+                    if buffer is not None:
+                        buffer.clear()
+                    self.release_ownership(channel_id)
+                except Exception as e:
+                    logging.error(f"Error clearing shared state of channel {channel_id}: {e}")
                 self._cleanup_channel(channel_id)
+        else:
+            # Served from the shared buffer only; the owner stops the channel
+            self._cleanup_channel(channel_id)
 
     def _cleanup_channel(self, channel_id: str) -> None:
         """Remove channel resources"""
@@ -868,41 +1332,59 @@ class ProxyServer:
         for channel_id in list(self.stream_managers.keys()):
             self.stop_channel(channel_id)
 
+    def get_fetch_stats(self, channel_id: str) -> Optional[dict]:
+        """Segment download metrics of a channel, or None if it isn't running"""
+        manager = self.stream_managers.get(channel_id)
+        if manager:
+            return {**manager.fetch_stats.snapshot(), 'owner': self.worker_id}
+        if self.has_channel(channel_id):
+            # Only the owner downloads segments
+            return {'owner': self.get_channel_owner(channel_id)}
+        return None
+
     # Remove Flask-specific routing
     def _setup_routes(self) -> None:
         pass
 
+    def _wait_until_ready(self, channel_id: str, buffer: StreamBuffer) -> bool:
+        """Wait for the channel's initial buffer, filled by whichever worker owns it"""
+        manager = self.stream_managers.get(channel_id)
+        if manager:
+            return manager.buffer_ready.wait(Config.BUFFER_READY_TIMEOUT)
+        deadline = time.time() + Config.BUFFER_READY_TIMEOUT
+        while not buffer.get_state().get('ready'):
+            if time.time() > deadline:
+                return False
+            time.sleep(0.25)
+        return True
+
     # Update methods to return data instead of Flask Response objects
-    def stream_endpoint(self, channel_id: str):
-        if channel_id not in self.stream_managers:
+    def stream_endpoint(self, channel_id: str, client_ip: Optional[str] = None):
+        buffer = self._channel_buffer(channel_id)
+        if buffer is None:
             return 'Channel not found', 404
-            
-        manager = self.stream_managers[channel_id]
         
         # Wait for initial buffer
-        if not manager.buffer_ready.wait(Config.BUFFER_READY_TIMEOUT):
+        if not self._wait_until_ready(channel_id, buffer):
             logging.error(f"Timeout waiting for initial buffer for channel {channel_id}")
             return 'Initial buffer not ready', 503
         
         try:
-            if (channel_id not in self.stream_managers) or (not self.stream_managers[channel_id].running):
+            if not self.has_channel(channel_id):
                 return 'Channel not found', 404
             
-            manager = self.stream_managers[channel_id]
-            buffer = self.stream_buffers[channel_id]
-            
             # Record client activity and enable cleanup
-            client_ip = request.remote_addr
-            manager.enable_cleanup()
-            self.client_managers[channel_id].record_activity(client_ip)
+            manager = self.stream_managers.get(channel_id)
+            if manager:
+                manager.enable_cleanup()
+            self.client_managers[channel_id].record_activity(client_ip or 'unknown')
             
             # Wait for first segment with timeout
             start_time = time.time()
             while True:
-                with buffer.lock:
-                    available = sorted(buffer.keys())
-                    if available:
-                        break
+                index = buffer.segment_index()
+                if index:
+                    break
                     
                 if time.time() - start_time > Config.FIRST_SEGMENT_TIMEOUT:
                     logging.warning(f"Timeout waiting for first segment for channel {channel_id}")
@@ -910,47 +1392,54 @@ class ProxyServer:
                     
                 time.sleep(0.1)  # Short sleep to prevent CPU spinning
             
+            if manager:
+                target_duration, manifest_version = manager.target_duration, manager.manifest_version
+            else:
+                state = buffer.get_state()
+                target_duration = float(state.get('target_duration', 10.0))
+                manifest_version = int(state.get('manifest_version', 3))
+
             # Rest of manifest generation code...
-            with buffer.lock:
-                max_seq = max(available)
-                # Find the first segment after any discontinuity
-                discontinuity_start = min(available)
-                for seq in available:
-                    if seq in manager.source_changes:
-                        discontinuity_start = seq
-                        break
-                
-                # Calculate window bounds starting from discontinuity
-                if len(available) <= Config.INITIAL_SEGMENTS:
-                    min_seq = discontinuity_start
-                else:
-                    min_seq = max(
-                        discontinuity_start,
-                        max_seq - Config.WINDOW_SIZE + 1
-                    )
-                
-                # Build manifest with proper tags
-                new_manifest = ['#EXTM3U']
-                new_manifest.append(f'#EXT-X-VERSION:{manager.manifest_version}')
-                new_manifest.append(f'#EXT-X-MEDIA-SEQUENCE:{min_seq}')
-                new_manifest.append(f'#EXT-X-TARGETDURATION:{int(manager.target_duration)}')
-                
-                # Filter segments within window
-                window_segments = [s for s in available if min_seq <= s <= max_seq]
-                
-                # Add segments with discontinuity handling
-                for seq in window_segments:
-                    if seq in manager.source_changes:
-                        new_manifest.append('#EXT-X-DISCONTINUITY')
-                        logging.debug(f"Added discontinuity marker before segment {seq}")
-                    
-                    duration = manager.segment_durations.get(seq, 10.0)
-                    new_manifest.append(f'#EXTINF:{duration},')
-                    new_manifest.append(f'/stream/{channel_id}/segments/{seq}.ts')
+            available = [seq for seq, _, _ in index]
+            max_seq = max(available)
+            # Find the first segment after any discontinuity
+            discontinuity_start = min(available)
+            for seq, _, discontinuity in index:
+                if discontinuity:
+                    discontinuity_start = seq
+                    break
+            
+            # Calculate window bounds starting from discontinuity
+            if len(available) <= Config.INITIAL_SEGMENTS:
+                min_seq = discontinuity_start
+            else:
+                min_seq = max(
+                    discontinuity_start,
+                    max_seq - Config.WINDOW_SIZE + 1
+                )
+            
+            # Build manifest with proper tags
+            new_manifest = ['#EXTM3U']
+            new_manifest.append(f'#EXT-X-VERSION:{manifest_version}')
+            new_manifest.append(f'#EXT-X-MEDIA-SEQUENCE:{min_seq}')
+            new_manifest.append(f'#EXT-X-TARGETDURATION:{int(target_duration)}')
+            
+            # Filter segments within window
+            window_segments = [entry for entry in index if min_seq <= entry[0] <= max_seq]
+            
+            # Add segments with discontinuity handling
+            for seq, duration, discontinuity in window_segments:
+                if discontinuity:
+                    new_manifest.append('#EXT-X-DISCONTINUITY')
+                    logging.debug(f"Added discontinuity marker before segment {seq}")
                 
-                manifest_content = '\n'.join(new_manifest)
-                logging.debug(f"Serving manifest with segments {min_seq}-{max_seq} (window: {len(window_segments)})")
-                return manifest_content, 200  # Return content and status code
+                new_manifest.append(f'#EXTINF:{duration},')
+                # Relative to the playlist URL, .../stream/<channel_id>
+                new_manifest.append(f'../segments/{channel_id}/{seq}.ts')
+            
+            manifest_content = '\n'.join(new_manifest)
+            logging.debug(f"Serving manifest with segments {min_seq}-{max_seq} (window: {len(window_segments)})")
+            return manifest_content, 200  # Return content and status code
         except ConnectionAbortedError:
             logging.debug("Client disconnected")
             return '', 499
@@ -958,17 +1447,18 @@ class ProxyServer:
             logging.error(f"Stream endpoint error: {e}")
             return '', 500
 
-    def get_segment(self, channel_id: str, segment_name: str):
+    def get_segment(self, channel_id: str, segment_name: str, client_ip: Optional[str] = None):
         """
         Serve individual MPEG-TS segments to clients.
         
         Args:
             channel_id: Unique identifier for the channel
             segment_name: Segment filename (e.g., '123.ts')
+            client_ip: Address of the requesting client
             
         Returns:
-            Flask Response:
-                - MPEG-TS segment data with video/MP2T content type
+            tuple of segment data and status code:
+                - MPEG-TS segment data and 200
                 - 404 if segment or channel not found
                 
         Error Handling:
@@ -976,20 +1466,18 @@ class ProxyServer:
             - Logs error on unexpected exceptions
             - Returns 404 on any error
         """
-        if channel_id not in self.stream_managers:
+        buffer = self._channel_buffer(channel_id, take_over=False)
+        if buffer is None:
             return 'Channel not found', 404
             
         try:
             # Record client activity
-            client_ip = request.remote_addr
-            self.client_managers[channel_id].record_activity(client_ip)
+            self.client_managers[channel_id].record_activity(client_ip or 'unknown')
             
             segment_id = int(segment_name.split('.')[0])
-            buffer = self.stream_buffers[channel_id]
-            
-            with buffer_lock:
-                if segment_id in buffer:
-                    return buffer[segment_id], 200  # Return content and status code
+            data = buffer.get_segment(segment_id)
+            if data is not None:
+                return data, 200  # Return content and status code
                     
             logging.warning(f"Segment {segment_id} not found for channel {channel_id}")
         except Exception as e:
@@ -8,4 +8,5 @@ urlpatterns = [
     path('initialize/<str:channel_id>', views.initialize_stream, name='initialize'),
     path('segments/<path:segment_name>', views.get_segment, name='segment'),
     path('change_stream/<str:channel_id>', views.change_stream, name='change_stream'),
+    path('stats/<str:channel_id>', views.fetch_stats, name='stats'),
 ]
\ No newline at end of file
@@ -13,10 +13,10 @@ proxy_server = ProxyServer()
 @require_http_methods(["GET"])
 def stream_endpoint(request, channel_id):
     """Handle HLS manifest requests"""
-    if channel_id not in proxy_server.stream_managers:
+    if not proxy_server.has_channel(channel_id):
         return JsonResponse({'error': 'Channel not found'}, status=404)
     
-    response = proxy_server.stream_endpoint(channel_id)
+    response = proxy_server.stream_endpoint(channel_id, request.META.get('REMOTE_ADDR'))
     return StreamingHttpResponse(
         response[0],
         content_type='application/vnd.apple.mpegurl',
@@ -26,16 +26,18 @@ def stream_endpoint(request, channel_id):
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_segment(request, segment_name):
-    """Serve MPEG-TS segments"""
+    """Serve MPEG-TS segments, named <channel_id>/<sequence>.ts"""
     try:
-        segment_num = int(segment_name.split('.')[0])
-        buffer = proxy_server.stream_buffers.get(segment_num)
+        channel_id, _, name = segment_name.rpartition('/')
+        if not channel_id or not name.split('.')[0].isdigit():
+            return JsonResponse({'error': 'Invalid segment name'}, status=400)
+        data, status = proxy_server.get_segment(channel_id, name, request.META.get('REMOTE_ADDR'))
         
-        if not buffer:
+        if status != 200:
             return JsonResponse({'error': 'Segment not found'}, status=404)
             
-        return StreamingHttpResponse(
-            buffer,
+        return HttpResponse(
+            data,
             content_type='video/MP2T'
         )
     except ValueError:
@@ -44,12 +46,21 @@ def get_segment(request, segment_name):
         logger.error(f"Error serving segment: {e}")
         return JsonResponse({'error': str(e)}, status=500)
 
+@csrf_exempt
+@require_http_methods(["GET"])
+def fetch_stats(request, channel_id):
+    """Segment download metrics of a channel"""
+    stats = proxy_server.get_fetch_stats(channel_id)
+    if stats is None:
+        return JsonResponse({'error': 'Channel not found'}, status=404)
+    return JsonResponse(stats)
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def change_stream(request, channel_id):
     """Change stream URL for existing channel"""
     try:
-        if channel_id not in proxy_server.stream_managers:
+        if not proxy_server.has_channel(channel_id):
             return JsonResponse({'error': 'Channel not found'}, status=404)
             
         data = json.loads(request.body)
@@ -57,8 +68,10 @@ def change_stream(request, channel_id):
         if not new_url:
             return JsonResponse({'error': 'No URL provided'}, status=400)
             
-        manager = proxy_server.stream_managers[channel_id]
-        if manager.update_url(new_url):
+        changed = proxy_server.update_channel_url(channel_id, new_url)
+        if changed is None:
+            return JsonResponse({'error': 'Channel not found'}, status=404)
+        if changed:
             return JsonResponse({
                 'message': 'Stream URL updated',
                 'channel': channel_id,
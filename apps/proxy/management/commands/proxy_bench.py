@@ -0,0 +1,398 @@
+import json
+import logging
+import multiprocessing
+import os
+import statistics
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.proxy.ts_proxy.constants import TS_PACKET_SIZE, ChannelMetadataField, ChannelState
+from apps.proxy.ts_proxy.redis_keys import RedisKeys
+from apps.proxy.ts_proxy.server import ProxyServer
+from apps.proxy.ts_proxy.services.channel_service import ChannelService
+from apps.proxy.ts_proxy.stream_generator import StreamGenerator
+
+USER_AGENT = 'proxy_bench'
+
+PAT_PID = 0x0000
+PMT_PID = 0x1000
+VIDEO_PID = 0x0100
+AUDIO_PID = 0x0101
+SECTIONS_PER_GOP = 16  # Every PID gets a multiple of 16 packets per loop, so counters wrap cleanly
+
+
+def _crc32_mpeg(data):
+    crc = 0xFFFFFFFF
+    for byte in data:
+        crc ^= byte << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else crc << 1
+            crc &= 0xFFFFFFFF
+    return crc.to_bytes(4, 'big')
+
+
+def _packet(pid, cc, payload=b'', pusi=False, adaptation=None):
+    header = bytes([0x47, (0x40 if pusi else 0) | (pid >> 8), pid & 0xFF])
+    if adaptation is None:
+        return header + bytes([0x10 | cc]) + payload.ljust(TS_PACKET_SIZE - 4, b'\xff')
+    field = bytes([len(adaptation)]) + adaptation
+    return header + bytes([0x30 | cc]) + field + payload.ljust(TS_PACKET_SIZE - 4 - len(field), b'\xff')
+
+
+def _psi_packet(pid, cc, table_id, body):
+    section = bytes([table_id, 0xB0 | ((len(body) + 4) >> 8), (len(body) + 4) & 0xFF]) + body
+    return _packet(pid, cc, b'\x00' + section + _crc32_mpeg(section), pusi=True)
+
+
+def _pcr_field(pcr, flags):
+    base, extension = divmod(pcr, 300)
+    return bytes([
+        flags | 0x10,
+        (base >> 25) & 0xFF, (base >> 17) & 0xFF, (base >> 9) & 0xFF, (base >> 1) & 0xFF,
+        ((base & 0x1) << 7) | 0x7E | (extension >> 8), extension & 0xFF,
+    ])
+
+
+def synthetic_gop(bitrate, gop_seconds=1.0):
+    """
+    One GOP of valid H.264-signalled MPEG-TS at the given bitrate: PAT/PMT,
+    an IDR PES with PCR, non-IDR PES and audio packets. It loops seamlessly;
+    the PCR jump at the loop point is flagged as a discontinuity.
+    """
+    total = max(SECTIONS_PER_GOP * 8, int(bitrate * gop_seconds / 8 / TS_PACKET_SIZE))
+    per_section = total // SECTIONS_PER_GOP
+    audio = max(1, (per_section - 3) // 6)
+    video = per_section - 3 - audio
+
+    pat = b'\x00\x01\xc1\x00\x00' + bytes([0x00, 0x01, 0xE0 | (PMT_PID >> 8), PMT_PID & 0xFF])
+    pmt = (
+        b'\x00\x01\xc1\x00\x00' + bytes([0xE0 | (VIDEO_PID >> 8), VIDEO_PID & 0xFF, 0xF0, 0x00]) +
+        bytes([0x1B, 0xE0 | (VIDEO_PID >> 8), VIDEO_PID & 0xFF, 0xF0, 0x00]) +
+        bytes([0x0F, 0xE0 | (AUDIO_PID >> 8), AUDIO_PID & 0xFF, 0xF0, 0x00])
+    )
+    pes_header = b'\x00\x00\x01\xe0\x00\x00\x80\x80\x05\x21\x00\x01\x00\x01'
+    ticks_per_packet = TS_PACKET_SIZE * 8 * 27000000 // bitrate
+
+    cc = {PAT_PID: 0, PMT_PID: 0, VIDEO_PID: 0, AUDIO_PID: 0}
+    packets = []
+
+    def add(pid, **kwargs):
+        packets.append(_packet(pid, cc[pid], **kwargs))
+        cc[pid] = (cc[pid] + 1) % 16
+
+    for section in range(SECTIONS_PER_GOP):
+        for pid, table_id, body in ((PAT_PID, 0x00, pat), (PMT_PID, 0x02, pmt)):
+            packets.append(_psi_packet(pid, cc[pid], table_id, body))
+            cc[pid] = (cc[pid] + 1) % 16
+
+        # Random access + discontinuity on the IDR that starts the loop
+        flags = 0xC0 if section == 0 else 0x00
+        nal = 0x65 if section == 0 else 0x41
+        add(VIDEO_PID, payload=pes_header + b'\x00\x00\x00\x01\x09\xf0\x00\x00\x00\x01' + bytes([nal]),
+            pusi=True, adaptation=_pcr_field(len(packets) * ticks_per_packet, flags))
+        for i in range(video + audio):
+            if i % 6 == 5 and audio:
+                add(AUDIO_PID, payload=b'\x00' * (TS_PACKET_SIZE - 4))
+            else:
+                add(VIDEO_PID, payload=b'\x00' * (TS_PACKET_SIZE - 4))
+
+    # Pad each PID back to a multiple of 16 packets
+    while cc[VIDEO_PID]:
+        add(VIDEO_PID, payload=b'\x00' * (TS_PACKET_SIZE - 4))
+    while cc[AUDIO_PID]:
+        add(AUDIO_PID, payload=b'\x00' * (TS_PACKET_SIZE - 4))
+    return b''.join(packets)
+
+
+def run_origin(source, bitrate, stall_every, stall_seconds, disconnect_every, port_queue, counters):
+    """Fake TS origin, run in its own process so its CPU time isn't billed to the proxy"""
+
+    class OriginHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'video/mp2t')
+            self.end_headers()
+            with counters.get_lock():
+                counters[0] += 1
+
+            # ~20ms of stream per write, paced against the wall clock
+            block = max(TS_PACKET_SIZE, (bitrate // 8 // 50) // TS_PACKET_SIZE * TS_PACKET_SIZE)
+            started = time.monotonic()
+            paused = 0.0
+            next_stall = stall_every
+            position = 0
+            sent = 0
+            try:
+                while True:
+                    elapsed = time.monotonic() - started
+                    if disconnect_every and elapsed >= disconnect_every:
+                        with counters.get_lock():
+                            counters[1] += 1
+                        return
+                    if stall_every and elapsed - paused >= next_stall:
+                        with counters.get_lock():
+                            counters[2] += 1
+                        time.sleep(stall_seconds)
+                        paused += stall_seconds
+                        next_stall += stall_every
+                        continue
+
+                    ahead = sent * 8 / bitrate - (elapsed - paused)
+                    if ahead > 0:
+                        time.sleep(ahead)
+                    data = source[position:position + block]
+                    if len(data) < block:
+                        data += source[:block - len(data)]
+                    position = (position + block) % len(source)
+                    self.wfile.write(data)
+                    sent += len(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), OriginHandler)
+    server.daemon_threads = True
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+class ClientStats:
+    def __init__(self, channel_id, client_id):
+        self.channel_id = channel_id
+        self.client_id = client_id
+        self.generator = None
+        self.started = None
+        self.first_data = None
+        self.bytes = 0
+        self.lag_samples = []
+
+
+def _summary(values, scale=1.0):
+    if not values:
+        return None
+    values = sorted(v * scale for v in values)
+    return {
+        'min': round(values[0], 3),
+        'median': round(statistics.median(values), 3),
+        'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+        'max': round(values[-1], 3),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the TS proxy in this process: start a local fake TS origin, initialize N "
+        "channels through ChannelService.initialize_channel and attach M synthetic clients to "
+        "each. Reports throughput, per-client lag, time-to-first-byte, Redis ops/sec and CPU per "
+        "channel as JSON. Needs Redis; channels are synthetic and not stored in the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--channels', type=int, default=4, help='Number of channels to start')
+        parser.add_argument('--clients', type=int, default=2, help='Clients attached to each channel')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds to stream once clients are attached')
+        parser.add_argument('--bitrate', type=float, default=5.0, help='Origin bitrate per channel in Mbit/s')
+        parser.add_argument('--source', help='MPEG-TS file for the origin to loop (default: synthetic H.264-signalled TS)')
+        parser.add_argument('--stall-every', type=float, default=0, help='Pause each origin connection every N seconds (0 = never)')
+        parser.add_argument('--stall-seconds', type=float, default=2.0, help='Length of each origin stall')
+        parser.add_argument('--disconnect-every', type=float, default=0, help='Drop each origin connection after N seconds (0 = never)')
+        parser.add_argument('--startup-timeout', type=float, default=30.0, help='Seconds to wait for channels to become ready')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        bitrate = int(options['bitrate'] * 1000000)
+        if bitrate <= 0 or options['channels'] < 1 or options['clients'] < 0:
+            raise CommandError("--bitrate and --channels must be positive")
+
+        if options['source']:
+            with open(options['source'], 'rb') as f:
+                source = f.read()
+            source = source[:len(source) - len(source) % TS_PACKET_SIZE]
+            if not source:
+                raise CommandError(f"{options['source']} holds no complete TS packet")
+        else:
+            source = synthetic_gop(bitrate)
+
+        if options['verbosity'] < 2:
+            # Per-chunk proxy logging would dominate the CPU being measured
+            logging.getLogger('ts_proxy').setLevel(logging.CRITICAL)
+
+        proxy_server = ProxyServer.get_instance()
+        if not proxy_server.redis_client:
+            raise CommandError("proxy_bench needs Redis")
+
+        counters = multiprocessing.Array('i', 3)  # connections, disconnects, stalls
+        port_queue = multiprocessing.Queue()
+        origin = multiprocessing.Process(
+            target=run_origin,
+            args=(source, bitrate, options['stall_every'], options['stall_seconds'],
+                  options['disconnect_every'], port_queue, counters),
+            daemon=True,
+        )
+        origin.start()
+        channel_ids = []
+        try:
+            base_url = f"http://127.0.0.1:{port_queue.get(timeout=10)}"
+            channel_ids = [str(uuid.uuid4()) for _ in range(options['channels'])]
+            report = self._run(proxy_server, channel_ids, base_url, bitrate, options)
+            report['origin'] = {
+                'connections': counters[0],
+                'disconnects': counters[1],
+                'stalls': counters[2],
+            }
+        finally:
+            for channel_id in channel_ids:
+                try:
+                    ChannelService.stop_channel(channel_id)
+                except Exception as e:
+                    self.stderr.write(f"Error stopping channel {channel_id}: {e}")
+            origin.terminate()
+            origin.join(5)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def _run(self, proxy_server, channel_ids, base_url, bitrate, options):
+        redis_client = proxy_server.redis_client
+
+        started = {}
+        for n, channel_id in enumerate(channel_ids):
+            if ChannelService.initialize_channel(channel_id, f"{base_url}/channel/{n}.ts", USER_AGENT):
+                started[channel_id] = time.time()
+        ready_after = self._wait_until_ready(redis_client, started, options['startup_timeout'])
+
+        clients = []
+        for channel_id in ready_after:
+            for _ in range(options['clients']):
+                clients.append(ClientStats(channel_id, f"bench_{uuid.uuid4().hex[:12]}"))
+
+        buffers = {channel_id: proxy_server.stream_buffers.get(channel_id) for channel_id in ready_after}
+        start_index = {channel_id: buffer.index for channel_id, buffer in buffers.items() if buffer}
+
+        redis_commands = self._redis_commands(redis_client)
+        cpu_started = time.process_time()
+        window_started = time.time()
+        deadline = window_started + options['duration']
+        threads = [
+            threading.Thread(target=self._client, args=(proxy_server, stats, deadline), daemon=True)
+            for stats in clients
+        ]
+        for thread in threads:
+            thread.start()
+
+        # Sample how far each client trails the live edge
+        while time.time() < deadline:
+            time.sleep(0.5)
+            for stats in clients:
+                generator = stats.generator
+                buffer = getattr(generator, 'buffer', None)
+                if buffer is not None:
+                    stats.lag_samples.append(max(0, buffer.index - generator.local_index))
+
+        elapsed = time.time() - window_started
+        cpu = time.process_time() - cpu_started
+        redis_commands_after = self._redis_commands(redis_client)
+        for thread in threads:
+            thread.join(5)
+
+        chunk_size = next((b.target_chunk_size for b in buffers.values() if b), 0)
+        chunk_seconds = chunk_size * 8 / bitrate
+        ingest_bytes = sum(
+            (buffers[channel_id].index - index) * chunk_size for channel_id, index in start_index.items()
+        )
+        egress_bytes = sum(stats.bytes for stats in clients)
+        redis_ops = None
+        if redis_commands is not None and redis_commands_after is not None:
+            redis_ops = round((redis_commands_after - redis_commands) / elapsed, 1)
+
+        return {
+            'config': {
+                'channels': len(channel_ids),
+                'clients_per_channel': options['clients'],
+                'duration_s': options['duration'],
+                'bitrate_mbps': bitrate / 1000000,
+                'source': options['source'] or 'synthetic',
+                'stall_every_s': options['stall_every'],
+                'stall_seconds': options['stall_seconds'],
+                'disconnect_every_s': options['disconnect_every'],
+                'chunk_size': chunk_size,
+                'pid': os.getpid(),
+            },
+            'channels': {
+                'started': len(started),
+                'ready': len(ready_after),
+                'failed': len(channel_ids) - len(ready_after),
+                'ready_ms': _summary(list(ready_after.values()), 1000),
+            },
+            'clients': {
+                'attached': len(clients),
+                'receiving': sum(1 for stats in clients if stats.first_data is not None),
+                'ttfb_ms': _summary([s.first_data for s in clients if s.first_data is not None], 1000),
+                # Worst lag behind the live edge seen by each client
+                'lag_chunks': _summary([max(s.lag_samples) for s in clients if s.lag_samples]),
+                'lag_s': _summary([max(s.lag_samples) for s in clients if s.lag_samples], chunk_seconds),
+                'mbps': _summary([s.bytes * 8 / elapsed / 1000000 for s in clients]),
+            },
+            'throughput': {
+                'window_s': round(elapsed, 3),
+                'ingest_mbps': round(ingest_bytes * 8 / elapsed / 1000000, 3),
+                'egress_mbps': round(egress_bytes * 8 / elapsed / 1000000, 3),
+            },
+            'redis_ops_per_sec': redis_ops,
+            'cpu': {
+                # Clients run in this process too, so this is an upper bound for the proxy itself
+                'process_percent': round(cpu / elapsed * 100, 1),
+                'percent_per_channel': round(cpu / elapsed * 100 / max(1, len(ready_after)), 2),
+            },
+        }
+
+    def _wait_until_ready(self, redis_client, started, timeout):
+        """Milliseconds-from-init of every channel that reached a streaming state"""
+        ready = {}
+        deadline = time.time() + timeout
+        while len(ready) < len(started) and time.time() < deadline:
+            for channel_id, init_time in started.items():
+                if channel_id in ready:
+                    continue
+                state = redis_client.hget(RedisKeys.channel_metadata(channel_id), ChannelMetadataField.STATE)
+                if state and state.decode('utf-8') in (ChannelState.WAITING_FOR_CLIENTS, ChannelState.ACTIVE):
+                    ready[channel_id] = time.time() - init_time
+            time.sleep(0.1)
+        for channel_id in started:
+            if channel_id not in ready:
+                self.stderr.write(f"Channel {channel_id} did not become ready within {timeout}s")
+        return ready
+
+    def _client(self, proxy_server, stats, deadline):
+        """Consume a channel like stream_ts does, until the deadline"""
+        stats.started = time.time()
+        proxy_server.client_managers[stats.channel_id].add_client(stats.client_id, '127.0.0.1', USER_AGENT)
+        stats.generator = StreamGenerator(stats.channel_id, stats.client_id, '127.0.0.1', USER_AGENT)
+        stream = stats.generator.generate()
+        try:
+            for data in stream:
+                # Single packets are keepalives, not stream data
+                if stats.first_data is None and len(data) > TS_PACKET_SIZE:
+                    stats.first_data = time.time() - stats.started
+                stats.bytes += len(data)
+                if time.time() >= deadline:
+                    break
+        finally:
+            stream.close()
+
+    def _redis_commands(self, redis_client):
+        try:
+            return int(redis_client.info('stats')['total_commands_processed'])
+        except Exception:
+            return None
@@ -0,0 +1,81 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.proxy.config import TSConfig
+from apps.proxy.ts_proxy.chunk_accumulator import ChunkAccumulator
+from apps.proxy.ts_proxy.constants import TS_PACKET_SIZE
+
+
+class LegacyAlignment:
+    """The bytearray concatenate-and-slice assembly StreamBuffer.add_chunk used before ChunkAccumulator"""
+
+    def __init__(self, chunk_size):
+        self.chunk_size = chunk_size
+        self._partial_packet = bytearray()
+        self._write_buffer = bytearray()
+
+    def add(self, chunk):
+        combined_data = bytearray(self._partial_packet) + bytearray(chunk)
+        complete_packets_size = (len(combined_data) // TS_PACKET_SIZE) * TS_PACKET_SIZE
+        if complete_packets_size == 0:
+            self._partial_packet = combined_data
+            return []
+
+        self._partial_packet = combined_data[complete_packets_size:]
+        self._write_buffer.extend(combined_data[:complete_packets_size])
+
+        chunks = []
+        while len(self._write_buffer) >= self.chunk_size:
+            chunk_data = self._write_buffer[:self.chunk_size]
+            self._write_buffer = self._write_buffer[self.chunk_size:]
+            chunks.append(bytes(chunk_data))
+        return chunks
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure single-core throughput of TS packet alignment and chunk assembly in "
+        "StreamBuffer.add_chunk, before (bytearray copies) and after (ChunkAccumulator). "
+        "Redis is not involved."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--megabytes', type=int, default=512, help='Amount of synthetic stream data to push through')
+        parser.add_argument('--read-size', type=int, default=8192, help='Size of each simulated upstream read in bytes')
+        parser.add_argument('--chunk-size', type=int, default=TSConfig.BUFFER_CHUNK_SIZE, help='Buffer chunk size in bytes')
+
+    def handle(self, *args, **options):
+        read_size = max(1, options['read_size'])
+        chunk_size = options['chunk_size']
+        reads = max(1, options['megabytes'] * 1024 * 1024 // read_size)
+
+        # Upstream reads are fresh bytes objects; reuse a pool so generating them isn't measured
+        pool = [os.urandom(read_size) for _ in range(64)]
+
+        self.stdout.write(
+            f"{reads * read_size / (1024 * 1024):.0f} MB in {read_size} byte reads, "
+            f"{chunk_size} byte chunks"
+        )
+
+        legacy = LegacyAlignment(chunk_size)
+        before = self._run(legacy.add, pool, reads, read_size)
+
+        accumulator = ChunkAccumulator(chunk_size)
+
+        def add(data):
+            accumulator.append(data)
+            return accumulator.pop_chunks()
+
+        after = self._run(add, pool, reads, read_size)
+
+        self.stdout.write(f"  before: {before / (1024 * 1024):10.1f} MB/s")
+        self.stdout.write(f"  after:  {after / (1024 * 1024):10.1f} MB/s  ({after / before:.1f}x)")
+
+    def _run(self, add, pool, reads, read_size):
+        started = time.process_time()
+        for i in range(reads):
+            add(pool[i % len(pool)])
+        elapsed = max(time.process_time() - started, 1e-9)
+        return reads * read_size / elapsed
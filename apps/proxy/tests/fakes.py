@@ -0,0 +1,116 @@
+"""In-memory stand-ins for the Redis client, shared by the proxy tests."""
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+        return queue
+
+    def execute(self):
+        self.redis.pipelines += 1
+        self.redis.chunk_reads += sum(1 for name, _, _ in self.commands if name == "get")
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+class FakeRedis:
+    """Just enough of the Redis client for the TS proxy, counting chunk reads and pipelines."""
+
+    def __init__(self):
+        self.data = {}
+        self.chunk_reads = 0
+        self.pipelines = 0
+        self.published = []
+        self.scripts_run = 0
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+        return int(self.data[key])
+
+    def decr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) - 1).encode()
+        return int(self.data[key])
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        values = self.data.setdefault(key, {})
+        if field is not None:
+            values[field] = value
+        values.update(mapping or {})
+
+    def hincrby(self, key, field, amount=1):
+        values = self.data.setdefault(key, {})
+        values[field] = int(values.get(field, 0)) + amount
+        return values[field]
+
+    def hdel(self, key, *fields):
+        values = self.data.get(key, {})
+        return sum(1 for field in fields if values.pop(field, None) is not None)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def expire(self, key, ttl):
+        return int(key in self.data)
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def hkeys(self, key):
+        return list(self.data.get(key, {}))
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    def zremrangebyscore(self, key, low, high):
+        values = self.data.get(key, {})
+        for member in [m for m, score in values.items() if low <= score <= high]:
+            del values[member]
+
+    def zrangebyscore(self, key, low, high, withscores=False):
+        low = float(low)
+        high = float(high)
+        entries = sorted(
+            (score, member) for member, score in self.data.get(key, {}).items() if low <= score <= high
+        )
+        return [(member, score) if withscores else member for score, member in entries]
+
+    def register_script(self, script):
+        # Mirrors StreamBuffer's STORE_CHUNK_SCRIPT
+        def store_chunk(keys, args):
+            self.scripts_run += 1
+            index = self.incr(keys[0])
+            self.setex(f"{args[0]}{index}", args[1], args[2])
+            self.set(keys[1], args[3], ex=args[4])
+            if args[5] != '':
+                self.zadd(keys[2], {f"{index}:{args[5]}".encode(): float(args[3])})
+                self.zremrangebyscore(keys[2], float("-inf"), float(args[3]) - args[1])
+            return index
+        return store_chunk
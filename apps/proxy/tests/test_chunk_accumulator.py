@@ -0,0 +1,51 @@
+import os
+
+from django.test import SimpleTestCase
+
+from apps.proxy.ts_proxy.chunk_accumulator import ChunkAccumulator
+from apps.proxy.ts_proxy.constants import TS_PACKET_SIZE
+
+
+class ChunkAccumulatorTests(SimpleTestCase):
+    def test_chunks_match_the_concatenated_input(self):
+        accumulator = ChunkAccumulator(TS_PACKET_SIZE * 7)
+        stream = os.urandom(TS_PACKET_SIZE * 50 + 100)
+
+        emitted = []
+        offset = 0
+        for size in [1, 187, 188, 189, 8192, 3000, 5, 100000]:
+            accumulator.append(stream[offset:offset + size])
+            offset += size
+            emitted.extend(accumulator.pop_chunks())
+
+        self.assertTrue(all(len(chunk) == TS_PACKET_SIZE * 7 for chunk in emitted))
+        self.assertTrue(all(isinstance(chunk, bytes) for chunk in emitted))
+        tail = accumulator.pop_aligned()
+        self.assertEqual(b"".join(emitted) + tail, stream[:len(stream) - 100])
+        self.assertEqual(len(accumulator), 100)
+
+    def test_chunk_size_is_rounded_to_whole_packets(self):
+        self.assertEqual(ChunkAccumulator(1000).chunk_size, TS_PACKET_SIZE * 5)
+        self.assertEqual(ChunkAccumulator(10).chunk_size, TS_PACKET_SIZE)
+
+    def test_whole_read_is_emitted_without_copying(self):
+        accumulator = ChunkAccumulator(TS_PACKET_SIZE * 4)
+        read = os.urandom(TS_PACKET_SIZE * 4)
+        accumulator.append(read)
+        self.assertIs(accumulator.pop_chunks()[0], read)
+
+    def test_mutable_buffers_are_not_aliased(self):
+        accumulator = ChunkAccumulator(TS_PACKET_SIZE)
+        buffer = bytearray(b"\x47" * TS_PACKET_SIZE)
+        accumulator.append(buffer)
+        buffer[:] = b"\x00" * TS_PACKET_SIZE
+        self.assertEqual(accumulator.pop_chunks(), [b"\x47" * TS_PACKET_SIZE])
+
+    def test_drop_partial_keeps_whole_packets(self):
+        accumulator = ChunkAccumulator(TS_PACKET_SIZE * 4)
+        stream = os.urandom(TS_PACKET_SIZE * 2 + 50)
+        accumulator.append(stream[:TS_PACKET_SIZE + 20])
+        accumulator.append(stream[TS_PACKET_SIZE + 20:])
+        accumulator.drop_partial()
+        self.assertEqual(len(accumulator), TS_PACKET_SIZE * 2)
+        self.assertEqual(accumulator.pop_aligned(), stream[:TS_PACKET_SIZE * 2])
@@ -0,0 +1,54 @@
+import time
+
+import gevent
+from django.test import SimpleTestCase
+
+from apps.proxy.ts_proxy.constants import TS_PACKET_SIZE
+from apps.proxy.ts_proxy.redis_keys import RedisKeys
+from apps.proxy.ts_proxy.stream_buffer import StreamBuffer
+
+from .fakes import FakeRedis
+
+
+class ChunkNotificationTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.owner = StreamBuffer("chan", redis_client=self.redis)
+        self.owner.target_chunk_size = TS_PACKET_SIZE * 10
+
+    def _produce_later(self, delay):
+        def produce():
+            gevent.sleep(delay)
+            self.owner.add_chunk(b"\x47" * self.owner.target_chunk_size)
+        return gevent.spawn(produce)
+
+    def test_waiter_wakes_when_owner_writes(self):
+        producer = self._produce_later(0.05)
+        started = time.time()
+        self.assertTrue(self.owner.wait_for_chunks(0, timeout=5))
+        self.assertLess(time.time() - started, 1)
+        producer.join()
+
+    def test_owner_announces_new_index_to_other_workers(self):
+        self.owner.add_chunk(b"\x47" * TS_PACKET_SIZE * 25)
+        self.assertEqual(self.redis.published, [(RedisKeys.chunks_channel("chan"), "2")])
+
+    def test_partial_chunk_does_not_notify(self):
+        self.owner.add_chunk(b"\x47" * TS_PACKET_SIZE)
+        self.assertEqual(self.redis.published, [])
+        self.assertFalse(self.owner.wait_for_chunks(0, timeout=0.01))
+
+    def test_other_worker_woken_by_notification(self):
+        reader = StreamBuffer("chan", redis_client=self.redis)
+
+        def announce():
+            gevent.sleep(0.05)
+            reader.notify_new_index(3)
+
+        gevent.spawn(announce)
+        self.assertTrue(reader.wait_for_chunks(0, timeout=5))
+        self.assertEqual(reader.index, 3)
+
+        # Stale or repeated announcements don't wake anyone
+        reader.notify_new_index(2)
+        self.assertFalse(reader.wait_for_chunks(3, timeout=0.01))
@@ -0,0 +1,72 @@
+from django.test import SimpleTestCase
+
+from apps.proxy.ts_proxy.chunk_ring import ChunkRing
+from apps.proxy.ts_proxy.constants import TS_PACKET_SIZE
+from apps.proxy.ts_proxy.redis_keys import RedisKeys
+from apps.proxy.ts_proxy.stream_buffer import StreamBuffer
+
+from .fakes import FakeRedis
+
+
+class ChunkRingTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.owner = StreamBuffer("chan", redis_client=self.redis)
+        self.owner.target_chunk_size = TS_PACKET_SIZE * 10
+
+    def _produce(self, count):
+        for i in range(count):
+            self.owner.add_chunk(bytes([i % 256]) * self.owner.target_chunk_size)
+
+    def test_owner_serves_local_clients_without_redis_reads(self):
+        self._produce(5)
+        for _ in range(30):
+            chunks, next_index = self.owner.get_optimized_client_data(1)
+            self.assertEqual(len(chunks), 4)
+            self.assertEqual(next_index, 5)
+        self.assertEqual(self.redis.chunk_reads, 0)
+        self.assertEqual(self.owner.chunk_cache.stats()["misses"], 0)
+
+    def test_other_worker_reads_each_chunk_from_redis_once(self):
+        self._produce(5)
+        reader = StreamBuffer("chan", redis_client=self.redis)
+
+        results = [reader.get_chunks_exact(0, 5) for _ in range(30)]
+        self.assertEqual(self.redis.chunk_reads, 5)
+        self.assertTrue(all(chunks == results[0] for chunks in results))
+        # Every client gets the same bytes objects, not its own copy
+        self.assertIs(results[0][2], results[-1][2])
+
+        stats = reader.chunk_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (29 * 5, 5))
+
+    def test_only_missing_chunks_are_fetched(self):
+        self._produce(6)
+        reader = StreamBuffer("chan", redis_client=self.redis)
+        reader.get_chunks_exact(0, 3)
+        reader.get_chunks_exact(0, 6)
+        self.assertEqual(self.redis.chunk_reads, 6)
+
+    def test_expired_chunks_are_skipped_like_redis(self):
+        self._produce(4)
+        del self.redis.data[RedisKeys.buffer_chunk("chan", 2)]
+        reader = StreamBuffer("chan", redis_client=self.redis)
+        self.assertEqual(len(reader.get_chunks_exact(0, 4)), 3)
+
+    def test_ring_is_bounded_by_bytes(self):
+        ring = ChunkRing(max_bytes=250)
+        for idx in range(1, 6):
+            ring.put(idx, b"x" * 100)
+        self.assertEqual(ring.peek_range(1, 6), [None, None, None, b"x" * 100, b"x" * 100])
+        self.assertEqual(ring.stats()["bytes"], 200)
+
+    def test_stale_indexes_dropped_after_buffer_reset(self):
+        self._produce(5)
+        reader = StreamBuffer("chan", redis_client=self.redis)
+        reader.get_chunks_exact(0, 5)
+
+        # Channel restarted: buffer index starts over with new data
+        self.redis.data.clear()
+        self.redis.setex(RedisKeys.buffer_chunk("chan", 1), 60, b"new")
+        self.redis.data[RedisKeys.buffer_index("chan")] = b"1"
+        self.assertEqual(reader.get_chunks_exact(0, 1), [b"new"])
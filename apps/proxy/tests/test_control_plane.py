@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.proxy.ts_proxy import control_plane
+from apps.proxy.ts_proxy.control_plane import ControlPlane
+from apps.proxy.ts_proxy.redis_keys import RedisKeys
+
+from .fakes import FakeRedis
+
+
+class ControlPlaneTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.server = SimpleNamespace(
+            redis_client=self.redis,
+            client_managers={"chan": SimpleNamespace(clients={"a", "b"})},
+        )
+        self.now = 1000.0
+        patcher = mock.patch.object(control_plane.time, "time", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.control = ControlPlane(self.server)
+
+    def test_clients_share_one_refresh_per_interval(self):
+        for _ in range(50):
+            self.assertIsNone(self.control.stop_reason("chan", "a"))
+            self.assertIsNone(self.control.stop_reason("chan", "b"))
+        self.assertEqual(self.redis.pipelines, 1)
+
+        self.redis.setex(RedisKeys.client_stop("chan", "b"), 30, "true")
+        self.now += self.control.refresh_interval
+        self.assertIsNone(self.control.stop_reason("chan", "a"))
+        self.assertEqual(self.control.stop_reason("chan", "b"), "client_stop")
+        self.assertEqual(self.redis.pipelines, 2)
+
+    def test_state_and_stop_flag_are_detected(self):
+        self.redis.hset(RedisKeys.channel_metadata("chan"), "state", b"error")
+        self.assertEqual(self.control.stop_reason("chan", "a"), "channel_state:error")
+
+        self.redis.setex(RedisKeys.channel_stopping("chan"), 60, "true")
+        self.now += self.control.refresh_interval
+        self.assertEqual(self.control.stop_reason("chan", "a"), "channel_stopping")
+
+    def test_events_take_effect_before_next_refresh(self):
+        self.assertIsNone(self.control.stop_reason("chan", "a"))
+        self.control.mark_client_stopped("chan", "a")
+        self.assertEqual(self.control.stop_reason("chan", "a"), "client_stop")
+        self.control.mark_channel_stopping("chan")
+        self.assertEqual(self.control.stop_reason("chan", "b"), "channel_stopping")
+        self.assertEqual(self.redis.pipelines, 1)
+
+        # A restarted channel starts from a clean slate
+        self.control.forget_channel("chan")
+        self.assertIsNone(self.control.stop_reason("chan", "b"))
+
+    def test_client_stats_are_flushed_in_one_batch(self):
+        for chunk in range(1, 11):
+            for client_id in ("a", "b", "gone"):
+                self.control.record_client_stats("chan", client_id, {"chunks_sent": str(chunk)})
+                self.control.flush_client_stats()
+        self.assertEqual(self.redis.pipelines, 0)
+
+        self.now += self.control.stats_flush_interval
+        self.assertEqual(self.control.flush_client_stats(), 2)
+        self.assertEqual(self.redis.pipelines, 1)
+        self.assertEqual(self.redis.data[RedisKeys.client_metadata("chan", "a")], {"chunks_sent": "10"})
+        # Disconnected clients aren't written back
+        self.assertNotIn(RedisKeys.client_metadata("chan", "gone"), self.redis.data)
@@ -0,0 +1,146 @@
+import threading
+
+import m3u8
+from django.test import SimpleTestCase
+
+from apps.proxy.hls_proxy.server import (
+    SegmentScheduler,
+    StreamBuffer,
+    StreamFetcher,
+    StreamManager,
+)
+
+SEGMENT = b"\x47" + b"\x00" * 187
+
+
+def playlist(first, count, duration=2.0):
+    lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:2", f"#EXT-X-MEDIA-SEQUENCE:{first}"]
+    for sequence in range(first, first + count):
+        lines += [f"#EXTINF:{duration},", f"seg{sequence}.ts"]
+    return m3u8.loads("\n".join(lines))
+
+
+class SegmentSchedulerTests(SimpleTestCase):
+    def setUp(self):
+        self.manager = StreamManager("http://origin/live.m3u8", "chan")
+        self.buffer = StreamBuffer()
+        self.fetcher = StreamFetcher(self.manager, self.buffer)
+        # Segment name -> Event the download waits for; unknown segments fail
+        self.gates = {}
+        self.fetcher.download = self._download
+        self.scheduler = SegmentScheduler(self.fetcher)
+        self.addCleanup(self.scheduler.shutdown)
+
+    def _download(self, url, throttle=True):
+        name = url.rsplit("/", 1)[-1]
+        gate = self.gates.get(name)
+        if gate is None:
+            raise OSError(f"404 {name}")
+        gate.wait(5)
+        return SEGMENT * (int(name[3:-3]) + 1), url
+
+    def _open(self, *sequences):
+        for sequence in sequences:
+            self.gates.setdefault(f"seg{sequence}.ts", threading.Event()).set()
+
+    def _stored(self):
+        with self.buffer.lock:
+            return [len(self.buffer[seq]) // len(SEGMENT) - 1 for seq in sorted(self.buffer.keys())]
+
+    def _wait_stored(self, count):
+        for _ in range(500):
+            if len(self.buffer.keys()) >= count and not self.scheduler.pending:
+                return
+            threading.Event().wait(0.01)
+        self.fail(f"only {len(self.buffer.keys())} segments stored")
+
+    def test_initial_window_then_every_new_segment(self):
+        self._open(*range(10, 30))
+        self.manager.initial_buffering = True
+        # 25s initial buffer of 2s segments: the last 10 (MAX_INITIAL_SEGMENTS) of 20
+        self.assertEqual(self.scheduler.schedule(playlist(0, 20), "http://origin/live.m3u8"), 10)
+        self._wait_stored(10)
+        self.assertTrue(self.manager.buffer_ready.is_set())
+
+        # Two segments appeared between polls; both are fetched
+        self.assertEqual(self.scheduler.schedule(playlist(2, 20), "http://origin/live.m3u8"), 2)
+        self._wait_stored(12)
+        self.assertEqual(self._stored(), list(range(10, 22)))
+        self.assertEqual(self.manager.source_changes, set())
+
+    def test_segments_are_stored_in_sequence_order(self):
+        self.manager.initial_buffering = False
+        self._open(0)
+        self.scheduler.schedule(playlist(0, 1), "http://origin/live.m3u8")
+        self._wait_stored(1)
+
+        self.gates["seg1.ts"] = threading.Event()
+        self._open(2, 3)
+        self.scheduler.schedule(playlist(0, 4), "http://origin/live.m3u8")
+        threading.Event().wait(0.1)
+        # 2 and 3 are done but wait behind 1
+        self.assertEqual(self._stored(), [0])
+
+        self._open(1)
+        self._wait_stored(4)
+        self.assertEqual(self._stored(), [0, 1, 2, 3])
+        snapshot = self.manager.fetch_stats.snapshot()
+        self.assertEqual(snapshot["fetched"], 4)
+        self.assertEqual([entry["media_sequence"] for entry in snapshot["recent"]][:1], [0])
+        self.assertIn("p95", snapshot["latency"])
+
+    def test_failed_and_missed_segments_mark_a_discontinuity(self):
+        self.manager.initial_buffering = False
+        self._open(0, 2, 7)
+        self.scheduler.schedule(playlist(0, 1), "http://origin/live.m3u8")
+        self._wait_stored(1)
+
+        # seg1 can't be downloaded
+        self.scheduler.schedule(playlist(0, 3), "http://origin/live.m3u8")
+        self._wait_stored(2)
+        self.assertEqual(self._stored(), [0, 2])
+        self.assertEqual(self.manager.source_changes, {1})
+
+        # 3-5 left the playlist before the next poll
+        self.scheduler.schedule(playlist(6, 2), "http://origin/live.m3u8")
+        self._wait_stored(3)
+        self.assertEqual(self._stored(), [0, 2, 7])
+        self.assertEqual(self.manager.source_changes, {1, 2})
+        stats = self.manager.fetch_stats.snapshot()
+        self.assertEqual((stats["failed"], stats["missed"]), (2, 3))
+
+    def test_restarted_numbering_starts_at_the_live_edge(self):
+        self.manager.initial_buffering = False
+        self._open(50, 51, 2)
+        # Not initially buffering: joins at the live edge
+        self.assertEqual(self.scheduler.schedule(playlist(50, 2), "http://origin/live.m3u8"), 1)
+        self._wait_stored(1)
+
+        self.assertEqual(self.scheduler.schedule(playlist(0, 3), "http://origin/live.m3u8"), 1)
+        self._wait_stored(2)
+        self.assertEqual(self._stored(), [51, 2])
+        self.assertEqual(self.manager.source_changes, {1})
+
+    def test_restart_while_a_download_waits_to_be_stored(self):
+        self.scheduler = SegmentScheduler(self.fetcher, workers=1)
+        self.addCleanup(self.scheduler.shutdown)
+        self.manager.initial_buffering = False
+        self._open(0, 1)
+        self.scheduler.schedule(playlist(0, 1), "http://origin/live.m3u8")
+        self._wait_stored(1)
+
+        with self.scheduler.lock:
+            self.scheduler.schedule(playlist(0, 3), "http://origin/live.m3u8")
+            # seg1 is downloaded but its callback waits for the lock; seg2 hasn't started
+            _, first = self.scheduler.pending[1]
+            first.exception(5)
+            _, second = self.scheduler.pending[2]
+            self.assertFalse(second.done())
+
+            # The upstream restarted its numbering: cancelling seg2 runs its callback right away
+            self.scheduler.schedule(playlist(0, 2), "http://origin/live.m3u8")
+            self.assertTrue(second.cancelled())
+
+        self._wait_stored(2)
+        self.assertEqual(self._stored(), [0, 1])
+        self.assertEqual(self.manager.source_changes, {1})
@@ -0,0 +1,137 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase
+
+from apps.proxy.ts_proxy.hls_ingest import HLSStreamConnection
+
+
+def segment(number):
+    return (b"\x47" + bytes([number]) * 187) * 3
+
+
+def playlist(first, count, discontinuity_at=None, ended=False, extra=""):
+    lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:1", f"#EXT-X-MEDIA-SEQUENCE:{first}", extra]
+    for sequence in range(first, first + count):
+        if sequence == discontinuity_at:
+            lines.append("#EXT-X-DISCONTINUITY")
+        lines += ["#EXTINF:1.0,", f"seg{sequence}.ts"]
+    if ended:
+        lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines).encode()
+
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, to see the session reuse its connection
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.client_ports.add(self.client_address[1])
+        server.requests.append(self.path)
+        body = server.files.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class HLSStreamConnectionTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), UpstreamHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.files = {f"/seg{n}.ts": segment(n) for n in range(20)}
+        self.server.client_ports = set()
+        self.server.requests = []
+
+    def _connect(self, **kwargs):
+        connection = HLSStreamConnection(f"{self.base_url}/live.m3u8", read_size=188 * 2, read_timeout=3, **kwargs)
+        self.addCleanup(connection.close)
+        return connection
+
+    def _read_segments(self, connection, count):
+        """Read count segments' worth of data, with the segments that started a discontinuity"""
+        data, discontinuities = b"", []
+        while len(data) < count * len(segment(0)):
+            block = connection.read_chunk()
+            self.assertTrue(block)
+            self.assertLessEqual(len(block), connection.read_size)
+            if connection.discontinuity:
+                discontinuities.append(block[1])
+                connection.discontinuity = False
+            data += block
+        return data, discontinuities
+
+    def test_follows_the_live_playlist(self):
+        self.server.files["/live.m3u8"] = (
+            b"#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=800000\nlow.m3u8\n#EXT-X-STREAM-INF:BANDWIDTH=3000000\nhigh.m3u8\n"
+        )
+        self.server.files["/high.m3u8"] = playlist(0, 5)
+        connection = self._connect(live_segments=2)
+        self.assertTrue(connection.connect())
+        self.assertEqual(connection.playlist_url, f"{self.base_url}/high.m3u8")
+
+        # Joins two segments from the live edge
+        data, discontinuities = self._read_segments(connection, 2)
+        self.assertEqual(data, segment(3) + segment(4))
+        self.assertEqual(discontinuities, [])
+
+        self.server.files["/high.m3u8"] = playlist(3, 4, discontinuity_at=6, ended=True)
+        data, discontinuities = self._read_segments(connection, 2)
+        self.assertEqual(data, segment(5) + segment(6))
+        self.assertEqual(discontinuities, [6])
+        self.assertEqual(connection.read_chunk(), b"")
+
+        # Playlist and segments over one kept-alive connection
+        self.assertEqual(len(self.server.client_ports), 1)
+        self.assertNotIn("/low.m3u8", self.server.requests)
+
+    def test_skipped_segments_mark_a_discontinuity(self):
+        del self.server.files["/seg2.ts"]
+        self.server.files["/live.m3u8"] = playlist(0, 4, ended=True)
+        connection = self._connect()
+        self.assertTrue(connection.connect())
+        # A finished playlist is read from the start
+        data, discontinuities = self._read_segments(connection, 3)
+        self.assertEqual(data, segment(0) + segment(1) + segment(3))
+        self.assertEqual(discontinuities, [3])
+
+    def test_unsupported_sources_are_left_to_ffmpeg(self):
+        self.server.files["/live.m3u8"] = playlist(0, 3, extra='#EXT-X-MAP:URI="init.mp4"')
+        connection = self._connect()
+        self.assertFalse(connection.connect())
+        self.assertEqual(connection.unsupported, "fMP4 segments")
+
+        self.server.files["/live.m3u8"] = playlist(0, 3, extra='#EXT-X-KEY:METHOD=AES-128,URI="key"')
+        connection = self._connect()
+        self.assertFalse(connection.connect())
+        self.assertEqual(connection.unsupported, "encrypted segments")
+
+        self.server.files["/seg0.ts"] = b"ID3\x04" + b"\x00" * 200
+        self.server.files["/live.m3u8"] = playlist(0, 1)
+        connection = self._connect()
+        self.assertFalse(connection.connect())
+        self.assertEqual(connection.unsupported, "segments that aren't MPEG-TS")
+
+    def test_missing_playlist_fails_to_connect(self):
+        connection = self._connect()
+        self.assertFalse(connection.connect())
+        self.assertIsNone(connection.unsupported)
@@ -0,0 +1,103 @@
+from django.test import SimpleTestCase
+
+from apps.proxy.ts_proxy.constants import TS_PACKET_SIZE
+from apps.proxy.ts_proxy.hls_output import build_playlist, get_segments, read_segment
+from apps.proxy.ts_proxy.redis_keys import RedisKeys
+from apps.proxy.ts_proxy.stream_buffer import StreamBuffer
+from apps.proxy.ts_proxy.ts_index import TSIndexer
+
+from .fakes import FakeRedis
+from .test_ts_index import FILLER, VIDEO_PID, pat_packet, pmt_packet, ts_packet
+
+PSI = pat_packet() + pmt_packet()
+# PMT of the stream after a switch: MPEG-2 video, keyframes flagged with the random access indicator
+SWITCHED_PSI = pat_packet() + pmt_packet(video_type=0x02)
+
+
+def keyframe(seconds, rai=False):
+    pts = int(seconds * 90000)
+    pts_bytes = bytes([
+        0x21 | ((pts >> 29) & 0x0E), (pts >> 22) & 0xFF, ((pts >> 14) & 0xFE) | 1,
+        (pts >> 7) & 0xFF, ((pts << 1) & 0xFE) | 1,
+    ])
+    pes = b"\x00\x00\x01\xe0\x00\x00\x80\x80\x05" + pts_bytes
+    es = b"\x00\x00\x00\x01\x09\xf0" + b"\x00\x00\x00\x01\x65"
+    return ts_packet(VIDEO_PID, pes + es, pusi=True, rai=rai)
+
+
+def gop(seconds, psi=PSI, rai=False):
+    """One chunk: PAT/PMT, a keyframe and nine filler packets"""
+    return psi + keyframe(seconds, rai) + FILLER * 9
+
+
+class HLSOutputTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.buffer = StreamBuffer("chan", redis_client=self.redis)
+        self.buffer.target_chunk_size = TS_PACKET_SIZE * 12
+        self.chunks = []
+
+    def _add(self, *chunks):
+        for chunk in chunks:
+            self.chunks.append(chunk)
+            self.buffer.add_chunk(chunk)
+
+    def test_keyframe_pts(self):
+        indexer = TSIndexer()
+        indexer.scan(gop(12.5))
+        self.assertEqual(indexer.keyframe_pts, 12.5 * 90000)
+
+    def test_segments_are_cut_on_keyframes(self):
+        # A keyframe every 2s, 4s segments
+        self._add(*(gop(2 * i) for i in range(6)))
+        segments = get_segments(self.redis, "chan")
+        self.assertEqual(
+            [(s.sequence, s.start_index, s.end_index, s.duration, s.discontinuity) for s in segments],
+            [(0, 1, 3, 4.0, False), (1, 3, 5, 4.0, False)],
+        )
+
+        playlist = build_playlist(self.redis, "chan").splitlines()
+        self.assertEqual(playlist[:5], [
+            "#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:4",
+            "#EXT-X-MEDIA-SEQUENCE:0", "#EXT-X-DISCONTINUITY-SEQUENCE:0",
+        ])
+        self.assertEqual(playlist[5:7], ["#EXTINF:4.000,", segments[0].uri])
+
+        # PAT/PMT, then from the first keyframe up to the next segment's
+        offset = 2 * TS_PACKET_SIZE
+        data = read_segment(self.redis, "chan", 0, segments[0].started_at_ms, self.buffer)
+        self.assertEqual(data, PSI + self.chunks[0][offset:] + self.chunks[1] + self.chunks[2][:offset])
+        # Workers without a buffer for the channel read the chunks straight from Redis
+        self.assertEqual(read_segment(self.redis, "chan", 0, segments[0].started_at_ms), data)
+
+    def test_stream_change_starts_a_discontinuity(self):
+        self._add(*(gop(2 * i) for i in range(6)))
+        # New upstream: different PMT, timestamps start over
+        self._add(*(gop(2 * i, SWITCHED_PSI, rai=True) for i in range(5)))
+
+        segments = get_segments(self.redis, "chan")
+        self.assertEqual([(s.start_index, s.discontinuity, s.discontinuity_sequence) for s in segments],
+                         [(1, False, 0), (3, False, 0), (7, True, 1), (9, False, 1)])
+        playlist = build_playlist(self.redis, "chan")
+        self.assertIn(f"#EXT-X-DISCONTINUITY\n#EXTINF:4.000,\n{segments[2].uri}", playlist)
+        self.assertTrue(read_segment(self.redis, "chan", 2, segments[2].started_at_ms).startswith(SWITCHED_PSI))
+
+    def test_numbering_continues_under_a_new_owner(self):
+        self._add(*(gop(2 * i) for i in range(4)))
+        new_owner = StreamBuffer("chan", redis_client=self.redis)
+        new_owner.target_chunk_size = TS_PACKET_SIZE * 12
+        for i in range(3):
+            new_owner.add_chunk(gop(100 + 2 * i))
+
+        segments = get_segments(self.redis, "chan")
+        self.assertEqual([(s.sequence, s.discontinuity) for s in segments], [(0, False), (1, True)])
+
+    def test_unknown_or_expired_segments(self):
+        self._add(*(gop(2 * i) for i in range(4)))
+        segment = get_segments(self.redis, "chan")[0]
+        # Same sequence number from an earlier run of the channel
+        self.assertIsNone(read_segment(self.redis, "chan", 0, segment.started_at_ms - 1))
+        self.assertIsNone(read_segment(self.redis, "chan", 5, segment.started_at_ms))
+
+        self.redis.delete(RedisKeys.buffer_chunk("chan", 2))
+        self.assertIsNone(read_segment(self.redis, "chan", 0, segment.started_at_ms))
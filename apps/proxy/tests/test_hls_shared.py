@@ -0,0 +1,100 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.proxy.config import HLSConfig
+from apps.proxy.hls_proxy import server
+from apps.proxy.hls_proxy.redis_keys import RedisKeys
+from apps.proxy.hls_proxy.server import ProxyServer
+
+from .fakes import FakeRedis
+
+URL = "http://origin/live.m3u8"
+
+
+def segment(sequence):
+    return bytes([0x47, sequence]) + b"\x00" * 186
+
+
+class SharedChannelTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        for patcher in (
+            mock.patch.object(server.RedisClient, "get_client", return_value=self.redis),
+            # No upstream: segments are stored by the tests
+            mock.patch.object(server.StreamFetcher, "fetch_loop"),
+            mock.patch.object(server.StreamManager, "start_cleanup_thread"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.owner = self._server("worker-a")
+        self.follower = self._server("worker-b")
+
+    def _server(self, worker_id):
+        proxy = ProxyServer()
+        proxy.worker_id = worker_id
+        return proxy
+
+    def _store(self, proxy, *sequences):
+        buffer = proxy.stream_buffers["chan"]
+        with buffer.lock:
+            for sequence in sequences:
+                buffer.add_segment(sequence, segment(sequence), 2.0, False)
+        buffer.set_state(target_duration=2.0, manifest_version=3, ready=1)
+
+    def test_one_worker_fetches_and_every_worker_serves(self):
+        self.owner.initialize_channel(URL, "chan")
+        self.follower.initialize_channel(URL, "chan")
+        self.assertEqual(self.follower.get_channel_owner("chan"), "worker-a")
+        self.assertNotIn("chan", self.follower.stream_managers)
+        self.assertEqual(server.StreamFetcher.fetch_loop.call_count, 1)
+
+        self._store(self.owner, 0, 1, 2)
+        manifest, status = self.follower.stream_endpoint("chan", "10.0.0.2")
+        self.assertEqual(status, 200)
+        self.assertIn("#EXT-X-TARGETDURATION:2", manifest)
+        self.assertIn("#EXT-X-MEDIA-SEQUENCE:0", manifest)
+        self.assertIn("../segments/chan/2.ts", manifest)
+        self.assertEqual(self.follower.get_segment("chan", "1.ts", "10.0.0.2"), (segment(1), 200))
+        self.assertEqual(self.follower.get_segment("chan", "7.ts", "10.0.0.2")[1], 404)
+
+        # The owner counts the follower's client and stays up
+        self.assertTrue(self.owner.stream_managers["chan"].keep_ownership())
+        self.assertFalse(self.owner.client_managers["chan"].cleanup_inactive(30))
+
+    def test_old_segments_leave_the_shared_store(self):
+        self.owner.initialize_channel(URL, "chan")
+        self._store(self.owner, *range(HLSConfig.MAX_SEGMENTS + 2))
+        index = self.follower._channel_buffer("chan").segment_index()
+        self.assertEqual([entry[0] for entry in index], list(range(2, HLSConfig.MAX_SEGMENTS + 2)))
+        self.assertIsNone(self.redis.get(RedisKeys.segment("chan", 1)))
+
+    def test_orphaned_channel_is_taken_over(self):
+        self.owner.initialize_channel(URL, "chan")
+        self._store(self.owner, 0, 1, 2)
+        # The owner's lease ran out
+        self.redis.delete(RedisKeys.channel_owner("chan"))
+
+        manifest, status = self.follower.stream_endpoint("chan", "10.0.0.2")
+        self.assertEqual(status, 200)
+        manager = self.follower.stream_managers["chan"]
+        self.assertEqual((manager.current_url, manager.next_sequence), (URL, 3))
+        self.assertIn(3, manager.source_changes)
+        self.assertTrue(manager.buffer_ready.is_set())
+        self.assertEqual(self.follower.get_channel_owner("chan"), "worker-b")
+
+        # The old owner stops fetching once it sees the new lease
+        self.assertFalse(self.owner.stream_managers["chan"].keep_ownership())
+        self.assertNotIn("chan", self.owner.stream_managers)
+
+    def test_stream_change_and_stop_through_any_worker(self):
+        self.owner.initialize_channel(URL, "chan")
+        self._store(self.owner, 0)
+        self.assertTrue(self.follower.update_channel_url("chan", "http://origin/other.m3u8"))
+        self.assertEqual(self.owner.stream_buffers["chan"].get_state()["url"], "http://origin/other.m3u8")
+
+        self.owner.stop_channel("chan")
+        self.assertFalse(self.follower.has_channel("chan"))
+        self.assertEqual(self.follower.stream_endpoint("chan"), ("Channel not found", 404))
+        self.assertIsNone(self.redis.get(RedisKeys.segment("chan", 0)))
+        self.assertIsNone(self.follower.get_channel_owner("chan"))
@@ -0,0 +1,145 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.proxy.ts_proxy import hot_standby
+from apps.proxy.ts_proxy.constants import TS_PACKET_SIZE, ChannelMetadataField
+from apps.proxy.ts_proxy.hot_standby import HotStandby
+from apps.proxy.ts_proxy.redis_keys import RedisKeys
+from apps.proxy.ts_proxy.stream_buffer import StreamBuffer
+
+from .fakes import FakeRedis
+from .test_ts_index import FILLER, IDR, NON_IDR, pat_packet, pmt_packet, video_packet
+
+PSI = pat_packet() + pmt_packet()
+GOP = PSI + IDR + (NON_IDR + FILLER) * 20
+
+
+class LiveUpstreamHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp2t")
+        self.end_headers()
+        # Start mid-GOP, like joining a live stream
+        self.wfile.write(GOP[3 * TS_PACKET_SIZE:])
+        repeats = 1 if self.path == "/short" else 200
+        try:
+            for _ in range(repeats):
+                self.wfile.write(GOP)
+                self.wfile.flush()
+                time.sleep(0.02)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class HotStandbyTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), LiveUpstreamHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.max_streams = 2
+        self.manager = SimpleNamespace(
+            channel_id="chan", running=True, connected=True, url_switching=False,
+            current_stream_id=1, url=f"{self.base_url}/active",
+        )
+        for patcher in (
+            mock.patch.object(hot_standby.RedisClient, "get_client", return_value=self.redis),
+            mock.patch.object(hot_standby.M3UAccountProfile.objects, "get",
+                              side_effect=lambda id: SimpleNamespace(max_streams=self.max_streams)),
+            mock.patch.object(hot_standby.db_connection, "close"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _standby(self, path="/standby"):
+        standby = HotStandby(self.manager)
+        standby.retry_interval = 0.5
+        stream_info = {
+            "url": f"{self.base_url}{path}", "user_agent": "test", "transcode": False,
+            "stream_profile": "proxy", "m3u_profile_id": 5, "stream_id": 2,
+        }
+        patcher = mock.patch.object(standby, "_choose_stream", return_value=stream_info)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(standby.stop)
+        return standby
+
+    def _wait_for(self, condition, timeout=5.0):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            time.sleep(0.02)
+        return condition()
+
+    def test_handoff_starts_on_a_keyframe(self):
+        standby = self._standby()
+        standby.start()
+        self.assertTrue(self._wait_for(standby.is_ready))
+        self.assertEqual(self.redis.get("profile_connections:5"), b"1")
+        metadata = self.redis.data[RedisKeys.channel_metadata("chan")]
+        self.assertEqual(metadata[ChannelMetadataField.STANDBY_STREAM_ID], "2")
+
+        handoff = standby.take_over(2.0)
+        self.assertEqual((handoff.stream_id, handoff.profile_id, handoff.reserved), (2, 5, True))
+        self.assertTrue(handoff.prefix.startswith(PSI + IDR))
+        standby.thread.join(2.0)
+        self.assertFalse(standby.thread.is_alive())
+
+        # The connection keeps streaming and the slot stays taken until released
+        self.assertTrue(handoff.connection.read_chunk())
+        handoff.connection.close()
+        self.assertEqual(self.redis.get("profile_connections:5"), b"1")
+        handoff.release_reservation()
+        self.assertEqual(self.redis.get("profile_connections:5"), b"0")
+
+    def test_failed_standby_releases_its_slot(self):
+        standby = self._standby("/short")
+        standby.start()
+        self.assertTrue(self._wait_for(lambda: 2 in standby._failed_stream_ids))
+        self.assertTrue(self._wait_for(lambda: self.redis.get("profile_connections:5") == b"0"))
+        self.assertIsNone(standby.take_over(0.5))
+        self.assertNotIn(ChannelMetadataField.STANDBY_STREAM_ID,
+                         self.redis.data[RedisKeys.channel_metadata("chan")])
+
+    def test_profile_limit_is_respected(self):
+        standby = HotStandby(self.manager)
+        self.redis.data["profile_connections:5"] = b"2"
+        self.assertFalse(standby._reserve(5))
+        self.assertEqual(self.redis.get("profile_connections:5"), b"2")
+
+        self.max_streams = 0
+        self.assertTrue(standby._reserve(5))
+        self.assertFalse(standby._reserved)
+        self.assertEqual(self.redis.get("profile_connections:5"), b"2")
+
+
+class SpliceTests(SimpleTestCase):
+    def test_splice_drops_partial_packet_and_flags_discontinuity(self):
+        buffer = StreamBuffer("chan", redis_client=FakeRedis())
+        buffer.target_chunk_size = TS_PACKET_SIZE * 2
+        buffer.add_chunk(FILLER + IDR[:100])
+
+        keyframe = video_packet(0x65, rai=True)
+        buffer.splice(keyframe)
+        chunk = buffer.get_chunks_exact(0, 1)[0]
+        self.assertEqual(chunk[:TS_PACKET_SIZE], FILLER)
+        self.assertEqual(chunk[TS_PACKET_SIZE + 5], keyframe[5] | 0x80)
+        self.assertEqual(chunk[TS_PACKET_SIZE + 6:], keyframe[6:])
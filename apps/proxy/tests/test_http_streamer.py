@@ -0,0 +1,95 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase
+
+from apps.proxy.ts_proxy.http_streamer import HTTPStreamConnection
+
+PAYLOAD = bytes(range(256)) * 4096  # 1 MB
+
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/missing":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp2t")
+        if self.path == "/chunked":
+            self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        for i in range(0, len(PAYLOAD), 50000):
+            block = PAYLOAD[i:i + 50000]
+            if self.path == "/chunked":
+                self.wfile.write(f"{len(block):x}\r\n".encode() + block + b"\r\n")
+            else:
+                self.wfile.write(block)
+            if self.path == "/stall" and i == 0:
+                self.wfile.flush()
+                time.sleep(1.5)
+        if self.path == "/chunked":
+            self.wfile.write(b"0\r\n\r\n")
+
+
+class HTTPStreamConnectionTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), UpstreamHandler)
+        cls.server.protocol_version = "HTTP/1.1"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def _read_all(self, connection):
+        blocks = []
+        while True:
+            block = connection.read_chunk()
+            if not block:
+                return blocks
+            self.assertLessEqual(len(block), connection.read_size)
+            blocks.append(block)
+
+    def test_reads_whole_stream_in_large_blocks(self):
+        for path in ("/plain", "/chunked"):
+            connection = HTTPStreamConnection(f"{self.base_url}{path}", read_size=256 * 1024)
+            self.assertTrue(connection.connect())
+            blocks = self._read_all(connection)
+            connection.close()
+            self.assertEqual(b"".join(blocks), PAYLOAD)
+            self.assertLess(len(blocks), len(PAYLOAD) // 8192)
+
+    def test_error_status_fails_to_connect(self):
+        connection = HTTPStreamConnection(f"{self.base_url}/missing")
+        self.assertFalse(connection.connect())
+        self.assertIsNone(connection.response)
+
+    def test_stalled_upstream_ends_the_stream(self):
+        connection = HTTPStreamConnection(f"{self.base_url}/stall", read_size=256 * 1024, read_timeout=0.5)
+        self.assertTrue(connection.connect())
+        received = b"".join(self._read_all(connection))
+        self.assertEqual(received, PAYLOAD[:50000])
+        self.assertIsNone(connection.response)
+
+    def test_close_interrupts_a_blocked_read(self):
+        connection = HTTPStreamConnection(f"{self.base_url}/stall", read_size=256 * 1024)
+        self.assertTrue(connection.connect())
+        connection.read_chunk()
+
+        threading.Timer(0.2, connection.close).start()
+        started = time.time()
+        self._read_all(connection)
+        self.assertLess(time.time() - started, 1.2)
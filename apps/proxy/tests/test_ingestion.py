@@ -0,0 +1,32 @@
+from django.test import SimpleTestCase
+
+from apps.proxy.ts_proxy.constants import TS_PACKET_SIZE
+from apps.proxy.ts_proxy.redis_keys import RedisKeys
+from apps.proxy.ts_proxy.stream_buffer import StreamBuffer
+
+from .fakes import FakeRedis
+
+
+class IngestionWriteTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.buffer = StreamBuffer("chan", redis_client=self.redis)
+        self.buffer.target_chunk_size = TS_PACKET_SIZE * 10
+
+    def test_each_chunk_is_one_scripted_write_that_touches_liveness(self):
+        self.buffer.add_chunk(b"\x47" * TS_PACKET_SIZE * 35)
+        self.assertEqual(self.redis.scripts_run, 3)
+        self.assertEqual(self.redis.get(RedisKeys.buffer_index("chan")), b"3")
+        self.assertEqual(len(self.redis.get(RedisKeys.buffer_chunk("chan", 3))), TS_PACKET_SIZE * 10)
+        self.assertIn(RedisKeys.last_data("chan"), self.redis.data)
+
+    def test_liveness_writes_are_rate_limited(self):
+        self.buffer.add_chunk(b"\x47" * TS_PACKET_SIZE * 10)
+        del self.redis.data[RedisKeys.last_data("chan")]
+
+        self.buffer.touch_liveness()
+        self.assertNotIn(RedisKeys.last_data("chan"), self.redis.data)
+
+        self.buffer._liveness_written_at -= self.buffer.liveness_interval
+        self.buffer.touch_liveness()
+        self.assertIn(RedisKeys.last_data("chan"), self.redis.data)
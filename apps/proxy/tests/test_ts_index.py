@@ -0,0 +1,143 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.proxy.ts_proxy import stream_buffer
+from apps.proxy.ts_proxy.constants import TS_PACKET_SIZE
+from apps.proxy.ts_proxy.redis_keys import RedisKeys
+from apps.proxy.ts_proxy.stream_buffer import StreamBuffer
+from apps.proxy.ts_proxy.ts_index import TSIndexer
+
+from .fakes import FakeRedis
+
+PMT_PID = 0x1000
+VIDEO_PID = 0x100
+AUDIO_PID = 0x101
+CRC = b"\x00\x00\x00\x00"
+
+
+def ts_packet(pid, payload=b"", pusi=False, cc=0, rai=False):
+    header = bytes([0x47, (0x40 if pusi else 0) | (pid >> 8), pid & 0xFF])
+    if rai:
+        adaptation = bytes([1, 0x40])
+        return header + bytes([0x30 | cc]) + adaptation + payload.ljust(TS_PACKET_SIZE - 6, b"\xff")
+    return header + bytes([0x10 | cc]) + payload.ljust(TS_PACKET_SIZE - 4, b"\xff")
+
+
+def pat_packet(cc=0, pmt_pid=PMT_PID):
+    programs = bytes([0x00, 0x01, 0xE0 | (pmt_pid >> 8), pmt_pid & 0xFF])
+    body = b"\x00\x01\xc1\x00\x00" + programs + CRC
+    section = bytes([0x00, 0xB0, len(body)]) + body
+    return ts_packet(0, b"\x00" + section, pusi=True, cc=cc)
+
+
+def pmt_packet(cc=0, video_type=0x1B):
+    streams = bytes([video_type, 0xE1, 0x00, 0xF0, 0x00, 0x0F, 0xE1, 0x01, 0xF0, 0x00])
+    body = b"\x00\x01\xc1\x00\x00\xe1\x00\xf0\x00" + streams + CRC
+    section = bytes([0x02, 0xB0, len(body)]) + body
+    return ts_packet(PMT_PID, b"\x00" + section, pusi=True, cc=cc)
+
+
+def video_packet(nal_header, rai=False):
+    pes = b"\x00\x00\x01\xe0\x00\x00\x80\x80\x05" + b"\x21\x00\x01\x00\x01"
+    es = b"\x00\x00\x00\x01\x09\xf0" + b"\x00\x00\x00\x01" + bytes([nal_header])
+    return ts_packet(VIDEO_PID, pes + es, pusi=True, rai=rai)
+
+
+IDR = video_packet(0x65)
+NON_IDR = video_packet(0x41)
+FILLER = ts_packet(AUDIO_PID, b"audio")
+
+
+class TSIndexerTests(SimpleTestCase):
+    def test_finds_last_keyframe_after_psi(self):
+        indexer = TSIndexer()
+        chunk = pat_packet() + pmt_packet() + NON_IDR + IDR + FILLER + IDR + NON_IDR
+        self.assertEqual(indexer.scan(chunk), 5 * TS_PACKET_SIZE)
+        self.assertEqual((indexer.video_pid, indexer.codec), (VIDEO_PID, "h264"))
+        self.assertEqual(indexer.psi, pat_packet() + pmt_packet())
+
+    def test_keyframes_need_the_pmt(self):
+        indexer = TSIndexer()
+        self.assertIsNone(indexer.scan(IDR + FILLER))
+        self.assertIsNone(indexer.scan(pat_packet() + pmt_packet() + NON_IDR))
+
+    def test_random_access_indicator_and_hevc(self):
+        indexer = TSIndexer()
+        indexer.scan(pat_packet() + pmt_packet(video_type=0x24))
+        self.assertEqual(indexer.codec, "hevc")
+        # IDR_W_RADL (19) / TRAIL_R (1) NAL headers
+        self.assertEqual(indexer.scan(FILLER + video_packet(19 << 1)), TS_PACKET_SIZE)
+        self.assertIsNone(indexer.scan(video_packet(1 << 1)))
+        self.assertEqual(indexer.scan(video_packet(1 << 1, rai=True)), 0)
+
+    def test_repeated_psi_does_not_count_as_change(self):
+        indexer = TSIndexer()
+        indexer.scan(pat_packet(cc=0) + pmt_packet(cc=0))
+        version = indexer.psi_version
+        indexer.scan(pat_packet(cc=1) + pmt_packet(cc=1))
+        self.assertEqual(indexer.psi_version, version)
+        indexer.scan(pat_packet(pmt_pid=0x1001) + pmt_packet())
+        self.assertGreater(indexer.psi_version, version)
+
+
+class KeyframeJoinTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.buffer = StreamBuffer("chan", redis_client=self.redis)
+        self.buffer.target_chunk_size = TS_PACKET_SIZE * 8
+        self.now = 1000.0
+        patcher = mock.patch.object(stream_buffer.time, "time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _add(self, *packets, at):
+        self.now = at
+        packets += (FILLER,) * (8 - len(packets))
+        self.buffer.add_chunk(b"".join(packets))
+
+    def _stream(self):
+        self._add(pat_packet(), pmt_packet(), FILLER, IDR, NON_IDR, at=1000.0)
+        self._add(NON_IDR, FILLER, at=1001.0)
+        self._add(pat_packet(cc=1), pmt_packet(cc=1), FILLER, FILLER, IDR, at=1003.0)
+        self._add(NON_IDR, at=1004.0)
+        return pat_packet() + pmt_packet()
+
+    def test_joins_newest_keyframe_old_enough(self):
+        psi = self._stream()
+        chunks = self.buffer.get_chunks_exact(0, 4)
+
+        self.now = 1004.5
+        index, data = self.buffer.find_join_point(2.0, 10.0)
+        self.assertEqual(index, 1)
+        self.assertEqual(data, psi + chunks[0][3 * TS_PACKET_SIZE:])
+
+        self.now = 1005.5
+        index, data = self.buffer.find_join_point(2.0, 10.0)
+        self.assertEqual(index, 3)
+        self.assertEqual(data, psi + chunks[2][4 * TS_PACKET_SIZE:])
+
+    def test_falls_back_to_oldest_younger_keyframe(self):
+        self._stream()
+        self.now = 1003.5
+        self.assertEqual(self.buffer.find_join_point(5.0, 10.0)[0], 1)
+
+    def test_no_join_point_without_recent_keyframes(self):
+        self._stream()
+        self.now = 1020.0
+        self.assertIsNone(self.buffer.find_join_point(2.0, 10.0))
+
+    def test_expired_keyframe_chunk_is_not_used(self):
+        self._stream()
+        del self.redis.data[RedisKeys.buffer_chunk("chan", 3)]
+        # Another worker: no local copy of the chunk
+        reader = StreamBuffer("chan", redis_client=self.redis)
+        self.now = 1005.5
+        self.assertIsNone(reader.find_join_point(2.0, 10.0))
+        self.assertEqual(reader.find_join_point(4.0, 10.0)[0], 1)
+
+    def test_stream_change_drops_old_keyframes(self):
+        self._stream()
+        self._add(pat_packet(pmt_pid=0x1001), NON_IDR, at=1005.0)
+        self.now = 1008.0
+        self.assertIsNone(self.buffer.find_join_point(2.0, 10.0))
@@ -0,0 +1,134 @@
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.proxy.ts_proxy import stream_buffer
+from apps.proxy.ts_proxy.constants import TS_PACKET_SIZE, ChannelMetadataField
+from apps.proxy.ts_proxy.redis_keys import RedisKeys
+from apps.proxy.ts_proxy.stream_buffer import StreamBuffer
+from apps.proxy.ts_proxy.ts_inspector import TSInspector
+
+from .fakes import FakeRedis
+
+VIDEO_PID = 0x100
+AUDIO_PID = 0x101
+
+
+def packet(pid, cc, pcr=None, discontinuity=False, sync=0x47, error=False):
+    header = bytes([sync, (0x80 if error else 0) | (pid >> 8), pid & 0xFF])
+    if pcr is None and not discontinuity:
+        return header + bytes([0x10 | cc]) + b"\xff" * (TS_PACKET_SIZE - 4)
+
+    flags = (0x80 if discontinuity else 0) | (0x10 if pcr is not None else 0)
+    adaptation = bytes([flags])
+    if pcr is not None:
+        base, extension = divmod(pcr, 300)
+        adaptation += bytes([
+            (base >> 25) & 0xFF, (base >> 17) & 0xFF, (base >> 9) & 0xFF, (base >> 1) & 0xFF,
+            ((base & 0x1) << 7) | 0x7E | (extension >> 8), extension & 0xFF,
+        ])
+    field = bytes([len(adaptation)]) + adaptation
+    return header + bytes([0x30 | cc]) + field + b"\xff" * (TS_PACKET_SIZE - 4 - len(field))
+
+
+class PacketStream:
+    """Continuous two-PID stream at 10 packets per millisecond, with a PCR on every video packet"""
+
+    def __init__(self):
+        self.cc = {VIDEO_PID: 0, AUDIO_PID: 0}
+        self.packets = 0
+
+    def next(self, pid):
+        cc = self.cc[pid]
+        self.cc[pid] = (cc + 1) % 16
+        pcr = self.packets * 2700 if pid == VIDEO_PID else None
+        self.packets += 1
+        return packet(pid, cc, pcr=pcr)
+
+    def chunk(self, count):
+        return b"".join(self.next(VIDEO_PID if i % 4 else AUDIO_PID) for i in range(count))
+
+
+class TSInspectorTests(SimpleTestCase):
+    def test_clean_stream_across_chunks(self):
+        stream = PacketStream()
+        inspector = TSInspector()
+        for _ in range(5):
+            report = inspector.inspect(stream.chunk(100))
+            self.assertEqual(report.errors, 0)
+            self.assertEqual(report.pcr_discontinuities, 0)
+        self.assertEqual(inspector.pid_packets, {VIDEO_PID: 375, AUDIO_PID: 125})
+
+        self.assertAlmostEqual(inspector.bitrate(), 10 * TS_PACKET_SIZE * 8 * 1000)
+        rates = inspector.pid_bitrates()
+        self.assertAlmostEqual(rates[AUDIO_PID] * 3, rates[VIDEO_PID])
+
+    def test_continuity_gaps(self):
+        inspector = TSInspector()
+        report = inspector.inspect(
+            packet(VIDEO_PID, 0) + packet(VIDEO_PID, 1) + packet(VIDEO_PID, 1) +  # duplicate is allowed
+            packet(AUDIO_PID, 5) + packet(VIDEO_PID, 4) + packet(AUDIO_PID, 6)
+        )
+        self.assertEqual(report.cc_errors, 1)
+
+        # Gaps at the chunk boundary count, signalled discontinuities don't
+        self.assertEqual(inspector.inspect(packet(VIDEO_PID, 6) + packet(AUDIO_PID, 7)).cc_errors, 1)
+        self.assertEqual(inspector.inspect(packet(VIDEO_PID, 12, discontinuity=True)).cc_errors, 0)
+        self.assertEqual(inspector.cc_errors, 2)
+
+    def test_sync_and_transport_errors(self):
+        inspector = TSInspector()
+        report = inspector.inspect(
+            packet(VIDEO_PID, 0) + packet(VIDEO_PID, 1, sync=0x00) + packet(VIDEO_PID, 1, error=True)
+        )
+        self.assertEqual((report.sync_errors, report.transport_errors, report.cc_errors), (1, 1, 0))
+        self.assertAlmostEqual(report.error_ratio, 2 / 3)
+
+    def test_unsignalled_pcr_jump(self):
+        inspector = TSInspector()
+        report = inspector.inspect(
+            packet(VIDEO_PID, 0, pcr=0) + packet(VIDEO_PID, 1, pcr=27000) + packet(VIDEO_PID, 2, pcr=27000 * 5000)
+        )
+        self.assertEqual(report.pcr_discontinuities, 1)
+        # Only the good interval is used for the bitrate
+        self.assertAlmostEqual(inspector.bitrate(), TS_PACKET_SIZE * 8 * 1000)
+
+
+class BufferInspectionTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.buffer = StreamBuffer("chan", redis_client=self.redis)
+        self.buffer.target_chunk_size = TS_PACKET_SIZE * 100
+        self.now = 1000.0
+        patcher = mock.patch.object(stream_buffer.time, "time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.buffer.ts_inspector.reset_stats()
+
+    def _metadata(self):
+        return self.redis.data.get(RedisKeys.channel_metadata("chan"), {})
+
+    def test_stats_written_each_interval(self):
+        stream = PacketStream()
+        self.buffer.add_chunk(stream.chunk(100))
+        self.assertEqual(self._metadata(), {})
+
+        self.now += self.buffer.ts_stats_interval
+        self.buffer.add_chunk(stream.chunk(100))
+        metadata = self._metadata()
+        self.assertEqual(metadata[ChannelMetadataField.TS_CC_ERRORS], "0")
+        self.assertEqual(metadata[ChannelMetadataField.TS_BITRATE], "15040.0")
+        self.assertEqual(set(json.loads(metadata[ChannelMetadataField.TS_PID_BITRATES])), {"256", "257"})
+        self.assertIsNone(self.buffer.corrupt_since)
+
+    def test_corrupt_chunks_are_flagged(self):
+        garbage = bytes(TS_PACKET_SIZE * 100)
+        self.buffer.add_chunk(garbage)
+        self.assertEqual(self.buffer.corrupt_since, 1000.0)
+        self.now += 1
+        self.buffer.add_chunk(garbage)
+        self.assertEqual(self.buffer.corrupt_since, 1000.0)
+
+        self.buffer.add_chunk(PacketStream().chunk(100))
+        self.assertIsNone(self.buffer.corrupt_since)
@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from requests.structures import CaseInsensitiveDict
+
+from apps.proxy.vod_proxy import block_cache
+from apps.proxy.vod_proxy.block_cache import CachedRangeStream
+from apps.proxy.vod_proxy.multi_worker_connection_manager import RedisBackedVODConnection
+
+from .fakes import FakeRedis
+
+BLOCK = 1000
+FILE = bytes(i % 251 for i in range(6500))  # Seven blocks, the last one 500 bytes
+KEY = block_cache.cache_key("movie-uuid", len(FILE))
+
+
+class FakeResponse:
+    def __init__(self, first, last, status_code=206):
+        self.status_code = status_code
+        if status_code == 200:
+            first, last = 0, len(FILE) - 1
+        self.body = FILE[first:last + 1]
+        self.headers = CaseInsensitiveDict({"Content-Range": f"bytes {first}-{last}/{len(FILE)}"})
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), 300):
+            yield self.body[i:i + 300]
+
+    def close(self):
+        self.closed = True
+
+
+class VODBlockCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        override = override_settings(
+            VOD_BLOCK_CACHE_DIR=self.cache_dir,
+            VOD_BLOCK_CACHE_BLOCK_SIZE=BLOCK,
+            VOD_BLOCK_CACHE_MAX_BYTES=100 * BLOCK,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.redis = FakeRedis()
+        patcher = mock.patch.object(block_cache.RedisClient, "get_client", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.fetches = []
+
+    def _fetch(self, first, last):
+        self.fetches.append((first, last))
+        return FakeResponse(first, last)
+
+    def _read(self, first, last, response=None):
+        stream = CachedRangeStream(KEY, first, last, len(FILE), self._fetch, response=response)
+        return b"".join(stream.iter_content(chunk_size=256))
+
+    def test_only_missing_blocks_are_fetched(self):
+        self.assertEqual(self._read(1500, 4499), FILE[1500:4500])
+        # Widened to whole blocks, so every block that arrives is stored
+        self.assertEqual(self.fetches, [(1000, 4999)])
+
+        self.assertEqual(self._read(2000, 3000), FILE[2000:3001])
+        self.assertEqual(len(self.fetches), 1)
+
+        self.assertEqual(self._read(0, len(FILE) - 1), FILE)
+        self.assertEqual(self.fetches[1:], [(0, 999), (5000, 6499)])
+        self.assertEqual(self._read(6200, 6499), FILE[6200:])
+        self.assertEqual(len(self.fetches), 3)
+
+    def test_open_response_is_relayed_and_stored(self):
+        self.assertEqual(self._read(500, 6499, response=FakeResponse(500, 6499)), FILE[500:])
+        self.assertEqual(self.fetches, [])
+        # Block 0 started before the response did
+        self.assertFalse(block_cache.has_block(KEY, 0, len(FILE)))
+        self.assertTrue(all(block_cache.has_block(KEY, block, len(FILE)) for block in range(1, 7)))
+
+    def test_provider_ignoring_the_range(self):
+        self._fetch = lambda first, last: FakeResponse(first, last, status_code=200)
+        self.assertEqual(self._read(2500, 3499), FILE[2500:3500])
+        self.assertEqual(self._read(2000, 3999), FILE[2000:4000])
+
+    def test_hit_rate(self):
+        self._read(0, 1999)
+        self._read(0, 999)
+        stats = block_cache.get_stats()
+        self.assertEqual((stats["hit_bytes"], stats["miss_bytes"], stats["requests"]), (1000, 2000, 2))
+        self.assertEqual(stats["hit_rate"], 0.3333)
+
+    def test_least_recently_read_blocks_are_evicted(self):
+        self._read(0, len(FILE) - 1)
+        now = time.time()
+        for block in range(7):
+            path = block_cache._block_path(KEY, block)
+            os.utime(path, (now - 100 + block, now - 100 + block))
+        # Reading a block marks it as used
+        block_cache.read_block(KEY, 0, len(FILE))
+        block_cache.read_block(KEY, 5, len(FILE))
+
+        block_cache.evict(self.cache_dir, 4 * BLOCK)
+        cached = [block for block in range(7) if block_cache.has_block(KEY, block, len(FILE))]
+        self.assertEqual(cached, [0, 4, 5, 6])
+        self.assertEqual(block_cache.get_stats()["disk_bytes"], 3500)
+
+    def test_range_bounds(self):
+        self.assertEqual(RedisBackedVODConnection._range_bounds(None, 6500), (0, 6499))
+        self.assertEqual(RedisBackedVODConnection._range_bounds("bytes=10-99", 6500), (10, 99))
+        self.assertIsNone(RedisBackedVODConnection._range_bounds("bytes=0-10,20-30", 6500))
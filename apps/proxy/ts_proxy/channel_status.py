@@ -1,3 +1,4 @@
+import json
 import logging
 import time
 import re
@@ -64,6 +65,11 @@ class ChannelStatus:
             except ValueError:
                 logger.warning(f"Invalid stream_id format in Redis: {stream_id_bytes}")
 
+        # Add the warm standby stream of hot_standby channels
+        standby_stream_id = metadata.get(ChannelMetadataField.STANDBY_STREAM_ID.encode('utf-8'))
+        if standby_stream_id:
+            info['standby_stream_id'] = int(standby_stream_id.decode('utf-8'))
+
         # Add M3U profile information
         m3u_profile_id_bytes = metadata.get(ChannelMetadataField.M3U_PROFILE.encode('utf-8'))
         if m3u_profile_id_bytes:
@@ -264,6 +270,10 @@ class ChannelStatus:
                 'last_data_age': time.time() - manager.last_data_time
             }
 
+        # Hit/miss counters of this worker's shared chunk ring
+        if channel_id in proxy_server.stream_buffers:
+            info['local_chunk_cache'] = proxy_server.stream_buffers[channel_id].chunk_cache.stats()
+
         # Add FFmpeg stream information
         video_codec = metadata.get(ChannelMetadataField.VIDEO_CODEC.encode('utf-8'))
         if video_codec:
@@ -321,6 +331,24 @@ class ChannelStatus:
         if stream_type:
             info['stream_type'] = stream_type.decode('utf-8')
 
+        # Add TS packet inspection stats of the last reporting window
+        ts_stats_updated = metadata.get(ChannelMetadataField.TS_STATS_UPDATED.encode('utf-8'))
+        if ts_stats_updated:
+            ts_health = {'updated_at': float(ts_stats_updated.decode('utf-8'))}
+            for field in (ChannelMetadataField.TS_SYNC_ERRORS, ChannelMetadataField.TS_TRANSPORT_ERRORS,
+                          ChannelMetadataField.TS_CC_ERRORS, ChannelMetadataField.TS_PCR_DISCONTINUITIES):
+                value = metadata.get(field.encode('utf-8'))
+                if value:
+                    ts_health[field[3:]] = int(value.decode('utf-8'))
+            for field in (ChannelMetadataField.TS_ERROR_RATIO, ChannelMetadataField.TS_BITRATE):
+                value = metadata.get(field.encode('utf-8'))
+                if value:
+                    ts_health[field[3:]] = float(value.decode('utf-8'))
+            pid_bitrates = metadata.get(ChannelMetadataField.TS_PID_BITRATES.encode('utf-8'))
+            if pid_bitrates:
+                ts_health['pid_bitrates'] = json.loads(pid_bitrates.decode('utf-8'))
+            info['ts_health'] = ts_health
+
         return info
 
     @staticmethod
@@ -0,0 +1,84 @@
+"""TS packet-aligned chunk assembly for StreamBuffer"""
+
+from collections import deque
+
+from .constants import TS_PACKET_SIZE
+
+
+class ChunkAccumulator:
+    """
+    Collects upstream reads and cuts them into fixed-size, TS packet aligned chunks.
+
+    Reads are kept as zero-copy memoryviews of the bytes objects handed in;
+    emitting a chunk joins the pieces it spans into a new bytes object, which is
+    the only copy of the data on its way to Redis and the chunk ring. A chunk
+    that lies entirely within one read is returned without copying at all.
+    """
+
+    def __init__(self, chunk_size, packet_size=TS_PACKET_SIZE):
+        self.packet_size = packet_size
+        self.chunk_size = max(packet_size, (chunk_size // packet_size) * packet_size)
+        self._pieces = deque()
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, data):
+        """Queue data; bytes are referenced, mutable buffers (which a caller may reuse) are copied"""
+        if not data:
+            return
+        if not isinstance(data, bytes):
+            data = bytes(data)
+        self._pieces.append(memoryview(data))
+        self._size += len(data)
+
+    def pop_chunks(self):
+        """Remove and return every complete chunk that has accumulated"""
+        chunks = []
+        while self._size >= self.chunk_size:
+            chunks.append(self._take(self.chunk_size))
+        return chunks
+
+    def pop_aligned(self):
+        """Remove and return all whole TS packets (used to flush on stop), or None"""
+        size = (self._size // self.packet_size) * self.packet_size
+        return self._take(size) if size else None
+
+    def drop_partial(self):
+        """Discard a trailing partial TS packet, e.g. before data from another source is appended"""
+        partial = self._size % self.packet_size
+        while partial:
+            piece = self._pieces[-1]
+            if len(piece) <= partial:
+                self._pieces.pop()
+                partial -= len(piece)
+                self._size -= len(piece)
+            else:
+                self._pieces[-1] = piece[:len(piece) - partial]
+                self._size -= partial
+                partial = 0
+
+    def clear(self):
+        self._pieces.clear()
+        self._size = 0
+
+    def _take(self, size):
+        parts = []
+        needed = size
+        while needed:
+            piece = self._pieces[0]
+            if len(piece) <= needed:
+                parts.append(piece)
+                self._pieces.popleft()
+                needed -= len(piece)
+            else:
+                parts.append(piece[:needed])
+                self._pieces[0] = piece[needed:]
+                needed = 0
+        self._size -= size
+
+        if len(parts) == 1 and len(parts[0]) == len(parts[0].obj):
+            # Exactly one whole upstream read
+            return parts[0].obj
+        return b"".join(parts)
@@ -0,0 +1,120 @@
+"""In-process ring of recent buffer chunks shared by all clients of a channel in one worker"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class ChunkRing:
+    """
+    Byte-bounded cache of recent chunks keyed by buffer index.
+
+    Every StreamGenerator in a worker reads through its channel's StreamBuffer,
+    so keeping recent chunks here means each chunk is fetched from Redis (and
+    allocated) once per worker instead of once per client. Entries older than
+    max_age are dropped as well, so the ring never serves data Redis has already
+    expired.
+    """
+
+    def __init__(self, max_bytes, max_age=None):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        # Held while fetching missing chunks so concurrent readers share one round trip
+        self.fetch_lock = threading.Lock()
+        self._chunks = OrderedDict()  # index -> (data, stored_at)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def put(self, index, data):
+        """Store a chunk; eviction is oldest-stored first"""
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+
+        with self.lock:
+            previous = self._chunks.pop(index, None)
+            if previous is not None:
+                self._bytes -= len(previous[0])
+            self._chunks[index] = (data, time.time())
+            self._bytes += len(data)
+            self._evict()
+
+    def get_range(self, start_id, end_id):
+        """
+        Return a list with the cached chunk (or None) for each index in
+        [start_id, end_id), counting hits and misses.
+        """
+        if not self.enabled:
+            return [None] * max(0, end_id - start_id)
+
+        with self.lock:
+            self._evict()
+            results = []
+            for idx in range(start_id, end_id):
+                entry = self._chunks.get(idx)
+                results.append(entry[0] if entry is not None else None)
+
+        found = sum(1 for chunk in results if chunk is not None)
+        self.hits += found
+        self.misses += len(results) - found
+        return results
+
+    def peek_range(self, start_id, end_id):
+        """Like get_range, but without touching the hit/miss counters"""
+        if not self.enabled:
+            return [None] * max(0, end_id - start_id)
+
+        with self.lock:
+            return [
+                entry[0] if entry is not None else None
+                for entry in (self._chunks.get(idx) for idx in range(start_id, end_id))
+            ]
+
+    def newest_index(self):
+        with self.lock:
+            return max(self._chunks, default=0)
+
+    def clear(self):
+        with self.lock:
+            self._chunks.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self.lock:
+            chunk_count = len(self._chunks)
+            total_bytes = self._bytes
+            oldest = min(self._chunks, default=None)
+            newest = max(self._chunks, default=None)
+
+        lookups = self.hits + self.misses
+        return {
+            'chunks': chunk_count,
+            'bytes': total_bytes,
+            'max_bytes': self.max_bytes,
+            'oldest_index': oldest,
+            'newest_index': newest,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+    def _evict(self):
+        # Caller holds self.lock
+        while self._chunks and self._bytes > self.max_bytes:
+            _, (data, _) = self._chunks.popitem(last=False)
+            self._bytes -= len(data)
+
+        if self.max_age:
+            cutoff = time.time() - self.max_age
+            while self._chunks:
+                oldest = next(iter(self._chunks))
+                data, stored_at = self._chunks[oldest]
+                if stored_at >= cutoff:
+                    break
+                del self._chunks[oldest]
+                self._bytes -= len(data)
@@ -34,6 +34,10 @@ class ClientManager:
         self.heartbeat_interval = ConfigHelper.get('CLIENT_HEARTBEAT_INTERVAL', 10)
         self.last_heartbeat_time = {}
 
+        # Clients that poll instead of holding a connection (HLS): client_id -> time of the last request
+        self.request_clients = {}
+        self.request_client_timeout = ConfigHelper.hls_client_timeout()
+
         # Start heartbeat thread for local clients
         self._start_heartbeat_thread()
         self._registered_clients = set()  # Track already registered client IDs
@@ -126,13 +130,20 @@ class ClientManager:
                                     logger.debug(f"Client {client_id} inactive for {current_time - last_active_time:.1f}s, removing as ghost")
                                     clients_to_remove.add(client_id)
 
-                        # Remove ghost clients in a separate step
-                        for client_id in clients_to_remove:
-                            self.remove_client(client_id)
+                        # Polling clients that stopped polling
+                        for client_id, last_request in self.request_clients.items():
+                            if current_time - last_request > self.request_client_timeout:
+                                logger.debug(f"Client {client_id} made no request for {current_time - last_request:.1f}s, removing")
+                                clients_to_remove.add(client_id)
+
+                    # Remove ghost clients in a separate step, outside the lock remove_client takes
+                    for client_id in clients_to_remove:
+                        self.remove_client(client_id)
 
-                        if clients_to_remove:
-                            logger.info(f"Removed {len(clients_to_remove)} ghost clients from channel {self.channel_id}")
+                    if clients_to_remove:
+                        logger.info(f"Removed {len(clients_to_remove)} ghost clients from channel {self.channel_id}")
 
+                    with self.lock:
                         # Now send heartbeats only for remaining clients
                         pipe = self.redis_client.pipeline()
                         current_time = time.time()
@@ -297,6 +308,18 @@ class ClientManager:
             logger.error(f"Error adding client {client_id}: {e}")
             return False
 
+    def touch_client(self, client_id, client_ip, user_agent=None):
+        """
+        Register or refresh a client that polls instead of holding a connection
+        open (HLS). It is removed once it has made no request for the HLS
+        client timeout.
+        """
+        with self.lock:
+            known = client_id in self.request_clients
+            self.request_clients[client_id] = time.time()
+        if not known:
+            self.add_client(client_id, client_ip, user_agent)
+
     def remove_client(self, client_id):
         """Remove a client from this channel and Redis"""
         client_ip = None
@@ -308,6 +331,10 @@ class ClientManager:
             if client_id in self.last_heartbeat_time:
                 del self.last_heartbeat_time[client_id]
 
+            if self.request_clients.pop(client_id, None) is not None:
+                # A polling client that comes back registers again
+                self._registered_clients.discard(client_id)
+
             self.last_active_time = time.time()
 
             if self.redis_client:
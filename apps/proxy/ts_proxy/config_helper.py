@@ -56,6 +56,121 @@ class ConfigHelper:
         """Get Redis chunk TTL in seconds"""
         return Config.get_redis_chunk_ttl()
 
+    @staticmethod
+    def local_chunk_cache_bytes():
+        """Get the byte budget of the per-worker chunk ring for each channel"""
+        return ConfigHelper.get('LOCAL_CHUNK_CACHE_BYTES', 8 * 1024 * 1024)
+
+    @staticmethod
+    def control_refresh_interval():
+        """Get how often each worker re-reads channel/client stop signals from Redis"""
+        return ConfigHelper.get('CONTROL_REFRESH_INTERVAL', 1.0)
+
+    @staticmethod
+    def client_stats_flush_interval():
+        """Get how often each worker writes queued client stats to Redis"""
+        return ConfigHelper.get('CLIENT_STATS_FLUSH_INTERVAL', 2.0)
+
+    @staticmethod
+    def liveness_update_interval():
+        """Get the minimum seconds between upstream last_data writes for a channel"""
+        return ConfigHelper.get('LIVENESS_UPDATE_INTERVAL', 5)
+
+    @staticmethod
+    def http_direct_ingest():
+        """Whether non-transcoded HTTP streams are read directly instead of through a pipe"""
+        return ConfigHelper.get('HTTP_DIRECT_INGEST', True)
+
+    @staticmethod
+    def http_read_size():
+        """Get the maximum bytes per direct upstream HTTP read"""
+        return ConfigHelper.get('HTTP_READ_SIZE', 128 * 1024)
+
+    @staticmethod
+    def keyframe_join():
+        """Whether new clients start on an indexed keyframe instead of a fixed chunk offset"""
+        return ConfigHelper.get('KEYFRAME_JOIN', True)
+
+    @staticmethod
+    def keyframe_join_seconds():
+        """Get how far behind live (in seconds) a keyframe join should start at least"""
+        return ConfigHelper.get('KEYFRAME_JOIN_SECONDS', 2.0)
+
+    @staticmethod
+    def keyframe_join_max_seconds():
+        """Get the age (in seconds) beyond which indexed keyframes aren't used for joins"""
+        return ConfigHelper.get('KEYFRAME_JOIN_MAX_SECONDS', 10.0)
+
+    @staticmethod
+    def ts_inspection():
+        """Whether buffered chunks are inspected for TS errors and bitrate"""
+        return ConfigHelper.get('TS_INSPECTION', True)
+
+    @staticmethod
+    def ts_stats_interval():
+        """Get seconds between writes of TS inspection stats"""
+        return ConfigHelper.get('TS_STATS_INTERVAL', 5)
+
+    @staticmethod
+    def ts_corruption_threshold():
+        """Get the fraction of errored packets at which a chunk counts as corrupt"""
+        return ConfigHelper.get('TS_CORRUPTION_THRESHOLD', 0.05)
+
+    @staticmethod
+    def ts_corruption_timeout():
+        """Get seconds of continuous corruption before switching streams (0 disables)"""
+        return ConfigHelper.get('TS_CORRUPTION_TIMEOUT', 10)
+
+    @staticmethod
+    def hot_standby_probe_timeout():
+        """Get seconds without data after which a hot standby connection is reopened"""
+        return ConfigHelper.get('HOT_STANDBY_PROBE_TIMEOUT', 10)
+
+    @staticmethod
+    def hot_standby_retry_interval():
+        """Get seconds between attempts to open a hot standby connection"""
+        return ConfigHelper.get('HOT_STANDBY_RETRY_INTERVAL', 30)
+
+    @staticmethod
+    def hot_standby_tail_bytes():
+        """Get the max bytes of standby data kept for splicing"""
+        return ConfigHelper.get('HOT_STANDBY_TAIL_BYTES', 8 * 1024 * 1024)
+
+    @staticmethod
+    def hot_standby_handoff_timeout():
+        """Get the max seconds to wait for a hot standby handoff"""
+        return ConfigHelper.get('HOT_STANDBY_HANDOFF_TIMEOUT', 1.0)
+
+    @staticmethod
+    def hls_output():
+        """Whether the buffer is cut into HLS segments for the HLS endpoints"""
+        return ConfigHelper.get('HLS_OUTPUT', True)
+
+    @staticmethod
+    def hls_segment_seconds():
+        """Get the minimum HLS segment duration in seconds"""
+        return ConfigHelper.get('HLS_SEGMENT_SECONDS', 4.0)
+
+    @staticmethod
+    def hls_playlist_segments():
+        """Get the number of segments in the rolling HLS playlist"""
+        return ConfigHelper.get('HLS_PLAYLIST_SEGMENTS', 6)
+
+    @staticmethod
+    def hls_client_timeout():
+        """Get seconds without a playlist request after which an HLS client is dropped"""
+        return ConfigHelper.get('HLS_CLIENT_TIMEOUT', 20)
+
+    @staticmethod
+    def hls_native_ingest():
+        """Whether MPEG-TS HLS upstreams are fetched in process instead of through FFmpeg"""
+        return ConfigHelper.get('HLS_NATIVE_INGEST', True)
+
+    @staticmethod
+    def hls_ingest_live_segments():
+        """Get how many segments back from the live edge a native HLS upstream starts"""
+        return ConfigHelper.get('HLS_INGEST_LIVE_SEGMENTS', 3)
+
     @staticmethod
     def chunk_size():
         """Get chunk size in bytes"""
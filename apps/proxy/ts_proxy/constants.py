@@ -63,6 +63,7 @@ class ChannelMetadataField:
     # Stream switching
     STREAM_SWITCH_TIME = "stream_switch_time"
     STREAM_SWITCH_REASON = "stream_switch_reason"
+    STANDBY_STREAM_ID = "standby_stream_id"
 
     # FFmpeg performance metrics
     FFMPEG_SPEED = "ffmpeg_speed"
@@ -71,6 +72,16 @@ class ChannelMetadataField:
     FFMPEG_OUTPUT_BITRATE = "ffmpeg_output_bitrate"
     FFMPEG_STATS_UPDATED = "ffmpeg_stats_updated"
 
+    # TS packet inspection of buffered chunks (last reporting window)
+    TS_BITRATE = "ts_bitrate"
+    TS_PID_BITRATES = "ts_pid_bitrates"
+    TS_SYNC_ERRORS = "ts_sync_errors"
+    TS_TRANSPORT_ERRORS = "ts_transport_errors"
+    TS_CC_ERRORS = "ts_cc_errors"
+    TS_PCR_DISCONTINUITIES = "ts_pcr_discontinuities"
+    TS_ERROR_RATIO = "ts_error_ratio"
+    TS_STATS_UPDATED = "ts_stats_updated"
+
     # Video stream info
     VIDEO_CODEC = "video_codec"
     RESOLUTION = "resolution"
@@ -0,0 +1,159 @@
+"""
+Per-worker cache of channel/client control signals and batched client stats.
+
+Every StreamGenerator used to ask Redis on each loop whether its channel or
+client had been stopped, and wrote its transfer stats after every chunk.
+ControlPlane answers those questions for all local clients of a channel from
+one pipelined refresh per interval, is updated immediately by the stop events
+arriving on ts_proxy:events:*, and writes client stats for the whole worker in
+one pipeline per flush interval.
+"""
+
+import threading
+import time
+
+from .config_helper import ConfigHelper
+from .constants import ChannelMetadataField
+from .redis_keys import RedisKeys
+from .utils import get_logger
+
+logger = get_logger()
+
+STOPPED_STATES = ('error', 'stopped', 'stopping')
+
+
+class ChannelControlState:
+    """What this worker last learned about a channel's stop signals"""
+
+    def __init__(self):
+        self.checked_at = 0
+        self.stopping = False
+        self.state = None
+        self.stopped_clients = set()
+
+
+class ControlPlane:
+    def __init__(self, proxy_server):
+        self.proxy_server = proxy_server
+        self.refresh_interval = ConfigHelper.control_refresh_interval()
+        self.stats_flush_interval = ConfigHelper.client_stats_flush_interval()
+        self.lock = threading.Lock()
+        self._channels = {}
+        self._pending_stats = {}  # (channel_id, client_id) -> stats mapping
+        self._last_flush = time.time()
+
+    def _channel(self, channel_id):
+        with self.lock:
+            entry = self._channels.get(channel_id)
+            if entry is None:
+                entry = self._channels[channel_id] = ChannelControlState()
+            return entry
+
+    # Signals pushed by the event listener
+
+    def mark_channel_stopping(self, channel_id):
+        self._channel(channel_id).stopping = True
+
+    def mark_client_stopped(self, channel_id, client_id):
+        self._channel(channel_id).stopped_clients.add(client_id)
+
+    def forget_channel(self, channel_id):
+        """Drop cached state once the channel's local resources are gone"""
+        with self.lock:
+            self._channels.pop(channel_id, None)
+            for key in [key for key in self._pending_stats if key[0] == channel_id]:
+                del self._pending_stats[key]
+
+    def forget_client(self, channel_id, client_id):
+        with self.lock:
+            self._pending_stats.pop((channel_id, client_id), None)
+            entry = self._channels.get(channel_id)
+        if entry:
+            entry.stopped_clients.discard(client_id)
+
+    # Checks made by stream generators
+
+    def stop_reason(self, channel_id, client_id):
+        """
+        Return why the client's stream should end ('channel_stopping',
+        'channel_state:<state>' or 'client_stop'), or None to keep streaming.
+        """
+        entry = self._channel(channel_id)
+        now = time.time()
+        if now - entry.checked_at >= self.refresh_interval:
+            # Claim the refresh so concurrent clients keep using the cached answer
+            entry.checked_at = now
+            self._refresh(channel_id, entry)
+
+        if entry.stopping:
+            return 'channel_stopping'
+        if entry.state in STOPPED_STATES:
+            return f'channel_state:{entry.state}'
+        if client_id in entry.stopped_clients:
+            return 'client_stop'
+        return None
+
+    def _refresh(self, channel_id, entry):
+        """Read the channel's stop flag, state and local clients' stop keys in one round trip"""
+        redis_client = self.proxy_server.redis_client
+        if not redis_client:
+            return
+
+        client_manager = self.proxy_server.client_managers.get(channel_id)
+        client_ids = list(client_manager.clients) if client_manager else []
+
+        try:
+            pipe = redis_client.pipeline()
+            pipe.exists(RedisKeys.channel_stopping(channel_id))
+            pipe.hget(RedisKeys.channel_metadata(channel_id), ChannelMetadataField.STATE)
+            for client_id in client_ids:
+                pipe.exists(RedisKeys.client_stop(channel_id, client_id))
+            results = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to refresh control state for channel {channel_id}: {e}")
+            return
+
+        # Stop events are always backed by these keys, so Redis is authoritative here
+        stopping, state = results[0], results[1]
+        entry.stopping = bool(stopping)
+        entry.state = state.decode('utf-8') if state else None
+        entry.stopped_clients = {
+            client_id for client_id, stopped in zip(client_ids, results[2:]) if stopped
+        }
+
+    # Client stats
+
+    def record_client_stats(self, channel_id, client_id, stats):
+        """Queue the latest stats of a client; they're written on the next flush"""
+        with self.lock:
+            self._pending_stats[(channel_id, client_id)] = stats
+
+    def flush_client_stats(self, force=False):
+        """Write queued client stats in one pipeline if the flush interval has passed"""
+        now = time.time()
+        with self.lock:
+            if not self._pending_stats or (not force and now - self._last_flush < self.stats_flush_interval):
+                return 0
+            pending, self._pending_stats = self._pending_stats, {}
+            self._last_flush = now
+
+        redis_client = self.proxy_server.redis_client
+        if not redis_client:
+            return 0
+
+        written = 0
+        try:
+            pipe = redis_client.pipeline()
+            for (channel_id, client_id), stats in pending.items():
+                # Don't resurrect the metadata of clients that have since disconnected
+                client_manager = self.proxy_server.client_managers.get(channel_id)
+                if not client_manager or client_id not in client_manager.clients:
+                    continue
+                pipe.hset(RedisKeys.client_metadata(channel_id, client_id), mapping=stats)
+                written += 1
+            if written:
+                pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to store client stats in Redis: {e}")
+            return 0
+        return written
@@ -0,0 +1,235 @@
+"""
+Native HLS ingestion for the TS proxy.
+
+HLSStreamConnection follows a live HLS playlist and hands its MPEG-TS segments
+to the stream manager through the same read_chunk() interface as
+HTTPStreamConnection, so HLS upstreams don't need an FFmpeg process. The
+playlist and the segments are fetched over one pooled keep-alive session.
+Sources whose segments can't be passed through as they are (fMP4 or encrypted)
+are reported as unsupported and left to FFmpeg.
+"""
+
+import threading
+import time
+from collections import deque
+
+import m3u8
+import requests
+from requests.adapters import HTTPAdapter
+
+from .http_streamer import UPSTREAM_READ_TIMEOUT
+from .utils import get_logger
+
+logger = get_logger()
+
+TS_SYNC_BYTE = b'\x47'
+MIN_PLAYLIST_INTERVAL = 0.5  # Never poll the playlist more often than this, whatever the target duration
+
+
+class HLSStreamConnection:
+    """Live HLS upstream of MPEG-TS segments, read in place by the stream manager"""
+
+    def __init__(self, url, user_agent=None, read_size=131072, read_timeout=UPSTREAM_READ_TIMEOUT, live_segments=3):
+        self.url = url
+        self.user_agent = user_agent
+        self.read_size = read_size
+        self.read_timeout = read_timeout
+        self.live_segments = live_segments
+        self.session = None
+        self.playlist_url = None  # Media playlist actually followed, after variant selection and redirects
+        self.target_duration = 2.0
+        self.next_sequence = None
+        self.ended = False
+        self.segments_read = 0
+        # Set when the data returned by the last read_chunk() starts a new timeline; the reader clears it
+        self.discontinuity = False
+        # Why the source has to go through FFmpeg instead, when connect() fails because of it
+        self.unsupported = None
+
+        self._queue = deque()  # (media sequence, segment) listed but not downloaded yet
+        self._gap = False  # Segments were skipped or failed since the last one read
+        self._data = b''
+        self._offset = 0
+        self._last_refresh = 0
+        self._closed = threading.Event()
+
+    def connect(self):
+        """Load the playlist and the first segment, returning True once MPEG-TS data is ready"""
+        logger.info(f"HLS reader connecting to {self.url}")
+        self.session = requests.Session()
+        # One connection reused for the playlist and every segment
+        adapter = HTTPAdapter(max_retries=0, pool_connections=1, pool_maxsize=2)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if self.user_agent:
+            self.session.headers['User-Agent'] = self.user_agent
+
+        try:
+            playlist = self._load_playlist(self.url)
+            if playlist.is_variant:
+                if not playlist.playlists:
+                    logger.error(f"HLS master playlist {self.url} lists no variants")
+                    self.close()
+                    return False
+                variant = max(playlist.playlists, key=lambda p: p.stream_info.bandwidth or 0)
+                logger.info(f"HLS reader using variant {variant.absolute_uri} ({variant.stream_info.bandwidth} bps)")
+                playlist = self._load_playlist(variant.absolute_uri)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"HLS reader playlist error: {e}")
+            self.close()
+            return False
+
+        self.unsupported = self._unsupported_reason(playlist)
+        if self.unsupported:
+            logger.info(f"HLS upstream {self.url} has {self.unsupported}, not ingesting it natively")
+            self.close()
+            return False
+        if not playlist.segments:
+            logger.error(f"HLS playlist {self.playlist_url} lists no segments")
+            self.close()
+            return False
+
+        self._update(playlist)
+        if not self._advance():
+            self.close()
+            return False
+
+        logger.info(f"HLS reader connected, starting at media sequence {self.next_sequence - 1}")
+        return True
+
+    def read_chunk(self):
+        """
+        Return the next block of stream data, up to read_size bytes, or b'' once
+        the playlist has ended or no new segment arrived for read_timeout.
+        """
+        while not self._closed.is_set():
+            if self._offset < len(self._data):
+                piece = self._data[self._offset:self._offset + self.read_size]
+                self._offset += len(piece)
+                return piece
+            if not self._advance():
+                return b''
+        return b''
+
+    def close(self):
+        # Set first: wakes a read waiting for the next playlist refresh
+        self._closed.set()
+        if self.session is not None:
+            try:
+                self.session.close()
+            except Exception:
+                pass
+            self.session = None
+
+    def _load_playlist(self, url):
+        response = self.session.get(url, timeout=(5, self.read_timeout))
+        try:
+            response.raise_for_status()
+            self.playlist_url = response.url
+            return m3u8.loads(response.text, uri=response.url)
+        finally:
+            response.close()
+
+    @staticmethod
+    def _unsupported_reason(playlist):
+        if playlist.is_variant:
+            return None
+        if playlist.segment_map or any(segment.init_section for segment in playlist.segments):
+            return "fMP4 segments"
+        if any(key and key.method and key.method.upper() != 'NONE' for key in playlist.keys):
+            return "encrypted segments"
+        return None
+
+    def _update(self, playlist):
+        """Queue the segments of a freshly loaded playlist that haven't been read yet"""
+        self.target_duration = playlist.target_duration or self.target_duration
+        self.ended = playlist.is_endlist
+        first = playlist.media_sequence or 0
+        count = len(playlist.segments)
+        last = first + count - 1
+
+        if self.next_sequence is None:
+            # Join a live stream near its edge, a finished one from the start
+            self.next_sequence = first if self.ended else max(first, last + 1 - self.live_segments)
+        elif self.next_sequence < first:
+            logger.warning(f"HLS reader fell behind: segments {self.next_sequence}-{first - 1} left the playlist")
+            self._gap = True
+            self.next_sequence = first
+        elif last + 1 + count < self.next_sequence:
+            # Far behind what was already read: the upstream restarted its numbering
+            logger.info(f"HLS media sequence restarted at {first} (expected {self.next_sequence})")
+            self._gap = True
+            self.next_sequence = max(first, last + 1 - self.live_segments)
+
+        self._queue = deque(
+            (sequence, segment)
+            for sequence, segment in enumerate(playlist.segments, start=first)
+            if sequence >= self.next_sequence
+        )
+
+    def _advance(self):
+        """Download the next segment into the read buffer; False once the stream ended, stalled or was closed"""
+        deadline = time.time() + self.read_timeout
+        while not self._closed.is_set():
+            if self._queue:
+                sequence, segment = self._queue.popleft()
+                self.next_sequence = sequence + 1
+                data = self._download(segment)
+                if data is None:
+                    self._gap = True
+                    continue
+                if not data.startswith(TS_SYNC_BYTE):
+                    if self.segments_read == 0:
+                        self.unsupported = "segments that aren't MPEG-TS"
+                        logger.info(f"HLS upstream {self.url} has {self.unsupported}, not ingesting it natively")
+                        return False
+                    logger.warning(f"HLS segment {sequence} isn't MPEG-TS, skipping it")
+                    self._gap = True
+                    continue
+
+                # The first segment starts the stream, it doesn't interrupt it
+                self.discontinuity = self.segments_read > 0 and (segment.discontinuity or self._gap)
+                self._gap = False
+                self._data = data
+                self._offset = 0
+                self.segments_read += 1
+                return True
+
+            if self.ended:
+                logger.info(f"HLS playlist {self.playlist_url} ended")
+                return False
+            if time.time() > deadline:
+                logger.warning(f"No new HLS segment from {self.playlist_url} for {self.read_timeout}s")
+                return False
+
+            wait = self._last_refresh + max(self.target_duration / 2, MIN_PLAYLIST_INTERVAL) - time.time()
+            if wait > 0 and self._closed.wait(wait):
+                return False
+            self._refresh()
+        return False
+
+    def _refresh(self):
+        self._last_refresh = time.time()
+        try:
+            self._update(self._load_playlist(self.playlist_url))
+        except requests.exceptions.RequestException as e:
+            # Retried on the next poll until read_timeout passes without a segment
+            logger.warning(f"HLS playlist refresh failed: {e}")
+        except Exception as e:
+            if not self._closed.is_set():
+                logger.warning(f"HLS playlist refresh error: {e}")
+
+    def _download(self, segment):
+        try:
+            response = self.session.get(segment.absolute_uri, timeout=(5, self.read_timeout))
+            try:
+                if response.status_code != 200:
+                    logger.warning(f"HTTP {response.status_code} for HLS segment {segment.absolute_uri}")
+                    return None
+                return response.content
+            finally:
+                response.close()
+        except Exception as e:
+            if not self._closed.is_set():
+                logger.warning(f"HLS segment {segment.absolute_uri} failed: {e}")
+            return None
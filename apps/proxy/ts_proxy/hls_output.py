@@ -0,0 +1,228 @@
+"""
+HLS output cut from the TS proxy buffer.
+
+The worker that stores a channel's chunks closes an HLS segment at the first
+indexed keyframe at least HLS_SEGMENT_SECONDS after the keyframe the segment
+started on. Each segment is recorded in Redis as a byte range over buffer
+chunks, together with the PAT/PMT to put in front of it. Any worker can then
+build the rolling playlist and assemble segments from the chunks, so one
+upstream connection feeds both TS and HLS clients.
+
+Recorded segments never change, and their URIs carry the segment's start time,
+so a media sequence reused after a channel restart gets a new URI. Segments can
+therefore be cached by a CDN or reverse proxy.
+"""
+
+import math
+import time
+from collections import namedtuple
+
+from .config_helper import ConfigHelper
+from .redis_keys import RedisKeys
+from .utils import get_logger
+
+logger = get_logger()
+
+PTS_WRAP = 1 << 33
+PTS_HZ = 90000
+MAX_SEGMENT_SECONDS = 60  # Longer PTS gaps are timestamp jumps, not segment durations
+
+
+class HLSSegment(namedtuple('HLSSegment', [
+    'sequence', 'start_index', 'start_offset', 'end_index', 'end_offset',
+    'duration', 'discontinuity', 'discontinuity_sequence', 'started_at_ms',
+])):
+    """A recorded segment: from start_offset in chunk start_index up to end_offset in chunk end_index"""
+
+    __slots__ = ()
+
+    def to_entry(self):
+        return (
+            f"{self.start_index}:{self.start_offset}:{self.end_index}:{self.end_offset}:"
+            f"{self.duration:.3f}:{int(self.discontinuity)}:{self.discontinuity_sequence}:{self.started_at_ms}"
+        )
+
+    @classmethod
+    def from_entry(cls, sequence, entry):
+        if isinstance(entry, bytes):
+            entry = entry.decode('utf-8')
+        fields = entry.split(':')
+        return cls(
+            int(sequence), int(fields[0]), int(fields[1]), int(fields[2]), int(fields[3]),
+            float(fields[4]), fields[5] == '1', int(fields[6]), int(fields[7]),
+        )
+
+    @property
+    def uri(self):
+        return f"segments/{self.sequence}-{self.started_at_ms}.ts"
+
+
+class HLSSegmenter:
+    """
+    Records HLS segments as the owner stores chunks. StreamBuffer feeds it every
+    indexed keyframe, with the PTS and the PAT/PMT in effect, under its lock.
+    """
+
+    def __init__(self, channel_id, redis_client, chunk_ttl):
+        self.channel_id = channel_id
+        self.redis_client = redis_client
+        self.chunk_ttl = chunk_ttl
+        self.target_duration = ConfigHelper.hls_segment_seconds()
+        # Enough segments for the playlist and for everything whose chunks still exist
+        self.history = max(
+            ConfigHelper.hls_playlist_segments() * 2,
+            int(chunk_ttl / self.target_duration) + 1,
+        )
+
+        self.segments_key = RedisKeys.hls_segments(channel_id)
+        self.psi_key = RedisKeys.hls_segment_psi(channel_id)
+        self.sequence_key = RedisKeys.hls_sequence(channel_id)
+
+        # (chunk index, offset, pts, stored at, psi) of the keyframe the open segment starts on
+        self.start = None
+        self.discontinuity = False
+        self.sequence = None  # Next media sequence, loaded from Redis on first use
+        self.discontinuity_sequence = 0
+
+    def reset(self):
+        """The stream changed (new PAT/PMT or a splice): drop the open segment and flag the next one"""
+        self.start = None
+        self.discontinuity = True
+
+    def add_keyframe(self, chunk_index, offset, pts, psi, now):
+        """Close the open segment here if it is long enough, and start the next one"""
+        if self.start is None:
+            self.start = (chunk_index, offset, pts, now, psi)
+            return
+
+        start_index, start_offset, start_pts, started_at, start_psi = self.start
+        duration = now - started_at
+        if pts is not None and start_pts is not None:
+            duration = ((pts - start_pts) % PTS_WRAP) / PTS_HZ
+            if not 0 < duration <= MAX_SEGMENT_SECONDS:
+                # Timestamps jumped: the upstream changed without new PAT/PMT
+                self.reset()
+                self.start = (chunk_index, offset, pts, now, psi)
+                return
+
+        if duration < self.target_duration:
+            return
+
+        self._record(start_index, start_offset, chunk_index, offset, duration, started_at, start_psi)
+        self.start = (chunk_index, offset, pts, now, psi)
+
+    def _record(self, start_index, start_offset, end_index, end_offset, duration, started_at, psi):
+        if self.sequence is None:
+            self._load_sequence()
+
+        if self.discontinuity:
+            self.discontinuity_sequence += 1
+        segment = HLSSegment(
+            self.sequence, start_index, start_offset, end_index, end_offset,
+            duration, self.discontinuity, self.discontinuity_sequence, int(started_at * 1000),
+        )
+
+        pipe = self.redis_client.pipeline()
+        pipe.hset(self.segments_key, segment.sequence, segment.to_entry())
+        pipe.hset(self.psi_key, segment.sequence, psi)
+        pipe.set(self.sequence_key, segment.sequence + 1, ex=self.chunk_ttl)
+        expired = segment.sequence - self.history
+        if expired >= 0:
+            pipe.hdel(self.segments_key, expired)
+            pipe.hdel(self.psi_key, expired)
+        pipe.expire(self.segments_key, self.chunk_ttl)
+        pipe.expire(self.psi_key, self.chunk_ttl)
+        pipe.execute()
+
+        logger.debug(
+            f"HLS segment {segment.sequence} for channel {self.channel_id}: chunks "
+            f"{start_index}-{end_index}, {duration:.3f}s"
+        )
+        self.sequence += 1
+        self.discontinuity = False
+
+    def _load_sequence(self):
+        """Continue the numbering of an earlier owner of the channel, if there was one"""
+        self.sequence = int(self.redis_client.get(self.sequence_key) or 0)
+        if self.sequence == 0:
+            # Nothing before the first segment to be discontinuous with
+            self.discontinuity = False
+            return
+        previous = self.redis_client.hget(self.segments_key, self.sequence - 1)
+        if previous:
+            self.discontinuity_sequence = HLSSegment.from_entry(self.sequence - 1, previous).discontinuity_sequence
+
+
+def get_segments(redis_client, channel_id):
+    """Recorded segments of a channel in media sequence order"""
+    entries = redis_client.hgetall(RedisKeys.hls_segments(channel_id))
+    return sorted(
+        (HLSSegment.from_entry(sequence, entry) for sequence, entry in entries.items()),
+        key=lambda segment: segment.sequence,
+    )
+
+
+def build_playlist(redis_client, channel_id, now=None):
+    """
+    The rolling live playlist of a channel, or None while no segment is ready.
+    Segments are listed while their chunks are at most half the chunk TTL old,
+    so clients have time to fetch them.
+    """
+    now = time.time() if now is None else now
+    oldest = (now - ConfigHelper.redis_chunk_ttl() / 2) * 1000
+    segments = [segment for segment in get_segments(redis_client, channel_id) if segment.started_at_ms >= oldest]
+    segments = segments[-ConfigHelper.hls_playlist_segments():]
+    if not segments:
+        return None
+
+    first = segments[0]
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:3',
+        f'#EXT-X-TARGETDURATION:{math.ceil(max(segment.duration for segment in segments))}',
+        f'#EXT-X-MEDIA-SEQUENCE:{first.sequence}',
+        f'#EXT-X-DISCONTINUITY-SEQUENCE:{first.discontinuity_sequence - int(first.discontinuity)}',
+    ]
+    for segment in segments:
+        if segment.discontinuity:
+            lines.append('#EXT-X-DISCONTINUITY')
+        lines.append(f'#EXTINF:{segment.duration:.3f},')
+        lines.append(segment.uri)
+    return '\n'.join(lines) + '\n'
+
+
+def read_segment(redis_client, channel_id, sequence, started_at_ms, buffer=None):
+    """
+    Assemble a segment from the buffer: its PAT/PMT, then the chunk bytes from
+    its start keyframe up to the next segment's. None if the segment is unknown
+    or its chunks have expired. Chunks come through this worker's StreamBuffer
+    for the channel when there is one (sharing its chunk cache with the TS
+    clients), otherwise straight from Redis.
+    """
+    pipe = redis_client.pipeline()
+    pipe.hget(RedisKeys.hls_segments(channel_id), sequence)
+    pipe.hget(RedisKeys.hls_segment_psi(channel_id), sequence)
+    entry, psi = pipe.execute()
+    if not entry or psi is None:
+        return None
+    segment = HLSSegment.from_entry(sequence, entry)
+    if segment.started_at_ms != started_at_ms:
+        # A segment of an earlier run of the channel
+        return None
+
+    count = segment.end_index - segment.start_index + 1
+    if buffer is not None:
+        chunks = buffer.get_chunks_exact(segment.start_index - 1, count)
+    else:
+        pipe = redis_client.pipeline()
+        for index in range(segment.start_index, segment.end_index + 1):
+            pipe.get(RedisKeys.buffer_chunk(channel_id, index))
+        chunks = [chunk for chunk in pipe.execute() if chunk is not None]
+    if len(chunks) != count:
+        return None
+
+    if count == 1:
+        body = [chunks[0][segment.start_offset:segment.end_offset]]
+    else:
+        body = [chunks[0][segment.start_offset:], *chunks[1:-1], chunks[-1][:segment.end_offset]]
+    return b''.join([psi, *body])
@@ -0,0 +1,347 @@
+"""
+Hot-standby upstream connection for fast failover of priority channels.
+
+For channels with hot_standby enabled, the stream manager keeps a second
+connection open to the next stream in the channel's order. It reads that
+connection continuously, so the provider doesn't time it out, and keeps only
+the data since the last keyframe. When the active stream fails, the standby is
+handed to the stream manager and spliced into the buffer. There is no connect
+and no initial buffering in between.
+
+The standby holds a slot of its M3U profile's max_streams for as long as it is
+open, using the same profile_connections counters as Channel.get_stream().
+"""
+
+import threading
+import time
+
+from django.db import connection as db_connection
+
+from apps.m3u.models import M3UAccountProfile
+from core.utils import RedisClient
+from .config_helper import ConfigHelper
+from .constants import TS_PACKET_SIZE, ChannelMetadataField, StreamType
+from .http_streamer import HTTPStreamConnection, direct_read_supported
+from .redis_keys import RedisKeys
+from .ts_index import TSIndexer
+from .url_utils import get_alternate_streams, get_stream_info_for_switch
+from .utils import detect_stream_type, get_logger
+
+logger = get_logger()
+
+
+class StandbyHandoff:
+    """A warm standby connection taken over by the stream manager"""
+
+    def __init__(self, connection, stream_id, profile_id, url, user_agent, stream_profile, prefix, reserved):
+        self.connection = connection
+        self.stream_id = stream_id
+        self.profile_id = profile_id
+        self.url = url
+        self.user_agent = user_agent
+        self.stream_profile = stream_profile
+        # PAT/PMT and the data since the last keyframe, to start the splice with
+        self.prefix = prefix
+        self.reserved = reserved
+
+    def release_reservation(self):
+        """
+        Drop the profile slot the standby held. Call it once the channel's own
+        count has moved to this profile (Channel.update_stream_profile), so the
+        profile is never under-counted in between.
+        """
+        if not self.reserved:
+            return
+        self.reserved = False
+        redis_client = RedisClient.get_client()
+        key = f"profile_connections:{self.profile_id}"
+        if int(redis_client.get(key) or 0) > 0:
+            redis_client.decr(key)
+
+
+class HotStandby:
+    def __init__(self, stream_manager):
+        self.manager = stream_manager
+        self.channel_id = stream_manager.channel_id
+        self.probe_timeout = ConfigHelper.hot_standby_probe_timeout()
+        self.retry_interval = ConfigHelper.hot_standby_retry_interval()
+        self.tail_limit = ConfigHelper.hot_standby_tail_bytes()
+
+        self.running = False
+        self.thread = None
+
+        # The standby stream, while one is reserved
+        self.connection = None
+        self.stream_info = None
+        self.profile_id = None
+        self._reserved = False
+        self._failed_stream_ids = {}  # stream_id -> time of the last failed attempt
+
+        # Data since the last keyframe, kept packet-aligned
+        self._indexer = TSIndexer()
+        self._tail = bytearray()
+        self._pending = b''
+        self._has_keyframe = False
+        self.last_data_time = 0
+
+        self._handoff_lock = threading.Lock()
+        self._handoff_requested = threading.Event()
+        self._handoff_done = threading.Event()
+        self._handoff = None
+
+    @staticmethod
+    def supported():
+        return direct_read_supported()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        logger.info(f"Hot standby started for channel {self.channel_id}")
+
+    def stop(self):
+        self.running = False
+        # Closing interrupts a blocked read; the thread releases the reservation on its way out
+        conn = self.connection
+        if conn is not None:
+            conn.close()
+
+    def is_ready(self):
+        """Whether a standby connection is open and has delivered data recently"""
+        return (
+            self.running and self.connection is not None and
+            time.time() - self.last_data_time < self.probe_timeout
+        )
+
+    def take_over(self, timeout):
+        """
+        Hand the standby connection to the caller, or return None if it isn't ready.
+        The standby thread completes the handoff after its current read, so the
+        connection is never read by two threads.
+        """
+        if not self.is_ready():
+            return None
+        self._handoff_done.clear()
+        self._handoff_requested.set()
+        self._handoff_done.wait(timeout)
+        with self._handoff_lock:
+            self._handoff_requested.clear()
+            handoff, self._handoff = self._handoff, None
+        if handoff is None:
+            logger.warning(f"Hot standby for channel {self.channel_id} did not hand over within {timeout}s")
+        return handoff
+
+    # Standby thread
+
+    def _run(self):
+        try:
+            while self.running and self.manager.running:
+                if self.connection is not None and self._handoff_requested.is_set():
+                    if self._complete_handoff():
+                        return
+                    continue
+
+                if self.connection is None:
+                    if not self.manager.connected or self.manager.url_switching:
+                        # Never compete with the active stream while it is (re)connecting
+                        time.sleep(1)
+                        continue
+                    if not self._open():
+                        self._wait(self.retry_interval)
+                        continue
+
+                if self.stream_info['stream_id'] == self.manager.current_stream_id:
+                    # The channel moved to our stream by other means
+                    self._close(release=True)
+                    continue
+
+                if not self._read():
+                    self._failed_stream_ids[self.stream_info['stream_id']] = time.time()
+                    self._close(release=True)
+                    self._wait(self.retry_interval)
+        except Exception as e:
+            logger.error(f"Hot standby error for channel {self.channel_id}: {e}", exc_info=True)
+        finally:
+            self._close(release=True)
+            try:
+                db_connection.close()
+            except Exception:
+                pass
+
+    def _wait(self, seconds):
+        deadline = time.time() + seconds
+        while self.running and self.manager.running and time.time() < deadline:
+            time.sleep(0.5)
+
+    def _open(self):
+        """Pick the next-best stream, reserve a profile slot for it and connect"""
+        stream_info = self._choose_stream()
+        if not stream_info:
+            return False
+
+        profile_id = stream_info['m3u_profile_id']
+        if not self._reserve(profile_id):
+            logger.info(f"No connection slot left on M3U profile {profile_id} for the hot standby of channel {self.channel_id}")
+            return False
+
+        conn = HTTPStreamConnection(
+            url=stream_info['url'],
+            user_agent=stream_info['user_agent'],
+            read_size=ConfigHelper.http_read_size(),
+            read_timeout=self.probe_timeout
+        )
+        self.stream_info = stream_info
+        self.profile_id = profile_id
+        if not conn.connect():
+            self._failed_stream_ids[stream_info['stream_id']] = time.time()
+            self._close(release=True)
+            return False
+
+        self.connection = conn
+        self.last_data_time = time.time()
+        self._set_standby_metadata(stream_info['stream_id'])
+        logger.info(f"Hot standby for channel {self.channel_id} connected to stream {stream_info['stream_id']}")
+        return True
+
+    def _choose_stream(self):
+        """First alternate stream (in channel order) that can be proxied without transcoding"""
+        now = time.time()
+        try:
+            for candidate in get_alternate_streams(self.channel_id, self.manager.current_stream_id):
+                stream_id = candidate['stream_id']
+                if now - self._failed_stream_ids.get(stream_id, 0) < self.retry_interval * 4:
+                    continue
+
+                stream_info = get_stream_info_for_switch(self.channel_id, stream_id)
+                if 'error' in stream_info or not stream_info.get('url'):
+                    continue
+                if stream_info['url'] == self.manager.url or stream_info['transcode']:
+                    # Transcoded output can't be spliced from a raw connection
+                    continue
+                if detect_stream_type(stream_info['url']) == StreamType.HLS:
+                    continue
+                return stream_info
+        finally:
+            try:
+                db_connection.close()
+            except Exception:
+                pass
+        return None
+
+    def _reserve(self, profile_id):
+        """Take a slot on the profile like Channel.get_stream() does, without exceeding max_streams"""
+        try:
+            max_streams = M3UAccountProfile.objects.get(id=profile_id).max_streams
+        except M3UAccountProfile.DoesNotExist:
+            return False
+        if max_streams == 0:
+            self._reserved = False
+            return True
+
+        redis_client = RedisClient.get_client()
+        key = f"profile_connections:{profile_id}"
+        if redis_client.incr(key) > max_streams:
+            redis_client.decr(key)
+            return False
+        self._reserved = True
+        return True
+
+    def _release(self):
+        if not self._reserved:
+            return
+        self._reserved = False
+        redis_client = RedisClient.get_client()
+        key = f"profile_connections:{self.profile_id}"
+        if int(redis_client.get(key) or 0) > 0:
+            redis_client.decr(key)
+
+    def _read(self):
+        """Read one block from the standby, keeping what a splice would need; False when it fails"""
+        try:
+            data = self.connection.read_chunk()
+        except OSError as e:
+            logger.warning(f"Hot standby stream for channel {self.channel_id} failed: {e}")
+            return False
+        if not data:
+            logger.warning(f"Hot standby stream for channel {self.channel_id} ended or stalled")
+            return False
+
+        self.last_data_time = time.time()
+        data = self._pending + data
+        aligned = len(data) - len(data) % TS_PACKET_SIZE
+        self._pending = data[aligned:]
+        if aligned:
+            self._keep_tail(data[:aligned])
+        return True
+
+    def _keep_tail(self, block):
+        keyframe_offset = self._indexer.scan(block)
+        if keyframe_offset is not None:
+            self._tail = bytearray(block[keyframe_offset:])
+            self._has_keyframe = True
+        else:
+            self._tail += block
+
+        if len(self._tail) > self.tail_limit:
+            # Keyframes too far apart (or not detected): keep the newest packets only
+            excess = len(self._tail) - self.tail_limit
+            excess += (-excess) % TS_PACKET_SIZE
+            del self._tail[:excess]
+            self._has_keyframe = False
+
+    def _complete_handoff(self):
+        """Pass the connection to take_over(); False if the request was withdrawn meanwhile"""
+        prefix = bytes(self._tail)
+        psi = self._indexer.psi
+        if self._has_keyframe and psi:
+            prefix = psi + prefix
+        # A trailing partial packet continues in the stream manager's next read
+        prefix += self._pending
+
+        info = self.stream_info
+        with self._handoff_lock:
+            if not self._handoff_requested.is_set():
+                return False
+            self._handoff = StandbyHandoff(
+                connection=self.connection,
+                stream_id=info['stream_id'],
+                profile_id=self.profile_id,
+                url=info['url'],
+                user_agent=info['user_agent'],
+                stream_profile=info['stream_profile'],
+                prefix=prefix,
+                reserved=self._reserved,
+            )
+            # The connection and its reservation belong to the stream manager now
+            self.connection = None
+            self.stream_info = None
+            self._reserved = False
+            self._handoff_requested.clear()
+            self.running = False
+        self._handoff_done.set()
+        return True
+
+    def _close(self, release):
+        conn, self.connection = self.connection, None
+        if conn is not None:
+            conn.close()
+        if release:
+            self._release()
+            if self.stream_info is not None:
+                self._set_standby_metadata(None)
+        self.stream_info = None
+        self._indexer = TSIndexer()
+        self._tail = bytearray()
+        self._pending = b''
+        self._has_keyframe = False
+
+    def _set_standby_metadata(self, stream_id):
+        try:
+            redis_client = RedisClient.get_client()
+            metadata_key = RedisKeys.channel_metadata(self.channel_id)
+            if stream_id is None:
+                redis_client.hdel(metadata_key, ChannelMetadataField.STANDBY_STREAM_ID)
+            else:
+                redis_client.hset(metadata_key, ChannelMetadataField.STANDBY_STREAM_ID, str(stream_id))
+        except Exception as e:
+            logger.debug(f"Could not update standby metadata for channel {self.channel_id}: {e}")
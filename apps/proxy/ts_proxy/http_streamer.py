@@ -1,16 +1,140 @@
 """
-HTTP Stream Reader - Thread-based HTTP stream reader that writes to a pipe.
-This allows us to use the same fetch_chunk() path for both transcode and HTTP streams.
+HTTP stream ingestion for non-transcoded streams.
+
+HTTPStreamConnection is read directly by the stream manager's thread, handing
+large upstream reads straight to the buffer. HTTPStreamReader is the fallback:
+a thread that copies the response into a pipe so fetch_chunk() can read it
+like transcode output.
 """
 
+import socket
 import threading
 import os
 import requests
+import urllib3
 from requests.adapters import HTTPAdapter
 from .utils import get_logger
 
 logger = get_logger()
 
+# Seconds without upstream data before an HTTP stream is considered dead
+UPSTREAM_READ_TIMEOUT = 30
+
+
+def direct_read_supported():
+    """Direct reads need urllib3's read1(), which returns whatever has arrived instead of blocking for a full read"""
+    return hasattr(urllib3.response.HTTPResponse, 'read1')
+
+
+def _open_stream(url, user_agent, read_timeout):
+    """Open a streaming GET to url on a dedicated session without retries"""
+    headers = {}
+    if user_agent:
+        headers['User-Agent'] = user_agent
+
+    session = requests.Session()
+
+    # Disable retries for faster failure detection
+    adapter = HTTPAdapter(max_retries=0, pool_connections=1, pool_maxsize=1)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    try:
+        response = session.get(url, headers=headers, stream=True, timeout=(5, read_timeout))
+    except Exception:
+        session.close()
+        raise
+    return session, response
+
+
+def _response_socket(raw):
+    """Best-effort lookup of the socket a urllib3 response reads from (None if it can't be found)"""
+    # http.client reads the body through a file object wrapping the socket
+    socket_io = getattr(getattr(getattr(raw, '_fp', None), 'fp', None), 'raw', None)
+    sock = getattr(socket_io, '_sock', None)
+    if sock is None:
+        sock = getattr(getattr(raw, 'connection', None), 'sock', None)
+    return sock
+
+
+class HTTPStreamConnection:
+    """Upstream HTTP stream read in place by the stream manager - no reader thread and no pipe"""
+
+    def __init__(self, url, user_agent=None, read_size=131072, read_timeout=UPSTREAM_READ_TIMEOUT):
+        self.url = url
+        self.user_agent = user_agent
+        self.read_size = read_size
+        self.read_timeout = read_timeout
+        self.session = None
+        self.response = None
+        self._sock = None
+        self._closed = False
+
+    def connect(self):
+        """Open the upstream connection, returning True once a 200 response is streaming"""
+        logger.info(f"HTTP direct reader connecting to {self.url}")
+        try:
+            self.session, self.response = _open_stream(self.url, self.user_agent, self.read_timeout)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"HTTP direct reader request error: {e}")
+            return False
+
+        if self.response.status_code != 200:
+            logger.error(f"HTTP {self.response.status_code} from {self.url}")
+            self.close()
+            return False
+
+        # Kept so close() from another thread can interrupt a blocked read
+        self._sock = _response_socket(self.response.raw)
+        logger.info(f"HTTP direct reader connected successfully, streaming data...")
+        return True
+
+    def read_chunk(self):
+        """
+        Return the next block of stream data, up to read_size bytes as soon as any
+        has arrived, or b'' once the stream has ended or stalled for read_timeout.
+        Raises OSError when the connection breaks.
+        """
+        response = self.response
+        if response is None:
+            return b''
+        try:
+            return response.raw.read1(self.read_size, decode_content=True)
+        except urllib3.exceptions.ReadTimeoutError:
+            # urllib3 drops the connection on a read timeout, so treat it as end of stream
+            logger.warning(f"No data from {self.url} for {self.read_timeout}s, closing connection")
+            self.close()
+            return b''
+        except Exception as e:
+            if self._closed:
+                # Closed from another thread while the read was blocked
+                return b''
+            if isinstance(e, (urllib3.exceptions.HTTPError, requests.exceptions.RequestException)):
+                raise OSError(f"HTTP stream error: {e}")
+            raise
+
+    def close(self):
+        # Set first: shutting the socket down wakes a blocked read before the rest is torn down
+        self._closed = True
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock = None
+        if self.response is not None:
+            try:
+                self.response.close()
+            except Exception:
+                pass
+            self.response = None
+        if self.session is not None:
+            try:
+                self.session.close()
+            except Exception:
+                pass
+            self.session = None
+
 
 class HTTPStreamReader:
     """Thread-based HTTP stream reader that writes to a pipe"""
@@ -42,28 +166,10 @@ class HTTPStreamReader:
     def _read_stream(self):
         """Thread worker that reads HTTP stream and writes to pipe"""
         try:
-            # Build headers
-            headers = {}
-            if self.user_agent:
-                headers['User-Agent'] = self.user_agent
-
             logger.info(f"HTTP reader connecting to {self.url}")
 
-            # Create session
-            self.session = requests.Session()
-
-            # Disable retries for faster failure detection
-            adapter = HTTPAdapter(max_retries=0, pool_connections=1, pool_maxsize=1)
-            self.session.mount('http://', adapter)
-            self.session.mount('https://', adapter)
-
-            # Stream the URL
-            self.response = self.session.get(
-                self.url,
-                headers=headers,
-                stream=True,
-                timeout=(5, 30)  # 5s connect, 30s read
-            )
+            # Stream the URL - 5s connect, 30s read
+            self.session, self.response = _open_stream(self.url, self.user_agent, UPSTREAM_READ_TIMEOUT)
 
             if self.response.status_code != 200:
                 logger.error(f"HTTP {self.response.status_code} from {self.url}")
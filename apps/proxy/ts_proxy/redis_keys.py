@@ -24,6 +24,31 @@ class RedisKeys:
         """Prefix for buffer chunks"""
         return f"ts_proxy:channel:{channel_id}:buffer:chunk:"
 
+    @staticmethod
+    def buffer_keyframes(channel_id):
+        """Sorted set of indexed keyframes ("<chunk index>:<offset>" scored by store time)"""
+        return f"ts_proxy:channel:{channel_id}:buffer:keyframes"
+
+    @staticmethod
+    def buffer_psi(channel_id):
+        """Key for the latest PAT/PMT packets of the buffered stream"""
+        return f"ts_proxy:channel:{channel_id}:buffer:psi"
+
+    @staticmethod
+    def hls_segments(channel_id):
+        """Hash of HLS media sequence -> segment byte range over buffer chunks"""
+        return f"ts_proxy:channel:{channel_id}:hls:segments"
+
+    @staticmethod
+    def hls_segment_psi(channel_id):
+        """Hash of HLS media sequence -> PAT/PMT packets to put in front of the segment"""
+        return f"ts_proxy:channel:{channel_id}:hls:psi"
+
+    @staticmethod
+    def hls_sequence(channel_id):
+        """Key for the next HLS media sequence number"""
+        return f"ts_proxy:channel:{channel_id}:hls:sequence"
+
     @staticmethod
     def channel_stopping(channel_id):
         """Key indicating channel is stopping"""
@@ -39,6 +64,11 @@ class RedisKeys:
         """PubSub channel for events"""
         return f"ts_proxy:events:{channel_id}"
 
+    @staticmethod
+    def chunks_channel(channel_id):
+        """PubSub channel announcing the latest buffer index"""
+        return f"ts_proxy:chunks:{channel_id}"
+
     @staticmethod
     def switch_request(channel_id):
         """Key for stream switch request"""
@@ -24,6 +24,7 @@ from redis.exceptions import ConnectionError, TimeoutError
 from .stream_manager import StreamManager
 from .stream_buffer import StreamBuffer
 from .client_manager import ClientManager
+from .control_plane import ControlPlane
 from .redis_keys import RedisKeys
 from .constants import ChannelState, EventType, StreamType
 from .config_helper import ConfigHelper
@@ -80,6 +81,9 @@ class ProxyServer:
             logger.error(f"Failed to initialize Redis: {e}")
             self.redis_client = None
 
+        # Stop signals and client stats shared by all stream generators in this worker
+        self.control_plane = ControlPlane(self)
+
         # Start cleanup thread
         self.cleanup_interval = getattr(Config, 'CLEANUP_INTERVAL', 60)
         self._start_cleanup_thread()
@@ -166,7 +170,7 @@ class ProxyServer:
 
                     # Create a pubsub instance from the client
                     pubsub = pubsub_client.pubsub()
-                    pubsub.psubscribe("ts_proxy:events:*")
+                    pubsub.psubscribe("ts_proxy:events:*", "ts_proxy:chunks:*")
 
                     logger.info(f"Started Redis event listener for client activity")
 
@@ -177,6 +181,11 @@ class ProxyServer:
                         if message["type"] != "pmessage":
                             continue
 
+                        # New buffer index announced by a channel owner - hot path, keep it cheap
+                        if message["pattern"] == b"ts_proxy:chunks:*":
+                            self._handle_chunk_notification(message["channel"], message["data"])
+                            continue
+
                         try:
                             channel = message["channel"].decode("utf-8")
                             data = json.loads(message["data"].decode("utf-8"))
@@ -185,6 +194,12 @@ class ProxyServer:
                             channel_id = data.get("channel_id")
 
                             if channel_id and event_type:
+                                # Every worker's clients react to stop requests without polling for them
+                                if event_type == EventType.CHANNEL_STOP:
+                                    self.control_plane.mark_channel_stopping(channel_id)
+                                elif event_type == EventType.CLIENT_STOP and data.get("client_id"):
+                                    self.control_plane.mark_client_stopped(channel_id, data["client_id"])
+
                                 # For owner, update client status immediately
                                 if self.am_i_owner(channel_id):
                                     if event_type == EventType.CLIENT_CONNECTED:
@@ -366,6 +381,16 @@ class ProxyServer:
         thread.name = "redis-event-listener"
         thread.start()
 
+    def _handle_chunk_notification(self, channel, data):
+        """Wake this worker's clients of a channel when the owner has written new chunks"""
+        try:
+            channel_id = channel.decode("utf-8").rsplit(":", 1)[1]
+            buffer = self.stream_buffers.get(channel_id)
+            if buffer:
+                buffer.notify_new_index(int(data))
+        except (ValueError, IndexError) as e:
+            logger.debug(f"Ignoring malformed chunk notification on {channel}: {e}")
+
     def get_channel_owner(self, channel_id):
         """Get the worker ID that owns this channel with proper error handling"""
         if not self.redis_client:
@@ -870,6 +895,8 @@ class ProxyServer:
                 except KeyError:
                     logger.debug(f"Client manager for channel {channel_id} already removed")
 
+            self.control_plane.forget_channel(channel_id)
+
             # Clean up Redis keys
             self._clean_redis_keys(channel_id)
 
@@ -1216,6 +1243,8 @@ class ProxyServer:
                 del self.client_managers[channel_id]
                 logger.info(f"Non-owner cleanup: Removed client manager for channel {channel_id}")
 
+            self.control_plane.forget_channel(channel_id)
+
             return True
         except Exception as e:
             logger.error(f"Error cleaning up local resources: {e}", exc_info=True)
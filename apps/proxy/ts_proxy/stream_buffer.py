@@ -1,5 +1,6 @@
 """Buffer management for TS streams"""
 
+import json
 import threading
 import logging
 import time
@@ -9,13 +10,36 @@ import random
 from apps.proxy.config import TSConfig as Config
 from .redis_keys import RedisKeys
 from .config_helper import ConfigHelper
-from .constants import TS_PACKET_SIZE
+from .chunk_ring import ChunkRing
+from .chunk_accumulator import ChunkAccumulator
+from .ts_index import TSIndexer, mark_discontinuity
+from .ts_inspector import TSInspector, inspection_available
+from .hls_output import HLSSegmenter
+from .constants import TS_PACKET_SIZE, ChannelMetadataField
 from .utils import get_logger
 import gevent.event
 import gevent  # Make sure this import is at the top
 
 logger = get_logger()
 
+# Stores one chunk under the next buffer index and refreshes the channel's last_data
+# timestamp in a single round trip. When the chunk holds a keyframe it is added to the
+# keyframe index too, and entries older than the chunk TTL are trimmed from it.
+# KEYS: buffer index, last_data, keyframes
+# ARGV: chunk key prefix, chunk TTL, chunk, timestamp, last_data TTL, keyframe offset ('' if none)
+STORE_CHUNK_SCRIPT = """
+local index = redis.call('INCR', KEYS[1])
+redis.call('SETEX', ARGV[1] .. index, ARGV[2], ARGV[3])
+redis.call('SET', KEYS[2], ARGV[4], 'EX', ARGV[5])
+if ARGV[6] ~= '' then
+    redis.call('ZADD', KEYS[3], ARGV[4], index .. ':' .. ARGV[6])
+    redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', tonumber(ARGV[4]) - tonumber(ARGV[2]))
+    redis.call('EXPIRE', KEYS[3], ARGV[2])
+end
+return index
+"""
+LAST_DATA_TTL = 60
+
 class StreamBuffer:
     """Manages stream data buffering with optimized chunk storage"""
 
@@ -32,6 +56,32 @@ class StreamBuffer:
 
         self.chunk_ttl = ConfigHelper.redis_chunk_ttl()
 
+        # Ingestion writes: one scripted call per chunk, liveness writes rate-limited in between
+        self.last_data_key = RedisKeys.last_data(channel_id) if channel_id else ""
+        self.liveness_interval = ConfigHelper.liveness_update_interval()
+        self._liveness_written_at = 0
+        self._store_script = None
+
+        # Keyframe/PAT/PMT index of stored chunks, used to start new clients on a keyframe
+        self.keyframes_key = RedisKeys.buffer_keyframes(channel_id) if channel_id else ""
+        self.psi_key = RedisKeys.buffer_psi(channel_id) if channel_id else ""
+        self.ts_indexer = TSIndexer()
+        self._psi_version_written = 0
+
+        # HLS segments cut at indexed keyframes, recorded by the worker that stores the chunks
+        self.hls_segmenter = None
+        if self.redis_client and channel_id and ConfigHelper.hls_output():
+            self.hls_segmenter = HLSSegmenter(channel_id, self.redis_client, self.chunk_ttl)
+
+        # Packet-level health of the ingested stream, written to channel metadata periodically
+        self.ts_inspector = TSInspector() if ConfigHelper.ts_inspection() and inspection_available() else None
+        self.ts_stats_interval = ConfigHelper.ts_stats_interval()
+        self.corruption_threshold = ConfigHelper.ts_corruption_threshold()
+        self.corrupt_since = None  # When the current run of corrupt chunks started
+
+        # Recent chunks shared by every client of this channel in this worker
+        self.chunk_cache = ChunkRing(ConfigHelper.local_chunk_cache_bytes(), max_age=self.chunk_ttl)
+
         # Initialize from Redis if available
         if self.redis_client and channel_id:
             try:
@@ -42,13 +92,22 @@ class StreamBuffer:
             except Exception as e:
                 logger.error(f"Error initializing buffer from Redis: {e}")
 
-        self._write_buffer = bytearray()
         self.target_chunk_size = ConfigHelper.get('BUFFER_CHUNK_SIZE', TS_PACKET_SIZE * 5644)  # ~1MB default
 
         # Track timers for proper cleanup
         self.stopping = False
         self.fill_timers = []
+        # Replaced on every notification so a waiter can't miss a wakeup between checking and waiting
         self.chunk_available = gevent.event.Event()
+        self.chunks_channel = RedisKeys.chunks_channel(channel_id) if channel_id else ""
+
+    @property
+    def target_chunk_size(self):
+        return self._accumulator.chunk_size
+
+    @target_chunk_size.setter
+    def target_chunk_size(self, size):
+        self._accumulator = ChunkAccumulator(size, self.TS_PACKET_SIZE)
 
     def add_chunk(self, chunk):
         """Add data with optimized Redis storage and TS packet alignment"""
@@ -56,51 +115,22 @@ class StreamBuffer:
             return False
 
         try:
-            # Accumulate partial packets between chunks
-            if not hasattr(self, '_partial_packet'):
-                self._partial_packet = bytearray()
-
-            # Combine with any previous partial packet
-            combined_data = bytearray(self._partial_packet) + bytearray(chunk)
-
-            # Calculate complete packets
-            complete_packets_size = (len(combined_data) // self.TS_PACKET_SIZE) * self.TS_PACKET_SIZE
-
-            if complete_packets_size == 0:
-                # Not enough data for a complete packet
-                self._partial_packet = combined_data
+            # Upstream reads are only referenced here; each chunk is assembled with a single copy
+            self._accumulator.append(chunk)
+            if len(self._accumulator) < self.target_chunk_size:
                 return True
 
-            # Split into complete packets and remainder
-            complete_packets = combined_data[:complete_packets_size]
-            self._partial_packet = combined_data[complete_packets_size:]
-
-            # Add completed packets to write buffer
-            self._write_buffer.extend(complete_packets)
-
             # Only write to Redis when we have enough data for an optimized chunk
             writes_done = 0
             with self.lock:
-                while len(self._write_buffer) >= self.target_chunk_size:
-                    # Extract a full chunk
-                    chunk_data = self._write_buffer[:self.target_chunk_size]
-                    self._write_buffer = self._write_buffer[self.target_chunk_size:]
-
-                    # Write optimized chunk to Redis
+                for chunk_data in self._accumulator.pop_chunks():
                     if self.redis_client:
-                        chunk_index = self.redis_client.incr(self.buffer_index_key)
-                        chunk_key = RedisKeys.buffer_chunk(self.channel_id, chunk_index)
-                        self.redis_client.setex(chunk_key, self.chunk_ttl, bytes(chunk_data))
-
-                        # Update local tracking
-                        self.index = chunk_index
+                        self._store_chunk(chunk_data)
                         writes_done += 1
 
             if writes_done > 0:
                 logger.debug(f"Added {writes_done} chunks ({self.target_chunk_size} bytes each) to Redis for channel {self.channel_id} at index {self.index}")
-
-            self.chunk_available.set()  # Signal that new data is available
-            self.chunk_available.clear()  # Reset for next notification
+                self._announce_index()
 
             return True
 
@@ -108,6 +138,140 @@ class StreamBuffer:
             logger.error(f"Error adding chunk to buffer: {e}")
             return False
 
+    def _store_chunk(self, chunk_data):
+        """Write one chunk to Redis and the local ring under the next buffer index (caller holds self.lock)"""
+        if self._store_script is None:
+            self._store_script = self.redis_client.register_script(STORE_CHUNK_SCRIPT)
+
+        keyframe_offset = self._index_chunk(chunk_data)
+        self._inspect_chunk(chunk_data)
+
+        now = time.time()
+        chunk_index = int(self._store_script(
+            keys=[self.buffer_index_key, self.last_data_key, self.keyframes_key],
+            args=[
+                self.buffer_prefix, self.chunk_ttl, chunk_data, str(now), LAST_DATA_TTL,
+                '' if keyframe_offset is None else keyframe_offset,
+            ],
+        ))
+        self._liveness_written_at = now
+        self.chunk_cache.put(chunk_index, chunk_data)
+
+        if keyframe_offset is not None and self.hls_segmenter:
+            try:
+                self.hls_segmenter.add_keyframe(
+                    chunk_index, keyframe_offset, self.ts_indexer.keyframe_pts, self.ts_indexer.psi, now
+                )
+            except Exception as e:
+                logger.warning(f"Error recording HLS segment for channel {self.channel_id}: {e}")
+
+        # Update local tracking
+        self.index = chunk_index
+        return chunk_index
+
+    def _index_chunk(self, chunk_data):
+        """Scan a chunk for keyframes, storing the PAT/PMT when they change; returns the keyframe offset"""
+        try:
+            keyframe_offset = self.ts_indexer.scan(chunk_data)
+            psi = self.ts_indexer.psi
+            if self.ts_indexer.psi_version != self._psi_version_written:
+                # Keyframes indexed under the previous PAT/PMT (e.g. before a stream switch) no longer apply
+                pipe = self.redis_client.pipeline()
+                pipe.delete(self.keyframes_key)
+                if psi:
+                    pipe.setex(self.psi_key, self.chunk_ttl, psi)
+                else:
+                    pipe.delete(self.psi_key)
+                pipe.execute()
+                self._psi_version_written = self.ts_indexer.psi_version
+                if self.hls_segmenter:
+                    self.hls_segmenter.reset()
+            return keyframe_offset if psi else None
+        except Exception as e:
+            logger.warning(f"Error indexing chunk for channel {self.channel_id}: {e}")
+            return None
+
+    def _inspect_chunk(self, chunk_data):
+        """Check a chunk's packets, track corruption and write the window's stats when it's due"""
+        if not self.ts_inspector:
+            return
+        try:
+            report = self.ts_inspector.inspect(chunk_data)
+            now = time.time()
+            if report.error_ratio > self.corruption_threshold:
+                if self.corrupt_since is None:
+                    logger.warning(
+                        f"Corrupt TS data for channel {self.channel_id}: {report.sync_errors} sync, "
+                        f"{report.transport_errors} transport and {report.cc_errors} continuity errors "
+                        f"in {report.packets} packets"
+                    )
+                    self.corrupt_since = now
+            else:
+                self.corrupt_since = None
+
+            if now - self.ts_inspector.window_started >= self.ts_stats_interval:
+                self._write_ts_stats(now)
+        except Exception as e:
+            logger.warning(f"Error inspecting chunk for channel {self.channel_id}: {e}")
+
+    def _write_ts_stats(self, now):
+        inspector = self.ts_inspector
+        update_data = {
+            ChannelMetadataField.TS_SYNC_ERRORS: str(inspector.sync_errors),
+            ChannelMetadataField.TS_TRANSPORT_ERRORS: str(inspector.transport_errors),
+            ChannelMetadataField.TS_CC_ERRORS: str(inspector.cc_errors),
+            ChannelMetadataField.TS_PCR_DISCONTINUITIES: str(inspector.pcr_discontinuities),
+            ChannelMetadataField.TS_ERROR_RATIO: str(round(inspector.error_ratio, 5)),
+            ChannelMetadataField.TS_STATS_UPDATED: str(now),
+        }
+        bitrate = inspector.bitrate()
+        if bitrate is not None:
+            # kbps, like the ffmpeg bitrate fields
+            update_data[ChannelMetadataField.TS_BITRATE] = str(round(bitrate / 1000, 1))
+            update_data[ChannelMetadataField.TS_PID_BITRATES] = json.dumps(
+                {str(pid): round(rate / 1000, 1) for pid, rate in sorted(inspector.pid_bitrates().items())}
+            )
+        inspector.reset_stats()
+        self.redis_client.hset(RedisKeys.channel_metadata(self.channel_id), mapping=update_data)
+
+    def find_join_point(self, min_age, max_age):
+        """
+        Find where a new client should start: the newest indexed keyframe stored at
+        least min_age seconds ago (or, failing that, the oldest one younger than that),
+        ignoring keyframes older than max_age.
+
+        Returns (chunk_index, join_data) where join_data is the PAT/PMT followed by
+        the chunk from the keyframe on, or None when no usable keyframe is indexed.
+        """
+        if not self.redis_client or not self.keyframes_key:
+            return None
+
+        try:
+            now = time.time()
+            pipe = self.redis_client.pipeline()
+            pipe.zrangebyscore(self.keyframes_key, now - max_age, '+inf', withscores=True)
+            pipe.get(self.psi_key)
+            entries, psi = pipe.execute()
+            if not entries or not psi:
+                return None
+
+            target = now - min_age
+            older = [member for member, stored_at in entries if stored_at <= target]
+            # Sorted oldest first: newest old-enough keyframe, else the one closest to the target
+            member = older[-1] if older else entries[0][0]
+            if isinstance(member, bytes):
+                member = member.decode('utf-8')
+            chunk_index, offset = (int(part) for part in member.split(':'))
+
+            chunks = self.get_chunks_exact(chunk_index - 1, 1)
+            if not chunks or offset >= len(chunks[0]):
+                return None
+            return chunk_index, psi + chunks[0][offset:]
+
+        except Exception as e:
+            logger.warning(f"Error finding keyframe join point for channel {self.channel_id}: {e}")
+            return None
+
     def get_chunks(self, start_index=None):
         """Get chunks from the buffer with detailed logging"""
         try:
@@ -207,13 +371,8 @@ class StreamBuffer:
             # Cap end at current buffer position
             end_id = min(end_id, current_index + 1)
 
-            # Directly fetch from Redis using pipeline
-            pipe = self.redis_client.pipeline()
-            for idx in range(start_id, end_id):
-                chunk_key = RedisKeys.buffer_chunk(self.channel_id, idx)
-                pipe.get(chunk_key)
-
-            results = pipe.execute()
+            # Serve from the local ring first, Redis is only needed for what it doesn't hold
+            results = self._get_cached_range(start_id, end_id, current_index)
 
             # Filter out None results
             chunks = [result for result in results if result is not None]
@@ -228,6 +387,92 @@ class StreamBuffer:
             logger.error(f"Error getting exact chunks: {e}", exc_info=True)
             return []
 
+    def touch_liveness(self):
+        """Record that upstream data is flowing, at most once per liveness interval"""
+        now = time.time()
+        if not self.redis_client or now - self._liveness_written_at < self.liveness_interval:
+            return
+        self._liveness_written_at = now
+        try:
+            self.redis_client.set(self.last_data_key, str(now), ex=LAST_DATA_TTL)
+        except Exception as e:
+            logger.debug(f"Failed to update last data time for channel {self.channel_id}: {e}")
+
+    def notify_new_index(self, index):
+        """Record that chunks up to index exist (announced by the owner) and wake local clients"""
+        if index > self.index:
+            self.index = index
+            self._wake_waiters()
+
+    def wait_for_chunks(self, after_index, timeout):
+        """
+        Block until the buffer index moves past after_index or timeout expires.
+        Returns True if new chunks are available.
+        """
+        # Grab the event before checking so a notification in between still wakes us
+        event = self.chunk_available
+        if self.index > after_index:
+            return True
+        event.wait(timeout)
+        return self.index > after_index
+
+    def _wake_waiters(self):
+        event, self.chunk_available = self.chunk_available, gevent.event.Event()
+        event.set()
+
+    def _announce_index(self):
+        """Wake local clients and tell other workers about the new index"""
+        self._wake_waiters()
+        if self.redis_client and self.chunks_channel:
+            try:
+                self.redis_client.publish(self.chunks_channel, str(self.index))
+            except Exception as e:
+                logger.debug(f"Failed to publish chunk notification for channel {self.channel_id}: {e}")
+
+    def _get_cached_range(self, start_id, end_id, current_index):
+        """Chunks (or None) for [start_id, end_id), filling gaps in the local ring from Redis"""
+        cache = self.chunk_cache
+        if cache.newest_index() > current_index:
+            # Buffer index went backwards (channel was reset), nothing cached is valid
+            cache.clear()
+
+        results = cache.get_range(start_id, end_id)
+        if None not in results:
+            return results
+
+        # One reader fetches the gaps while the others wait and then read the ring
+        with cache.fetch_lock:
+            results = [
+                chunk if chunk is not None else cached
+                for chunk, cached in zip(results, cache.peek_range(start_id, end_id))
+            ]
+            missing = [start_id + i for i, chunk in enumerate(results) if chunk is None]
+            if not missing:
+                return results
+
+            pipe = self.redis_client.pipeline()
+            for idx in missing:
+                pipe.get(RedisKeys.buffer_chunk(self.channel_id, idx))
+
+            for idx, chunk in zip(missing, pipe.execute()):
+                if chunk is not None:
+                    results[idx - start_id] = chunk
+                    cache.put(idx, chunk)
+
+        return results
+
+    def splice(self, data):
+        """
+        Continue the buffer with data from another upstream: a pending partial
+        packet of the old one is dropped and the new data is flagged as a
+        discontinuity
+        """
+        with self.lock:
+            self._accumulator.drop_partial()
+            if self.hls_segmenter:
+                self.hls_segmenter.reset()
+        return self.add_chunk(mark_discontinuity(data))
+
     def stop(self):
         """Stop the buffer and cancel all timers"""
         # Set stopping flag first to prevent new timer creation
@@ -250,30 +495,21 @@ class StreamBuffer:
         self.fill_timers.clear()
 
         try:
-            # Flush any remaining data in the write buffer
-            if hasattr(self, '_write_buffer') and len(self._write_buffer) > 0:
-                # Ensure remaining data is aligned to TS packets
-                complete_size = (len(self._write_buffer) // 188) * 188
-
-                if complete_size > 0:
-                    final_chunk = self._write_buffer[:complete_size]
-
-                    # Write final chunk to Redis
-                    with self.lock:
-                        if self.redis_client:
-                            try:
-                                chunk_index = self.redis_client.incr(self.buffer_index_key)
-                                chunk_key = f"{self.buffer_prefix}{chunk_index}"
-                                self.redis_client.setex(chunk_key, self.chunk_ttl, bytes(final_chunk))
-                                self.index = chunk_index
-                                logger.info(f"Flushed final chunk of {len(final_chunk)} bytes to Redis")
-                            except Exception as e:
-                                logger.error(f"Error flushing final chunk: {e}")
-
-                # Clear buffers
-                self._write_buffer = bytearray()
-                if hasattr(self, '_partial_packet'):
-                    self._partial_packet = bytearray()
+            # Flush any remaining whole TS packets, the trailing partial packet is dropped
+            final_chunk = self._accumulator.pop_aligned()
+            if final_chunk:
+                # Write final chunk to Redis
+                with self.lock:
+                    if self.redis_client:
+                        try:
+                            self._store_chunk(final_chunk)
+                            logger.info(f"Flushed final chunk of {len(final_chunk)} bytes to Redis")
+                            self._announce_index()
+                        except Exception as e:
+                            logger.error(f"Error flushing final chunk: {e}")
+
+            # Clear buffers
+            self._accumulator.clear()
 
         except Exception as e:
             logger.error(f"Error during buffer stop: {e}")
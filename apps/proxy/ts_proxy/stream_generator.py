@@ -45,6 +45,7 @@ class StreamGenerator:
         self.bytes_sent = 0
         self.chunks_sent = 0
         self.local_index = 0
+        self.join_data = None
         self.consecutive_empty = 0
 
         # Add tracking for current transfer rate calculation
@@ -166,10 +167,19 @@ class StreamGenerator:
             logger.error(f"[{self.client_id}] No buffer found for channel {self.channel_id}")
             return False
 
-        # Client state tracking - use config for initial position
+        # Client state tracking - start on a keyframe when one is indexed, else a fixed chunk offset back
         initial_behind = ConfigHelper.initial_behind_chunks()
         current_buffer_index = buffer.index
         self.local_index = max(0, current_buffer_index - initial_behind)
+        self.join_data = None
+        if ConfigHelper.keyframe_join():
+            join_point = buffer.find_join_point(
+                ConfigHelper.keyframe_join_seconds(),
+                ConfigHelper.keyframe_join_max_seconds()
+            )
+            if join_point:
+                # The keyframe's chunk goes out as join_data, reading continues after it
+                self.local_index, self.join_data = join_point
 
         # Store important objects as instance variables
         self.buffer = buffer
@@ -179,17 +189,29 @@ class StreamGenerator:
         self.consecutive_empty = 0
         self.is_owner_worker = proxy_server.am_i_owner(self.channel_id) if hasattr(proxy_server, 'am_i_owner') else True
 
-        logger.info(f"[{self.client_id}] Starting stream at index {self.local_index} (buffer at {buffer.index})")
+        if self.join_data:
+            logger.info(f"[{self.client_id}] Starting stream on keyframe in chunk {self.local_index} (buffer at {buffer.index})")
+        else:
+            logger.info(f"[{self.client_id}] Starting stream at index {self.local_index} (buffer at {buffer.index})")
         return True
 
     def _stream_data_generator(self):
         """Generate stream data chunks based on buffer contents."""
+        if self.join_data:
+            # PAT/PMT and the stream from the join keyframe, so playback can start immediately
+            yield from self._process_chunks([self.join_data], self.local_index)
+            self.join_data = None
+            self.last_yield_time = time.time()
+
         # Main streaming loop
         while True:
             # Check if resources still exist
             if not self._check_resources():
                 break
 
+            # Remember where the buffer was so a chunk arriving during the read isn't waited for
+            seen_index = self.buffer.index
+
             # Get chunks at client's position using improved strategy
             chunks, next_index = self.buffer.get_optimized_client_data(self.local_index)
 
@@ -223,11 +245,10 @@ class StreamGenerator:
                     self.bytes_sent += len(keepalive_packet)
                     self.last_yield_time = time.time()
                     self.consecutive_empty = 0  # Reset consecutive counter but keep total empty_reads
-                    gevent.sleep(Config.KEEPALIVE_INTERVAL)  # Replace time.sleep
+                    self.buffer.wait_for_chunks(max(self.local_index, seen_index), Config.KEEPALIVE_INTERVAL)
                 else:
-                    # Standard wait with backoff
-                    sleep_time = min(0.1 * self.consecutive_empty, 1.0)
-                    gevent.sleep(sleep_time)  # Replace time.sleep
+                    # Woken as soon as the buffer advances; the timeout keeps resource checks running
+                    self.buffer.wait_for_chunks(max(self.local_index, seen_index), Config.CHUNK_WAIT_TIMEOUT)
 
                 # Log empty reads periodically
                 if self.empty_reads % 50 == 0:
@@ -256,28 +277,19 @@ class StreamGenerator:
             logger.info(f"[{self.client_id}] Client manager no longer exists, terminating stream")
             return False
 
-        # Check if this specific client has been stopped (Redis keys, etc.)
+        # Check if this specific client has been stopped - answered from the worker's
+        # control plane cache, which is refreshed from Redis once per interval per channel
         if proxy_server.redis_client:
-            # Channel stop check - with extended key set
-            stop_key = RedisKeys.channel_stopping(self.channel_id)
-            if proxy_server.redis_client.exists(stop_key):
+            stop_reason = proxy_server.control_plane.stop_reason(self.channel_id, self.client_id)
+            if stop_reason == 'channel_stopping':
                 logger.info(f"[{self.client_id}] Detected channel stop signal, terminating stream")
                 return False
-
-            # Also check channel state in metadata
-            metadata_key = RedisKeys.channel_metadata(self.channel_id)
-            metadata = proxy_server.redis_client.hgetall(metadata_key)
-            if metadata and b'state' in metadata:
-                state = metadata[b'state'].decode('utf-8')
-                if state in ['error', 'stopped', 'stopping']:
-                    logger.info(f"[{self.client_id}] Channel in {state} state, terminating stream")
-                    return False
-
-            # Client stop check
-            client_stop_key = RedisKeys.client_stop(self.channel_id, self.client_id)
-            if proxy_server.redis_client.exists(client_stop_key):
+            elif stop_reason == 'client_stop':
                 logger.info(f"[{self.client_id}] Detected client stop signal, terminating stream")
                 return False
+            elif stop_reason:
+                logger.info(f"[{self.client_id}] Channel in {stop_reason.split(':', 1)[1]} state, terminating stream")
+                return False
 
             # Also check if client has been removed from client_manager
             if self.channel_id in proxy_server.client_managers:
@@ -324,21 +336,18 @@ class StreamGenerator:
                     logger.debug(f"[{self.client_id}] Stats: {self.chunks_sent} chunks, {self.bytes_sent/1024:.1f} KB, "
                                 f"avg: {avg_rate:.1f} KB/s, current: {self.current_rate:.1f} KB/s")
 
-                # Store stats in Redis client metadata
+                # Queue stats for the client metadata; the worker writes all clients' stats in one batch
                 if proxy_server.redis_client:
-                    try:
-                        client_key = RedisKeys.client_metadata(self.channel_id, self.client_id)
-                        stats = {
-                            ChannelMetadataField.CHUNKS_SENT: str(self.chunks_sent),
-                            ChannelMetadataField.BYTES_SENT: str(self.bytes_sent),
-                            ChannelMetadataField.AVG_RATE_KBPS: str(round(avg_rate, 1)),
-                            ChannelMetadataField.CURRENT_RATE_KBPS: str(round(self.current_rate, 1)),
-                            ChannelMetadataField.STATS_UPDATED_AT: str(current_time)
-                        }
-                        proxy_server.redis_client.hset(client_key, mapping=stats)
-                        # No need to set expiration as client heartbeat will refresh this key
-                    except Exception as e:
-                        logger.warning(f"[{self.client_id}] Failed to store stats in Redis: {e}")
+                    stats = {
+                        ChannelMetadataField.CHUNKS_SENT: str(self.chunks_sent),
+                        ChannelMetadataField.BYTES_SENT: str(self.bytes_sent),
+                        ChannelMetadataField.AVG_RATE_KBPS: str(round(avg_rate, 1)),
+                        ChannelMetadataField.CURRENT_RATE_KBPS: str(round(self.current_rate, 1)),
+                        ChannelMetadataField.STATS_UPDATED_AT: str(current_time)
+                    }
+                    proxy_server.control_plane.record_client_stats(self.channel_id, self.client_id, stats)
+                    # No need to set expiration as client heartbeat will refresh this key
+                    proxy_server.control_plane.flush_client_stats()
 
             except Exception as e:
                 logger.error(f"[{self.client_id}] Error sending chunk to client: {e}")
@@ -416,6 +425,8 @@ class StreamGenerator:
             except Exception as e:
                 logger.error(f"[{self.client_id}] Error checking stream data for release: {e}")
 
+        proxy_server.control_plane.forget_client(self.channel_id, self.client_id)
+
         if self.channel_id in proxy_server.client_managers:
             client_manager = proxy_server.client_managers[self.channel_id]
             local_clients = client_manager.remove_client(self.client_id)
@@ -118,6 +118,10 @@ class StreamManager:
         # Add HTTP reader thread property
         self.http_reader = None
 
+        # Warm connection to the next stream, for channels with hot_standby enabled
+        self.hot_standby = None
+        self._standby_handoff = None
+
     def _create_session(self):
         """Create and configure requests session with optimal settings"""
         session = requests.Session()
@@ -189,6 +193,8 @@ class StreamManager:
             health_thread = threading.Thread(target=self._monitor_health, daemon=True)
             health_thread.start()
 
+            self._start_hot_standby()
+
             logger.info(f"Starting stream for URL: {self.url} for channel {self.channel_id}")
 
             # Main stream switching loop - we'll try different streams if needed
@@ -228,9 +234,9 @@ class StreamManager:
 
                 # Check stream type before connecting
                 stream_type = detect_stream_type(self.url)
-                if self.transcode == False and stream_type == StreamType.HLS:
+                if self.transcode == False and stream_type == StreamType.HLS and not ConfigHelper.hls_native_ingest():
                     logger.info(f"Detected HLS stream: {self.url} for channel {self.channel_id}")
-                    logger.info(f"HLS streams will be handled with FFmpeg for now - future version will support HLS natively for channel {self.channel_id}")
+                    logger.info(f"Native HLS ingest is disabled, HLS stream will be handled with FFmpeg for channel {self.channel_id}")
                     # Enable transcoding for HLS streams
                     self.transcode = True
                     # We'll override the stream profile selection with ffmpeg in the transcoding section
@@ -280,6 +286,12 @@ class StreamManager:
                             # Normal shutdown requested
                             return
 
+                        if self.hot_standby and self.hot_standby.is_ready():
+                            # Fail over to the warm standby instead of reconnecting
+                            logger.info(f"Connection lost, failing over to hot standby for channel: {self.channel_id}")
+                            url_failed = True
+                            continue
+
                         # Connection failed, increment retry count
                         self.retry_count += 1
                         self.connected = False
@@ -333,6 +345,7 @@ class StreamManager:
         finally:
             # Enhanced cleanup in the finally block
             self.connected = False
+            self._stop_hot_standby()
 
             # Explicitly cancel all timers
             for timer in list(self._buffer_check_timers):
@@ -750,8 +763,12 @@ class StreamManager:
 
 
     def _establish_http_connection(self):
-        """Establish HTTP connection using thread-based reader (same as transcode path)"""
+        """Establish HTTP connection, read directly by this thread or via the thread/pipe reader"""
         try:
+            handoff, self._standby_handoff = self._standby_handoff, None
+            if handoff and handoff.url == self.url:
+                return self._adopt_standby_connection(handoff)
+
             logger.debug(f"Using HTTP streamer thread to connect to stream: {self.url}")
 
             # Check if we already have active HTTP connections
@@ -769,9 +786,33 @@ class StreamManager:
                 logger.debug(f"Closing existing transcode process before establishing HTTP connection for channel {self.channel_id}")
                 self._close_socket()
 
-            # Use HTTPStreamReader to fetch stream and pipe to a readable file descriptor
+            if ConfigHelper.hls_native_ingest() and detect_stream_type(self.url) == StreamType.HLS:
+                return self._establish_hls_connection()
+
+            from .http_streamer import HTTPStreamConnection, HTTPStreamReader, direct_read_supported
+
+            if ConfigHelper.http_direct_ingest() and direct_read_supported():
+                # Read the response in place: large reads go straight into the buffer
+                connection = HTTPStreamConnection(
+                    url=self.url,
+                    user_agent=self.user_agent,
+                    read_size=ConfigHelper.http_read_size()
+                )
+                if not connection.connect():
+                    return False
+
+                self.socket = connection
+                self.connected = True
+                self.healthy = True
+
+                logger.info(f"Successfully connected to HTTP stream (direct read) for channel {self.channel_id}")
+
+                self.connection_start_time = time.time()
+                self._set_waiting_for_clients()
+                return True
+
+            # Fallback: HTTPStreamReader fetches the stream and pipes it to a readable file descriptor
             # This allows us to use the same fetch_chunk() path as transcode
-            from .http_streamer import HTTPStreamReader
 
             # Create and start the HTTP stream reader
             self.http_reader = HTTPStreamReader(
@@ -804,6 +845,34 @@ class StreamManager:
             self._close_socket()
             return False
 
+    def _establish_hls_connection(self):
+        """Follow an HLS upstream in process, falling back to FFmpeg for segments that can't be passed through"""
+        from .hls_ingest import HLSStreamConnection
+
+        connection = HLSStreamConnection(
+            url=self.url,
+            user_agent=self.user_agent,
+            read_size=ConfigHelper.http_read_size(),
+            live_segments=ConfigHelper.hls_ingest_live_segments()
+        )
+        if not connection.connect():
+            if connection.unsupported:
+                logger.info(f"HLS stream has {connection.unsupported}, handling it with FFmpeg for channel {self.channel_id}")
+                self.transcode = True
+                self.force_ffmpeg = True
+                return self._establish_transcode_connection()
+            return False
+
+        self.socket = connection
+        self.connected = True
+        self.healthy = True
+
+        logger.info(f"Successfully connected to HLS stream (native ingest) for channel {self.channel_id}")
+
+        self.connection_start_time = time.time()
+        self._set_waiting_for_clients()
+        return True
+
     def _update_bytes_processed(self, chunk_size):
         """Update the total bytes processed in Redis metadata"""
         try:
@@ -916,6 +985,7 @@ class StreamManager:
 
         # Explicitly close socket/transcode resources
         self._close_socket()
+        self._stop_hot_standby()
 
         # Set running to false to ensure thread exits
         self.running = False
@@ -1067,6 +1137,19 @@ class StreamManager:
                 if self.healthy:
                     consecutive_unhealthy_checks = 0
 
+                # Data that keeps arriving but fails TS packet checks gets a stream switch as well
+                corruption_timeout = ConfigHelper.ts_corruption_timeout()
+                corrupt_since = getattr(self.buffer, 'corrupt_since', None)
+                if (corruption_timeout and corrupt_since and self.connected and
+                        now - corrupt_since > corruption_timeout and
+                        now - self.last_health_action_time > action_cooldown and
+                        not self.needs_stream_switch):
+                    logger.warning(f"Stream for channel {self.channel_id} has been sending corrupt TS data for "
+                                   f"{now - corrupt_since:.1f}s, setting stream switch flag")
+                    self.needs_stream_switch = True
+                    self.last_health_action_time = now
+                    self.buffer.corrupt_since = None
+
             except Exception as e:
                 logger.error(f"Error in health monitor: {e}")
 
@@ -1278,7 +1361,11 @@ class StreamManager:
 
             try:
                 # Handle different socket types with timeout
-                if hasattr(self.socket, 'recv'):
+                if hasattr(self.socket, 'read_chunk'):
+                    # Direct HTTP connection - blocks until data arrives; a stall ends the
+                    # stream after the upstream read timeout and close() interrupts it
+                    chunk = self.socket.read_chunk()
+                elif hasattr(self.socket, 'recv'):
                     # Standard socket - set timeout
                     original_timeout = self.socket.gettimeout()
                     self.socket.settimeout(chunk_timeout)
@@ -1312,13 +1399,17 @@ class StreamManager:
             chunk_size = len(chunk)
             self._update_bytes_processed(chunk_size)
 
-            # Add directly to buffer without TS-specific processing
-            success = self.buffer.add_chunk(chunk)
+            if getattr(self.socket, 'discontinuity', False):
+                # Native HLS: the segment starts a new timeline (EXT-X-DISCONTINUITY or skipped segments)
+                self.socket.discontinuity = False
+                success = self.buffer.splice(chunk)
+            else:
+                # Add directly to buffer without TS-specific processing
+                success = self.buffer.add_chunk(chunk)
 
-            # Update last data timestamp in Redis if successful
-            if success and hasattr(self.buffer, 'redis_client') and self.buffer.redis_client:
-                last_data_key = RedisKeys.last_data(self.buffer.channel_id)
-                self.buffer.redis_client.set(last_data_key, str(time.time()), ex=60)
+            # Update last data timestamp in Redis if successful (rate-limited, chunk writes also refresh it)
+            if success:
+                self.buffer.touch_liveness()
 
             return True
 
@@ -1460,6 +1551,9 @@ class StreamManager:
             bool: True if successfully switched to a new stream, False otherwise
         """
         try:
+            if self._promote_hot_standby():
+                return True
+
             logger.info(f"Trying to find alternative stream for channel {self.channel_id}, current stream ID: {self.current_stream_id}")
 
             # Get alternate streams excluding the current one
@@ -1522,6 +1616,7 @@ class StreamManager:
                 # Store the new user agent and transcode settings
                 self.user_agent = new_user_agent
                 self.transcode = new_transcode
+                self.force_ffmpeg = False
 
                 # Update stream metadata in Redis - use the profile_id we got from get_alternate_streams
                 if hasattr(self.buffer, 'redis_client') and self.buffer.redis_client:
@@ -1550,6 +1645,112 @@ class StreamManager:
             logger.error(f"Error trying next stream for channel {self.channel_id}: {e}", exc_info=True)
             return False
 
+    def _start_hot_standby(self):
+        """Start a warm standby connection if the channel has hot_standby enabled"""
+        from .hot_standby import HotStandby
+
+        try:
+            channel = get_stream_object(self.channel_id)
+            if not isinstance(channel, Channel) or not channel.hot_standby:
+                return
+            if not HotStandby.supported():
+                logger.warning(f"Hot standby is not supported by this HTTP stack, channel {self.channel_id} fails over normally")
+                return
+            self.hot_standby = HotStandby(self)
+            self.hot_standby.start()
+        except Exception as e:
+            logger.error(f"Error starting hot standby for channel {self.channel_id}: {e}", exc_info=True)
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def _stop_hot_standby(self):
+        if self.hot_standby:
+            self.hot_standby.stop()
+            self.hot_standby = None
+        handoff, self._standby_handoff = self._standby_handoff, None
+        if handoff:
+            # Taken over but never adopted
+            handoff.connection.close()
+            handoff.release_reservation()
+
+    def _promote_hot_standby(self):
+        """
+        Make the warm standby stream the active one.
+
+        The connection itself is adopted by the next _establish_http_connection(),
+        so the retry loop and health monitoring treat it like any new connection.
+
+        Returns:
+            bool: True if the standby took over, False to switch streams normally
+        """
+        if not self.hot_standby:
+            return False
+        handoff = self.hot_standby.take_over(ConfigHelper.hot_standby_handoff_timeout())
+        if not handoff:
+            return False
+
+        logger.info(f"Failing over channel {self.channel_id} to hot standby stream {handoff.stream_id}")
+
+        # Move the channel's profile count first, then drop the standby's own slot
+        try:
+            channel = Channel.objects.get(uuid=self.channel_id)
+            if not channel.update_stream_profile(handoff.profile_id):
+                logger.warning(f"Failed to update stream profile for channel {self.channel_id}")
+        except Exception as e:
+            logger.error(f"Error updating stream profile for channel {self.channel_id}: {e}")
+        finally:
+            handoff.release_reservation()
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+        self._close_socket()
+        self.socket = None
+        self.connected = False
+
+        self.url = handoff.url
+        self.user_agent = handoff.user_agent
+        self.transcode = False
+        self.current_stream_id = handoff.stream_id
+        self.tried_stream_ids.add(handoff.stream_id)
+        self._standby_handoff = handoff
+
+        if hasattr(self.buffer, 'redis_client') and self.buffer.redis_client:
+            metadata_key = RedisKeys.channel_metadata(self.channel_id)
+            self.buffer.redis_client.hset(metadata_key, mapping={
+                ChannelMetadataField.URL: handoff.url,
+                ChannelMetadataField.USER_AGENT: handoff.user_agent,
+                ChannelMetadataField.STREAM_PROFILE: handoff.stream_profile,
+                ChannelMetadataField.M3U_PROFILE: str(handoff.profile_id),
+                ChannelMetadataField.STREAM_ID: str(handoff.stream_id),
+                ChannelMetadataField.STREAM_SWITCH_TIME: str(time.time()),
+                ChannelMetadataField.STREAM_SWITCH_REASON: "hot_standby_failover"
+            })
+            self.buffer.redis_client.hdel(metadata_key, ChannelMetadataField.STANDBY_STREAM_ID)
+
+        # Warm up a standby for the new active stream
+        self.hot_standby = None
+        self._start_hot_standby()
+        return True
+
+    def _adopt_standby_connection(self, handoff):
+        """Continue on a connection handed over by the hot standby, spliced into the buffer"""
+        self.socket = handoff.connection
+        self.connected = True
+        self.healthy = True
+        self.connection_start_time = time.time()
+
+        # PAT/PMT and the standby's data since its last keyframe go in first
+        self.buffer.splice(handoff.prefix)
+        self.last_data_time = time.time()
+
+        logger.info(f"Adopted hot standby connection for channel {self.channel_id} ({len(handoff.prefix)} bytes spliced)")
+        return True
+
     # Add a new helper method to safely reset the URL switching state
     def _reset_url_switching_state(self):
         """Safely reset the URL switching state if it gets stuck"""
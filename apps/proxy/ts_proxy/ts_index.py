@@ -0,0 +1,208 @@
+"""
+Lightweight MPEG-TS indexing of buffer chunks.
+
+TSIndexer follows the PAT and PMT of the stream to find its video PID and
+records where random access points (keyframes) start in each chunk, so new
+clients can join on a keyframe with the current PAT/PMT in front instead of at
+an arbitrary byte offset.
+"""
+
+from .constants import TS_PACKET_SIZE
+
+TS_SYNC_BYTE = 0x47
+PAT_PID = 0x0000
+
+# PMT stream_type -> codec of the video elementary stream
+VIDEO_STREAM_TYPES = {
+    0x01: 'mpeg2',  # MPEG-1 video
+    0x02: 'mpeg2',
+    0x1B: 'h264',
+    0x24: 'hevc',
+}
+
+H264_KEYFRAME_NALS = (5, 7)                # IDR slice, SPS
+HEVC_KEYFRAME_NALS = tuple(range(16, 22)) + (32, 33)  # IRAP slices, VPS, SPS
+MPEG2_KEYFRAME_CODES = (0xB3, 0xB8)        # sequence header, GOP header
+
+
+def _section(packet, payload_start):
+    """Return the PSI section starting in a packet's payload, or None"""
+    pointer = packet[payload_start]
+    start = payload_start + 1 + pointer
+    if start + 3 > len(packet):
+        return None
+    section_length = ((packet[start + 1] & 0x0F) << 8) | packet[start + 2]
+    return packet[start:start + 3 + section_length]
+
+
+def _payload_start(packet):
+    """Offset of the payload in a TS packet, or None when it carries none"""
+    adaptation = (packet[3] >> 4) & 0x3
+    if not adaptation & 0x1:
+        return None
+    if adaptation & 0x2:
+        start = 5 + packet[4]
+        return start if start < TS_PACKET_SIZE else None
+    return 4
+
+
+def pes_pts(packet):
+    """PTS (90 kHz ticks) of the PES that starts in a packet, or None"""
+    payload_start = _payload_start(packet)
+    if payload_start is None:
+        return None
+    pes = bytes(packet[payload_start:payload_start + 14])
+    if len(pes) < 14 or pes[:3] != b'\x00\x00\x01' or not pes[7] & 0x80:
+        return None
+    return (
+        ((pes[9] >> 1) & 0x07) << 30 | pes[10] << 22 | (pes[11] >> 1) << 15 |
+        pes[12] << 7 | pes[13] >> 1
+    )
+
+
+def mark_discontinuity(data):
+    """
+    Return a copy of packet-aligned data with the discontinuity indicator set on
+    the first packet of each PID that carries an adaptation field, so decoders
+    reset their clock and continuity tracking at a splice
+    """
+    data = bytearray(data)
+    seen = set()
+    for offset in range(0, len(data) - TS_PACKET_SIZE + 1, TS_PACKET_SIZE):
+        if data[offset] != TS_SYNC_BYTE:
+            continue
+        pid = ((data[offset + 1] & 0x1F) << 8) | data[offset + 2]
+        if pid in seen:
+            continue
+        if data[offset + 3] & 0x20 and data[offset + 4] > 0:
+            data[offset + 5] |= 0x80
+            seen.add(pid)
+    return bytes(data)
+
+
+class TSIndexer:
+    """
+    Scans packet-aligned chunks of one stream, tracking PAT/PMT and keyframes.
+
+    Detection uses the adaptation field random access indicator when the
+    muxer sets it, and otherwise looks for H.264 IDR/SPS, HEVC IRAP/parameter
+    set or MPEG-2 sequence header start codes in the first packet of each
+    video PES. State carries across chunks, so a stream switch that changes
+    PIDs is picked up from the next PAT.
+    """
+
+    def __init__(self):
+        self.pmt_pids = set()
+        self.video_pid = None
+        self.codec = None
+        self.pat_packet = None
+        self.pmt_packet = None
+        self.psi_version = 0  # Bumped whenever the PAT/PMT packets change
+        self.keyframe_pts = None  # PTS of the keyframe last returned by scan(), if it carries one
+
+    @property
+    def psi(self):
+        """The latest PAT and PMT packets, to put in front of a keyframe join"""
+        if self.pat_packet is None or self.pmt_packet is None:
+            return None
+        return self.pat_packet + self.pmt_packet
+
+    def scan(self, data):
+        """Index one chunk and return the offset of its last keyframe packet, or None"""
+        keyframe_offset = None
+        data = memoryview(data)
+        for offset in range(0, len(data) - TS_PACKET_SIZE + 1, TS_PACKET_SIZE):
+            if data[offset] != TS_SYNC_BYTE:
+                continue
+            flags = data[offset + 1]
+            if not flags & 0x40:
+                # Only packets starting a PES or PSI section are of interest
+                continue
+            pid = ((flags & 0x1F) << 8) | data[offset + 2]
+
+            if pid == self.video_pid:
+                packet = data[offset:offset + TS_PACKET_SIZE]
+                if self._is_keyframe(packet):
+                    keyframe_offset = offset
+                    self.keyframe_pts = pes_pts(packet)
+            elif pid == PAT_PID:
+                self._parse_pat(bytes(data[offset:offset + TS_PACKET_SIZE]))
+            elif pid in self.pmt_pids:
+                self._parse_pmt(bytes(data[offset:offset + TS_PACKET_SIZE]))
+        return keyframe_offset
+
+    def _parse_pat(self, packet):
+        payload_start = _payload_start(packet)
+        section = _section(packet, payload_start) if payload_start is not None else None
+        if not section or section[0] != 0x00:
+            return
+
+        pmt_pids = set()
+        # Program loop runs from byte 8 up to the CRC
+        for pos in range(8, len(section) - 4 - 3, 4):
+            program_number = (section[pos] << 8) | section[pos + 1]
+            if program_number != 0:
+                pmt_pids.add(((section[pos + 2] & 0x1F) << 8) | section[pos + 3])
+
+        if pmt_pids != self.pmt_pids:
+            self.pmt_pids = pmt_pids
+            self.video_pid = None
+            self.codec = None
+            self.pmt_packet = None
+        self._set_psi('pat_packet', packet)
+
+    def _parse_pmt(self, packet):
+        payload_start = _payload_start(packet)
+        section = _section(packet, payload_start) if payload_start is not None else None
+        if not section or section[0] != 0x02 or len(section) < 12:
+            return
+
+        program_info_length = ((section[10] & 0x0F) << 8) | section[11]
+        pos = 12 + program_info_length
+        end = len(section) - 4
+        while pos + 5 <= end:
+            stream_type = section[pos]
+            elementary_pid = ((section[pos + 1] & 0x1F) << 8) | section[pos + 2]
+            es_info_length = ((section[pos + 3] & 0x0F) << 8) | section[pos + 4]
+            if stream_type in VIDEO_STREAM_TYPES:
+                self.video_pid = elementary_pid
+                self.codec = VIDEO_STREAM_TYPES[stream_type]
+                break
+            pos += 5 + es_info_length
+
+        self._set_psi('pmt_packet', packet)
+
+    def _set_psi(self, name, packet):
+        current = getattr(self, name)
+        # Byte 3 holds the continuity counter, which advances on every repetition
+        if current is None or current[:3] != packet[:3] or current[4:] != packet[4:]:
+            self.psi_version += 1
+        setattr(self, name, packet)
+
+    def _is_keyframe(self, packet):
+        adaptation = (packet[3] >> 4) & 0x3
+        if adaptation & 0x2 and packet[4] > 0 and packet[5] & 0x40:
+            # Random access indicator
+            return True
+
+        payload_start = _payload_start(packet)
+        if payload_start is None:
+            return False
+        pes = bytes(packet[payload_start:])
+        if len(pes) < 9 or pes[:3] != b'\x00\x00\x01':
+            return False
+        es = pes[9 + pes[8]:]
+
+        pos = es.find(b'\x00\x00\x01')
+        while pos != -1 and pos + 4 <= len(es):
+            code = es[pos + 3]
+            if self.codec == 'h264':
+                if code & 0x1F in H264_KEYFRAME_NALS:
+                    return True
+            elif self.codec == 'hevc':
+                if (code >> 1) & 0x3F in HEVC_KEYFRAME_NALS:
+                    return True
+            elif code in MPEG2_KEYFRAME_CODES:
+                return True
+            pos = es.find(b'\x00\x00\x01', pos + 3)
+        return False
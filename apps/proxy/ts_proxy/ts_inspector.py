@@ -0,0 +1,198 @@
+"""
+Vectorized MPEG-TS health inspection of buffer chunks.
+
+Each chunk is viewed as an (N, 188) uint8 array without copying, and every
+check is a whole-array NumPy operation: sync bytes, transport error
+indicators, continuity counter gaps per PID, PCR extraction and the packet
+mix per PID. This gives plain proxied streams the health signals that
+transcoded channels get from ffmpeg's stats, so a corrupt upstream can be
+detected (and failed over) without running ffprobe.
+"""
+
+import time
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - inspection is skipped without NumPy
+    np = None
+
+from .constants import TS_PACKET_SIZE, TS_SYNC_BYTE
+
+NULL_PID = 0x1FFF
+PCR_CLOCK = 27000000
+PCR_WRAP = (1 << 33) * 300
+MAX_PCR_GAP = PCR_CLOCK  # PCRs are sent at least every 100ms, a 1s jump is a discontinuity
+
+
+def inspection_available():
+    return np is not None
+
+
+class ChunkReport:
+    """Health counters for one inspected chunk"""
+
+    def __init__(self, packets):
+        self.packets = packets
+        self.sync_errors = 0
+        self.transport_errors = 0
+        self.cc_errors = 0
+        self.pcr_discontinuities = 0
+        self.pid_packets = {}
+
+    @property
+    def errors(self):
+        return self.sync_errors + self.transport_errors + self.cc_errors
+
+    @property
+    def error_ratio(self):
+        return self.errors / self.packets if self.packets else 0.0
+
+
+class TSInspector:
+    """
+    Tracks the health of one stream across packet-aligned chunks.
+
+    Continuity counters and the PCR clock carry over between chunks, so gaps
+    at chunk boundaries are counted too. The bitrate is measured between
+    PCRs of the stream's PCR PID and split across PIDs by packet count.
+    """
+
+    def __init__(self):
+        self._last_cc = {}  # pid -> last continuity counter seen on a payload packet
+        self._pcr_pid = None
+        self._last_pcr = None  # (pcr, packet position) of the last PCR on the PCR PID
+        self._position = 0  # packets inspected since the stream started
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Start a new reporting window"""
+        self.window_started = time.time()
+        self.packets = 0
+        self.sync_errors = 0
+        self.transport_errors = 0
+        self.cc_errors = 0
+        self.pcr_discontinuities = 0
+        self.pid_packets = {}
+        self._pcr_span = 0  # PCR ticks and packets between PCRs in this window
+        self._pcr_span_packets = 0
+
+    def inspect(self, data):
+        """Inspect one chunk, add it to the window and return its ChunkReport"""
+        count = len(data) // TS_PACKET_SIZE
+        report = ChunkReport(count)
+        if not count:
+            return report
+
+        packets = np.frombuffer(data, dtype=np.uint8, count=count * TS_PACKET_SIZE).reshape(count, TS_PACKET_SIZE)
+
+        synced = packets[:, 0] == TS_SYNC_BYTE
+        report.sync_errors = int(count - np.count_nonzero(synced))
+        if report.sync_errors:
+            # Fields of packets without a sync byte are garbage
+            packets = packets[synced]
+
+        pids = ((packets[:, 1].astype(np.uint16) & 0x1F) << 8) | packets[:, 2]
+        report.transport_errors = int(np.count_nonzero(packets[:, 1] & 0x80))
+
+        adaptation_control = packets[:, 3] >> 4
+        has_adaptation = (adaptation_control & 0x2).astype(bool) & (packets[:, 4] > 0)
+        adaptation_flags = np.where(has_adaptation, packets[:, 5], 0)
+
+        report.cc_errors = self._check_continuity(packets, pids, adaptation_control, adaptation_flags)
+        report.pcr_discontinuities = self._check_pcr(packets, pids, adaptation_flags)
+
+        unique_pids, pid_counts = np.unique(pids, return_counts=True)
+        report.pid_packets = dict(zip(unique_pids.tolist(), pid_counts.tolist()))
+
+        self._position += count
+        self._add_to_window(report)
+        return report
+
+    def _check_continuity(self, packets, pids, adaptation_control, adaptation_flags):
+        """Count continuity counter gaps per PID, including against the previous chunk"""
+        # Only payload-carrying packets advance the counter; null packets don't count
+        carries = (adaptation_control & 0x1).astype(bool) & (pids != NULL_PID)
+        pids = pids[carries].astype(np.int64)
+        counters = (packets[carries, 3] & 0x0F).astype(np.int64)
+        # The discontinuity indicator marks an allowed jump
+        allowed = (adaptation_flags[carries] & 0x80).astype(bool)
+        if not len(pids):
+            return 0
+
+        # Put each PID's last counter from the previous chunk ahead of its packets here
+        previous_pids = np.fromiter(self._last_cc.keys(), dtype=np.int64, count=len(self._last_cc))
+        previous_counters = np.fromiter(self._last_cc.values(), dtype=np.int64, count=len(self._last_cc))
+        all_pids = np.concatenate((previous_pids, pids))
+        all_counters = np.concatenate((previous_counters, counters))
+        all_allowed = np.concatenate((np.ones(len(previous_pids), dtype=bool), allowed))
+        order = np.lexsort((np.arange(len(all_pids)), all_pids))
+        all_pids, all_counters, all_allowed = all_pids[order], all_counters[order], all_allowed[order]
+
+        same_pid = all_pids[1:] == all_pids[:-1]
+        step = (all_counters[1:] - all_counters[:-1]) % 16
+        # A step of 0 is a permitted duplicate packet
+        errors = same_pid & (step != 1) & (step != 0) & ~all_allowed[1:]
+
+        # Remember the last counter of every PID for the next chunk
+        last = np.append(all_pids[1:] != all_pids[:-1], True)
+        self._last_cc = dict(zip(all_pids[last].tolist(), all_counters[last].tolist()))
+        return int(np.count_nonzero(errors))
+
+    def _check_pcr(self, packets, pids, adaptation_flags):
+        """Extract PCRs, accumulate the span used for bitrate and count PCR jumps"""
+        has_pcr = (adaptation_flags & 0x10).astype(bool) & (packets[:, 4] >= 7)
+        if not np.any(has_pcr):
+            return 0
+
+        pcr_pids = pids[has_pcr]
+        if self._pcr_pid is None or not np.any(pcr_pids == self._pcr_pid):
+            # Follow the PID carrying most PCRs (the program's PCR PID)
+            values, counts = np.unique(pcr_pids, return_counts=True)
+            self._pcr_pid = int(values[np.argmax(counts)])
+            self._last_pcr = None
+
+        rows = np.flatnonzero(has_pcr & (pids == self._pcr_pid))
+        fields = packets[rows, 6:12].astype(np.int64)
+        base = (fields[:, 0] << 25) | (fields[:, 1] << 17) | (fields[:, 2] << 9) | (fields[:, 3] << 1) | (fields[:, 4] >> 7)
+        pcrs = base * 300 + (((fields[:, 4] & 0x1) << 8) | fields[:, 5])
+        positions = self._position + rows
+        discontinuity = (adaptation_flags[rows] & 0x80).astype(bool)
+
+        if self._last_pcr is not None:
+            pcrs = np.insert(pcrs, 0, self._last_pcr[0])
+            positions = np.insert(positions, 0, self._last_pcr[1])
+            discontinuity = np.insert(discontinuity, 0, False)
+        self._last_pcr = (int(pcrs[-1]), int(positions[-1]))
+
+        ticks = (pcrs[1:] - pcrs[:-1]) % PCR_WRAP
+        jumps = discontinuity[1:] | (ticks == 0) | (ticks > MAX_PCR_GAP)
+        self._pcr_span += int(ticks[~jumps].sum())
+        self._pcr_span_packets += int((positions[1:] - positions[:-1])[~jumps].sum())
+        return int(np.count_nonzero(jumps & ~discontinuity[1:]))
+
+    def _add_to_window(self, report):
+        self.packets += report.packets
+        self.sync_errors += report.sync_errors
+        self.transport_errors += report.transport_errors
+        self.cc_errors += report.cc_errors
+        self.pcr_discontinuities += report.pcr_discontinuities
+        for pid, packets in report.pid_packets.items():
+            self.pid_packets[pid] = self.pid_packets.get(pid, 0) + packets
+
+    def bitrate(self):
+        """Stream bitrate in bits/s measured from PCRs in this window, or None"""
+        if not self._pcr_span:
+            return None
+        return self._pcr_span_packets * TS_PACKET_SIZE * 8 * PCR_CLOCK / self._pcr_span
+
+    def pid_bitrates(self):
+        """Bitrate in bits/s of every PID seen in this window, or {} without a PCR measurement"""
+        bitrate = self.bitrate()
+        if bitrate is None or not self.packets:
+            return {}
+        return {pid: bitrate * packets / self.packets for pid, packets in self.pid_packets.items()}
+
+    @property
+    def error_ratio(self):
+        errors = self.sync_errors + self.transport_errors + self.cc_errors
+        return errors / self.packets if self.packets else 0.0
@@ -5,6 +5,8 @@ app_name = 'ts_proxy'
 
 urlpatterns = [
     path('stream/<str:channel_id>', views.stream_ts, name='stream'),
+    path('hls/<str:channel_id>/index.m3u8', views.stream_hls, name='stream_hls'),
+    path('hls/<str:channel_id>/segments/<int:sequence>-<int:started_at>.ts', views.stream_hls_segment, name='stream_hls_segment'),
     path('change_stream/<str:channel_id>', views.change_stream, name='change_stream'),
     path('status', views.channel_status, name='channel_status'),
     path('status/<str:channel_id>', views.channel_status, name='channel_status_detail'),
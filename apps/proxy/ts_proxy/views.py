@@ -1,16 +1,18 @@
+import hashlib
 import json
 import threading
 import time
 import random
 import re
 import pathlib
-from django.http import StreamingHttpResponse, JsonResponse, HttpResponseRedirect
+from django.http import StreamingHttpResponse, JsonResponse, HttpResponse, HttpResponseRedirect
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import get_object_or_404
 from apps.proxy.config import TSConfig as Config
 from .server import ProxyServer
 from .channel_status import ChannelStatus
 from .stream_generator import create_stream_generator
+from .hls_output import build_playlist, read_segment
 from .utils import get_client_ip
 from .redis_keys import RedisKeys
 import logging
@@ -44,417 +46,436 @@ from dispatcharr.utils import network_access_allowed
 logger = get_logger()
 
 
-@api_view(["GET"])
-def stream_ts(request, channel_id):
-    if not network_access_allowed(request, "STREAMS"):
-        return JsonResponse({"error": "Forbidden"}, status=403)
-
-    """Stream TS data to client with immediate response and keep-alive packets during initialization"""
-    channel = get_stream_object(channel_id)
+def _prepare_channel(channel, channel_id, client_id, client_user_agent):
+    """
+    Make sure the channel is running, initializing it if needed, and has local
+    resources in this worker.
 
-    client_user_agent = None
+    Returns (channel_initializing, response); when response is not None it is
+    returned to the client instead of streaming (an error or a redirect).
+    """
     proxy_server = ProxyServer.get_instance()
 
-    try:
-        # Generate a unique client ID
-        client_id = f"client_{int(time.time() * 1000)}_{random.randint(1000, 9999)}"
-        client_ip = get_client_ip(request)
-        logger.info(f"[{client_id}] Requested stream for channel {channel_id}")
-
-        # Extract client user agent early
-        for header in ["HTTP_USER_AGENT", "User-Agent", "user-agent"]:
-            if header in request.META:
-                client_user_agent = request.META[header]
-                logger.debug(
-                    f"[{client_id}] Client connected with user agent: {client_user_agent}"
-                )
-                break
-
-        # Check if we need to reinitialize the channel
-        needs_initialization = True
-        channel_state = None
-        channel_initializing = False
+    # Check if we need to reinitialize the channel
+    needs_initialization = True
+    channel_state = None
+    channel_initializing = False
+
+    # Get current channel state from Redis if available
+    if proxy_server.redis_client:
+        metadata_key = RedisKeys.channel_metadata(channel_id)
+        if proxy_server.redis_client.exists(metadata_key):
+            metadata = proxy_server.redis_client.hgetall(metadata_key)
+            state_field = ChannelMetadataField.STATE.encode("utf-8")
+            if state_field in metadata:
+                channel_state = metadata[state_field].decode("utf-8")
+
+                if channel_state:
+                    # Channel is being initialized or already active - no need for reinitialization
+                    needs_initialization = False
+                    logger.debug(
+                        f"[{client_id}] Channel {channel_id} already in state {channel_state}, skipping initialization"
+                    )
 
-        # Get current channel state from Redis if available
-        if proxy_server.redis_client:
-            metadata_key = RedisKeys.channel_metadata(channel_id)
-            if proxy_server.redis_client.exists(metadata_key):
-                metadata = proxy_server.redis_client.hgetall(metadata_key)
-                state_field = ChannelMetadataField.STATE.encode("utf-8")
-                if state_field in metadata:
-                    channel_state = metadata[state_field].decode("utf-8")
-
-                    if channel_state:
-                        # Channel is being initialized or already active - no need for reinitialization
-                        needs_initialization = False
+                    # Special handling for initializing/connecting states
+                    if channel_state in [
+                        ChannelState.INITIALIZING,
+                        ChannelState.CONNECTING,
+                    ]:
+                        channel_initializing = True
                         logger.debug(
-                            f"[{client_id}] Channel {channel_id} already in state {channel_state}, skipping initialization"
+                            f"[{client_id}] Channel {channel_id} is still initializing, client will wait for completion"
                         )
-
-                        # Special handling for initializing/connecting states
-                        if channel_state in [
-                            ChannelState.INITIALIZING,
-                            ChannelState.CONNECTING,
-                        ]:
-                            channel_initializing = True
+                else:
+                    # Only check for owner if channel is in a valid state
+                    owner_field = ChannelMetadataField.OWNER.encode("utf-8")
+                    if owner_field in metadata:
+                        owner = metadata[owner_field].decode("utf-8")
+                        owner_heartbeat_key = f"ts_proxy:worker:{owner}:heartbeat"
+                        if proxy_server.redis_client.exists(owner_heartbeat_key):
+                            # Owner is still active, so we don't need to reinitialize
+                            needs_initialization = False
                             logger.debug(
-                                f"[{client_id}] Channel {channel_id} is still initializing, client will wait for completion"
+                                f"[{client_id}] Channel {channel_id} has active owner {owner}"
                             )
-                    else:
-                        # Only check for owner if channel is in a valid state
-                        owner_field = ChannelMetadataField.OWNER.encode("utf-8")
-                        if owner_field in metadata:
-                            owner = metadata[owner_field].decode("utf-8")
-                            owner_heartbeat_key = f"ts_proxy:worker:{owner}:heartbeat"
-                            if proxy_server.redis_client.exists(owner_heartbeat_key):
-                                # Owner is still active, so we don't need to reinitialize
-                                needs_initialization = False
-                                logger.debug(
-                                    f"[{client_id}] Channel {channel_id} has active owner {owner}"
-                                )
 
-        # Start initialization if needed
-        if needs_initialization or not proxy_server.check_if_channel_exists(channel_id):
-            logger.info(f"[{client_id}] Starting channel {channel_id} initialization")
-            # Force cleanup of any previous instance if in terminal state
-            if channel_state in [
-                ChannelState.ERROR,
-                ChannelState.STOPPING,
-                ChannelState.STOPPED,
-            ]:
-                logger.warning(
-                    f"[{client_id}] Channel {channel_id} in state {channel_state}, forcing cleanup"
-                )
-                ChannelService.stop_channel(channel_id)
-
-            # Use fixed retry interval and timeout
-            retry_timeout = 3  # 3 seconds total timeout
-            retry_interval = 0.1  # 100ms between attempts
-            wait_start_time = time.time()
-
-            stream_url = None
-            stream_user_agent = None
-            transcode = False
-            profile_value = None
-            error_reason = None
-            attempt = 0
-            should_retry = True
-
-            # Try to get a stream with fixed interval retries
-            while should_retry and time.time() - wait_start_time < retry_timeout:
-                attempt += 1
-                stream_url, stream_user_agent, transcode, profile_value = (
-                    generate_stream_url(channel_id)
+    # Start initialization if needed
+    if needs_initialization or not proxy_server.check_if_channel_exists(channel_id):
+        logger.info(f"[{client_id}] Starting channel {channel_id} initialization")
+        # Force cleanup of any previous instance if in terminal state
+        if channel_state in [
+            ChannelState.ERROR,
+            ChannelState.STOPPING,
+            ChannelState.STOPPED,
+        ]:
+            logger.warning(
+                f"[{client_id}] Channel {channel_id} in state {channel_state}, forcing cleanup"
+            )
+            ChannelService.stop_channel(channel_id)
+
+        # Use fixed retry interval and timeout
+        retry_timeout = 3  # 3 seconds total timeout
+        retry_interval = 0.1  # 100ms between attempts
+        wait_start_time = time.time()
+
+        stream_url = None
+        stream_user_agent = None
+        transcode = False
+        profile_value = None
+        error_reason = None
+        attempt = 0
+        should_retry = True
+
+        # Try to get a stream with fixed interval retries
+        while should_retry and time.time() - wait_start_time < retry_timeout:
+            attempt += 1
+            stream_url, stream_user_agent, transcode, profile_value = (
+                generate_stream_url(channel_id)
+            )
+
+            if stream_url is not None:
+                logger.info(
+                    f"[{client_id}] Successfully obtained stream for channel {channel_id} after {attempt} attempts"
                 )
+                break
 
-                if stream_url is not None:
-                    logger.info(
-                        f"[{client_id}] Successfully obtained stream for channel {channel_id} after {attempt} attempts"
+            # On first failure, check if the error is retryable
+            if attempt == 1:
+                _, _, error_reason = channel.get_stream()
+                if error_reason and "maximum connection limits" not in error_reason:
+                    logger.warning(
+                        f"[{client_id}] Can't retry - error not related to connection limits: {error_reason}"
                     )
+                    should_retry = False
                     break
 
-                # On first failure, check if the error is retryable
-                if attempt == 1:
-                    _, _, error_reason = channel.get_stream()
-                    if error_reason and "maximum connection limits" not in error_reason:
-                        logger.warning(
-                            f"[{client_id}] Can't retry - error not related to connection limits: {error_reason}"
-                        )
-                        should_retry = False
-                        break
-
-                # Check if we have time remaining for another sleep cycle
-                elapsed_time = time.time() - wait_start_time
-                remaining_time = retry_timeout - elapsed_time
+            # Check if we have time remaining for another sleep cycle
+            elapsed_time = time.time() - wait_start_time
+            remaining_time = retry_timeout - elapsed_time
 
-                # If we don't have enough time for the next sleep interval, break
-                # but only after we've already made an attempt (the while condition will try one more time)
-                if remaining_time <= retry_interval:
-                    logger.info(
-                        f"[{client_id}] Insufficient time ({remaining_time:.1f}s) for another sleep cycle, will make one final attempt"
-                    )
-                    break
-
-                # Wait before retrying
+            # If we don't have enough time for the next sleep interval, break
+            # but only after we've already made an attempt (the while condition will try one more time)
+            if remaining_time <= retry_interval:
                 logger.info(
-                    f"[{client_id}] Waiting {retry_interval*1000:.0f}ms for a connection to become available (attempt {attempt}, {remaining_time:.1f}s remaining)"
+                    f"[{client_id}] Insufficient time ({remaining_time:.1f}s) for another sleep cycle, will make one final attempt"
                 )
-                gevent.sleep(retry_interval)
-                retry_interval += 0.025  # Increase wait time by 25ms for next attempt
+                break
 
-            # Make one final attempt if we still don't have a stream, should retry, and haven't exceeded timeout
-            if stream_url is None and should_retry and time.time() - wait_start_time < retry_timeout:
-                attempt += 1
-                logger.info(
-                    f"[{client_id}] Making final attempt {attempt} at timeout boundary"
-                )
-                stream_url, stream_user_agent, transcode, profile_value = (
-                    generate_stream_url(channel_id)
-                )
-                if stream_url is not None:
-                    logger.info(
-                        f"[{client_id}] Successfully obtained stream on final attempt for channel {channel_id}"
-                    )
+            # Wait before retrying
+            logger.info(
+                f"[{client_id}] Waiting {retry_interval*1000:.0f}ms for a connection to become available (attempt {attempt}, {remaining_time:.1f}s remaining)"
+            )
+            gevent.sleep(retry_interval)
+            retry_interval += 0.025  # Increase wait time by 25ms for next attempt
 
-            if stream_url is None:
-                # Release the channel's stream lock if one was acquired
-                # Note: Only call this if get_stream() actually assigned a stream
-                # In our case, if stream_url is None, no stream was ever assigned, so don't release
-
-                # Get the specific error message if available
-                wait_duration = f"{int(time.time() - wait_start_time)}s"
-                error_msg = (
-                    error_reason
-                    if error_reason
-                    else "No available streams for this channel"
-                )
+        # Make one final attempt if we still don't have a stream, should retry, and haven't exceeded timeout
+        if stream_url is None and should_retry and time.time() - wait_start_time < retry_timeout:
+            attempt += 1
+            logger.info(
+                f"[{client_id}] Making final attempt {attempt} at timeout boundary"
+            )
+            stream_url, stream_user_agent, transcode, profile_value = (
+                generate_stream_url(channel_id)
+            )
+            if stream_url is not None:
                 logger.info(
-                    f"[{client_id}] Failed to obtain stream after {attempt} attempts over {wait_duration}: {error_msg}"
+                    f"[{client_id}] Successfully obtained stream on final attempt for channel {channel_id}"
                 )
-                return JsonResponse(
-                    {"error": error_msg, "waited": wait_duration}, status=503
-                )  # 503 Service Unavailable is appropriate here
 
-            # Get the stream ID from the channel
-            stream_id, m3u_profile_id, _ = channel.get_stream()
+        if stream_url is None:
+            # Release the channel's stream lock if one was acquired
+            # Note: Only call this if get_stream() actually assigned a stream
+            # In our case, if stream_url is None, no stream was ever assigned, so don't release
+
+            # Get the specific error message if available
+            wait_duration = f"{int(time.time() - wait_start_time)}s"
+            error_msg = (
+                error_reason
+                if error_reason
+                else "No available streams for this channel"
+            )
             logger.info(
-                f"Channel {channel_id} using stream ID {stream_id}, m3u account profile ID {m3u_profile_id}"
+                f"[{client_id}] Failed to obtain stream after {attempt} attempts over {wait_duration}: {error_msg}"
             )
+            return False, JsonResponse(
+                {"error": error_msg, "waited": wait_duration}, status=503
+            )  # 503 Service Unavailable is appropriate here
 
-            # Generate transcode command if needed
-            stream_profile = channel.get_stream_profile()
-            if stream_profile.is_redirect():
-                # Validate the stream URL before redirecting
-                from .url_utils import (
-                    validate_stream_url,
-                    get_alternate_streams,
-                    get_stream_info_for_switch,
-                )
+        # Get the stream ID from the channel
+        stream_id, m3u_profile_id, _ = channel.get_stream()
+        logger.info(
+            f"Channel {channel_id} using stream ID {stream_id}, m3u account profile ID {m3u_profile_id}"
+        )
 
-                # Try initial URL
-                logger.info(f"[{client_id}] Validating redirect URL: {stream_url}")
-                is_valid, final_url, status_code, message = validate_stream_url(
-                    stream_url, user_agent=stream_user_agent, timeout=(5, 5)
-                )
+        # Generate transcode command if needed
+        stream_profile = channel.get_stream_profile()
+        if stream_profile.is_redirect():
+            # Validate the stream URL before redirecting
+            from .url_utils import (
+                validate_stream_url,
+                get_alternate_streams,
+                get_stream_info_for_switch,
+            )
 
-                # If first URL doesn't validate, try alternates
-                if not is_valid:
-                    logger.warning(
-                        f"[{client_id}] Primary stream URL failed validation: {message}"
-                    )
+            # Try initial URL
+            logger.info(f"[{client_id}] Validating redirect URL: {stream_url}")
+            is_valid, final_url, status_code, message = validate_stream_url(
+                stream_url, user_agent=stream_user_agent, timeout=(5, 5)
+            )
 
-                    # Track tried streams to avoid loops
-                    tried_streams = {stream_id}
+            # If first URL doesn't validate, try alternates
+            if not is_valid:
+                logger.warning(
+                    f"[{client_id}] Primary stream URL failed validation: {message}"
+                )
 
-                    # Get alternate streams
-                    alternates = get_alternate_streams(channel_id, stream_id)
+                # Track tried streams to avoid loops
+                tried_streams = {stream_id}
 
-                    # Try each alternate until one works
-                    for alt in alternates:
-                        if alt["stream_id"] in tried_streams:
-                            continue
+                # Get alternate streams
+                alternates = get_alternate_streams(channel_id, stream_id)
 
-                        tried_streams.add(alt["stream_id"])
+                # Try each alternate until one works
+                for alt in alternates:
+                    if alt["stream_id"] in tried_streams:
+                        continue
 
-                        # Get stream info
-                        alt_info = get_stream_info_for_switch(
-                            channel_id, alt["stream_id"]
-                        )
-                        if "error" in alt_info:
-                            logger.warning(
-                                f"[{client_id}] Error getting alternate stream info: {alt_info['error']}"
-                            )
-                            continue
+                    tried_streams.add(alt["stream_id"])
 
-                        # Validate the alternate URL
-                        logger.info(
-                            f"[{client_id}] Trying alternate stream #{alt['stream_id']}: {alt_info['url']}"
-                        )
-                        is_valid, final_url, status_code, message = validate_stream_url(
-                            alt_info["url"],
-                            user_agent=alt_info["user_agent"],
-                            timeout=(5, 5),
+                    # Get stream info
+                    alt_info = get_stream_info_for_switch(
+                        channel_id, alt["stream_id"]
+                    )
+                    if "error" in alt_info:
+                        logger.warning(
+                            f"[{client_id}] Error getting alternate stream info: {alt_info['error']}"
                         )
+                        continue
 
-                        if is_valid:
-                            logger.info(
-                                f"[{client_id}] Alternate stream #{alt['stream_id']} validated successfully"
-                            )
-                            break
-                        else:
-                            logger.warning(
-                                f"[{client_id}] Alternate stream #{alt['stream_id']} failed validation: {message}"
-                            )
-                # Release stream lock before redirecting
-                channel.release_stream()
-                # Final decision based on validation results
-                if is_valid:
+                    # Validate the alternate URL
                     logger.info(
-                        f"[{client_id}] Redirecting to validated URL: {final_url} ({message})"
+                        f"[{client_id}] Trying alternate stream #{alt['stream_id']}: {alt_info['url']}"
                     )
-                    return HttpResponseRedirect(final_url)
-                else:
-                    logger.error(
-                        f"[{client_id}] All available redirect URLs failed validation"
+                    is_valid, final_url, status_code, message = validate_stream_url(
+                        alt_info["url"],
+                        user_agent=alt_info["user_agent"],
+                        timeout=(5, 5),
                     )
-                    return JsonResponse(
-                        {"error": "All available streams failed validation"}, status=502
-                    )  # 502 Bad Gateway
-
-            # Initialize channel with the stream's user agent (not the client's)
-            success = ChannelService.initialize_channel(
-                channel_id,
-                stream_url,
-                stream_user_agent,
-                transcode,
-                profile_value,
-                stream_id,
-                m3u_profile_id,
-            )
 
-            if not success:
-                return JsonResponse(
-                    {"error": "Failed to initialize channel"}, status=500
+                    if is_valid:
+                        logger.info(
+                            f"[{client_id}] Alternate stream #{alt['stream_id']} validated successfully"
+                        )
+                        break
+                    else:
+                        logger.warning(
+                            f"[{client_id}] Alternate stream #{alt['stream_id']} failed validation: {message}"
+                        )
+            # Release stream lock before redirecting
+            channel.release_stream()
+            # Final decision based on validation results
+            if is_valid:
+                logger.info(
+                    f"[{client_id}] Redirecting to validated URL: {final_url} ({message})"
                 )
+                return False, HttpResponseRedirect(final_url)
+            else:
+                logger.error(
+                    f"[{client_id}] All available redirect URLs failed validation"
+                )
+                return False, JsonResponse(
+                    {"error": "All available streams failed validation"}, status=502
+                )  # 502 Bad Gateway
 
-            # If we're the owner, wait for connection to establish
-            if proxy_server.am_i_owner(channel_id):
-                manager = proxy_server.stream_managers.get(channel_id)
-                if manager:
-                    wait_start = time.time()
-                    timeout = ConfigHelper.connection_timeout()
-                    while not manager.connected:
-                        if time.time() - wait_start > timeout:
-                            proxy_server.stop_channel(channel_id)
-                            return JsonResponse(
-                                {"error": "Connection timeout"}, status=504
-                            )
+        # Initialize channel with the stream's user agent (not the client's)
+        success = ChannelService.initialize_channel(
+            channel_id,
+            stream_url,
+            stream_user_agent,
+            transcode,
+            profile_value,
+            stream_id,
+            m3u_profile_id,
+        )
+
+        if not success:
+            return False, JsonResponse(
+                {"error": "Failed to initialize channel"}, status=500
+            )
 
-                        # Check if this manager should keep retrying or stop
-                        if not manager.should_retry():
-                            # Check channel state in Redis to make a better decision
-                            metadata_key = RedisKeys.channel_metadata(channel_id)
-                            current_state = None
+        # If we're the owner, wait for connection to establish
+        if proxy_server.am_i_owner(channel_id):
+            manager = proxy_server.stream_managers.get(channel_id)
+            if manager:
+                wait_start = time.time()
+                timeout = ConfigHelper.connection_timeout()
+                while not manager.connected:
+                    if time.time() - wait_start > timeout:
+                        proxy_server.stop_channel(channel_id)
+                        return False, JsonResponse(
+                            {"error": "Connection timeout"}, status=504
+                        )
 
-                            if proxy_server.redis_client:
-                                try:
-                                    state_bytes = proxy_server.redis_client.hget(
-                                        metadata_key, ChannelMetadataField.STATE
-                                    )
-                                    if state_bytes:
-                                        current_state = state_bytes.decode("utf-8")
-                                        logger.debug(
-                                            f"[{client_id}] Current state of channel {channel_id}: {current_state}"
-                                        )
-                                except Exception as e:
-                                    logger.warning(
-                                        f"[{client_id}] Error getting channel state: {e}"
-                                    )
+                    # Check if this manager should keep retrying or stop
+                    if not manager.should_retry():
+                        # Check channel state in Redis to make a better decision
+                        metadata_key = RedisKeys.channel_metadata(channel_id)
+                        current_state = None
 
-                            # Allow normal transitional states to continue
-                            if current_state in [
-                                ChannelState.INITIALIZING,
-                                ChannelState.CONNECTING,
-                            ]:
-                                logger.info(
-                                    f"[{client_id}] Channel {channel_id} is in {current_state} state, continuing to wait"
+                        if proxy_server.redis_client:
+                            try:
+                                state_bytes = proxy_server.redis_client.hget(
+                                    metadata_key, ChannelMetadataField.STATE
                                 )
-                                # Reset wait timer to allow the transition to complete
-                                wait_start = time.time()
-                                continue
-
-                            # Check if we're switching URLs
-                            if (
-                                hasattr(manager, "url_switching")
-                                and manager.url_switching
-                            ):
-                                logger.info(
-                                    f"[{client_id}] Stream manager is currently switching URLs for channel {channel_id}"
+                                if state_bytes:
+                                    current_state = state_bytes.decode("utf-8")
+                                    logger.debug(
+                                        f"[{client_id}] Current state of channel {channel_id}: {current_state}"
+                                    )
+                            except Exception as e:
+                                logger.warning(
+                                    f"[{client_id}] Error getting channel state: {e}"
                                 )
-                                # Reset wait timer to give the switch a chance
-                                wait_start = time.time()
-                                continue
 
-                            # If we reach here, we've exhausted retries and the channel isn't in a valid transitional state
-                            logger.warning(
-                                f"[{client_id}] Channel {channel_id} failed to connect and is not in transitional state"
+                        # Allow normal transitional states to continue
+                        if current_state in [
+                            ChannelState.INITIALIZING,
+                            ChannelState.CONNECTING,
+                        ]:
+                            logger.info(
+                                f"[{client_id}] Channel {channel_id} is in {current_state} state, continuing to wait"
                             )
-                            proxy_server.stop_channel(channel_id)
-                            return JsonResponse(
-                                {"error": "Failed to connect"}, status=502
+                            # Reset wait timer to allow the transition to complete
+                            wait_start = time.time()
+                            continue
+
+                        # Check if we're switching URLs
+                        if (
+                            hasattr(manager, "url_switching")
+                            and manager.url_switching
+                        ):
+                            logger.info(
+                                f"[{client_id}] Stream manager is currently switching URLs for channel {channel_id}"
                             )
+                            # Reset wait timer to give the switch a chance
+                            wait_start = time.time()
+                            continue
 
-                        gevent.sleep(
-                            0.1
-                        )  # FIXED: Using gevent.sleep instead of time.sleep
+                        # If we reach here, we've exhausted retries and the channel isn't in a valid transitional state
+                        logger.warning(
+                            f"[{client_id}] Channel {channel_id} failed to connect and is not in transitional state"
+                        )
+                        proxy_server.stop_channel(channel_id)
+                        return False, JsonResponse(
+                            {"error": "Failed to connect"}, status=502
+                        )
 
-            logger.info(f"[{client_id}] Successfully initialized channel {channel_id}")
-            channel_initializing = True
+                    gevent.sleep(
+                        0.1
+                    )  # FIXED: Using gevent.sleep instead of time.sleep
+
+        logger.info(f"[{client_id}] Successfully initialized channel {channel_id}")
+        channel_initializing = True
+
+    # Register client - can do this regardless of initialization state
+    # Create local resources if needed
+    if (
+        channel_id not in proxy_server.stream_buffers
+        or channel_id not in proxy_server.client_managers
+    ):
+        logger.debug(
+            f"[{client_id}] Channel {channel_id} exists in Redis but not initialized in this worker - initializing now"
+        )
 
-        # Register client - can do this regardless of initialization state
-        # Create local resources if needed
-        if (
-            channel_id not in proxy_server.stream_buffers
-            or channel_id not in proxy_server.client_managers
-        ):
-            logger.debug(
-                f"[{client_id}] Channel {channel_id} exists in Redis but not initialized in this worker - initializing now"
-            )
+        # Get URL from Redis metadata
+        url = None
+        stream_user_agent = None  # Initialize the variable
 
-            # Get URL from Redis metadata
-            url = None
-            stream_user_agent = None  # Initialize the variable
+        if proxy_server.redis_client:
+            metadata_key = RedisKeys.channel_metadata(channel_id)
+            url_bytes = proxy_server.redis_client.hget(
+                metadata_key, ChannelMetadataField.URL
+            )
+            ua_bytes = proxy_server.redis_client.hget(
+                metadata_key, ChannelMetadataField.USER_AGENT
+            )
+            profile_bytes = proxy_server.redis_client.hget(
+                metadata_key, ChannelMetadataField.STREAM_PROFILE
+            )
 
-            if proxy_server.redis_client:
-                metadata_key = RedisKeys.channel_metadata(channel_id)
-                url_bytes = proxy_server.redis_client.hget(
-                    metadata_key, ChannelMetadataField.URL
+            if url_bytes:
+                url = url_bytes.decode("utf-8")
+            if ua_bytes:
+                stream_user_agent = ua_bytes.decode("utf-8")
+            # Extract transcode setting from Redis
+            if profile_bytes:
+                profile_str = profile_bytes.decode("utf-8")
+                use_transcode = (
+                    profile_str == PROXY_PROFILE_NAME or profile_str == "None"
                 )
-                ua_bytes = proxy_server.redis_client.hget(
-                    metadata_key, ChannelMetadataField.USER_AGENT
+                logger.debug(
+                    f"Using profile '{profile_str}' for channel {channel_id}, transcode={use_transcode}"
                 )
-                profile_bytes = proxy_server.redis_client.hget(
-                    metadata_key, ChannelMetadataField.STREAM_PROFILE
+            else:
+                # Default settings when profile not found in Redis
+                profile_str = "None"  # Default profile name
+                use_transcode = (
+                    False  # Default to direct streaming without transcoding
+                )
+                logger.debug(
+                    f"No profile found in Redis for channel {channel_id}, defaulting to transcode={use_transcode}"
                 )
 
-                if url_bytes:
-                    url = url_bytes.decode("utf-8")
-                if ua_bytes:
-                    stream_user_agent = ua_bytes.decode("utf-8")
-                # Extract transcode setting from Redis
-                if profile_bytes:
-                    profile_str = profile_bytes.decode("utf-8")
-                    use_transcode = (
-                        profile_str == PROXY_PROFILE_NAME or profile_str == "None"
-                    )
-                    logger.debug(
-                        f"Using profile '{profile_str}' for channel {channel_id}, transcode={use_transcode}"
-                    )
-                else:
-                    # Default settings when profile not found in Redis
-                    profile_str = "None"  # Default profile name
-                    use_transcode = (
-                        False  # Default to direct streaming without transcoding
-                    )
-                    logger.debug(
-                        f"No profile found in Redis for channel {channel_id}, defaulting to transcode={use_transcode}"
-                    )
-
-            # Use client_user_agent as fallback if stream_user_agent is None
-            success = proxy_server.initialize_channel(
-                url, channel_id, stream_user_agent or client_user_agent, use_transcode
+        # Use client_user_agent as fallback if stream_user_agent is None
+        success = proxy_server.initialize_channel(
+            url, channel_id, stream_user_agent or client_user_agent, use_transcode
+        )
+        if not success:
+            logger.error(
+                f"[{client_id}] Failed to initialize channel {channel_id} locally"
             )
-            if not success:
-                logger.error(
-                    f"[{client_id}] Failed to initialize channel {channel_id} locally"
-                )
-                return JsonResponse(
-                    {"error": "Failed to initialize channel locally"}, status=500
+            return False, JsonResponse(
+                {"error": "Failed to initialize channel locally"}, status=500
+            )
+
+        logger.info(
+            f"[{client_id}] Successfully initialized channel {channel_id} locally"
+        )
+
+    return channel_initializing, None
+
+
+@api_view(["GET"])
+def stream_ts(request, channel_id):
+    if not network_access_allowed(request, "STREAMS"):
+        return JsonResponse({"error": "Forbidden"}, status=403)
+
+    """Stream TS data to client with immediate response and keep-alive packets during initialization"""
+    channel = get_stream_object(channel_id)
+
+    client_user_agent = None
+    proxy_server = ProxyServer.get_instance()
+
+    try:
+        # Generate a unique client ID
+        client_id = f"client_{int(time.time() * 1000)}_{random.randint(1000, 9999)}"
+        client_ip = get_client_ip(request)
+        logger.info(f"[{client_id}] Requested stream for channel {channel_id}")
+
+        # Extract client user agent early
+        for header in ["HTTP_USER_AGENT", "User-Agent", "user-agent"]:
+            if header in request.META:
+                client_user_agent = request.META[header]
+                logger.debug(
+                    f"[{client_id}] Client connected with user agent: {client_user_agent}"
                 )
+                break
 
-            logger.info(
-                f"[{client_id}] Successfully initialized channel {channel_id} locally"
-            )
+        channel_initializing, response = _prepare_channel(
+            channel, channel_id, client_id, client_user_agent
+        )
+        if response is not None:
+            return response
 
         # Register client
         buffer = proxy_server.stream_buffers[channel_id]
@@ -479,6 +500,84 @@ def stream_ts(request, channel_id):
         return JsonResponse({"error": str(e)}, status=500)
 
 
+def _hls_client_id(client_ip, user_agent):
+    """Stable ID for an HLS viewer, whose requests don't share a connection"""
+    digest = hashlib.sha1(f"{client_ip}|{user_agent}".encode("utf-8")).hexdigest()[:12]
+    return f"hls_{digest}"
+
+
+@api_view(["GET"])
+def stream_hls(request, channel_id):
+    """Rolling HLS playlist of a channel, segmented from the same buffer as stream_ts"""
+    if not network_access_allowed(request, "STREAMS"):
+        return JsonResponse({"error": "Forbidden"}, status=403)
+    if not ConfigHelper.hls_output():
+        return JsonResponse({"error": "HLS output is disabled"}, status=404)
+
+    channel = get_stream_object(channel_id)
+    proxy_server = ProxyServer.get_instance()
+    if not proxy_server.redis_client:
+        return JsonResponse({"error": "HLS output requires Redis"}, status=503)
+
+    try:
+        client_ip = get_client_ip(request)
+        client_user_agent = request.META.get("HTTP_USER_AGENT")
+        client_id = _hls_client_id(client_ip, client_user_agent)
+        logger.debug(f"[{client_id}] Requested HLS playlist for channel {channel_id}")
+
+        _, response = _prepare_channel(channel, channel_id, client_id, client_user_agent)
+        if response is not None:
+            return response
+        proxy_server.client_managers[channel_id].touch_client(client_id, client_ip, client_user_agent)
+
+        # A channel that just started has no playlist until its first segment is cut
+        timeout = ConfigHelper.connection_timeout() + ConfigHelper.hls_segment_seconds() * 2
+        wait_start = time.time()
+        playlist = build_playlist(proxy_server.redis_client, channel_id)
+        while playlist is None:
+            if time.time() - wait_start > timeout:
+                response = JsonResponse({"error": "No HLS segments available yet"}, status=503)
+                response["Retry-After"] = str(int(ConfigHelper.hls_segment_seconds()))
+                return response
+            gevent.sleep(0.5)
+            playlist = build_playlist(proxy_server.redis_client, channel_id)
+
+        response = HttpResponse(playlist, content_type="application/vnd.apple.mpegurl")
+        response["Cache-Control"] = "no-cache"
+        return response
+
+    except Exception as e:
+        logger.error(f"Error in stream_hls: {e}", exc_info=True)
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@api_view(["GET"])
+def stream_hls_segment(request, channel_id, sequence, started_at):
+    """One HLS segment, assembled from buffer chunks. Segments never change once listed."""
+    if not network_access_allowed(request, "STREAMS"):
+        return JsonResponse({"error": "Forbidden"}, status=403)
+
+    proxy_server = ProxyServer.get_instance()
+    if not proxy_server.redis_client:
+        return JsonResponse({"error": "HLS output requires Redis"}, status=503)
+
+    try:
+        data = read_segment(
+            proxy_server.redis_client, channel_id, sequence, started_at,
+            buffer=proxy_server.stream_buffers.get(channel_id),
+        )
+        if data is None:
+            return JsonResponse({"error": "Segment not found"}, status=404)
+
+        response = HttpResponse(data, content_type="video/mp2t")
+        response["Cache-Control"] = "public, max-age=86400, immutable"
+        return response
+
+    except Exception as e:
+        logger.error(f"Error in stream_hls_segment: {e}", exc_info=True)
+        return JsonResponse({"error": str(e)}, status=500)
+
+
 @api_view(["GET"])
 def stream_xc(request, username, password, channel_id):
     user = get_object_or_404(User, username=username)
@@ -0,0 +1,305 @@
+"""
+Disk cache of VOD bytes in fixed-size blocks.
+
+Files are cached per content item in VOD_BLOCK_CACHE_BLOCK_SIZE blocks aligned
+to the start of the file, so overlapping or repeated ranges (seeks, players
+re-reading the MP4 moov atom, parallel ranges at startup) are served from disk
+and only blocks that aren't cached yet are requested from the provider. Blocks
+are keyed by content UUID and file size, so a different file for the same
+content (another provider, a re-encode) never mixes with cached blocks.
+
+The cache is shared by every worker on the host, bounded in size, and evicts
+the least recently read blocks first. Hit and miss byte counts are kept in
+Redis for VODStatsView.
+"""
+import logging
+import os
+import time
+import uuid
+
+from django.conf import settings
+
+from core.utils import RedisClient
+
+logger = logging.getLogger("vod_proxy")
+
+STATS_KEY = "vod_proxy:block_cache:stats"
+EVICT_INTERVAL = 60
+EVICT_TARGET = 0.9  # Evict down to this fraction of VOD_BLOCK_CACHE_MAX_BYTES
+EVICT_WRITE_FRACTION = 0.05  # Also scan once this fraction of the budget was written since the last scan
+TOUCH_INTERVAL = 60  # Only bump a block's LRU position this often
+STALE_TMP_AGE = 300
+
+_last_evict = 0
+_written_since_evict = 0
+
+
+def enabled():
+    return settings.VOD_BLOCK_CACHE_MAX_BYTES > 0
+
+
+def cache_key(content_uuid, content_length):
+    return f"{content_uuid}-{content_length}"
+
+
+def response_range(response, content_length):
+    """(first, last) byte of the file that an upstream response carries"""
+    content_range = response.headers.get("Content-Range", "")
+    if response.status_code == 206 and content_range.startswith("bytes "):
+        first, last = content_range[len("bytes "):].split("/")[0].split("-")
+        return int(first), int(last)
+    return 0, content_length - 1
+
+
+def _block_path(key, block):
+    return os.path.join(settings.VOD_BLOCK_CACHE_DIR, key[:2], key, f"{block}.blk")
+
+
+def _block_size(content_length, block):
+    """Size of a block; the last block of a file is usually short"""
+    block_size = settings.VOD_BLOCK_CACHE_BLOCK_SIZE
+    return min(block_size, content_length - block * block_size)
+
+
+def has_block(key, block, content_length):
+    try:
+        return os.path.getsize(_block_path(key, block)) == _block_size(content_length, block)
+    except OSError:
+        return False
+
+
+def read_block(key, block, content_length):
+    """A cached block, or None if it isn't cached (or is incomplete)"""
+    path = _block_path(key, block)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) != _block_size(content_length, block):
+        return None
+    _touch(path)
+    return data
+
+
+def write_block(key, block, data):
+    global _written_since_evict
+    path = _block_path(key, block)
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Error writing VOD cache block {key}/{block}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return
+    _written_since_evict += len(data)
+    _maybe_evict()
+
+
+def _touch(path):
+    """Mark a block as recently used for LRU eviction (mtime is the access clock)."""
+    try:
+        if time.time() - os.path.getmtime(path) > TOUCH_INTERVAL:
+            os.utime(path)
+    except OSError:
+        pass
+
+
+def _maybe_evict():
+    global _last_evict, _written_since_evict
+    max_bytes = settings.VOD_BLOCK_CACHE_MAX_BYTES
+    if (
+        time.monotonic() - _last_evict < EVICT_INTERVAL
+        and _written_since_evict < max_bytes * EVICT_WRITE_FRACTION
+    ):
+        return
+    _last_evict = time.monotonic()
+    _written_since_evict = 0
+    evict(settings.VOD_BLOCK_CACHE_DIR, max_bytes)
+
+
+def evict(cache_dir, max_bytes):
+    """
+    Trim the cache to below max_bytes, least recently read blocks first.
+    Returns the number of blocks removed.
+    """
+    blocks = []
+    now = time.time()
+    try:
+        for shard in os.scandir(cache_dir):
+            if not shard.is_dir():
+                continue
+            for content in os.scandir(shard.path):
+                if not content.is_dir():
+                    continue
+                for entry in os.scandir(content.path):
+                    stat = entry.stat()
+                    if entry.name.endswith(".tmp"):
+                        # Left behind by a crashed worker
+                        if now - stat.st_mtime > STALE_TMP_AGE:
+                            os.remove(entry.path)
+                        continue
+                    blocks.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError as e:
+        logger.debug(f"Error scanning VOD block cache: {e}")
+        return 0
+
+    total = sum(size for _, size, _ in blocks)
+    removed = 0
+    if total > max_bytes:
+        for _, size, path in sorted(blocks):
+            if total <= max_bytes * EVICT_TARGET:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        if removed:
+            logger.debug(f"Evicted {removed} VOD cache blocks, {total} bytes remain")
+
+    redis_client = RedisClient.get_client()
+    if redis_client is not None:
+        try:
+            redis_client.hset(STATS_KEY, "disk_bytes", total)
+        except Exception:
+            pass
+    return removed
+
+
+def record_usage(hit_bytes, miss_bytes):
+    """Count bytes served from the cache and from the provider"""
+    redis_client = RedisClient.get_client()
+    if redis_client is None or not (hit_bytes or miss_bytes):
+        return
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hincrby(STATS_KEY, "hit_bytes", hit_bytes)
+        pipe.hincrby(STATS_KEY, "miss_bytes", miss_bytes)
+        pipe.hincrby(STATS_KEY, "requests", 1)
+        pipe.execute()
+    except Exception as e:
+        logger.debug(f"Unable to record VOD cache stats: {e}")
+
+
+def get_stats():
+    """Cache usage since the counters were created, for VODStatsView"""
+    stats = {"enabled": enabled(), "hit_bytes": 0, "miss_bytes": 0, "requests": 0, "disk_bytes": 0}
+    redis_client = RedisClient.get_client()
+    if redis_client is not None:
+        try:
+            for field, value in redis_client.hgetall(STATS_KEY).items():
+                field = field.decode("utf-8") if isinstance(field, bytes) else field
+                stats[field] = int(value)
+        except Exception as e:
+            logger.debug(f"Unable to read VOD cache stats: {e}")
+    served = stats["hit_bytes"] + stats["miss_bytes"]
+    stats["hit_rate"] = round(stats["hit_bytes"] / served, 4) if served else None
+    stats["max_bytes"] = settings.VOD_BLOCK_CACHE_MAX_BYTES
+    return stats
+
+
+class CachedRangeStream:
+    """
+    Bytes first..last of a file, read from cached blocks where possible.
+
+    Runs of missing blocks are requested from the provider with
+    fetch_range(start, end), widened to block boundaries so every block that
+    arrives can be stored. An upstream response that is already open (the
+    session's first request, which told us the file size) can be passed as
+    `response`; it is relayed as it is and its complete blocks are stored.
+    Used in place of the upstream response: the VOD stream generator only
+    calls iter_content() and close().
+    """
+
+    def __init__(self, key, first, last, content_length, fetch_range, response=None):
+        self.key = key
+        self.first = first
+        self.last = last
+        self.content_length = content_length
+        self.fetch_range = fetch_range
+        self.response = response
+        self.hit_bytes = 0
+        self.miss_bytes = 0
+
+    def iter_content(self, chunk_size=8192):
+        try:
+            if self.response is not None:
+                yield from self._relay(self.response, self.first, self.first, self.last, chunk_size)
+                return
+
+            block_size = settings.VOD_BLOCK_CACHE_BLOCK_SIZE
+            last_block = self.last // block_size
+            position = self.first
+            while position <= self.last:
+                block = position // block_size
+                data = read_block(self.key, block, self.content_length)
+                if data is not None:
+                    piece = data[position - block * block_size:self.last + 1 - block * block_size]
+                    self.hit_bytes += len(piece)
+                    position += len(piece)
+                    for i in range(0, len(piece), chunk_size):
+                        yield piece[i:i + chunk_size]
+                    continue
+
+                run_end = block
+                while run_end < last_block and not has_block(self.key, run_end + 1, self.content_length):
+                    run_end += 1
+                fetch_first = block * block_size
+                fetch_last = min((run_end + 1) * block_size, self.content_length) - 1
+                self.response = self.fetch_range(fetch_first, fetch_last)
+                yield from self._relay(self.response, fetch_first, position, self.last, chunk_size)
+                self.response.close()
+                self.response = None
+                position = fetch_last + 1
+        finally:
+            record_usage(self.hit_bytes, self.miss_bytes)
+
+    def _relay(self, response, offset, out_first, out_last, chunk_size):
+        """Yield bytes out_first..out_last of a response starting at file offset `offset`, storing whole blocks"""
+        block_size = settings.VOD_BLOCK_CACHE_BLOCK_SIZE
+        if response.status_code == 200:
+            # The provider ignored the Range header and sent the whole file
+            offset = 0
+        fetch_last = max(out_last, min((out_last // block_size + 1) * block_size, self.content_length) - 1)
+        pending = bytearray()
+        # Only blocks received from their first byte can be stored
+        pending_block = offset // block_size if offset % block_size == 0 else None
+
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if not chunk:
+                continue
+            end = offset + len(chunk)
+            lo, hi = max(offset, out_first), min(end, out_last + 1)
+            if lo < hi:
+                self.miss_bytes += hi - lo
+                yield chunk[lo - offset:hi - offset]
+
+            position = offset
+            while position < end:
+                block = position // block_size
+                block_end = min((block + 1) * block_size, self.content_length)
+                take = min(end, block_end) - position
+                if pending_block == block:
+                    pending += chunk[position - offset:position - offset + take]
+                position += take
+                if position == block_end:
+                    if pending_block == block:
+                        write_block(self.key, block, bytes(pending))
+                    pending = bytearray()
+                    pending_block = block + 1
+            offset = end
+            if offset > fetch_last:
+                break
+
+    def close(self):
+        if self.response is not None:
+            self.response.close()
+            self.response = None
@@ -20,6 +20,8 @@ from django.http import StreamingHttpResponse, HttpResponse
 from core.utils import RedisClient
 from apps.vod.models import Movie, Episode
 from apps.m3u.models import M3UAccountProfile
+from . import block_cache
+from .block_cache import CachedRangeStream
 
 logger = logging.getLogger("vod_proxy")
 
@@ -350,6 +352,29 @@ class RedisBackedVODConnection:
             target_url = state.final_url if state.final_url else state.stream_url
             allow_redirects = not state.final_url  # Only follow redirects if we don't have final URL
 
+            def fetch_range(first, last):
+                """Upstream request for the blocks the cache is missing"""
+                block_headers = dict(state.headers, Range=f"bytes={first}-{last}")
+                block_response = self.local_session.get(
+                    target_url,
+                    headers=block_headers,
+                    stream=True,
+                    timeout=(10, 30),
+                    allow_redirects=allow_redirects
+                )
+                block_response.raise_for_status()
+                return block_response
+
+            # Once the file size is known, ranges are served from the block cache
+            cache_key = self._block_cache_key(state)
+            bounds = self._range_bounds(range_header, int(state.content_length)) if cache_key else None
+            if bounds and state.request_count > 1:
+                first, last = bounds
+                logger.info(f"[{self.session_id}] Serving request #{state.request_count} through the VOD block cache: bytes {first}-{last}")
+                self._save_connection_state(state)
+                self.local_response = CachedRangeStream(cache_key, first, last, int(state.content_length), fetch_range)
+                return self.local_response
+
             logger.info(f"[{self.session_id}] Making request #{state.request_count} to {'final' if state.final_url else 'original'} URL")
 
             # Make request
@@ -411,6 +436,14 @@ class RedisBackedVODConnection:
 
                 logger.info(f"[{self.session_id}] Updated connection state: length={state.content_length}, type={state.content_type}")
 
+                # Store the blocks of the first response too, if it spans the whole file size we just learned
+                cache_key = self._block_cache_key(state)
+                if cache_key and self._spans_file(response, int(state.content_length)):
+                    first, last = block_cache.response_range(response, int(state.content_length))
+                    response = CachedRangeStream(
+                        cache_key, first, last, int(state.content_length), fetch_range, response=response
+                    )
+
             # Save updated state
             self._save_connection_state(state)
 
@@ -422,6 +455,38 @@ class RedisBackedVODConnection:
             self.cleanup()
             raise
 
+    @staticmethod
+    def _block_cache_key(state: SerializableConnectionState) -> Optional[str]:
+        """Block cache key of the session's file, or None if it can't be cached"""
+        if not block_cache.enabled() or not state.content_uuid:
+            return None
+        if not state.content_length or not str(state.content_length).isdigit():
+            return None
+        if state.utc_start or state.utc_end or state.offset:
+            # Timeshifted requests don't return the same file
+            return None
+        return block_cache.cache_key(state.content_uuid, int(state.content_length))
+
+    @staticmethod
+    def _range_bounds(range_header: str, content_length: int):
+        """(first, last) byte of a validated range header, the whole file without one, None if unparseable"""
+        if not range_header:
+            return 0, content_length - 1
+        match = re.fullmatch(r'bytes=(\d+)-(\d+)', range_header.strip())
+        if not match:
+            return None
+        return int(match.group(1)), int(match.group(2))
+
+    @staticmethod
+    def _spans_file(response, content_length: int) -> bool:
+        """Whether a response's byte offsets are relative to the whole file (not a compressed or unsized body)"""
+        if response.headers.get('content-encoding') not in (None, '', 'identity'):
+            return False
+        if response.status_code == 200:
+            return True
+        content_range = response.headers.get('content-range', '')
+        return response.status_code == 206 and content_range.endswith(f"/{content_length}")
+
     def _validate_range_header(self, range_header: str, content_length: int):
         """Validate range header against content length"""
         try:
@@ -17,6 +17,7 @@ from apps.m3u.models import M3UAccount, M3UAccountProfile
 from apps.proxy.vod_proxy.connection_manager import VODConnectionManager
 from apps.proxy.vod_proxy.multi_worker_connection_manager import MultiWorkerVODConnectionManager, infer_content_type_from_url
 from .utils import get_client_info, create_vod_response
+from . import block_cache
 
 logger = logging.getLogger(__name__)
 
@@ -1005,6 +1006,7 @@ class VODStatsView(View):
             return JsonResponse({
                 'vod_connections': list(content_stats.values()),
                 'total_connections': len(connections),
+                'block_cache': block_cache.get_stats(),
                 'timestamp': current_time
             })
 
@@ -71,6 +71,10 @@ def refresh_vod_content(account_id):
         send_m3u_update(account_id, "vod_refresh", 100, status="success",
                        message=f"VOD refresh completed in {duration:.2f} seconds")
 
+        # Warm the logo cache for new movie/series artwork
+        from apps.channels.tasks import prefetch_logos
+        prefetch_logos.delay()
+
         return f"Batch VOD refresh completed for account {account.name} in {duration:.2f} seconds"
 
     except Exception as e:
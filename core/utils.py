@@ -214,6 +214,36 @@ def release_task_lock(task_name, id):
     # Remove the lock
     redis_client.delete(lock_id)
 
+def acquire_task_locks(task_name, ids):
+    """Acquire the task lock for each id in one round trip. Returns the ids whose lock was acquired."""
+    ids = list(ids)
+    if not ids:
+        return set()
+    redis_client = RedisClient.get_client()
+    pipe = redis_client.pipeline()
+    for id in ids:
+        pipe.set(f"task_lock_{task_name}_{id}", "locked", ex=300, nx=True)
+    return {id for id, acquired in zip(ids, pipe.execute()) if acquired}
+
+def refresh_task_locks(task_name, ids):
+    """Reset the expiry of held task locks, for tasks that can outlive the 300s lock TTL."""
+    ids = list(ids)
+    if not ids:
+        return
+    redis_client = RedisClient.get_client()
+    pipe = redis_client.pipeline()
+    for id in ids:
+        pipe.expire(f"task_lock_{task_name}_{id}", 300)
+    pipe.execute()
+
+def release_task_locks(task_name, ids):
+    """Release the task lock for each id."""
+    ids = list(ids)
+    if not ids:
+        return
+    redis_client = RedisClient.get_client()
+    redis_client.delete(*(f"task_lock_{task_name}_{id}" for id in ids))
+
 def send_websocket_update(group_name, event_type, data, collect_garbage=False):
     """
     Standardized function to send WebSocket updates with proper memory management.
@@ -221,6 +221,29 @@ CELERY_BEAT_SCHEDULE = {
 MEDIA_ROOT = BASE_DIR / "media"
 MEDIA_URL = "/media/"
 
+# Rendered XMLTV output cache (set TTL to 0 to always render on request)
+EPG_OUTPUT_CACHE_DIR = os.environ.get("DISPATCHARR_EPG_OUTPUT_CACHE_DIR", "/data/cache/epg_output")
+EPG_OUTPUT_CACHE_TTL = int(os.environ.get("DISPATCHARR_EPG_OUTPUT_CACHE_TTL", 900))  # Seconds
+
+# Per-EPG-source sentence-transformer embeddings used by ML-assisted EPG matching
+EPG_EMBEDDING_CACHE_DIR = os.environ.get("DISPATCHARR_EPG_EMBEDDING_CACHE_DIR", "/data/cache/epg_embeddings")
+
+# Remote logo cache. Kept out of /data/logos, which is scanned for user-provided logo files.
+LOGO_CACHE_DIR = os.environ.get("DISPATCHARR_LOGO_CACHE_DIR", "/data/cache/logos")
+LOGO_CACHE_TTL = int(os.environ.get("DISPATCHARR_LOGO_CACHE_TTL", 7 * 86400))  # Seconds before revalidating
+LOGO_CACHE_NEGATIVE_TTL = int(os.environ.get("DISPATCHARR_LOGO_CACHE_NEGATIVE_TTL", 3600))  # Seconds to remember 404s
+LOGO_CACHE_MAX_BYTES = int(os.environ.get("DISPATCHARR_LOGO_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# nginx internal location aliased to LOGO_CACHE_DIR (see docker/nginx.conf); empty to always stream from Django
+LOGO_CACHE_ACCEL_PREFIX = os.environ.get("DISPATCHARR_LOGO_CACHE_ACCEL_PREFIX", "/internal/logo-cache/")
+# Background prefetch after M3U/VOD refreshes: total parallel fetches, and per upstream host
+LOGO_PREFETCH_WORKERS = int(os.environ.get("DISPATCHARR_LOGO_PREFETCH_WORKERS", 16))
+LOGO_PREFETCH_PER_HOST = int(os.environ.get("DISPATCHARR_LOGO_PREFETCH_PER_HOST", 4))
+
+# Block cache of proxied VOD bytes, shared by the workers on this host (set max bytes to 0 to disable)
+VOD_BLOCK_CACHE_DIR = os.environ.get("DISPATCHARR_VOD_BLOCK_CACHE_DIR", "/data/cache/vod_blocks")
+VOD_BLOCK_CACHE_MAX_BYTES = int(os.environ.get("DISPATCHARR_VOD_BLOCK_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+VOD_BLOCK_CACHE_BLOCK_SIZE = int(os.environ.get("DISPATCHARR_VOD_BLOCK_CACHE_BLOCK_SIZE", 1024 * 1024))
+
 
 SERVER_IP = "127.0.0.1"
 
@@ -34,6 +34,7 @@ import {
   NumberInput,
   Image,
   UnstyledButton,
+  Switch,
 } from '@mantine/core';
 import { notifications } from '@mantine/notifications';
 import { ListOrdered, SquarePlus, SquareX, X, Zap } from 'lucide-react';
@@ -305,6 +306,7 @@ const ChannelForm = ({ channel = null, isOpen, onClose }) => {
       epg_data_id: '',
       logo_id: '',
       user_level: '0',
+      hot_standby: false,
     },
     validationSchema: Yup.object({
       name: Yup.string().required('Name is required'),
@@ -405,6 +407,7 @@ const ChannelForm = ({ channel = null, isOpen, onClose }) => {
         epg_data_id: channel.epg_data_id ?? '',
         logo_id: channel.logo_id ? `${channel.logo_id}` : '',
         user_level: `${channel.user_level}`,
+        hot_standby: channel.hot_standby ?? false,
       });
 
       setChannelStreams(channel.streams || []);
@@ -656,6 +659,22 @@ const ChannelForm = ({ channel = null, isOpen, onClose }) => {
                   formik.errors.user_level ? formik.touched.user_level : ''
                 }
               />
+
+              <Group justify="space-between">
+                <Box>Hot Standby</Box>
+                <Switch
+                  id="hot_standby"
+                  name="hot_standby"
+                  description="Keep a warm connection to the next stream for near-instant failover (uses an extra provider connection)"
+                  checked={formik.values.hot_standby}
+                  onChange={(event) =>
+                    formik.setFieldValue(
+                      'hot_standby',
+                      event.currentTarget.checked
+                    )
+                  }
+                />
+              </Group>
             </Stack>
 
             <Divider size="sm" orientation="vertical" />